@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+'''
+Pipelined out-of-core AO->MO transformation.
+
+With pipeline_depth > 0, ao2mo.outcore.half_e1 (and general, full) evaluates
+the AO integrals, transforms the first two indices and writes to the HDF5
+file in three overlapping stages.  This script compares the throughput of
+the first half transformation with and without the pipeline against the raw
+disk bandwidth for alkane chains of increasing size.
+
+Usage:
+    python 23-outcore_pipeline.py [nao_max]
+'''
+
+import sys
+import time
+import numpy
+from pyscf import gto, lib
+from pyscf.ao2mo import outcore
+
+def alkane(n):
+    atoms = []
+    for i in range(n):
+        x = i * 1.26
+        z = .44 * (i % 2)
+        atoms.append(['C', (x, 0, z)])
+        atoms.append(['H', (x, .89, z + .63*(1-2*(i%2)))])
+        atoms.append(['H', (x, -.89, z + .63*(1-2*(i%2)))])
+    atoms.append(['H', (-1.09, 0, 0)])
+    atoms.append(['H', ((n-1)*1.26 + 1.09, 0, .44*((n-1)%2))])
+    return gto.M(atom=atoms, basis='ccpvdz', verbose=0)
+
+def disk_bandwidth(nwords=2**27):
+    '''Sequential HDF5 write bandwidth in MB/s'''
+    ftmp = lib.H5TmpFile()
+    buf = numpy.random.random(nwords // 8)
+    t0 = time.time()
+    dset = ftmp.create_dataset('x', (8, buf.size), 'f8')
+    for i in range(8):
+        dset[i] = buf
+    ftmp.flush()
+    return nwords * 8e-6 / (time.time() - t0)
+
+nao_max = 2000
+if len(sys.argv) > 1:
+    nao_max = int(sys.argv[1])
+
+print('Disk bandwidth %.1f MB/s' % disk_bandwidth())
+print('%6s %6s %12s %14s %14s' % ('nao', 'nocc', 'size (MB)',
+                                   'serial (MB/s)', 'pipeline (MB/s)'))
+for n in (20, 30, 45, 60, 83):
+    mol = alkane(n)
+    nao = mol.nao_nr()
+    if nao > nao_max:
+        break
+    nocc = mol.nelectron // 2
+    mo = numpy.random.random((nao,nao))
+    mos = (mo[:,:nocc], mo[:,:nocc])
+    size = nocc*(nocc+1)//2 * nao*(nao+1)//2 * 8e-6
+
+    rates = []
+    for depth in (0, 2):
+        fswap = lib.H5TmpFile()
+        t0 = time.time()
+        outcore.half_e1(mol, mos, fswap, max_memory=4000, pipeline_depth=depth)
+        rates.append(size / (time.time() - t0))
+        fswap = None
+    print('%6d %6d %12.1f %14.1f %14.1f' % (nao, nocc, size, rates[0], rates[1]))
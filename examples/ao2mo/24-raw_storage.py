@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+'''
+Raw binary storage for the out-of-core integral files.
+
+The functions ao2mo.outcore.full/general and df.outcore.cholesky_eri accept
+the argument storage='raw' to save the integrals (and the temporary swap
+files) with lib.RawFile instead of HDF5.  The datasets of a raw file are
+numpy.memmap arrays.  Slices of the arrays do not copy the data, and the
+reads from multiple threads are not serialized by the global lock of h5py.
+
+This script compares the two backends for the write of the transformed
+integrals and for the multithreaded read of the integral file.
+'''
+
+import time
+import tempfile
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+from pyscf import gto, scf, lib, ao2mo, df
+
+mol = gto.M(atom='''
+C       -0.65830719      0.61123287     -0.00800148
+C        0.73685281      0.61123287     -0.00800148
+C        1.43439081      1.81898387     -0.00800148
+C        0.73673681      3.02749287     -0.00920048
+C       -0.65808819      3.02741487     -0.00967948
+C       -1.35568919      1.81920887     -0.00868348
+H       -1.20806619     -0.34108413     -0.00755148
+H        1.28636081     -0.34128013     -0.00668648
+H        2.53407081      1.81906387     -0.00736748
+H        1.28693681      3.97963587     -0.00925948
+H       -1.20821019      3.97969587     -0.01063248
+H       -2.45529319      1.81939187     -0.00886348''',
+            basis='ccpvdz', verbose=0)
+mf = scf.RHF(mol).density_fit().run()
+nthreads = lib.num_threads()
+
+def threaded_read(feri, blksize=64):
+    '''Each thread reads a row block and contracts it with a vector'''
+    eri = feri['eri_mo']
+    nrow, ncol = eri.shape
+    v = numpy.ones(ncol)
+    def task(p0):
+        return numpy.dot(numpy.asarray(eri[p0:p0+blksize]), v).sum()
+    with lib.with_omp_threads(1):
+        with ThreadPoolExecutor(nthreads) as executor:
+            return sum(executor.map(task, range(0, nrow, blksize)))
+
+for storage in ('hdf5', 'raw'):
+    ftmp = lib.H5TmpFile() if storage == 'hdf5' else lib.RawTmpFile()
+    t0 = time.time()
+    ao2mo.outcore.full(mol, mf.mo_coeff, ftmp, max_memory=500, storage=storage)
+    t1 = time.time()
+    threaded_read(ftmp)
+    t2 = time.time()
+    print('%-4s ao2mo.outcore.full %6.2f s,  read with %d threads %6.2f s'
+          % (storage, t1-t0, nthreads, t2-t1))
+
+#
+# DF tensor in the raw format.  The DF object reads the raw file as well.
+#
+for storage in ('hdf5', 'raw'):
+    cderi = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+    t0 = time.time()
+    df.outcore.cholesky_eri(mol, cderi.name, max_memory=200, storage=storage)
+    t1 = time.time()
+    mydf = df.DF(mol)
+    mydf._cderi = cderi.name
+    for eri1 in mydf.loop():
+        pass
+    print('%-4s df.outcore.cholesky_eri %6.2f s,  DF.loop %6.2f s'
+          % (storage, t1-t0, time.time()-t1))
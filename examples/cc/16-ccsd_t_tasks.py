@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+
+'''
+Process-parallel CCSD(T) with checkpoints.
+
+With nproc > 1, the (a,b) virtual blocks of the (T) correction are evaluated
+as independent tasks by nproc processes.  The sorted integrals and
+amplitudes are shared by the processes through a memory-mapped file.  If
+chkfile is given, the energy contribution of every completed block is saved
+in the chkfile.  When the calculation is interrupted, calling ccsd_t again
+with the same chkfile skips the blocks which have been completed.
+'''
+
+from pyscf import gto, scf, cc, lib
+
+mol = gto.M(atom='''
+O    0.000000    0.000000    0.117790
+H    0.000000    0.755453   -0.471161
+H    0.000000   -0.755453   -0.471161''',
+            basis='ccpvtz', verbose=4)
+mf = scf.RHF(mol).run()
+mycc = cc.CCSD(mf).run()
+
+et = mycc.ccsd_t(nproc=lib.num_threads(), chkfile='ccsd_t.chk')
+
+# The (T) tasks recorded in ccsd_t.chk are not computed again
+et = mycc.ccsd_t(nproc=lib.num_threads(), chkfile='ccsd_t.chk')
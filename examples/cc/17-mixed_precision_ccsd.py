@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+'''
+Mixed precision CCSD.
+
+With mixed_precision = True, the T2 amplitudes, the DIIS vectors and the
+intermediates of the out-of-core algorithm are stored in single precision in
+the early iterations.  If the MO integrals do not fit in memory, they are
+saved on disk in single precision as well, which halves the I/O of each
+iteration.  The residuals and the correlation energy are computed in double
+precision.  When the change of the amplitudes drops below
+mixed_precision_tol, the amplitudes (and integrals) are promoted to double
+precision and the iterations continue to the regular convergence criteria.
+'''
+
+import time
+from pyscf import gto, scf, cc
+
+mol = gto.M(atom='''
+O    0.000000    0.000000    0.117790
+H    0.000000    0.755453   -0.471161
+H    0.000000   -0.755453   -0.471161''',
+            basis='ccpvtz', verbose=4)
+mf = scf.RHF(mol).run()
+
+t0 = time.time()
+mycc = cc.CCSD(mf)
+mycc.max_memory = 200  # to use the out-of-core integrals
+mycc.kernel()
+print('Double precision CCSD %.2f s' % (time.time() - t0))
+
+t0 = time.time()
+mycc = cc.CCSD(mf)
+mycc.max_memory = 200
+mycc.mixed_precision = True
+mycc.mixed_precision_tol = 1e-3
+mycc.kernel()
+print('Mixed precision CCSD %.2f s' % (time.time() - t0))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+'''
+CCSD with multiple processes on a single node.
+
+With nproc > 1, the amplitude equations are evaluated by nproc forked
+processes.  The vvvv, ovvv and voov terms are distributed over the blocks
+of virtual orbitals, so that each process reads its own part of the
+integrals.  The amplitudes and the integrals are shared by the processes
+through memory-mapped files.  Each process runs with one OpenMP thread, so nproc is
+usually set to the number of physical cores.  This avoids the poor scaling
+of the OpenMP threads in the out-of-core algorithm.
+'''
+
+import time
+from pyscf import gto, scf, cc, lib
+
+mol = gto.M(atom='''
+O    0.000000    0.000000    0.117790
+H    0.000000    0.755453   -0.471161
+H    0.000000   -0.755453   -0.471161''',
+            basis='ccpvtz', verbose=4)
+mf = scf.RHF(mol).run()
+
+t0 = time.time()
+mycc = cc.CCSD(mf)
+mycc.kernel()
+print('CCSD with %d threads %.2f s' % (lib.num_threads(), time.time() - t0))
+
+t0 = time.time()
+mycc = cc.CCSD(mf)
+mycc.nproc = lib.num_threads()
+mycc.kernel()
+print('CCSD with %d processes %.2f s' % (mycc.nproc, time.time() - t0))
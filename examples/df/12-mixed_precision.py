@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+'''
+Mixed precision DF-SCF.
+
+With mixed_precision = True, the DF object keeps a single precision (float32)
+copy of the 3-index tensor.  The SCF iterations use the float32 tensor in the
+incremental J/K builds until the density matrix changes less than
+mixed_precision_tol.  Then the J/K matrices are rebuilt with the double
+precision tensor, so the converged energy is the same as the regular DF-SCF.
+'''
+
+import time
+from pyscf import gto, scf
+
+mol = gto.M(atom='''
+C       -0.65830719      0.61123287     -0.00800148
+C        0.73685281      0.61123287     -0.00800148
+C        1.43439081      1.81898387     -0.00800148
+C        0.73673681      3.02749287     -0.00920048
+C       -0.65808819      3.02741487     -0.00967948
+C       -1.35568919      1.81920887     -0.00868348
+H       -1.20806619     -0.34108413     -0.00755148
+H        1.28636081     -0.34128013     -0.00668648
+H        2.53407081      1.81906387     -0.00736748
+H        1.28693681      3.97963587     -0.00925948
+H       -1.20821019      3.97969587     -0.01063248
+H       -2.45529319      1.81939187     -0.00886348''',
+            basis='ccpvtz', verbose=0)
+
+t0 = time.time()
+e0 = scf.RHF(mol).density_fit().kernel()
+print('float64 DF-RHF %.10f  %.2f s' % (e0, time.time() - t0))
+
+t0 = time.time()
+mf = scf.RHF(mol).density_fit()
+mf.with_df.mixed_precision = True
+mf.with_df.mixed_precision_tol = 1e-4
+e1 = mf.kernel()
+print('mixed precision DF-RHF %.10f  %.2f s' % (e1, time.time() - t0))
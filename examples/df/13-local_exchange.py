@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+'''
+Local exchange for DF-SCF.
+
+With DF.local_exchange = True, the exchange matrix is computed with the
+Cholesky orbitals of the density matrix.  These orbitals are localized by
+construction.  Only the blocks of the half-transformed DF integrals (P|i nu)
+whose Schwarz estimates exceed DF.local_exchange_tol are evaluated, so the
+cost of K grows nearly linearly with the system size for large molecules.
+'''
+
+import time
+import numpy
+from pyscf import gto, scf
+
+def water_chain(n):
+    atoms = []
+    for i in range(n):
+        x = i * 3.
+        atoms.append(['O', (x, 0,     0)])
+        atoms.append(['H', (x, .757,  .587)])
+        atoms.append(['H', (x, -.757, .587)])
+    return gto.M(atom=atoms, basis='ccpvdz', verbose=0)
+
+mol = water_chain(12)
+mf = scf.RHF(mol).density_fit()
+dm = mf.get_init_guess()
+
+t0 = time.time()
+vj0, vk0 = mf.get_jk(mol, dm)
+print('Dense K: %.2f s' % (time.time() - t0))
+
+for tol in (1e-10, 1e-8):
+    mf.with_df.local_exchange = True
+    mf.with_df.local_exchange_tol = tol
+    t0 = time.time()
+    vj1, vk1 = mf.get_jk(mol, dm)
+    print('Local K, tol %g: %.2f s, error %.2g'
+          % (tol, time.time() - t0, abs(vk1-vk0).max()))
+
+mf.with_df.local_exchange_tol = 1e-10
+mf.run()
+print('E(DF-RHF) with local exchange = %.12f' % mf.e_tot)
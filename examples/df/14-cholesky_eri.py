@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+'''
+Pivoted Cholesky decomposition of the AO ERIs as an alternative to the
+auxiliary basis density fitting.
+
+df.CDDF generates the Cholesky vectors of the ERI matrix on the fly.  The
+accuracy is controlled by the threshold tol (the largest error of the
+integrals) rather than by the choice of the auxiliary basis.  The CDDF
+object can be used wherever a DF object is used (DF-SCF, DF-MP2, DF-CCSD).
+'''
+
+from pyscf import gto, scf, df, mp, cc
+
+mol = gto.M(atom='''
+O     0    0.       0.
+H     0    -0.757   0.587
+H     0    0.757    0.587''',
+            basis='ccpvtz')
+
+e_ref = scf.RHF(mol).run().e_tot
+e_df = scf.RHF(mol).density_fit().run().e_tot
+print('Error of DF with auxbasis %.3g' % (e_df - e_ref))
+
+for tol in (1e-4, 1e-6, 1e-8):
+    cd = df.CDDF(mol, tol=tol)
+    mf = scf.RHF(mol).density_fit(with_df=cd).run()
+    print('tol %g, %d Cholesky vectors, error %.3g' %
+          (tol, cd.get_naoaux(), mf.e_tot - e_ref))
+
+# The Cholesky vectors are shared by the post-HF methods
+mf = scf.RHF(mol).density_fit(with_df=df.CDDF(mol, tol=1e-6)).run()
+mp.dfmp2.DFMP2(mf).run()
+cc.CCSD(mf).run()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+'''
+Scratch storage of the Davidson subspace vectors.
+
+When the subspace vectors do not fit in max_memory, the Davidson solver
+saves them in a scratch file.  The config option
+lib_linalg_helper_davidson_subspace_storage selects the storage:
+
+* 'mmap' (default): a memory-mapped raw file.  The vectors are written in a
+  background thread and are read from the memory until they are written.
+* 'hdf5': an HDF5 temporary file which is flushed after each update.
+
+With lib_linalg_helper_davidson_subspace_single_precision = True, the old
+subspace vectors of the 'mmap' storage are kept in single precision.  This
+halves the size of the scratch file.  The errors of the eigenvalues are
+~1e-7 (relative).
+
+The config options can be set in the PySCF config file or modified in the
+module pyscf.lib.linalg_helper, as shown below.
+'''
+
+import time
+from pyscf import gto, scf, ao2mo, fci, cc, lib
+from pyscf.lib import linalg_helper
+
+mol = gto.M(atom='O 0 0 0; H 0 -.757 .587; H 0 .757 .587', basis='6-31g',
+            verbose=0)
+mf = scf.RHF(mol).run()
+
+norb, nelec = 13, 8
+mo = mf.mo_coeff[:,:norb]
+h1 = mo.T.dot(mf.get_hcore()).dot(mo)
+eri = ao2mo.kernel(mol, mo)
+
+def fci_run():
+    cis = fci.direct_spin1.FCI(mol)
+    cis.max_memory = 100  # to save the subspace vectors on disk
+    return cis.kernel(h1, eri, norb, nelec)[0]
+
+def eom_run():
+    mycc = cc.CCSD(mf).run()
+    eom = mycc.EOMEE()
+    eom.max_memory = 1
+    return eom.eeccsd(nroots=3)[0]
+
+for storage, single in (('hdf5', False), ('mmap', False), ('mmap', True)):
+    with lib.temporary_env(linalg_helper, SUBSPACE_STORAGE=storage,
+                           SUBSPACE_SINGLE_PRECISION=single):
+        t0 = time.time()
+        e_fci = fci_run()
+        t1 = time.time()
+        e_eom = eom_run()
+        t2 = time.time()
+    print('%s single_precision=%s' % (storage, single))
+    print('    FCI      %.2f s  %s' % (t1-t0, e_fci))
+    print('    EOM-CCSD %.2f s  %s' % (t2-t1, e_eom))
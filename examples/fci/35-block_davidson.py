@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+'''
+Block Davidson solver with thick restart.
+
+lib.block_davidson1 is lib.davidson1 with thick_restart=True.  When the
+subspace is full, it keeps the lowest Ritz vectors and the eigenvectors of
+the previous iteration (the LOBPCG conjugate directions) instead of
+restarting from the current eigenvectors only.  No matrix-vector
+multiplication is needed for the restart.  It is most useful when many roots
+are required.
+
+The FCI and TDDFT solvers call lib.davidson1.  The solver can be replaced in
+the context of lib.temporary_env.  This example counts the number of
+matrix-vector multiplications of the two solvers.
+'''
+
+import numpy
+from pyscf import gto, scf, ao2mo, fci, tdscf, lib
+
+class CountMatvec(object):
+    def __init__(self, solver):
+        self.solver = solver
+        self.count = 0
+    def __call__(self, aop, *args, **kwargs):
+        def counted_aop(xs):
+            self.count += len(xs)
+            return aop(xs)
+        return self.solver(counted_aop, *args, **kwargs)
+
+mol = gto.M(atom='O 0 0 0; H 0 -.757 .587; H 0 .757 .587', basis='6-31g',
+            verbose=0)
+mf = scf.RHF(mol).run()
+norb, nelec = 11, 8
+mo = mf.mo_coeff[:,:norb]
+h1 = mo.T.dot(mf.get_hcore()).dot(mo)
+eri = ao2mo.kernel(mol, mo)
+
+for solver in (lib.davidson1, lib.block_davidson1):
+    counter = CountMatvec(solver)
+    with lib.temporary_env(lib, davidson1=counter):
+        e = fci.direct_spin1.FCI().kernel(h1, eri, norb, nelec, nroots=4)[0]
+    print('FCI 4 roots, %-16s %4d matvec  E = %s' % (solver.__name__, counter.count, e))
+
+mol = gto.M(atom='O 0 0 0; H 0 -.757 .587; H 0 .757 .587', basis='aug-ccpvdz',
+            verbose=0)
+mf = scf.RHF(mol).run()
+for solver in (lib.davidson1, lib.block_davidson1):
+    counter = CountMatvec(solver)
+    with lib.temporary_env(lib, davidson1=counter):
+        e = tdscf.TDA(mf).kernel(nstates=15)[0]
+    print('TDA 15 states, %-16s %4d matvec  E[-1] = %.9f' % (solver.__name__, counter.count, e[-1]))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+'''
+Memory and wall time of the FCI sigma vector (direct_spin1.contract_2e) for
+different batch sizes of beta strings.
+
+contract_2e processes the beta strings in batches.  Each OpenMP thread holds
+an intermediate of na*blksize doubles, where na is the number of alpha
+strings.  The batch size is direct_spin1.STRB_BLKSIZE (112) by default.
+FCISolver passes its max_memory to contract_2e, and the batch size is
+reduced when the intermediates do not fit in max_memory.
+
+Each batch size is measured in a separate process to get the peak RSS.
+'''
+
+import time
+import resource
+import multiprocessing
+import numpy
+from pyscf import fci, lib
+from pyscf.fci import direct_spin1
+
+norb, nelec = 12, (6, 6)
+na = fci.cistring.num_strings(norb, nelec[0])
+numpy.random.seed(1)
+h1 = numpy.random.random((norb,norb))
+h1 = h1 + h1.T
+eri = numpy.random.random((norb,)*4) * .1
+eri = eri + eri.transpose(1,0,2,3)
+eri = eri + eri.transpose(0,1,3,2)
+eri = eri + eri.transpose(2,3,0,1)
+h2 = direct_spin1.absorb_h1e(h1, eri, norb, nelec, .5)
+link_index = direct_spin1._unpack(norb, nelec, None)
+
+def run(blksize, result):
+    ci0 = numpy.random.random((na,na))
+    rss0 = lib.current_memory()[0]
+    t0 = time.time()
+    with lib.temporary_env(direct_spin1, STRB_BLKSIZE=blksize, BLKMIN=1):
+        for i in range(3):
+            direct_spin1.contract_2e(h2, ci0, norb, nelec, link_index)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+    result.put(((time.time() - t0) / 3, peak - rss0))
+
+print('na = nb = %d, %d threads' % (na, lib.num_threads()))
+print('blksize  time/sigma (s)  peak RSS over ci0 (MB)')
+for blksize in (4, 16, 32, 64, 112, 256, 512):
+    result = multiprocessing.Queue()
+    p = multiprocessing.Process(target=run, args=(blksize, result))
+    p.start()
+    t, mem = result.get()
+    p.join()
+    print('%7d  %14.3f  %22.1f' % (blksize, t, mem))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+'''
+Distribute the direct SCF J/K builds over processes.
+
+By default, the direct SCF J/K matrices are computed with the OpenMP threads
+of one process.  Setting jk_nproc > 1 assigns the shell-quartet blocks to
+jk_nproc processes (each running one thread) based on the integral estimates
+of the direct SCF optimizer.  This example compares the two drivers.
+'''
+
+import time
+from pyscf import gto, scf, lib
+from pyscf.scf import _vhf
+
+mol = gto.M(atom='''
+C       -0.65830719      0.61123287     -0.00800148
+C        0.73685281      0.61123287     -0.00800148
+C        1.43439081      1.81898387     -0.00800148
+C        0.73673681      3.02749287     -0.00920048
+C       -0.65808819      3.02741487     -0.00967948
+C       -1.35568919      1.81920887     -0.00868348
+H       -1.20806619     -0.34108413     -0.00755148
+H        1.28636081     -0.34128013     -0.00668648
+H        2.53407081      1.81906387     -0.00736748
+H        1.28693681      3.97963587     -0.00925948
+H       -1.20821019      3.97969587     -0.01063248
+H       -2.45529319      1.81939187     -0.00886348''',
+            basis='ccpvdz')
+
+mf = scf.RHF(mol)
+mf.max_memory = 0  # to use direct SCF
+dm = mf.get_init_guess()
+mf.opt = mf.init_direct_scf()
+
+t0 = time.time()
+vj0, vk0 = mf.get_jk(mol, dm)
+print('OpenMP driver, %d threads: %.2f s' % (lib.num_threads(), time.time() - t0))
+
+nproc = lib.num_threads()
+mf.jk_nproc = nproc
+t0 = time.time()
+vj1, vk1 = mf.get_jk(mol, dm)
+print('Multiprocess driver, %d processes: %.2f s' % (nproc, time.time() - t0))
+print('Diff', abs(vj1-vj0).max(), abs(vk1-vk0).max())
+
+# Estimated costs of the shell-quartet blocks, which are used to balance the
+# workload of the processes
+costs = _vhf.direct_block_costs(mol._bas, mol.ao_loc_nr(), mf.opt)
+print('Number of blocks %d, max/mean cost %.2f' %
+      ((costs > 0).sum(), costs.max() / costs[costs > 0].mean()))
+
+mf.run()
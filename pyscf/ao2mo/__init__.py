@@ -31,6 +31,7 @@ Simple usage::
 import tempfile
 import numpy
 import h5py
+from pyscf import lib
 from pyscf.ao2mo import incore
 from pyscf.ao2mo import outcore
 from pyscf.ao2mo import r_outcore
@@ -149,7 +150,7 @@ def full(eri_or_mol, mo_coeff, erifile=None, dataname='eri_mo', intor='int2e',
         else:
             mod = outcore
 
-        if isinstance(erifile, (str, h5py.Group)): # args[0] is erifile
+        if isinstance(erifile, (str, h5py.Group, lib.RawGroup)): # args[0] is erifile
             return mod.full(eri_or_mol, mo_coeff, erifile, dataname, intor,
                             *args, **kwargs)
         elif isinstance(erifile, tempfile._TemporaryFileWrapper):
@@ -299,7 +300,7 @@ def general(eri_or_mol, mo_coeffs, erifile=None, dataname='eri_mo', intor='int2e
         else:
             mod = outcore
 
-        if isinstance(erifile, (str, h5py.Group)): # args[0] is erifile
+        if isinstance(erifile, (str, h5py.Group, lib.RawGroup)): # args[0] is erifile
             return mod.general(eri_or_mol, mo_coeffs, erifile, dataname, intor,
                                *args, **kwargs)
         elif isinstance(erifile, tempfile._TemporaryFileWrapper):
@@ -25,7 +25,7 @@ from pyscf import lib
 libao2mo = lib.load_library('libao2mo')
 
 class load(object):
-    '''load 2e integrals from hdf5 file
+    '''load 2e integrals from hdf5 file (or raw data file, see lib.RawFile)
 
     Usage:
         with load(erifile) as eri:
@@ -38,11 +38,11 @@ class load(object):
 
     def __enter__(self):
         if isinstance(self.eri, str):
-            feri = self.feri = h5py.File(self.eri, 'r')
-        elif isinstance(self.eri, h5py.Group):
+            feri = self.feri = lib.open_datafile(self.eri, 'r')
+        elif isinstance(self.eri, (h5py.Group, lib.RawGroup)):
             feri = self.eri
         elif isinstance(getattr(self.eri, 'name', None), str):
-            feri = self.feri = h5py.File(self.eri.name, 'r')
+            feri = self.feri = lib.open_datafile(self.eri.name, 'r')
         elif isinstance(self.eri, numpy.ndarray):
             return self.eri
         else:
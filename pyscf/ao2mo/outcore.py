@@ -27,12 +27,19 @@ IOBLK_SIZE = getattr(__config__, 'ao2mo_outcore_ioblk_size', 256)  # 256 MB
 IOBUF_WORDS = getattr(__config__, 'ao2mo_outcore_iobuf_words', 1e8)  # 800 MB
 IOBUF_ROW_MIN = getattr(__config__, 'ao2mo_outcore_row_min', 160)
 MAX_MEMORY = getattr(__config__, 'ao2mo_outcore_max_memory', 2000)  # 2GB
+# Number of blocks queued between the stages of the pipelined half_e1
+# transformation.  0 to disable the pipeline.
+PIPELINE_DEPTH = getattr(__config__, 'ao2mo_outcore_pipeline_depth', 0)
+# File format of the integral file and the swap file: 'hdf5' or 'raw' (see
+# pyscf.lib.rawfile)
+STORAGE = getattr(__config__, 'ao2mo_outcore_storage', 'hdf5')
 
 
 def full(mol, mo_coeff, erifile, dataname='eri_mo',
          intor='int2e', aosym='s4', comp=None,
          max_memory=MAX_MEMORY, ioblk_size=IOBLK_SIZE, verbose=logger.WARN,
-         compact=True):
+         compact=True, pipeline_depth=PIPELINE_DEPTH, storage=STORAGE,
+         dtype='f8'):
     r'''Transfer arbitrary spherical AO integrals to MO integrals for given orbitals
 
     Args:
@@ -40,7 +47,7 @@ def full(mol, mo_coeff, erifile, dataname='eri_mo',
             AO integrals will be generated in terms of mol._atm, mol._bas, mol._env
         mo_coeff : ndarray
             Transform (ij|kl) with the same set of orbitals.
-        erifile : str or h5py File or h5py Group object
+        erifile : str or h5py File or h5py Group or RawGroup object
             To store the transformed integrals, in HDF5 format.
 
     Kwargs:
@@ -79,6 +86,18 @@ def full(mol, mo_coeff, erifile, dataname='eri_mo',
             returned MO integrals has (up to 4-fold) permutation symmetry.
             If it's False, the function will abandon any permutation symmetry,
             and return the "plain" MO integrals
+        pipeline_depth : int
+            If > 0, the first half transformation runs in the pipelined mode
+            (see :func:`half_e1`).
+        storage : str
+            'hdf5' or 'raw'.  The file format of the temporary swap file, and
+            of erifile if it is given as a file name.  The 'raw' format
+            (:class:`lib.RawFile`) stores the integrals in memory-mapped
+            binary files.
+        dtype : str or numpy dtype
+            The data type of the MO integrals saved in erifile.  With 'f4',
+            the integrals are computed in double precision and saved in
+            single precision.
 
     Returns:
         None
@@ -108,13 +127,15 @@ def full(mol, mo_coeff, erifile, dataname='eri_mo',
     dataset ['eri_mo', 'new'], shape (3, 100, 55)
     '''
     general(mol, (mo_coeff,)*4, erifile, dataname,
-            intor, aosym, comp, max_memory, ioblk_size, verbose, compact)
+            intor, aosym, comp, max_memory, ioblk_size, verbose, compact,
+            pipeline_depth, storage, dtype)
     return erifile
 
 def general(mol, mo_coeffs, erifile, dataname='eri_mo',
             intor='int2e', aosym='s4', comp=None,
             max_memory=MAX_MEMORY, ioblk_size=IOBLK_SIZE, verbose=logger.WARN,
-            compact=True):
+            compact=True, pipeline_depth=PIPELINE_DEPTH, storage=STORAGE,
+            dtype='f8'):
     r'''For the given four sets of orbitals, transfer arbitrary spherical AO
     integrals to MO integrals on the fly.
 
@@ -124,7 +145,7 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
         mo_coeffs : 4-item list of ndarray
             Four sets of orbital coefficients, corresponding to the four
             indices of (ij|kl)
-        erifile : str or h5py File or h5py Group object
+        erifile : str or h5py File or h5py Group or RawGroup object
             To store the transformed integrals, in HDF5 format.
 
     Kwargs
@@ -163,6 +184,18 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
             returned MO integrals has (up to 4-fold) permutation symmetry.
             If it's False, the function will abandon any permutation symmetry,
             and return the "plain" MO integrals
+        pipeline_depth : int
+            If > 0, the first half transformation runs in the pipelined mode
+            (see :func:`half_e1`).
+        storage : str
+            'hdf5' or 'raw'.  The file format of the temporary swap file, and
+            of erifile if it is given as a file name.  The 'raw' format
+            (:class:`lib.RawFile`) stores the integrals in memory-mapped
+            binary files.
+        dtype : str or numpy dtype
+            The data type of the MO integrals saved in erifile.  With 'f4',
+            the integrals are computed in double precision and saved in
+            single precision.
 
     Returns:
         None
@@ -235,14 +268,9 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
 #        log.warn('low efficiency for AO to MO trans!')
 
     if isinstance(erifile, str):
-        if h5py.is_hdf5(erifile):
-            feri = h5py.File(erifile, 'a')
-            if dataname in feri:
-                del(feri[dataname])
-        else:
-            feri = h5py.File(erifile, 'w')
+        feri = _create_erifile(erifile, dataname, storage)
     else:
-        assert(isinstance(erifile, h5py.Group))
+        assert(isinstance(erifile, (h5py.Group, lib.RawGroup)))
         feri = erifile
 
     if comp == 1:
@@ -253,21 +281,22 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
         shape = (comp,nij_pair,nkl_pair)
 
     if nij_pair == 0 or nkl_pair == 0:
-        feri.create_dataset(dataname, shape, 'f8')
+        feri.create_dataset(dataname, shape, dtype)
         if isinstance(erifile, str):
             feri.close()
         return erifile
     else:
-        h5d_eri = feri.create_dataset(dataname, shape, 'f8', chunks=chunks)
+        h5d_eri = feri.create_dataset(dataname, shape, dtype, chunks=chunks)
 
     log.debug('MO integrals %s are saved in %s/%s', intor, erifile, dataname)
     log.debug('num. MO ints = %.8g, required disk %.8g MB',
-              float(nij_pair)*nkl_pair*comp, nij_pair*nkl_pair*comp*8/1e6)
+              float(nij_pair)*nkl_pair*comp,
+              nij_pair*nkl_pair*comp*numpy.dtype(dtype).itemsize/1e6)
 
 # transform e1
-    fswap = lib.H5TmpFile()
+    fswap = _tmpfile(storage=storage)
     half_e1(mol, mo_coeffs, fswap, intor, aosym, comp, max_memory, ioblk_size,
-            log, compact)
+            log, compact, pipeline_depth=pipeline_depth)
 
     time_1pass = log.timer('AO->MO transformation for %s 1 pass'%intor,
                            *time_0pass)
@@ -339,7 +368,8 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo',
 def half_e1(mol, mo_coeffs, swapfile,
             intor='int2e', aosym='s4', comp=1,
             max_memory=MAX_MEMORY, ioblk_size=IOBLK_SIZE, verbose=logger.WARN,
-            compact=True, ao2mopt=None):
+            compact=True, ao2mopt=None, pipeline_depth=PIPELINE_DEPTH,
+            storage=STORAGE):
     r'''Half transform arbitrary spherical AO integrals to MO integrals
     for the given two sets of orbitals
 
@@ -348,7 +378,7 @@ def half_e1(mol, mo_coeffs, swapfile,
             AO integrals will be generated in terms of mol._atm, mol._bas, mol._env
         mo_coeff : ndarray
             Transform (ij|kl) with the same set of orbitals.
-        swapfile : str or h5py File or h5py Group object
+        swapfile : str or h5py File or h5py Group or RawGroup object
             To store the transformed integrals, in HDF5 format.  The transformed
             integrals are saved in blocks.
 
@@ -386,6 +416,15 @@ def half_e1(mol, mo_coeffs, swapfile,
             and return the "plain" MO integrals
         ao2mopt : :class:`AO2MOpt` object
             Precomputed data to improve perfomance
+        pipeline_depth : int
+            If > 0, the AO integral evaluation, the first half transformation
+            and the HDF5 writes run in three threads, connected by queues
+            of pipeline_depth blocks (see :func:`lib.iter_in_background`).
+            Each stage then holds pipeline_depth+2 buffers, which are
+            sized to fit max_memory together.
+        storage : str
+            'hdf5' or 'raw'.  The file format of swapfile if it is given as
+            a file name (or None).
 
     Returns:
         None
@@ -406,12 +445,18 @@ def half_e1(mol, mo_coeffs, swapfile,
             incore._conc_mos(mo_coeffs[0], mo_coeffs[1],
                              compact and aosym in ('s4', 's2ij'))
 
+    # Number of buffers in each stage
+    if pipeline_depth > 0:
+        nbuf = pipeline_depth + 2
+    else:
+        nbuf = 1
     e1buflen, mem_words, iobuf_words, ioblk_words = \
-            guess_e1bufsize(max_memory, ioblk_size, nij_pair, nao_pair, comp)
+            guess_e1bufsize(max_memory/nbuf, ioblk_size, nij_pair, nao_pair, comp)
+    mem_words *= nbuf
     ioblk_size = ioblk_words * 8/1e6
 # The buffer to hold AO integrals in C code, see line (@)
-    aobuflen = max(int((mem_words - 2*comp*e1buflen*nij_pair) // (nao_pair*comp)),
-                   IOBUF_ROW_MIN)
+    aobuflen = max(int((mem_words - 2*nbuf*comp*e1buflen*nij_pair) //
+                       (nbuf*nao_pair*comp)), IOBUF_ROW_MIN)
     ao_loc = mol.ao_loc_nr('_cart' in intor)
     shranges = guess_shell_ranges(mol, (aosym in ('s4', 's2kl')), e1buflen,
                                   aobuflen, ao_loc)
@@ -422,10 +467,10 @@ def half_e1(mol, mo_coeffs, swapfile,
         else:
             ao2mopt = _ao2mo.AO2MOpt(mol, intor)
 
-    if isinstance(swapfile, h5py.Group):
+    if isinstance(swapfile, (h5py.Group, lib.RawGroup)):
         fswap = swapfile
     else:
-        fswap = lib.H5TmpFile(swapfile)
+        fswap = _tmpfile(swapfile, storage)
     for icomp in range(comp):
         g = fswap.create_group(str(icomp)) # for h5py old version
 
@@ -443,6 +488,13 @@ def half_e1(mol, mo_coeffs, swapfile,
 
     # transform e1
     ti0 = log.timer('Initializing ao2mo.outcore.half_e1', *time0)
+    if pipeline_depth > 0:
+        _half_e1_pipeline(mol, intor, aosym, comp, ao2mopt, moij, ijshape,
+                          ijmosym, nij_pair, nao_pair, shranges, e1buflen,
+                          save, pipeline_depth, log)
+        fswap = None
+        return swapfile
+
     with lib.call_in_background(save) as async_write:
         buf1 = numpy.empty((comp*e1buflen,nao_pair))
         buf2 = numpy.empty((comp*e1buflen,nij_pair))
@@ -472,6 +524,67 @@ def half_e1(mol, mo_coeffs, swapfile,
     fswap = None
     return swapfile
 
+def _half_e1_pipeline(mol, intor, aosym, comp, ao2mopt, moij, ijshape, ijmosym,
+                      nij_pair, nao_pair, shranges, e1buflen, save, depth, log):
+    '''Three-stage pipeline of half_e1: AO integrals (background thread) ->
+    first half transformation (background thread) -> save (current thread).
+    '''
+    nstep = len(shranges)
+    aobuflen = max([aoshs[2] for sh_range in shranges for aoshs in sh_range[3]])
+    nbuf = depth + 2
+
+    def gen_ao_ints():
+        bufs = [numpy.empty((comp*aobuflen,nao_pair)) for i in range(nbuf)]
+        k = 0
+        for istep, sh_range in enumerate(shranges):
+            for aoshs in sh_range[3]:
+                buf = _ao2mo.nr_e1fill(intor, aoshs, mol._atm, mol._bas, mol._env,
+                                       aosym, comp, ao2mopt, out=bufs[k%nbuf])
+                k += 1
+                yield istep, aoshs, buf.reshape(-1,nao_pair)
+
+    def transform(ao_blocks):
+        bufs = [numpy.empty((comp*e1buflen,nij_pair)) for i in range(nbuf)]
+        p1 = 0
+        for istep, aoshs, buf in ao_blocks:
+            buflen = shranges[istep][2]
+            if p1 == 0:
+                iobuf = numpy.ndarray((comp,buflen,nij_pair), buffer=bufs[istep%nbuf])
+            buf = _ao2mo.nr_e1(buf, moij, ijshape, aosym, ijmosym)
+            p0, p1 = p1, p1 + aoshs[2]
+            iobuf[:,p0:p1] = buf.reshape(comp,aoshs[2],nij_pair)
+            if p1 == buflen:
+                yield istep, iobuf
+                p1 = 0
+
+    ti0 = (time.clock(), time.time())
+    ao_blocks = lib.iter_in_background(gen_ao_ints(), depth)
+    for istep, iobuf in lib.iter_in_background(transform(ao_blocks), depth):
+        save(istep, iobuf)
+        ti0 = log.timer_debug1('pipeline gen AO/transform MO/save [%d/%d]'
+                               % (istep+1, nstep), *ti0)
+
+def _create_erifile(erifile, dataname, storage=STORAGE):
+    '''Open erifile to write dataname.  The other datasets are kept if
+    erifile is an existing file of the given storage format.'''
+    if storage == 'raw':
+        is_same_format = lib.is_rawfile(erifile)
+    else:
+        is_same_format = h5py.is_hdf5(erifile)
+    if is_same_format:
+        feri = lib.open_datafile(erifile, 'a', storage)
+        if dataname in feri:
+            del(feri[dataname])
+    else:
+        feri = lib.open_datafile(erifile, 'w', storage)
+    return feri
+
+def _tmpfile(filename=None, storage=STORAGE):
+    if storage == 'raw':
+        return lib.RawTmpFile(filename)
+    else:
+        return lib.H5TmpFile(filename)
+
 def _load_from_h5g(h5group, row0, row1, out=None):
     nkeys = len(h5group)
     dat = h5group['0']
@@ -104,6 +104,58 @@ class KnownValues(unittest.TestCase):
         with ao2mo.load(erifile, 'eri_mo') as eri:
             self.assertTrue(eri.size == 0)
 
+    def test_nroutcore_pipeline(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        erifile = ftmp.name
+        ao2mo.outcore.full(mol, mo, erifile, dataname='ref',
+                           intor='int2e_ip1_sph', aosym='s2kl', comp=3,
+                           max_memory=10, ioblk_size=5, compact=False)
+        ao2mo.outcore.full(mol, mo, erifile, dataname='eri_mo',
+                           intor='int2e_ip1_sph', aosym='s2kl', comp=3,
+                           max_memory=10, ioblk_size=5, compact=False,
+                           pipeline_depth=2)
+        with h5py.File(erifile, 'r') as feri:
+            self.assertAlmostEqual(abs(feri['eri_mo'][:] - feri['ref'][:]).max(), 0, 12)
+
+        mos = (mo[:,:8], mo[:,:8], mo, mo[:,:5])
+        ao2mo.outcore.general(mol, mos, erifile, dataname='ref',
+                              max_memory=2, ioblk_size=1)
+        ao2mo.outcore.general(mol, mos, erifile, dataname='eri_mo',
+                              max_memory=2, ioblk_size=1, pipeline_depth=3)
+        with h5py.File(erifile, 'r') as feri:
+            self.assertAlmostEqual(abs(feri['eri_mo'][:] - feri['ref'][:]).max(), 0, 12)
+
+    def test_nroutcore_raw_storage(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        erifile = ftmp.name
+        ao2mo.outcore.full(mol, mo, erifile, max_memory=10, ioblk_size=5)
+        with h5py.File(erifile, 'r') as feri:
+            ref = feri['eri_mo'][:]
+
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        erifile = ftmp.name
+        ao2mo.outcore.full(mol, mo, erifile, max_memory=10, ioblk_size=5,
+                           storage='raw')
+        ao2mo.outcore.full(mol, mo, erifile, dataname='ip1',
+                           intor='int2e_ip1_sph', aosym='s2kl', comp=3,
+                           max_memory=10, ioblk_size=5, storage='raw')
+        self.assertTrue(lib.is_rawfile(erifile))
+        with ao2mo.load(erifile) as eri:
+            self.assertAlmostEqual(abs(eri[:] - ref).max(), 0, 12)
+        with lib.RawFile(erifile, 'r') as feri:
+            self.assertEqual(feri['ip1'].shape, (3, nao*nao, nao*(nao+1)//2))
+
+        with lib.RawTmpFile() as feri:
+            ao2mo.general(mol, (mo,)*4, feri, max_memory=10, ioblk_size=5,
+                          storage='raw')
+            self.assertAlmostEqual(abs(feri['eri_mo'][:] - ref).max(), 0, 12)
+
+        with lib.H5TmpFile() as feri:
+            ao2mo.outcore.full(mol, mo, feri, max_memory=10, ioblk_size=5,
+                               dtype='f4')
+            self.assertEqual(feri['eri_mo'].dtype, numpy.float32)
+            self.assertAlmostEqual(abs(feri['eri_mo'][:] - ref).max()/abs(ref).max(), 0, 6)
+
     def test_group_segs(self):
         numpy.random.seed(1)
         segs = numpy.asarray(numpy.random.random(40)*50, dtype=int)
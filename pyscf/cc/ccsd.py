@@ -22,10 +22,13 @@ RCCSD for real integrals
 (ij|kl) = (ji|kl) = (kl|ij) = ...
 '''
 
+import os
 import time
+import copy
 import ctypes
 from functools import reduce
 import numpy
+import h5py
 from pyscf import gto
 from pyscf import lib
 from pyscf.lib import logger
@@ -44,12 +47,25 @@ MEMORYMIN = getattr(__config__, 'cc_ccsd_memorymin', 2000)
 def kernel(mycc, eris=None, t1=None, t2=None, max_cycle=50, tol=1e-8,
            tolnormt=1e-6, verbose=None):
     log = logger.new_logger(mycc, verbose)
+    # In the mixed precision mode, t2 amplitudes, DIIS vectors and (if
+    # possible) the integrals are stored in single precision until the
+    # amplitudes change less than mycc.mixed_precision_tol
+    single = getattr(mycc, 'mixed_precision', False)
     if eris is None:
-        eris = mycc.ao2mo(mycc.mo_coeff)
+        if single:
+            eris = _make_eris_mixed_precision(mycc, mycc.mo_coeff)
+        else:
+            eris = mycc.ao2mo(mycc.mo_coeff)
     if t1 is None and t2 is None:
         t1, t2 = mycc.get_init_guess(eris)
     elif t2 is None:
         t2 = mycc.get_init_guess(eris)[1]
+    single = (single and isinstance(t2, numpy.ndarray) and
+              t2.dtype in (numpy.float32, numpy.double))
+    mixed_precision = single
+    if single:
+        t1 = numpy.asarray(t1, dtype=numpy.double)
+        t2 = numpy.asarray(t2, dtype=numpy.float32)
 
     cput1 = cput0 = (time.clock(), time.time())
     eold = 0
@@ -63,6 +79,11 @@ def kernel(mycc, eris=None, t1=None, t2=None, max_cycle=50, tol=1e-8,
         adiis.space = mycc.diis_space
     else:
         adiis = None
+    if single and adiis is not None:
+        # The single precision vectors are extrapolated by a separate DIIS
+        # object. They are discarded after switching to double precision.
+        adiis, adiis_double = lib.diis.DIIS(mycc, incore=mycc.incore_complete), adiis
+        adiis.space = mycc.diis_space
 
     conv = False
     for istep in range(max_cycle):
@@ -76,14 +97,30 @@ def kernel(mycc, eris=None, t1=None, t2=None, max_cycle=50, tol=1e-8,
             t1new = (1-alpha) * t1 + alpha * t1new
             t2new *= alpha
             t2new += (1-alpha) * t2
+        if single:
+            t2new = t2new.astype(numpy.float32)
         t1, t2 = t1new, t2new
         t1new = t2new = None
         t1, t2 = mycc.run_diis(t1, t2, istep, normt, eccsd-eold, adiis)
+        if mixed_precision:
+            t1 = numpy.asarray(t1, dtype=numpy.double)
+            if not single:
+                t2 = numpy.asarray(t2, dtype=numpy.double)
         eold, eccsd = eccsd, mycc.energy(t1, t2, eris)
         log.info('cycle = %d  E(CCSD) = %.15g  dE = %.9g  norm(t1,t2) = %.6g',
                  istep+1, eccsd, eccsd - eold, normt)
         cput1 = log.timer('CCSD iter', *cput1)
-        if abs(eccsd-eold) < tol and normt < tolnormt:
+        if single and normt < mycc.mixed_precision_tol:
+            log.info('Switch to double precision amplitudes and integrals')
+            single = False
+            t2 = numpy.asarray(t2, dtype=numpy.double)
+            if adiis is not None:
+                adiis = adiis_double
+            if eris.ovov.dtype == numpy.float32:
+                eris = _make_eris_double(mycc, eris)
+            eccsd = mycc.energy(t1, t2, eris)
+            cput1 = log.timer('CCSD double precision integrals', *cput1)
+        elif not single and abs(eccsd-eold) < tol and normt < tolnormt:
             conv = True
             break
     log.timer('CCSD', *cput0)
@@ -103,6 +140,10 @@ def update_amps(mycc, t1, t2, eris):
     mo_e_o = eris.mo_energy[:nocc]
     mo_e_v = eris.mo_energy[nocc:] + mycc.level_shift
 
+    nproc = getattr(mycc, 'nproc', 1)
+    if nproc > 1:
+        eris = _shared_eris(eris)
+
     t1new = numpy.zeros_like(t1)
     t2new = mycc._add_vvvv(t1, t2, eris, t2sym='jiba')
     t2new *= .5  # *.5 because t2+t2.transpose(1,0,3,2) in the end
@@ -118,25 +159,35 @@ def update_amps(mycc, t1, t2, eris):
     fvv = fock[nocc:,nocc:] - numpy.diag(mo_e_v)
     fvv -= .5 * numpy.einsum('ia,ib->ab', t1, fock[:nocc,nocc:])
 
-    if mycc.incore_complete:
+    if nproc > 1:
+        # The intermediates are shared by the worker processes
+        fswap = lib.RawTmpFile()
+    elif mycc.incore_complete:
         fswap = None
     else:
         fswap = lib.H5TmpFile()
     fwVOov, fwVooV = _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap)
     time1 = log.timer_debug1('ovvv', *time1)
 
-    woooo = numpy.asarray(eris.oooo).transpose(0,2,1,3).copy()
+    woooo = numpy.asarray(eris.oooo, dtype=numpy.double).transpose(0,2,1,3).copy()
 
     unit = nocc**2*nvir*7 + nocc**3 + nocc*nvir**2
     mem_now = lib.current_memory()[0]
     max_memory = max(0, mycc.max_memory - mem_now)
+    if nproc > 1:
+        # Each process holds the partial sums of t1new, t2new, foo, fvv, ...
+        max_memory = max(0, max_memory/nproc - t2new.nbytes/1e6)
     blksize = min(nvir, max(BLKMIN, int((max_memory*.9e6/8-nocc**4)/unit)))
+    if nproc > 1:
+        # at least two blocks for each process to balance the load
+        blksize = min(blksize, max(BLKMIN, -(-nvir//(nproc*2))))
     log.debug1('max_memory %d MB,  nocc,nvir = %d,%d  blksize = %d',
                max_memory, nocc, nvir, blksize)
 
-    for p0, p1 in lib.prange(0, nvir, blksize):
-        wVOov = fwVOov[p0:p1]
-        wVooV = fwVooV[p0:p1]
+    def contract_voov(p0, p1, t1new, t2new, foo, fvv, fov, woooo):
+        time1 = time.clock(), time.time()
+        wVOov = numpy.asarray(fwVOov[p0:p1], dtype=numpy.double)
+        wVooV = numpy.asarray(fwVooV[p0:p1], dtype=numpy.double)
         eris_ovoo = eris.ovoo[:,p0:p1]
         eris_oovv = numpy.empty((nocc,nocc,p1-p0,nvir))
         def load_oovv(p0, p1):
@@ -239,7 +290,16 @@ def update_amps(mycc, t1, t2, eris):
                 update_t2(q0, q1, theta)
                 theta = None
         eris_VOov = wVOov = wVooV = update_wVOov = update_t2new = None
-        time1 = log.timer_debug1('voov [%d:%d]'%(p0, p1), *time1)
+        log.timer_debug1('voov [%d:%d]'%(p0, p1), *time1)
+
+    blocks = list(lib.prange(0, nvir, blksize))
+    if nproc > 1:
+        _procs_map(lambda blk, *out: contract_voov(blk[0], blk[1], *out),
+                   blocks, [t1new, t2new, foo, fvv, fov, woooo], nproc, log)
+    else:
+        for p0, p1 in blocks:
+            contract_voov(p0, p1, t1new, t2new, foo, fvv, fov, woooo)
+    time1 = log.timer_debug1('voov', *time1)
     fwVOov = fwVooV = fswap = None
 
     for p0, p1 in lib.prange(0, nvir, blksize):
@@ -276,65 +336,91 @@ def update_amps(mycc, t1, t2, eris):
 
 
 def _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap):
-    time1 = time.clock(), time.time()
     log = logger.Logger(mycc.stdout, mycc.verbose)
     nocc, nvir = t1.shape
     nvir_pair = nvir * (nvir+1) // 2
 
+    # Intermediates are saved in single precision for single precision t2
+    if t2.dtype == numpy.float32:
+        swap_dtype = 'f4'
+    else:
+        swap_dtype = 'f8'
     if fswap is None:
         wVOov = numpy.zeros((nvir,nocc,nocc,nvir))
     else:
-        wVOov = fswap.create_dataset('wVOov', (nvir,nocc,nocc,nvir), 'f8')
+        wVOov = fswap.create_dataset('wVOov', (nvir,nocc,nocc,nvir), swap_dtype)
     wooVV = numpy.zeros((nocc,nocc*nvir_pair))
 
+    nproc = getattr(mycc, 'nproc', 1)
     max_memory = mycc.max_memory - lib.current_memory()[0]
     unit = nocc*nvir**2*2.5 + nocc**2*nvir + 2
+    if nproc > 1:
+        # Each process holds the partial sums of t2new and wooVV
+        max_memory = max_memory/nproc - (t2new.nbytes+wooVV.nbytes)/1e6
     blksize = min(nvir, max(BLKMIN, int((max_memory*.95e6/8-wooVV.size)/unit)))
+    if nproc > 1:
+        blksize = min(blksize, max(BLKMIN, -(-nvir//(nproc*2))))
     log.debug1('max_memory %d MB,  nocc,nvir = %d,%d  blksize = %d',
                max_memory, nocc, nvir, blksize)
-    def load_ovvv(p0, p1):
-        if p0 < p1:
-            buf[:p1-p0] = eris.ovvv[:,p0:p1].transpose(1,0,2)
-
-    buf = numpy.empty((blksize,nocc,nvir_pair))
-    with lib.call_in_background(load_ovvv, sync=not mycc.async_io) as prefetch:
-        load_ovvv(0, blksize)
-        for p0, p1 in lib.prange(0, nvir, blksize):
-            eris_vovv, buf = buf[:p1-p0], numpy.empty_like(buf)
-            prefetch(p1, min(nvir, p1+blksize))
-
-            #:wooVV -= numpy.einsum('jc,ciba->jiba', t1[:,p0:p1], eris_vovv)
-            lib.ddot(numpy.asarray(t1[:,p0:p1], order='C'),
-                     eris_vovv.reshape(p1-p0,-1), -1, wooVV, 1)
-
-            eris_vovv = lib.unpack_tril(eris_vovv.reshape((p1-p0)*nocc,nvir_pair))
-            eris_vovv = eris_vovv.reshape(p1-p0,nocc,nvir,nvir)
-
-            fvv += 2*numpy.einsum('kc,ckab->ab', t1[:,p0:p1], eris_vovv)
-            fvv[:,p0:p1] -= numpy.einsum('kc,bkca->ab', t1, eris_vovv)
-
-            if not mycc.direct:
-                vvvo = eris_vovv.transpose(0,2,3,1).copy()
-                for i in range(nocc):
-                    tau = t2[i,:,p0:p1] + numpy.einsum('a,jb->jab', t1[i,p0:p1], t1)
-                    tmp = lib.einsum('jcd,cdbk->jbk', tau, vvvo)
-                    t2new[i] -= lib.einsum('ka,jbk->jab', t1, tmp)
-                    tau = tmp = None
-                eris_vvvo = None
-
-            wVOov[p0:p1] = lib.einsum('biac,jc->bija', eris_vovv, t1)
-
-            theta = t2[:,:,p0:p1].transpose(1,2,0,3) * 2
-            theta -= t2[:,:,p0:p1].transpose(0,2,1,3)
-            t1new += lib.einsum('icjb,cjba->ia', theta, eris_vovv)
-            theta = None
-            time1 = log.timer_debug1('vovv [%d:%d]'%(p0, p1), *time1)
+    def load_ovvv(p0, p1, buf):
+        buf = buf[:p1-p0]
+        buf[:] = eris.ovvv[:,p0:p1].transpose(1,0,2)
+        return buf
+    def readahead_ovvv(p0, p1):
+        lib.readahead(eris.ovvv, p0, p1, axis=1)
+
+    def contract(p0, p1, eris_vovv, fvv, t1new, wooVV, t2new=None):
+        time1 = time.clock(), time.time()
+        #:wooVV -= numpy.einsum('jc,ciba->jiba', t1[:,p0:p1], eris_vovv)
+        lib.ddot(numpy.asarray(t1[:,p0:p1], order='C'),
+                 eris_vovv.reshape(p1-p0,-1), -1, wooVV, 1)
+
+        eris_vovv = lib.unpack_tril(eris_vovv.reshape((p1-p0)*nocc,nvir_pair))
+        eris_vovv = eris_vovv.reshape(p1-p0,nocc,nvir,nvir)
+
+        fvv += 2*numpy.einsum('kc,ckab->ab', t1[:,p0:p1], eris_vovv)
+        fvv[:,p0:p1] -= numpy.einsum('kc,bkca->ab', t1, eris_vovv)
+
+        if not mycc.direct:
+            vvvo = eris_vovv.transpose(0,2,3,1).copy()
+            for i in range(nocc):
+                tau = t2[i,:,p0:p1] + numpy.einsum('a,jb->jab', t1[i,p0:p1], t1)
+                tmp = lib.einsum('jcd,cdbk->jbk', tau, vvvo)
+                t2new[i] -= lib.einsum('ka,jbk->jab', t1, tmp)
+                tau = tmp = None
+            eris_vvvo = None
+
+        wVOov[p0:p1] = lib.einsum('biac,jc->bija', eris_vovv, t1)
+
+        theta = t2[:,:,p0:p1].transpose(1,2,0,3) * 2
+        theta -= t2[:,:,p0:p1].transpose(0,2,1,3)
+        t1new += lib.einsum('icjb,cjba->ia', theta, eris_vovv)
+        theta = None
+        log.timer_debug1('vovv [%d:%d]'%(p0, p1), *time1)
+
+    blocks = lib.prange(0, nvir, blksize)
+    if mycc.direct:
+        outputs = [fvv, t1new, wooVV]
+    else:
+        outputs = [fvv, t1new, wooVV, t2new]
+    if nproc > 1:
+        def contract_blk(blk, *out):
+            p0, p1 = blk
+            buf = numpy.empty((p1-p0,nocc,nvir_pair))
+            contract(p0, p1, load_ovvv(p0, p1, buf), *out)
+        _procs_map(contract_blk, list(blocks), outputs, nproc, log)
+    else:
+        reader = lib.BlockReader(load_ovvv, blocks, (blksize,nocc,nvir_pair),
+                                 hint=readahead_ovvv, sync=not mycc.async_io)
+        for (p0, p1), eris_vovv in reader:
+            contract(p0, p1, eris_vovv, *outputs)
+        log.debug1('I/O wait time for ovvv %.2f sec', reader.wait_time)
 
     if fswap is None:
         wooVV = lib.unpack_tril(wooVV.reshape(nocc**2,nvir_pair))
         return wVOov, wooVV.reshape(nocc,nocc,nvir,nvir).transpose(2,1,0,3)
     else:
-        fswap.create_dataset('wVooV', (nvir,nocc,nocc,nvir), 'f8')
+        fswap.create_dataset('wVooV', (nvir,nocc,nocc,nvir), swap_dtype)
         wooVV = wooVV.reshape(nocc,nocc,nvir_pair)
         tril2sq = lib.square_mat_in_trilu_indices(nvir)
         for p0, p1 in lib.prange(0, nvir, blksize):
@@ -344,6 +430,9 @@ def _add_ovvv_(mycc, t1, t2, eris, fvv, t1new, t2new, fswap):
 def _add_vvvv(mycc, t1, t2, eris, out=None, with_ovvv=None, t2sym=None):
     '''t2sym: whether t2 has the symmetry t2[ijab]==t2[jiba] or
     t2[ijab]==-t2[jiab] or t2[ijab]==-t2[jiba]
+
+    If t1 is None, t2 can be a stack of amplitudes (nvec,nocc,nocc,nvir,nvir).
+    The vvvv integrals are then contracted with all amplitudes in one pass.
     '''
     #TODO: Guess the symmetry of t2 amplitudes
     #if t2sym is None:
@@ -358,8 +447,14 @@ def _add_vvvv(mycc, t1, t2, eris, out=None, with_ovvv=None, t2sym=None):
 
     if t2sym in ('jiba', '-jiba', '-jiab'):
         Ht2tril = _add_vvvv_tril(mycc, t1, t2, eris, with_ovvv=with_ovvv)
-        nocc, nvir = t2.shape[1:3]
-        Ht2 = _unpack_t2_tril(Ht2tril, nocc, nvir, out, t2sym)
+        nocc, nvir = t2.shape[-3:-1]
+        if t2.ndim == 4:
+            Ht2 = _unpack_t2_tril(Ht2tril, nocc, nvir, out, t2sym)
+        else:
+            Ht2tril = Ht2tril.reshape(-1,nocc*(nocc+1)//2,nvir,nvir)
+            Ht2 = numpy.ndarray(t2.shape, dtype=Ht2tril.dtype, buffer=out)
+            for k, x in enumerate(Ht2tril):
+                _unpack_t2_tril(x, nocc, nvir, Ht2[k], t2sym)
     else:
         Ht2 = _add_vvvv_full(mycc, t1, t2, eris, out, with_ovvv)
     return Ht2
@@ -373,12 +468,15 @@ def _add_vvvv_tril(mycc, t1, t2, eris, out=None, with_ovvv=None):
     log = logger.Logger(mycc.stdout, mycc.verbose)
     if with_ovvv is None:
         with_ovvv = mycc.direct
-    nocc, nvir = t2.shape[1:3]
+    nocc, nvir = t2.shape[-3:-1]
     nocc2 = nocc*(nocc+1)//2
     if t1 is None:
-        tau = t2[numpy.tril_indices(nocc)]
+        idx, idy = numpy.tril_indices(nocc)
+        tau = t2[...,idx,idy,:,:].reshape(-1,nvir,nvir)
+        # the lower triangular parts of all amplitudes in the stack
+        nocc2 = tau.shape[0]
     else:
-        tau = numpy.empty((nocc2,nvir,nvir), dtype=t2.dtype)
+        tau = numpy.empty((nocc2,nvir,nvir), dtype=numpy.result_type(t1, t2))
         p1 = 0
         for i in range(nocc):
             p0, p1 = p1, p1 + i+1
@@ -435,15 +533,15 @@ def _add_vvvv_full(mycc, t1, t2, eris, out=None, with_ovvv=False):
         mo = getattr(eris, 'mo_coeff', None)
         if mo is None:  # If eris does not have the attribute mo_coeff
             mo = _mo_without_core(mycc, mycc.mo_coeff)
-        nocc, nvir = t2.shape[1:3]
+        nocc, nvir = t2.shape[-3:-1]
         nao, nmo = mo.shape
         aos = numpy.asarray(mo[:,nocc:].T, order='F')
-        tau = _ao2mo.nr_e2(tau.reshape(nocc**2,nvir,nvir), aos, (0,nao,0,nao), 's1', 's1')
-        tau = tau.reshape(nocc,nocc,nao,nao)
+        tau = _ao2mo.nr_e2(tau.reshape(-1,nvir,nvir), aos, (0,nao,0,nao), 's1', 's1')
+        tau = tau.reshape(-1,nao,nao)
         time0 = log.timer_debug1('vvvv-tau mo2ao', *time0)
 
         buf = eris._contract_vvvv_t2(mycc, tau, mycc.direct, out, log)
-        buf = buf.reshape(nocc**2,nao,nao)
+        buf = buf.reshape(-1,nao,nao)
         Ht2 = _ao2mo.nr_e2(buf, mo.conj(), (nocc,nmo,nocc,nmo), 's1', 's1')
     else:
         assert(not with_ovvv)
@@ -452,6 +550,63 @@ def _add_vvvv_full(mycc, t1, t2, eris, out=None, with_ovvv=False):
     return Ht2.reshape(t2.shape)
 
 
+def _procs_map(fn, tasks, outputs, nproc, verbose=None, reduce=True):
+    '''Evaluate fn(task, *outputs) for all tasks in nproc forked processes.
+
+    The outputs are placed in a temporary memory-mapped file which is shared
+    by the processes.  If reduce is True, each process accumulates the
+    results in its own copy of the outputs (initialized to zero) and the
+    copies are added to outputs in the end.  Otherwise, all processes write
+    to the same copy, and the tasks should update different parts of the
+    outputs.  The input arrays of fn (t2, integrals, ...) are shared by the
+    processes through fork.
+    '''
+    log = logger.new_logger(verbose=verbose)
+    nproc = min(nproc, len(tasks))
+    ncopy = nproc if reduce else 1
+    ftmp = lib.RawTmpFile()
+    bufs = [[ftmp.create_dataset('%d/%d' % (p, k), x.shape, x.dtype)
+             for k, x in enumerate(outputs)] for p in range(ncopy)]
+
+    out = []
+    def initializer(p):
+        out[:] = bufs[p % ncopy]
+    lib.map_in_processes(lambda task: fn(task, *out), tasks, nproc,
+                         initializer=initializer, stdout=log.stdout)
+
+    for k, x in enumerate(outputs):
+        if reduce:
+            for p in range(ncopy):
+                x += bufs[p][k]
+        else:
+            x[:] = bufs[0][k]
+    return outputs
+
+def _shared_eris(eris):
+    '''The integrals which can be shared by the worker processes of
+    :func:`_procs_map`.  The contiguous HDF5 datasets are mapped from the
+    integral files to numpy.memmap arrays.  The other HDF5 datasets are read
+    by the processes through the file handles inherited from fork.
+    '''
+    keys = [key for key, val in eris.__dict__.items()
+            if isinstance(val, h5py.Dataset)]
+    if not keys:
+        return eris
+
+    eris_shm = copy.copy(eris)
+    for key in keys:
+        dset = getattr(eris, key)
+        dset.file.flush()
+        offset = dset.id.get_offset()
+        if offset is not None and dset.chunks is None and dset.size > 0:
+            # The file of H5TmpFile may have been unlinked.  It is accessed
+            # through the file descriptor of the HDF5 file.
+            fd = os.dup(dset.file.id.get_vfd_handle())
+            with os.fdopen(fd, 'rb') as f:
+                arr = numpy.memmap(f, dset.dtype, 'r', offset, dset.shape)
+            setattr(eris_shm, key, arr)
+    return eris_shm
+
 def _contract_vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
     '''Ht2 = numpy.einsum('ijcd,acbd->ijab', t2, vvvv)
 
@@ -489,7 +644,7 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
     Ht2 = numpy.ndarray(x2.shape, dtype=x2.dtype, buffer=out)
     Ht2[:] = 0
 
-    def contract_blk_(eri, i0, i1, j0, j1):
+    def contract_blk_(eri, i0, i1, j0, j1, Ht2):
         ic = i1 - i0
         jc = j1 - j0
         #:Ht2[:,j0:j1] += numpy.einsum('xef,efab->xab', x2[:,i0:i1], eri)
@@ -503,7 +658,12 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
                    x2.reshape(-1,nvir2), eri.reshape(-1,jc*nvirb),
                    Ht2.reshape(-1,nvir2), 1, 1, j0*nvirb, 0, i0*nvirb)
 
+    nproc = getattr(mycc, 'nproc', 1)
     max_memory = max(MEMORYMIN, mycc.max_memory - lib.current_memory()[0])
+    if nproc > 1:
+        # Each process holds its own partial sum of Ht2
+        max_memory = max(MEMORYMIN, max_memory/nproc - Ht2.nbytes/1e6)
+
     if vvvv is None:   # AO-direct CCSD
         ao_loc = mol.ao_loc_nr()
         assert(nvira == nvirb == ao_loc[-1])
@@ -519,7 +679,9 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
         loadbuf = numpy.empty((blksize,blksize,nvirb,nvirb))
         fint = gto.moleintor.getints4c
 
-        for ip, (ish0, ish1, ni) in enumerate(sh_ranges):
+        def block_contract(ip, Ht2):
+            time0 = time.clock(), time.time()
+            ish0, ish1, ni = sh_ranges[ip]
             for jsh0, jsh1, nj in sh_ranges[:ip]:
                 eri = fint(intor, mol._atm, mol._bas, mol._env,
                            shls_slice=(ish0,ish1,jsh0,jsh1), aosym='s2kl',
@@ -531,7 +693,7 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
                                        eri.ctypes.data_as(ctypes.c_void_p),
                                        (ctypes.c_int*4)(i0, i1, j0, j1),
                                        ctypes.c_int(nvirb))
-                contract_blk_(tmp, i0, i1, j0, j1)
+                contract_blk_(tmp, i0, i1, j0, j1, Ht2)
                 time0 = log.timer_debug1('AO-vvvv [%d:%d,%d:%d]' %
                                          (ish0,ish1,jsh0,jsh1), *time0)
 
@@ -546,22 +708,33 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
                                    (ctypes.c_int*4)(i0, i1, i0, i1),
                                    ctypes.c_int(nvirb))
             eri = None
-            contract_blk_(tmp, i0, i1, i0, i1)
-            time0 = log.timer_debug1('AO-vvvv [%d:%d,%d:%d]' %
-                                     (ish0,ish1,ish0,ish1), *time0)
+            contract_blk_(tmp, i0, i1, i0, i1, Ht2)
+            log.timer_debug1('AO-vvvv [%d:%d,%d:%d]' %
+                             (ish0,ish1,ish0,ish1), *time0)
+
+        if nproc > 1:
+            # The costs of the rows increase with ip.  The expensive rows
+            # are dispatched first.
+            tasks = list(reversed(range(len(sh_ranges))))
+            _procs_map(block_contract, tasks, [Ht2], nproc, log)
+        else:
+            for ip in range(len(sh_ranges)):
+                block_contract(ip, Ht2)
 
     else:
         nvir_pair = nvirb * (nvirb+1) // 2
         unit = nvira*nvir_pair*2 + nvirb**2*nvira/4 + 1
         blksize = numpy.sqrt(max(BLKMIN**2, max_memory*.95e6/8/unit))
         blksize = int(min((nvira+3)/4, blksize))
+        if nproc > 1:
+            blksize = min(blksize, max(BLKMIN, -(-nvira//(nproc*2))))
 
         tril2sq = lib.square_mat_in_trilu_indices(nvira)
         loadbuf = numpy.empty((blksize,blksize,nvirb,nvirb))
-        def block_contract(i0, i1):
+        def block_contract(i0, i1, Ht2):
             off0 = i0*(i0+1)//2
             off1 = i1*(i1+1)//2
-            wwbuf = numpy.asarray(vvvv[off0:off1], order='C')
+            wwbuf = numpy.asarray(vvvv[off0:off1], dtype=numpy.double, order='C')
             for j0, j1 in lib.prange(0, i1, blksize):
                 eri = wwbuf[tril2sq[i0:i1,j0:j1]-off0]
                 tmp = numpy.ndarray((i1-i0,nvirb,j1-j0,nvirb), buffer=loadbuf)
@@ -569,14 +742,20 @@ def _contract_s4vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
                                        eri.ctypes.data_as(ctypes.c_void_p),
                                        (ctypes.c_int*4)(i0, i1, j0, j1),
                                        ctypes.c_int(nvirb))
-                contract_blk_(tmp, i0, i1, j0, j1)
-
-        with lib.call_in_background(block_contract, sync=not mycc.async_io) as bcontract:
-            readbuf = numpy.empty((blksize,nvira,nvir_pair))
-            readbuf1 = numpy.empty_like(readbuf)
-            for p0, p1 in lib.prange(0, nvira, blksize):
-                bcontract(p0, p1)
-                time0 = log.timer_debug1('vvvv [%d:%d]'%(p0,p1), *time0)
+                contract_blk_(tmp, i0, i1, j0, j1, Ht2)
+
+        if nproc > 1:
+            # Each process reads the rows vvvv[off0:off1] of its own tasks.
+            # The expensive (last) rows are dispatched first.
+            tasks = list(reversed(list(lib.prange(0, nvira, blksize))))
+            _procs_map(lambda blk, Ht2: block_contract(blk[0], blk[1], Ht2),
+                       tasks, [Ht2], nproc, log)
+            time0 = log.timer_debug1('vvvv', *time0)
+        else:
+            with lib.call_in_background(block_contract, sync=not mycc.async_io) as bcontract:
+                for p0, p1 in lib.prange(0, nvira, blksize):
+                    bcontract(p0, p1, Ht2)
+                    time0 = log.timer_debug1('vvvv [%d:%d]'%(p0,p1), *time0)
     return Ht2.reshape(t2.shape)
 
 def _contract_s1vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
@@ -604,9 +783,21 @@ def _contract_s1vvvv_t2(mycc, mol, vvvv, t2, out=None, verbose=None):
     unit = nvirb**2*nvira*2 + nocc2*nvirb + 1
     blksize = min(nvira, max(BLKMIN, int(max_memory*1e6/8/unit)))
 
-    for p0,p1 in lib.prange(0, nvira, blksize):
+    def block_contract(p0, p1, Ht2):
         Ht2[:,p0:p1] = lib.einsum('xcd,acbd->xab', x2, vvvv[p0:p1])
-        time0 = log.timer_debug1('vvvv [%d:%d]' % (p0,p1), *time0)
+
+    nproc = getattr(mycc, 'nproc', 1)
+    if nproc > 1:
+        # Each process reads the rows vvvv[p0:p1] of its own tasks
+        blksize = min(blksize, max(BLKMIN, -(-nvira//(nproc*2))))
+        _procs_map(lambda blk, Ht2: block_contract(blk[0], blk[1], Ht2),
+                   list(lib.prange(0, nvira, blksize)), [Ht2], nproc, log,
+                   reduce=False)
+        time0 = log.timer_debug1('vvvv', *time0)
+    else:
+        for p0,p1 in lib.prange(0, nvira, blksize):
+            block_contract(p0, p1, Ht2)
+            time0 = log.timer_debug1('vvvv [%d:%d]' % (p0,p1), *time0)
     return Ht2.reshape(t2.shape)
 
 def _unpack_t2_tril(t2tril, nocc, nvir, out=None, t2sym='jiba'):
@@ -644,7 +835,10 @@ def amplitudes_to_vector(t1, t2, out=None):
     size = nov + nov*(nov+1)//2
     vector = numpy.ndarray(size, t1.dtype, buffer=out)
     vector[:nov] = t1.ravel()
-    lib.pack_tril(t2.transpose(0,2,1,3).reshape(nov,nov), out=vector[nov:])
+    if t2.dtype == vector.dtype:
+        lib.pack_tril(t2.transpose(0,2,1,3).reshape(nov,nov), out=vector[nov:])
+    else:  # single precision t2 in the mixed precision mode
+        vector[nov:] = lib.pack_tril(t2.transpose(0,2,1,3).reshape(nov,nov))
     return vector
 
 def vector_to_amplitudes(vector, nmo, nocc):
@@ -686,12 +880,15 @@ def energy(mycc, t1=None, t2=None, eris=None):
 
     nocc, nvir = t1.shape
     fock = eris.fock
+    # Accumulate energy in double precision for single precision amplitudes
+    dtype = numpy.result_type(t1, t2, numpy.double)
     e = numpy.einsum('ia,ia', fock[:nocc,nocc:], t1) * 2
     max_memory = mycc.max_memory - lib.current_memory()[0]
     blksize = int(min(nvir, max(BLKMIN, max_memory*.3e6/8/(nocc**2*nvir+1))))
     for p0, p1 in lib.prange(0, nvir, blksize):
         eris_ovvo = eris.ovvo[:,p0:p1]
-        tau = t2[:,:,p0:p1] + numpy.einsum('ia,jb->ijab', t1[:,p0:p1], t1)
+        tau = numpy.asarray(t2[:,:,p0:p1], dtype=dtype)
+        tau = tau + numpy.einsum('ia,jb->ijab', t1[:,p0:p1], t1)
         e += 2 * numpy.einsum('ijab,iabj', tau, eris_ovvo)
         e -=     numpy.einsum('jiab,iabj', tau, eris_ovvo)
     if abs(e.imag) > 1e-4:
@@ -830,6 +1027,24 @@ class CCSD(lib.StreamObject):
             Allow for asynchronous function execution. Default is True.
         incore_complete : bool
             Avoid all I/O (also for DIIS). Default is False.
+        mixed_precision : bool
+            Whether to store t2 amplitudes, DIIS vectors, the out-of-core
+            intermediates and the out-of-core MO integrals in single
+            precision in the early iterations.  The residuals and the energy
+            are accumulated in double precision.  Once the change of the
+            amplitudes is smaller than mixed_precision_tol, the amplitudes
+            and the integrals of occupied orbitals are promoted to double
+            precision and the iterations continue to convergence.  The vvvv
+            integrals stay in single precision on disk and are converted to
+            double precision when they are loaded.  Default is False.
+        mixed_precision_tol : float
+            See mixed_precision.
+        nproc : int
+            Number of processes to evaluate the amplitude equations.  The
+            rows of the vvvv integrals and the virtual orbitals (ovvv and
+            voov terms) are distributed over the forked processes.  The
+            amplitudes and the integrals are shared through memory-mapped
+            files.  Each process runs with one OpenMP thread.  Default is 1.
         level_shift : float
             A shift on virtual orbital energies to stablize the CCSD iteration
         frozen : int or list
@@ -874,6 +1089,9 @@ class CCSD(lib.StreamObject):
     async_io = getattr(__config__, 'cc_ccsd_CCSD_async_io', True)
     incore_complete = getattr(__config__, 'cc_ccsd_CCSD_incore_complete', False)
     cc2 = getattr(__config__, 'cc_ccsd_CCSD_cc2', False)
+    mixed_precision = getattr(__config__, 'cc_ccsd_CCSD_mixed_precision', False)
+    mixed_precision_tol = getattr(__config__, 'cc_ccsd_CCSD_mixed_precision_tol', 1e-3)
+    nproc = getattr(__config__, 'cc_ccsd_CCSD_nproc', 1)
 
     def __init__(self, mf, frozen=0, mo_coeff=None, mo_occ=None):
         from pyscf import gto
@@ -923,7 +1141,8 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
         keys = set(('max_cycle', 'conv_tol', 'iterative_damping',
                     'conv_tol_normt', 'diis', 'diis_space', 'diis_file',
                     'diis_start_cycle', 'diis_start_energy_diff', 'direct',
-                    'async_io', 'incore_complete', 'cc2'))
+                    'async_io', 'incore_complete', 'cc2', 'mixed_precision',
+                    'mixed_precision_tol', 'nproc'))
         self._keys = set(self.__dict__.keys()).union(keys)
 
     @property
@@ -968,6 +1187,11 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
         #log.info('diis_file = %s', self.diis_file)
         log.info('diis_start_cycle = %d', self.diis_start_cycle)
         log.info('diis_start_energy_diff = %g', self.diis_start_energy_diff)
+        if self.mixed_precision:
+            log.info('mixed_precision = %s, mixed_precision_tol = %g',
+                     self.mixed_precision, self.mixed_precision_tol)
+        if self.nproc > 1:
+            log.info('nproc = %d', self.nproc)
         log.info('max_memory %d MB (current use %d MB)',
                  self.max_memory, lib.current_memory()[0])
         if (log.verbose >= logger.DEBUG1 and
@@ -1053,12 +1277,12 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
                                    verbose=self.verbose)
         return self.l1, self.l2
 
-    def ccsd_t(self, t1=None, t2=None, eris=None):
+    def ccsd_t(self, t1=None, t2=None, eris=None, nproc=1, chkfile=None):
         from pyscf.cc import ccsd_t
         if t1 is None: t1 = self.t1
         if t2 is None: t2 = self.t2
         if eris is None: eris = self.ao2mo(self.mo_coeff)
-        return ccsd_t.kernel(self, eris, t1, t2, self.verbose)
+        return ccsd_t.kernel(self, eris, t1, t2, self.verbose, nproc, chkfile)
 
     def ipccsd(self, nroots=1, left=False, koopmans=False, guess=None,
                partition=None, eris=None):
@@ -1124,7 +1348,11 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
         if l1 is None: l1, l2 = self.solve_lambda(t1, t2)
         return ccsd_rdm.make_rdm2(self, t1, t2, l1, l2)
 
-    def ao2mo(self, mo_coeff=None):
+    def ao2mo(self, mo_coeff=None, dtype=numpy.double):
+        '''MO integrals for CCSD.  dtype (numpy.float32 or numpy.double)
+        is the precision of the integrals saved on disk by the out-of-core
+        algorithm.  The in-core integrals are always in double precision.
+        '''
         # Pseudo code how eris are implemented:
         # nocc = self.nocc
         # nmo = self.nmo
@@ -1161,13 +1389,16 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
             return _make_df_eris_outcore(self, mo_coeff)
 
         else:
-            return _make_eris_outcore(self, mo_coeff)
+            return _make_eris_outcore(self, mo_coeff, dtype)
 
     def run_diis(self, t1, t2, istep, normt, de, adiis):
         if (adiis and
             istep >= self.diis_start_cycle and
             abs(de) < self.diis_start_energy_diff):
             vec = self.amplitudes_to_vector(t1, t2)
+            if getattr(t2, 'dtype', None) == numpy.float32:
+                # mixed precision mode
+                vec = vec.astype(numpy.float32)
             t1, t2 = self.vector_to_amplitudes(adiis.update(vec))
             logger.debug1(self, 'DIIS for step %d', istep)
         return t1, t2
@@ -1357,7 +1588,11 @@ def _make_eris_incore(mycc, mo_coeff=None):
     logger.timer(mycc, 'CCSD integral transformation', *cput0)
     return eris
 
-def _make_eris_outcore(mycc, mo_coeff=None):
+def _make_eris_outcore(mycc, mo_coeff=None, dtype=numpy.double):
+    '''Out-of-core MO integrals.  If dtype is numpy.float32, the integrals
+    are saved in single precision.  The half-transformed integrals are kept
+    in eris._fswap then, so that :func:`_make_eris_double` can regenerate the
+    integrals of occupied orbitals in double precision.'''
     cput0 = (time.clock(), time.time())
     log = logger.Logger(mycc.stdout, mycc.verbose)
     eris = _ChemistsERIs()
@@ -1367,17 +1602,49 @@ def _make_eris_outcore(mycc, mo_coeff=None):
     mo_coeff = numpy.asarray(eris.mo_coeff, order='F')
     nocc = eris.nocc
     nao, nmo = mo_coeff.shape
-    nvir = nmo - nocc
     orbo = mo_coeff[:,:nocc]
     orbv = mo_coeff[:,nocc:]
+    dtype = numpy.dtype(dtype)
+
+    cput1 = time.clock(), time.time()
+    if not mycc.direct:
+        max_memory = max(MEMORYMIN, mycc.max_memory-lib.current_memory()[0])
+        eris.feri2 = lib.H5TmpFile()
+        ao2mo.full(mol, orbv, eris.feri2, max_memory=max_memory, verbose=log,
+                   dtype=dtype)
+        eris.vvvv = eris.feri2['eri_mo']
+        cput1 = log.timer_debug1('transforming vvvv', *cput1)
+
+    fswap = lib.H5TmpFile()
+    max_memory = max(MEMORYMIN, mycc.max_memory-lib.current_memory()[0])
+    int2e = mol._add_suffix('int2e')
+    ao2mo.outcore.half_e1(mol, (mo_coeff,orbo), fswap, int2e,
+                          's4', 1, max_memory, verbose=log)
+    _transform_oppp(mycc, eris, fswap, dtype, log)
+    if dtype != numpy.double:
+        eris._fswap = fswap
+
+    cput1 = log.timer_debug1('transforming oppp', *cput1)
+    log.timer('CCSD integral transformation', *cput0)
+    return eris
+
+def _transform_oppp(mycc, eris, fswap, dtype, log):
+    '''The second half transformation of the integrals (ip|kl) of occupied
+    orbitals i, from the half-transformed integrals in fswap.  The results
+    are saved in a new file eris.feri1 with the given dtype.'''
+    mol = mycc.mol
+    mo_coeff = numpy.asarray(eris.mo_coeff, order='F')
+    nocc = eris.nocc
+    nao, nmo = mo_coeff.shape
+    nvir = nmo - nocc
     nvpair = nvir * (nvir+1) // 2
     eris.feri1 = lib.H5TmpFile()
-    eris.oooo = eris.feri1.create_dataset('oooo', (nocc,nocc,nocc,nocc), 'f8')
-    eris.oovv = eris.feri1.create_dataset('oovv', (nocc,nocc,nvir,nvir), 'f8', chunks=(nocc,nocc,1,nvir))
-    eris.ovoo = eris.feri1.create_dataset('ovoo', (nocc,nvir,nocc,nocc), 'f8', chunks=(nocc,1,nocc,nocc))
-    eris.ovvo = eris.feri1.create_dataset('ovvo', (nocc,nvir,nvir,nocc), 'f8', chunks=(nocc,1,nvir,nocc))
-    eris.ovov = eris.feri1.create_dataset('ovov', (nocc,nvir,nocc,nvir), 'f8', chunks=(nocc,1,nocc,nvir))
-    eris.ovvv = eris.feri1.create_dataset('ovvv', (nocc,nvir,nvpair), 'f8')
+    eris.oooo = eris.feri1.create_dataset('oooo', (nocc,nocc,nocc,nocc), dtype)
+    eris.oovv = eris.feri1.create_dataset('oovv', (nocc,nocc,nvir,nvir), dtype, chunks=(nocc,nocc,1,nvir))
+    eris.ovoo = eris.feri1.create_dataset('ovoo', (nocc,nvir,nocc,nocc), dtype, chunks=(nocc,1,nocc,nocc))
+    eris.ovvo = eris.feri1.create_dataset('ovvo', (nocc,nvir,nvir,nocc), dtype, chunks=(nocc,1,nvir,nocc))
+    eris.ovov = eris.feri1.create_dataset('ovov', (nocc,nvir,nocc,nvir), dtype, chunks=(nocc,1,nocc,nvir))
+    eris.ovvv = eris.feri1.create_dataset('ovvv', (nocc,nvir,nvpair), dtype)
 
     def save_occ_frac(p0, p1, eri):
         eri = eri.reshape(p1-p0,nocc,nmo,nmo)
@@ -1392,59 +1659,65 @@ def _make_eris_outcore(mycc, mo_coeff=None):
         vvv = lib.pack_tril(eri[:,:,nocc:,nocc:].reshape((p1-p0)*nocc,nvir,nvir))
         eris.ovvv[:,p0:p1] = vvv.reshape(p1-p0,nocc,nvpair).transpose(1,0,2)
 
-    cput1 = time.clock(), time.time()
-    if not mycc.direct:
-        max_memory = max(MEMORYMIN, mycc.max_memory-lib.current_memory()[0])
-        eris.feri2 = lib.H5TmpFile()
-        ao2mo.full(mol, orbv, eris.feri2, max_memory=max_memory, verbose=log)
-        eris.vvvv = eris.feri2['eri_mo']
-        cput1 = log.timer_debug1('transforming vvvv', *cput1)
-
-    fswap = lib.H5TmpFile()
     max_memory = max(MEMORYMIN, mycc.max_memory-lib.current_memory()[0])
-    int2e = mol._add_suffix('int2e')
-    ao2mo.outcore.half_e1(mol, (mo_coeff,orbo), fswap, int2e,
-                          's4', 1, max_memory, verbose=log)
-
     ao_loc = mol.ao_loc_nr()
     nao_pair = nao * (nao+1) // 2
     blksize = int(min(8e9,max_memory*.5e6)/8/(nao_pair+nmo**2)/nocc)
     blksize = min(nmo, max(BLKMIN, blksize))
     log.debug1('blksize %d', blksize)
-    cput2 = cput1
+    cput2 = (time.clock(), time.time())
 
     fload = ao2mo.outcore._load_from_h5g
-    buf = numpy.empty((blksize*nocc,nao_pair))
-    buf_prefetch = numpy.empty_like(buf)
-    def prefetch(p0, p1, rowmax):
-        p0, p1 = p1, min(rowmax, p1+blksize)
-        if p0 < p1:
-            fload(fswap['0'], p0*nocc, p1*nocc, buf_prefetch)
+    def load(p0, p1, buf):
+        return fload(fswap['0'], p0*nocc, p1*nocc, buf)
+    def readahead(p0, p1):
+        for dset in fswap['0'].values():
+            lib.readahead(dset, p0*nocc, p1*nocc)
 
     outbuf = numpy.empty((blksize*nocc,nmo**2))
-    with lib.call_in_background(prefetch, sync=not mycc.async_io) as bprefetch:
-        fload(fswap['0'], 0, min(nocc,blksize)*nocc, buf_prefetch)
-        for p0, p1 in lib.prange(0, nocc, blksize):
-            nrow = (p1 - p0) * nocc
-            buf, buf_prefetch = buf_prefetch, buf
-            bprefetch(p0, p1, nocc)
-            dat = ao2mo._ao2mo.nr_e2(buf[:nrow], mo_coeff, (0,nmo,0,nmo),
-                                     's4', 's1', out=outbuf, ao_loc=ao_loc)
-            save_occ_frac(p0, p1, dat)
-        cput2 = log.timer_debug1('transforming oopp', *cput2)
-
-        fload(fswap['0'], nocc**2, min(nmo,nocc+blksize)*nocc, buf_prefetch)
-        for p0, p1 in lib.prange(0, nvir, blksize):
-            nrow = (p1 - p0) * nocc
-            buf, buf_prefetch = buf_prefetch, buf
-            bprefetch(nocc+p0, nocc+p1, nmo)
-            dat = ao2mo._ao2mo.nr_e2(buf[:nrow], mo_coeff, (0,nmo,0,nmo),
-                                     's4', 's1', out=outbuf, ao_loc=ao_loc)
-            save_vir_frac(p0, p1, dat)
-            cput2 = log.timer_debug1('transforming ovpp [%d:%d]'%(p0,p1), *cput2)
+    reader = lib.BlockReader(load, lib.prange(0, nocc, blksize),
+                             (blksize*nocc,nao_pair), hint=readahead,
+                             sync=not mycc.async_io)
+    for (p0, p1), buf in reader:
+        dat = ao2mo._ao2mo.nr_e2(buf, mo_coeff, (0,nmo,0,nmo),
+                                 's4', 's1', out=outbuf, ao_loc=ao_loc)
+        save_occ_frac(p0, p1, dat)
+    cput2 = log.timer_debug1('transforming oopp', *cput2)
+    wait_time = reader.wait_time
+
+    reader = lib.BlockReader(load, lib.prange(nocc, nmo, blksize),
+                             (blksize*nocc,nao_pair), hint=readahead,
+                             sync=not mycc.async_io)
+    for (p0, p1), buf in reader:
+        dat = ao2mo._ao2mo.nr_e2(buf, mo_coeff, (0,nmo,0,nmo),
+                                 's4', 's1', out=outbuf, ao_loc=ao_loc)
+        save_vir_frac(p0-nocc, p1-nocc, dat)
+        cput2 = log.timer_debug1('transforming ovpp [%d:%d]'%(p0-nocc,p1-nocc), *cput2)
+    log.debug1('I/O wait time for the half-transformed integrals %.2f sec',
+               wait_time + reader.wait_time)
+    return eris
 
-    cput1 = log.timer_debug1('transforming oppp', *cput1)
-    log.timer('CCSD integral transformation', *cput0)
+def _make_eris_mixed_precision(mycc, mo_coeff=None):
+    '''Integrals for the single precision iterations of the mixed precision
+    CCSD.  Single precision integrals are generated by the out-of-core
+    algorithm of CCSD.ao2mo.  Otherwise, the regular integrals are used.'''
+    if type(mycc).ao2mo is CCSD.ao2mo:
+        return mycc.ao2mo(mo_coeff, dtype=numpy.float32)
+    else:
+        return mycc.ao2mo(mo_coeff)
+
+def _make_eris_double(mycc, eris):
+    '''Switch the single precision integrals of the mixed precision CCSD to
+    double precision.  The integrals of occupied orbitals are regenerated in
+    double precision from the half-transformed integrals kept in eris._fswap.
+    The AO integrals are not evaluated again.  The vvvv integrals stay in
+    single precision on disk.  They are converted to double precision when
+    they are loaded.'''
+    if getattr(eris, '_fswap', None) is None:
+        return mycc.ao2mo(mycc.mo_coeff)
+    log = logger.Logger(mycc.stdout, mycc.verbose)
+    _transform_oppp(mycc, eris, eris._fswap, numpy.double, log)
+    eris._fswap = None
     return eris
 
 def _make_df_eris_outcore(mycc, mo_coeff=None):
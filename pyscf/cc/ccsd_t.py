@@ -24,6 +24,7 @@ import gc
 import time
 import ctypes
 import numpy
+import h5py
 from pyscf import lib
 from pyscf import symm
 from pyscf.lib import logger
@@ -32,7 +33,22 @@ from pyscf.cc import _ccsd
 # t3 as ijkabc
 
 # JCP, 94, 442.  Error in Eq (1), should be [ia] >= [jb] >= [kc]
-def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
+def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE, nproc=1,
+           chkfile=None):
+    '''CCSD(T) energy correction
+
+    Kwargs:
+        nproc : int
+            If nproc > 1, the (a,b) virtual blocks are evaluated by nproc
+            processes.  See :func:`kernel_tasks`.
+        chkfile : str
+            HDF5 file to record the contributions of the completed (a,b)
+            virtual blocks.  An interrupted calculation resumes from the
+            blocks recorded in this file.
+    '''
+    if nproc > 1 or chkfile:
+        return kernel_tasks(mycc, eris, t1, t2, verbose, nproc, chkfile)
+
     cpu1 = cpu0 = (time.clock(), time.time())
     log = logger.new_logger(mycc, verbose)
     if t1 is None: t1 = mycc.t1
@@ -56,18 +72,7 @@ def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
     cpu1 = log.timer_debug1('CCSD(T) sort_eri', *cpu1)
 
     cpu2 = list(cpu1)
-    orbsym = numpy.hstack((numpy.sort(orbsym[:nocc]),numpy.sort(orbsym[nocc:])))
-    o_ir_loc = numpy.append(0, numpy.cumsum(numpy.bincount(orbsym[:nocc], minlength=8)))
-    v_ir_loc = numpy.append(0, numpy.cumsum(numpy.bincount(orbsym[nocc:], minlength=8)))
-    o_sym = orbsym[:nocc]
-    oo_sym = (o_sym[:,None] ^ o_sym).ravel()
-    oo_ir_loc = numpy.append(0, numpy.cumsum(numpy.bincount(oo_sym, minlength=8)))
-    nirrep = max(oo_sym) + 1
-
-    orbsym   = orbsym.astype(numpy.int32)
-    o_ir_loc = o_ir_loc.astype(numpy.int32)
-    v_ir_loc = v_ir_loc.astype(numpy.int32)
-    oo_ir_loc = oo_ir_loc.astype(numpy.int32)
+    orbsym, o_ir_loc, v_ir_loc, oo_ir_loc, nirrep = _irrep_loc(orbsym, nocc)
     if dtype == numpy.complex:
         drv = _ccsd.libcc.CCsd_t_zcontract
     else:
@@ -132,6 +137,205 @@ def kernel(mycc, eris, t1=None, t2=None, verbose=logger.NOTE):
     log.note('CCSD(T) correction = %.15g', et)
     return et
 
+def kernel_tasks(mycc, eris, t1=None, t2=None, verbose=logger.NOTE, nproc=None,
+                 chkfile=None):
+    '''CCSD(T) correction with the (a,b) virtual blocks evaluated as
+    independent tasks.
+
+    The tasks are distributed over nproc processes (each running one
+    thread) on demand.  The sorted integrals vvop, t2 and vooo are placed in
+    a temporary memory-mapped file (:class:`lib.RawTmpFile`) which is shared
+    by the processes.  If chkfile is given, the energy contribution and the
+    wall time of each task are recorded in the HDF5 chkfile under the key
+    "ccsd_t" once the task is completed.  When the function is called again
+    with the same amplitudes and the same chkfile, the completed tasks are
+    skipped.
+
+    Kwargs:
+        nproc : int
+            Number of processes.  By default, lib.num_threads().  If nproc
+            is 1, the tasks are evaluated in the current process.
+        chkfile : str
+            HDF5 file to record the completed tasks.
+    '''
+    cpu1 = cpu0 = (time.clock(), time.time())
+    log = logger.new_logger(mycc, verbose)
+    if t1 is None: t1 = mycc.t1
+    if t2 is None: t2 = mycc.t2
+    if nproc is None:
+        nproc = lib.num_threads()
+
+    nocc, nvir = t1.shape
+    nmo = nocc + nvir
+    dtype = numpy.result_type(t1, t2, eris.ovoo.dtype)
+    fingerprint = numpy.asarray([nocc, nvir, lib.fingerprint(t1),
+                                 lib.fingerprint(t2)], dtype=dtype)
+
+    ftmp = lib.RawTmpFile()
+    eris_vvop = ftmp.create_dataset('vvop', (nvir,nvir,nocc,nmo), dtype)
+    orbsym = _sort_eri(mycc, eris, nocc, nvir, eris_vvop, log)
+    mo_energy, t1T, t2T, vooo, fvo, restore_t2_inplace = \
+            _sort_t2_vooo_(mycc, orbsym, t1, t2, eris)
+    # t2T is sorted in the buffer of t2.  It is copied to the shared file and
+    # t2 is restored immediately.
+    vooo = ftmp.create_dataset('vooo', data=vooo)
+    t2T_shm = ftmp.create_dataset('t2T', data=t2T)
+    restore_t2_inplace(t2T)
+    t2T = t2T_shm
+    ftmp.flush()
+    cpu1 = log.timer_debug1('CCSD(T) sort_eri', *cpu1)
+
+    orbsym, o_ir_loc, v_ir_loc, oo_ir_loc, nirrep = _irrep_loc(orbsym, nocc)
+    if dtype == numpy.complex:
+        drv = _ccsd.libcc.CCsd_t_zcontract
+    else:
+        drv = _ccsd.libcc.CCsd_t_contract
+
+    def load_cache(b0, b1):
+        cache_row = numpy.asarray(eris_vvop[b0:b1,:b1], order='C')
+        if b0 == 0:
+            cache_col = cache_row
+        else:
+            cache_col = numpy.asarray(eris_vvop[:b0,b0:b1], order='C')
+        return cache_row, cache_col
+
+    def contract(task):
+        a0, a1, b0, b1 = task
+        cache_row_a, cache_col_a = load_cache(a0, a1)
+        if a0 == b0:
+            cache_row_b, cache_col_b = cache_row_a, cache_col_a
+        else:
+            cache_row_b, cache_col_b = load_cache(b0, b1)
+        et = numpy.zeros(1, dtype=dtype)
+        drv(et.ctypes.data_as(ctypes.c_void_p),
+            mo_energy.ctypes.data_as(ctypes.c_void_p),
+            t1T.ctypes.data_as(ctypes.c_void_p),
+            t2T.ctypes.data_as(ctypes.c_void_p),
+            vooo.ctypes.data_as(ctypes.c_void_p),
+            fvo.ctypes.data_as(ctypes.c_void_p),
+            ctypes.c_int(nocc), ctypes.c_int(nvir),
+            ctypes.c_int(a0), ctypes.c_int(a1),
+            ctypes.c_int(b0), ctypes.c_int(b1),
+            ctypes.c_int(nirrep),
+            o_ir_loc.ctypes.data_as(ctypes.c_void_p),
+            v_ir_loc.ctypes.data_as(ctypes.c_void_p),
+            oo_ir_loc.ctypes.data_as(ctypes.c_void_p),
+            orbsym.ctypes.data_as(ctypes.c_void_p),
+            cache_row_a.ctypes.data_as(ctypes.c_void_p),
+            cache_col_a.ctypes.data_as(ctypes.c_void_p),
+            cache_row_b.ctypes.data_as(ctypes.c_void_p),
+            cache_col_b.ctypes.data_as(ctypes.c_void_p))
+        return et[0]
+
+    mem_now = lib.current_memory()[0]
+    max_memory = max(0, mycc.max_memory - mem_now) / nproc
+    if nproc > 1:
+        nthreads = 1
+    else:
+        nthreads = lib.num_threads()
+    bufsize = (max_memory*1e6/8-nocc**3*3*nthreads)/(nocc*nmo)
+    bufsize *= .5  #*.5 upper triangular part is loaded
+    bufsize *= .8  #*.8 for [a0:a1]/[b0:b1] partition
+    bufsize = max(8, bufsize)
+    log.debug('max_memory %d MB per process (%d MB in use)', max_memory, mem_now)
+    tasks = []
+    for a0, a1 in reversed(list(lib.prange_tril(0, nvir, bufsize))):
+        tasks.append((a0, a1, a0, a1))
+        for b0, b1 in lib.prange_tril(0, a0, bufsize/8):
+            tasks.append((a0, a1, b0, b1))
+    tasks = numpy.asarray(tasks, dtype=numpy.int32)
+
+    if chkfile:
+        tasks, et_tasks, done, wall_time = \
+                _load_tasks_chk(chkfile, tasks, fingerprint, log)
+    else:
+        et_tasks = numpy.zeros(len(tasks), dtype=dtype)
+        done = numpy.zeros(len(tasks), dtype=bool)
+        wall_time = numpy.zeros(len(tasks))
+    pending = numpy.where(~done)[0]
+    log.debug('CCSD(T) %d tasks, %d to compute with %d processes',
+              len(tasks), pending.size, nproc)
+
+    def task_done(i, et, t):
+        et_tasks[i] = et
+        wall_time[i] = t
+        done[i] = True
+        log.debug('CCSD(T) task %d:%d,%d:%d  et = %.15g  wall time %.2f s',
+                  tasks[i][0], tasks[i][1], tasks[i][2], tasks[i][3], et.real, t)
+        if chkfile:
+            with h5py.File(chkfile, 'a') as f:
+                g = f['ccsd_t']
+                g['et'][i] = et
+                g['time'][i] = t
+                g['done'][i] = 1
+
+    def timed_contract(i):
+        t0 = time.time()
+        et = contract(tasks[i])
+        return et, time.time() - t0
+
+    def callback(k, result):
+        task_done(pending[k], *result)
+
+    lib.map_in_processes(timed_contract, pending, nproc, callback,
+                         stdout=log.stdout)
+
+    if pending.size > 0:
+        log.info('CCSD(T) wall time per task: max %.2f s, mean %.2f s, '
+                 'total %.2f s', wall_time[pending].max(),
+                 wall_time[pending].mean(), wall_time[pending].sum())
+    ftmp = eris_vvop = t2T = vooo = None
+
+    et_sum = et_tasks.sum() * 2
+    if abs(et_sum.imag) > 1e-4:
+        logger.warn(mycc, 'Non-zero imaginary part of CCSD(T) energy was found %s',
+                    et_sum)
+    et = et_sum.real
+    log.timer('CCSD(T)', *cpu0)
+    log.note('CCSD(T) correction = %.15g', et)
+    return et
+
+def _load_tasks_chk(chkfile, tasks, fingerprint, log):
+    '''Load the records of the tasks from chkfile or initialize the records
+    if they do not exist or they were generated for different amplitudes.'''
+    with h5py.File(chkfile, 'a') as f:
+        if 'ccsd_t' in f:
+            g = f['ccsd_t']
+            fp = g['fingerprint'][()]
+            if fp.shape == fingerprint.shape and numpy.allclose(fp, fingerprint):
+                # The task partition of the previous run is reused
+                tasks = g['tasks'][()]
+                done = g['done'][()].astype(bool)
+                log.info('Resume CCSD(T) from %s. %d of %d tasks were completed',
+                         chkfile, done.sum(), len(tasks))
+                return tasks, g['et'][()], done, g['time'][()]
+            log.warn('CCSD(T) records in %s do not match the current '
+                     'amplitudes. They are discarded.', chkfile)
+            del(f['ccsd_t'])
+        ntasks = len(tasks)
+        g = f.create_group('ccsd_t')
+        g['fingerprint'] = fingerprint
+        g['tasks'] = tasks
+        g['et'] = et_tasks = numpy.zeros(ntasks, dtype=fingerprint.dtype)
+        g['done'] = numpy.zeros(ntasks, dtype=numpy.int8)
+        g['time'] = wall_time = numpy.zeros(ntasks)
+    return tasks, et_tasks, numpy.zeros(ntasks, dtype=bool), wall_time
+
+def _irrep_loc(orbsym, nocc):
+    orbsym = numpy.hstack((numpy.sort(orbsym[:nocc]),numpy.sort(orbsym[nocc:])))
+    o_ir_loc = numpy.append(0, numpy.cumsum(numpy.bincount(orbsym[:nocc], minlength=8)))
+    v_ir_loc = numpy.append(0, numpy.cumsum(numpy.bincount(orbsym[nocc:], minlength=8)))
+    o_sym = orbsym[:nocc]
+    oo_sym = (o_sym[:,None] ^ o_sym).ravel()
+    oo_ir_loc = numpy.append(0, numpy.cumsum(numpy.bincount(oo_sym, minlength=8)))
+    nirrep = max(oo_sym) + 1
+
+    orbsym   = orbsym.astype(numpy.int32)
+    o_ir_loc = o_ir_loc.astype(numpy.int32)
+    v_ir_loc = v_ir_loc.astype(numpy.int32)
+    oo_ir_loc = oo_ir_loc.astype(numpy.int32)
+    return orbsym, o_ir_loc, v_ir_loc, oo_ir_loc, nirrep
+
 def _sort_eri(mycc, eris, nocc, nvir, vvop, log):
     cpu1 = (time.clock(), time.time())
     mol = mycc.mol
@@ -130,6 +130,21 @@ class EOM(lib.StreamObject):
         return self
 
 
+def _batch_matvec(eom, matvec_batch, unit, *args):
+    '''Function to compute the sigma vectors of a list of trial vectors with
+    matvec_batch. The trial vectors are divided into batches so that the
+    intermediates of each batch (unit words per vector) fit in memory.'''
+    def matvec(xs):
+        mem_now = lib.current_memory()[0]
+        max_memory = max(0, eom.max_memory - mem_now)
+        blksize = max(1, int(max_memory*1e6/8/unit))
+        hxs = []
+        for p0, p1 in lib.prange(0, len(xs), blksize):
+            hxs.extend(matvec_batch(eom, xs[p0:p1], *args))
+        return hxs
+    return matvec
+
+
 def _sort_left_right_eigensystem(eom, right_converged, right_evals, right_evecs,
                                  left_converged, left_evals, left_evecs, tol=1e-6):
     '''Ensures the left and right eigenvectors correspond to the same eigenvalue.
@@ -272,47 +287,55 @@ def amplitudes_to_vector_ip(r1, r2):
 
 def ipccsd_matvec(eom, vector, imds=None, diag=None):
     # Ref: Nooijen and Snijders, J. Chem. Phys. 102, 1681 (1995) Eqs.(8)-(9)
+    return ipccsd_matvec_batch(eom, [vector], imds, diag)[0]
+
+def ipccsd_matvec_batch(eom, vectors, imds=None, diag=None):
+    '''Sigma vectors for a batch of trial vectors.  Each intermediate is
+    contracted with all trial vectors at once.'''
     if imds is None: imds = eom.make_imds()
     nocc = eom.nocc
     nmo = eom.nmo
-    r1, r2 = vector_to_amplitudes_ip(vector, nmo, nocc)
+    nvir = nmo - nocc
+    vectors = np.asarray(vectors)
+    nvec = vectors.shape[0]
+    r1 = vectors[:,:nocc]
+    r2 = vectors[:,nocc:].reshape(nvec,nocc,nocc,nvir)
 
     # 1h-1h block
-    Hr1 = -np.einsum('ki,k->i', imds.Loo, r1)
+    Hr1 = -lib.einsum('ki,zk->zi', imds.Loo, r1)
     #1h-2h1p block
-    Hr1 += 2*np.einsum('ld,ild->i', imds.Fov, r2)
-    Hr1 +=  -np.einsum('kd,kid->i', imds.Fov, r2)
-    Hr1 += -2*np.einsum('klid,kld->i', imds.Wooov, r2)
-    Hr1 +=    np.einsum('lkid,kld->i', imds.Wooov, r2)
+    Hr1 += 2*lib.einsum('ld,zild->zi', imds.Fov, r2)
+    Hr1 +=  -lib.einsum('kd,zkid->zi', imds.Fov, r2)
+    Hr1 += -2*lib.einsum('klid,zkld->zi', imds.Wooov, r2)
+    Hr1 +=    lib.einsum('lkid,zkld->zi', imds.Wooov, r2)
 
     # 2h1p-1h block
-    Hr2 = -np.einsum('kbij,k->ijb', imds.Wovoo, r1)
+    Hr2 = -lib.einsum('kbij,zk->zijb', imds.Wovoo, r1)
     # 2h1p-2h1p block
     if eom.partition == 'mp':
         fock = imds.eris.fock
         foo = fock[:nocc,:nocc]
         fvv = fock[nocc:,nocc:]
-        Hr2 += lib.einsum('bd,ijd->ijb', fvv, r2)
-        Hr2 += -lib.einsum('ki,kjb->ijb', foo, r2)
-        Hr2 += -lib.einsum('lj,ilb->ijb', foo, r2)
+        Hr2 += lib.einsum('bd,zijd->zijb', fvv, r2)
+        Hr2 += -lib.einsum('ki,zkjb->zijb', foo, r2)
+        Hr2 += -lib.einsum('lj,zilb->zijb', foo, r2)
     elif eom.partition == 'full':
         diag_matrix2 = vector_to_amplitudes_ip(diag, nmo, nocc)[1]
         Hr2 += diag_matrix2 * r2
     else:
-        Hr2 += lib.einsum('bd,ijd->ijb', imds.Lvv, r2)
-        Hr2 += -lib.einsum('ki,kjb->ijb', imds.Loo, r2)
-        Hr2 += -lib.einsum('lj,ilb->ijb', imds.Loo, r2)
-        Hr2 +=  lib.einsum('klij,klb->ijb', imds.Woooo, r2)
-        Hr2 += 2*lib.einsum('lbdj,ild->ijb', imds.Wovvo, r2)
-        Hr2 +=  -lib.einsum('kbdj,kid->ijb', imds.Wovvo, r2)
-        Hr2 +=  -lib.einsum('lbjd,ild->ijb', imds.Wovov, r2) #typo in Ref
-        Hr2 +=  -lib.einsum('kbid,kjd->ijb', imds.Wovov, r2)
-        tmp = 2*np.einsum('lkdc,kld->c', imds.Woovv, r2)
-        tmp += -np.einsum('kldc,kld->c', imds.Woovv, r2)
-        Hr2 += -np.einsum('c,ijcb->ijb', tmp, imds.t2)
-
-    vector = amplitudes_to_vector_ip(Hr1, Hr2)
-    return vector
+        Hr2 += lib.einsum('bd,zijd->zijb', imds.Lvv, r2)
+        Hr2 += -lib.einsum('ki,zkjb->zijb', imds.Loo, r2)
+        Hr2 += -lib.einsum('lj,zilb->zijb', imds.Loo, r2)
+        Hr2 +=  lib.einsum('klij,zklb->zijb', imds.Woooo, r2)
+        Hr2 += 2*lib.einsum('lbdj,zild->zijb', imds.Wovvo, r2)
+        Hr2 +=  -lib.einsum('kbdj,zkid->zijb', imds.Wovvo, r2)
+        Hr2 +=  -lib.einsum('lbjd,zild->zijb', imds.Wovov, r2) #typo in Ref
+        Hr2 +=  -lib.einsum('kbid,zkjd->zijb', imds.Wovov, r2)
+        tmp = 2*lib.einsum('lkdc,zkld->zc', imds.Woovv, r2)
+        tmp += -lib.einsum('kldc,zkld->zc', imds.Woovv, r2)
+        Hr2 += -lib.einsum('zc,ijcb->zijb', tmp, imds.t2)
+
+    return np.hstack((Hr1, Hr2.reshape(nvec,-1)))
 
 def lipccsd_matvec(eom, vector, imds=None, diag=None):
     '''For left eigenvector'''
@@ -553,6 +576,10 @@ class EOMIP(EOM):
         diag = self.get_diag(imds)
         if left:
             matvec = lambda xs: [self.l_matvec(x, imds, diag) for x in xs]
+        elif getattr(self.matvec, '__func__', None) is ipccsd_matvec:
+            # The trial vectors are contracted together with the intermediates
+            unit = self.vector_size() * 8
+            matvec = _batch_matvec(self, ipccsd_matvec_batch, unit, imds, diag)
         else:
             matvec = lambda xs: [self.matvec(x, imds, diag) for x in xs]
         return matvec, diag
@@ -623,47 +650,56 @@ def amplitudes_to_vector_ea(r1, r2):
 
 def eaccsd_matvec(eom, vector, imds=None, diag=None):
     # Ref: Nooijen and Bartlett, J. Chem. Phys. 102, 3629 (1995) Eqs.(30)-(31)
+    return eaccsd_matvec_batch(eom, [vector], imds, diag)[0]
+
+def eaccsd_matvec_batch(eom, vectors, imds=None, diag=None):
+    '''Sigma vectors for a batch of trial vectors.  Each intermediate
+    (including Wvvvv) is contracted with all trial vectors at once.'''
     if imds is None: imds = eom.make_imds()
     nocc = eom.nocc
     nmo = eom.nmo
     nvir = nmo - nocc
-    r1, r2 = vector_to_amplitudes_ea(vector, nmo, nocc)
+    vectors = np.asarray(vectors)
+    nvec = vectors.shape[0]
+    r1 = vectors[:,:nvir]
+    r2 = vectors[:,nvir:].reshape(nvec,nocc,nvir,nvir)
 
     # Eq. (37)
     # 1p-1p block
-    Hr1 =  np.einsum('ac,c->a', imds.Lvv, r1)
+    Hr1 =  lib.einsum('ac,zc->za', imds.Lvv, r1)
     # 1p-2p1h block
-    Hr1 += np.einsum('ld,lad->a', 2.*imds.Fov, r2)
-    Hr1 += np.einsum('ld,lda->a',   -imds.Fov, r2)
-    Hr1 += np.einsum('alcd,lcd->a', 2.*imds.Wvovv-imds.Wvovv.transpose(0,1,3,2), r2)
+    Hr1 += lib.einsum('ld,zlad->za', 2.*imds.Fov, r2)
+    Hr1 += lib.einsum('ld,zlda->za',   -imds.Fov, r2)
+    Hr1 += lib.einsum('alcd,zlcd->za', 2.*imds.Wvovv-imds.Wvovv.transpose(0,1,3,2), r2)
     # Eq. (38)
     # 2p1h-1p block
-    Hr2 = np.einsum('abcj,c->jab', imds.Wvvvo, r1)
+    Hr2 = lib.einsum('abcj,zc->zjab', imds.Wvvvo, r1)
     # 2p1h-2p1h block
     if eom.partition == 'mp':
         fock = imds.eris.fock
         foo = fock[:nocc,:nocc]
         fvv = fock[nocc:,nocc:]
-        Hr2 +=  lib.einsum('ac,jcb->jab', fvv, r2)
-        Hr2 +=  lib.einsum('bd,jad->jab', fvv, r2)
-        Hr2 += -lib.einsum('lj,lab->jab', foo, r2)
+        Hr2 +=  lib.einsum('ac,zjcb->zjab', fvv, r2)
+        Hr2 +=  lib.einsum('bd,zjad->zjab', fvv, r2)
+        Hr2 += -lib.einsum('lj,zlab->zjab', foo, r2)
     elif eom.partition == 'full':
         diag_matrix2 = vector_to_amplitudes_ea(diag, nmo, nocc)[1]
         Hr2 += diag_matrix2 * r2
     else:
-        Hr2 +=  lib.einsum('ac,jcb->jab', imds.Lvv, r2)
-        Hr2 +=  lib.einsum('bd,jad->jab', imds.Lvv, r2)
-        Hr2 += -lib.einsum('lj,lab->jab', imds.Loo, r2)
-        Hr2 += lib.einsum('lbdj,lad->jab', 2.*imds.Wovvo-imds.Wovov.transpose(0,1,3,2), r2)
-        Hr2 += -lib.einsum('lajc,lcb->jab', imds.Wovov, r2)
-        Hr2 += -lib.einsum('lbcj,lca->jab', imds.Wovvo, r2)
+        Hr2 +=  lib.einsum('ac,zjcb->zjab', imds.Lvv, r2)
+        Hr2 +=  lib.einsum('bd,zjad->zjab', imds.Lvv, r2)
+        Hr2 += -lib.einsum('lj,zlab->zjab', imds.Loo, r2)
+        Hr2 += lib.einsum('lbdj,zlad->zjab', 2.*imds.Wovvo-imds.Wovov.transpose(0,1,3,2), r2)
+        Hr2 += -lib.einsum('lajc,zlcb->zjab', imds.Wovov, r2)
+        Hr2 += -lib.einsum('lbcj,zlca->zjab', imds.Wovvo, r2)
+        r2 = r2.reshape(nvec*nocc,nvir,nvir)
         for a in range(nvir):
-            Hr2[:,a,:] += lib.einsum('bcd,jcd->jb', imds.Wvvvv[a], r2)
-        tmp = np.einsum('klcd,lcd->k', 2.*imds.Woovv-imds.Woovv.transpose(0,1,3,2), r2)
-        Hr2 += -np.einsum('k,kjab->jab', tmp, imds.t2)
+            Hr2[:,:,a,:] += lib.einsum('bcd,xcd->xb', imds.Wvvvv[a], r2).reshape(nvec,nocc,nvir)
+        r2 = r2.reshape(nvec,nocc,nvir,nvir)
+        tmp = lib.einsum('klcd,zlcd->zk', 2.*imds.Woovv-imds.Woovv.transpose(0,1,3,2), r2)
+        Hr2 += -lib.einsum('zk,kjab->zjab', tmp, imds.t2)
 
-    vector = amplitudes_to_vector_ea(Hr1,Hr2)
-    return vector
+    return np.hstack((Hr1, Hr2.reshape(nvec,-1)))
 
 def leaccsd_matvec(eom, vector, imds=None, diag=None):
     # Note this is not the same left EA equations used by Nooijen and Bartlett.
@@ -920,6 +956,10 @@ class EOMEA(EOM):
         diag = self.get_diag(imds)
         if left:
             matvec = lambda xs: [self.l_matvec(x, imds, diag) for x in xs]
+        elif getattr(self.matvec, '__func__', None) is eaccsd_matvec:
+            # The trial vectors are contracted together with the intermediates
+            unit = self.vector_size() * 8
+            matvec = _batch_matvec(self, eaccsd_matvec_batch, unit, imds, diag)
         else:
             matvec = lambda xs: [self.matvec(x, imds, diag) for x in xs]
         return matvec, diag
@@ -1136,101 +1176,109 @@ def vector_to_amplitudes_triplet(vector, nmo, nocc):
     return t1, (t2aa, t2ab)
 
 def eeccsd_matvec_singlet(eom, vector, imds=None):
+    return eeccsd_matvec_singlet_batch(eom, [vector], imds)[0]
+
+def eeccsd_matvec_singlet_batch(eom, vectors, imds=None):
+    '''Sigma vectors for a batch of trial vectors.  The integrals and the
+    intermediates (ovvv, vvvv and the intermediates saved on disk) are loaded
+    once for all trial vectors.'''
     if imds is None: imds = eom.make_imds()
     nocc = eom.nocc
     nmo = eom.nmo
     nvir = nmo - nocc
 
-    r1, r2 = vector_to_amplitudes_singlet(vector, nmo, nocc)
+    r1, r2 = zip(*[vector_to_amplitudes_singlet(v, nmo, nocc) for v in vectors])
+    r1 = np.asarray(r1)
+    r2 = np.asarray(r2)
+    nvec = len(r1)
     t1, t2, eris = imds.t1, imds.t2, imds.eris
     nocc, nvir = t1.shape
 
-    Hr1  = lib.einsum('ae,ie->ia', imds.Fvv, r1)
-    Hr1 -= lib.einsum('mi,ma->ia', imds.Foo, r1)
-    Hr1 += np.einsum('me,imae->ia',imds.Fov, r2) * 2
-    Hr1 -= np.einsum('me,imea->ia',imds.Fov, r2)
+    Hr1  = lib.einsum('ae,zie->zia', imds.Fvv, r1)
+    Hr1 -= lib.einsum('mi,zma->zia', imds.Foo, r1)
+    Hr1 += lib.einsum('me,zimae->zia',imds.Fov, r2) * 2
+    Hr1 -= lib.einsum('me,zimea->zia',imds.Fov, r2)
 
     #:eris_vvvv = ao2mo.restore(1,np.asarray(eris.vvvv), t1.shape[1])
-    #:Hr2 += lib.einsum('ijef,aebf->ijab', tau2, eris_vvvv) * .5
+    #:Hr2 += lib.einsum('zijef,aebf->zijab', tau2, eris_vvvv) * .5
     tau2 = _make_tau(r2, r1, t1, fac=2)
     Hr2 = eom._cc._add_vvvv(None, tau2, eris, with_ovvv=False, t2sym='jiba')
 
     woOoO = np.asarray(imds.woOoO)
-    Hr2 += lib.einsum('mnij,mnab->ijab', woOoO, r2)
+    Hr2 += lib.einsum('mnij,zmnab->zijab', woOoO, r2)
     Hr2 *= .5
     woOoO = None
 
-    Hr2 += lib.einsum('be,ijae->ijab', imds.Fvv   , r2)
-    Hr2 -= lib.einsum('mj,imab->ijab', imds.Foo   , r2)
+    Hr2 += lib.einsum('be,zijae->zijab', imds.Fvv   , r2)
+    Hr2 -= lib.einsum('mj,zimab->zijab', imds.Foo   , r2)
 
     mem_now = lib.current_memory()[0]
     max_memory = max(0, eom.max_memory - mem_now - Hr2.size*8e-6)
     blksize = min(nocc, max(ccsd.BLKMIN, int(max_memory*1e6/8/(nvir**3*3))))
     for p0,p1 in lib.prange(0, nocc, blksize):
         ovvv = eris.get_ovvv(slice(p0,p1))  # ovvv = eris.ovvv[p0:p1]
-        theta = r2[p0:p1] * 2 - r2[p0:p1].transpose(0,1,3,2)
-        Hr1 += lib.einsum('mfae,mife->ia', ovvv, theta)
+        theta = r2[:,p0:p1] * 2 - r2[:,p0:p1].transpose(0,1,2,4,3)
+        Hr1 += lib.einsum('mfae,zmife->zia', ovvv, theta)
         theta = None
-        tmp = lib.einsum('meaf,ijef->maij', ovvv, tau2)
-        Hr2 -= lib.einsum('ma,mbij->ijab', t1[p0:p1], tmp)
-        tmp  = lib.einsum('meaf,me->af', ovvv, r1[p0:p1]) * 2
-        tmp -= lib.einsum('mfae,me->af', ovvv, r1[p0:p1])
-        Hr2 += lib.einsum('af,ijfb->ijab', tmp, t2)
+        tmp = lib.einsum('meaf,zijef->zmaij', ovvv, tau2)
+        Hr2 -= lib.einsum('ma,zmbij->zijab', t1[p0:p1], tmp)
+        tmp  = lib.einsum('meaf,zme->zaf', ovvv, r1[:,p0:p1]) * 2
+        tmp -= lib.einsum('mfae,zme->zaf', ovvv, r1[:,p0:p1])
+        Hr2 += lib.einsum('zaf,ijfb->zijab', tmp, t2)
         ovvv = tmp = None
     tau2 = None
-    Hr2 -= lib.einsum('mbij,ma->ijab', imds.woVoO, r1)
+    Hr2 -= lib.einsum('mbij,zma->zijab', imds.woVoO, r1)
 
     blksize = min(nvir, max(ccsd.BLKMIN, int(max_memory*1e6/8/(nocc*nvir**2*2))))
     for p0, p1 in lib.prange(0, nvir, nocc):
-        Hr2 += lib.einsum('ejab,ie->ijab', np.asarray(imds.wvOvV[p0:p1]), r1[:,p0:p1])
+        Hr2 += lib.einsum('ejab,zie->zijab', np.asarray(imds.wvOvV[p0:p1]), r1[:,:,p0:p1])
 
     woVVo = np.asarray(imds.woVVo)
-    tmp = lib.einsum('mbej,imea->jiab', woVVo, r2)
+    tmp = lib.einsum('mbej,zimea->zjiab', woVVo, r2)
     Hr2 += tmp
     tmp *= .5
-    Hr2 += tmp.transpose(0,1,3,2)
+    Hr2 += tmp.transpose(0,1,2,4,3)
     tmp = None
 
     woVvO = woVVo * .5
     woVVo = None
     woVvO += np.asarray(imds.woVvO)
-    theta = r2*2 - r2.transpose(0,1,3,2)
-    Hr1 += np.einsum('maei,me->ia', woVvO, r1) * 2
-    Hr2 += lib.einsum('mbej,imae->ijab', woVvO, theta)
+    theta = r2*2 - r2.transpose(0,1,2,4,3)
+    Hr1 += lib.einsum('maei,zme->zia', woVvO, r1) * 2
+    Hr2 += lib.einsum('mbej,zimae->zijab', woVvO, theta)
     woVvO = None
 
     woOoV = np.asarray(imds.woOoV)
-    Hr1-= lib.einsum('mnie,mnae->ia', woOoV, theta)
-    tmp = lib.einsum('nmie,me->ni', woOoV, r1) * 2
-    tmp-= lib.einsum('mnie,me->ni', woOoV, r1)
-    Hr2 -= lib.einsum('ni,njab->ijab', tmp, t2)
+    Hr1-= lib.einsum('mnie,zmnae->zia', woOoV, theta)
+    tmp = lib.einsum('nmie,zme->zni', woOoV, r1) * 2
+    tmp-= lib.einsum('mnie,zme->zni', woOoV, r1)
+    Hr2 -= lib.einsum('zni,njab->zijab', tmp, t2)
     tmp = woOoV = None
 
     eris_ovov = np.asarray(eris.ovov)
-    tmp  = np.einsum('mfne,mf->en', eris_ovov, r1) * 2
-    tmp -= np.einsum('menf,mf->en', eris_ovov, r1)
-    tmp  = np.einsum('en,nb->eb', tmp, t1)
-    tmp += lib.einsum('menf,mnbf->eb', eris_ovov, theta)
-    Hr2 -= lib.einsum('eb,ijea->jiab', tmp, t2)
+    tmp  = lib.einsum('mfne,zmf->zen', eris_ovov, r1) * 2
+    tmp -= lib.einsum('menf,zmf->zen', eris_ovov, r1)
+    tmp  = lib.einsum('zen,nb->zeb', tmp, t1)
+    tmp += lib.einsum('menf,zmnbf->zeb', eris_ovov, theta)
+    Hr2 -= lib.einsum('zeb,ijea->zjiab', tmp, t2)
     tmp = None
 
-    tmp = lib.einsum('nemf,imef->ni', eris_ovov, theta)
-    Hr1 -= lib.einsum('na,ni->ia', t1, tmp)
-    Hr2 -= lib.einsum('mj,miab->ijba', tmp, t2)
+    tmp = lib.einsum('nemf,zimef->zni', eris_ovov, theta)
+    Hr1 -= lib.einsum('na,zni->zia', t1, tmp)
+    Hr2 -= lib.einsum('zmj,miab->zijba', tmp, t2)
     tmp = theta = None
 
     tau2 = _make_tau(r2, r1, t1, fac=2)
-    tmp = lib.einsum('menf,ijef->mnij', eris_ovov, tau2)
+    tmp = lib.einsum('menf,zijef->zmnij', eris_ovov, tau2)
     tau2 = None
 
     tau = _make_tau(t2, t1, t1)
     tau *= .5
-    Hr2 += lib.einsum('mnij,mnab->ijab', tmp, tau)
+    Hr2 += lib.einsum('zmnij,mnab->zijab', tmp, tau)
     tau = tmp = eris_ovov = None
 
-    Hr2 = Hr2 + Hr2.transpose(1,0,3,2)
-    vector = amplitudes_to_vector_ee(Hr1, Hr2)
-    return vector
+    Hr2 = Hr2 + Hr2.transpose(0,2,1,4,3)
+    return [amplitudes_to_vector_ee(Hr1[k], Hr2[k]) for k in range(nvec)]
 
 def eeccsd_matvec_triplet(eom, vector, imds=None):
     if imds is None: imds = eom.make_imds()
@@ -1664,7 +1712,15 @@ class EOMEESinglet(EOMEE):
     def gen_matvec(self, imds=None, diag=None, **kwargs):
         if imds is None: imds = self.make_imds()
         if diag is None: diag = self.get_diag(imds)[0]
-        matvec = lambda xs: [self.matvec(x, imds) for x in xs]
+        if getattr(self.matvec, '__func__', None) is eeccsd_matvec_singlet:
+            # The trial vectors are contracted together with the integrals
+            # and the intermediates
+            nocc = self.nocc
+            nvir = self.nmo - nocc
+            unit = nocc**2*nvir**2 * 8
+            matvec = _batch_matvec(self, eeccsd_matvec_singlet_batch, unit, imds)
+        else:
+            matvec = lambda xs: [self.matvec(x, imds) for x in xs]
         return matvec, diag
 
     def vector_to_amplitudes(self, vector, nmo=None, nocc=None):
@@ -2049,8 +2105,9 @@ class _IMDS:
         return self
 
 def _make_tau(t2, t1, r1, fac=1, out=None):
-    tau = np.einsum('ia,jb->ijab', t1, r1)
-    tau = tau + tau.transpose(1,0,3,2)
+    # t2 and t1 (or r1) can be the stacks of amplitudes of multiple vectors
+    tau = np.einsum('...ia,...jb->...ijab', t1, r1)
+    tau = tau + tau.swapaxes(-4,-3).swapaxes(-2,-1)
     tau *= fac * .5
     tau += t2
     return tau
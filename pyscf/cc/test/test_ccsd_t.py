@@ -14,7 +14,9 @@
 # limitations under the License.
 
 import unittest
+import tempfile
 import numpy
+import h5py
 from functools import reduce
 
 from pyscf import gto, scf, lib, symm
@@ -86,6 +88,28 @@ class KnownValues(unittest.TestCase):
         self.assertAlmostEqual(e3a, -0.003060022611584471, 9)
         mcc.mol.symmetry = True
 
+    def test_ccsd_t_tasks(self):
+        eris = mcc.ao2mo()
+        t2ref = mcc.t2.copy()
+        with lib.temporary_env(mcc, max_memory=1):
+            e3a = ccsd_t.kernel(mcc, eris, nproc=2)
+            self.assertAlmostEqual(e3a, -0.003060022611584471, 9)
+            self.assertAlmostEqual(abs(mcc.t2 - t2ref).max(), 0, 12)
+
+            ftmp = tempfile.NamedTemporaryFile()
+            e3a = mcc.ccsd_t(eris=eris, nproc=1, chkfile=ftmp.name)
+            self.assertAlmostEqual(e3a, -0.003060022611584471, 9)
+
+        # Remove half of the records and resume
+        with h5py.File(ftmp.name, 'a') as f:
+            done = f['ccsd_t/done'][()]
+            self.assertTrue(done.all())
+            done[::2] = 0
+            f['ccsd_t/done'][:] = done
+            f['ccsd_t/et'][::2] = 0
+        e3a = ccsd_t.kernel(mcc, eris, nproc=2, chkfile=ftmp.name)
+        self.assertAlmostEqual(e3a, -0.003060022611584471, 9)
+
     def test_sort_eri(self):
         eris = mcc.ao2mo()
         nocc, nvir = mcc.t1.shape
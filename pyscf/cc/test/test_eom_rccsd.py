@@ -334,6 +334,27 @@ class KnownValues(unittest.TestCase):
         self.assertAlmostEqual(lib.finger(vec1), -17030.363405297598, 9)
         self.assertAlmostEqual(lib.finger(diag), 4688.9122122011922, 9)
 
+    def test_matvec_batch(self):
+        numpy.random.seed(12)
+        # Fingerprints of the sigma vectors of the single-vector matvec
+        refs = ((eom_rccsd.EOMIP, (-1576.9789303167163, -624.9883381264431, -7209.662952597128)),
+                (eom_rccsd.EOMEA, (-141741.51086345015, 11977.840246542728, -133542.10816524137)),
+                (eom_rccsd.EOMEESinglet, (73450.2917345076, 60009.15747670738, 48939.38903390315)))
+        for cls, ref in refs:
+            myeom = cls(mycc1)
+            imds = myeom.make_imds(eris1)
+            xs = numpy.random.random((3,myeom.vector_size())) - .9
+            matvec, diag = myeom.gen_matvec(imds)
+            hxs = matvec(xs)
+            for hx, r in zip(hxs, ref):
+                self.assertAlmostEqual(lib.finger(hx), r, 7)
+
+            # one vector per batch
+            myeom.max_memory = 0
+            matvec, diag = myeom.gen_matvec(imds)
+            for hx, r in zip(matvec(xs), ref):
+                self.assertAlmostEqual(lib.finger(hx), r, 7)
+
 
 ########################################
 # Complex integrals
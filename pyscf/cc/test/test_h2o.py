@@ -90,6 +90,49 @@ class KnownValues(unittest.TestCase):
         mcc.kernel()
         self.assertAlmostEqual(mcc.ecc, -0.21303885376969361, 8)
 
+    def test_mixed_precision(self):
+        mcc = cc.ccsd.CCSD(mf)
+        mcc.mixed_precision = True
+        mcc.conv_tol = 1e-9
+        mcc.conv_tol_normt = 1e-7
+        mcc.kernel()
+        self.assertTrue(mcc.converged)
+        self.assertEqual(mcc.t2.dtype, numpy.double)
+        self.assertAlmostEqual(mcc.e_corr, -0.2133432312951, 7)
+
+        mcc = cc.ccsd.CCSD(mf)
+        mcc.max_memory = 1
+        mcc.mixed_precision = True
+        mcc.conv_tol = 1e-9
+        mcc.conv_tol_normt = 1e-7
+        with lib.temporary_env(mf, _eri=None):
+            eris = mcc.ao2mo(dtype=numpy.float32)
+            self.assertEqual(eris.ovov.dtype, numpy.float32)
+            self.assertEqual(eris.vvvv.dtype, numpy.float32)
+            mcc.kernel()
+        self.assertTrue(mcc.converged)
+        self.assertEqual(mcc.t2.dtype, numpy.double)
+        self.assertAlmostEqual(mcc.e_corr, -0.2133432312951, 7)
+
+    def test_nproc(self):
+        mcc = cc.ccsd.CCSD(mf)
+        mcc.nproc = 2
+        mcc.conv_tol = 1e-9
+        mcc.conv_tol_normt = 1e-7
+        mcc.kernel()
+        self.assertTrue(mcc.converged)
+        self.assertAlmostEqual(mcc.e_corr, -0.2133432312951, 8)
+
+        mcc = cc.ccsd.CCSD(mf)
+        mcc.max_memory = 1
+        mcc.nproc = 2
+        mcc.conv_tol = 1e-9
+        mcc.conv_tol_normt = 1e-7
+        with lib.temporary_env(mf, _eri=None):
+            mcc.kernel()
+        self.assertTrue(mcc.converged)
+        self.assertAlmostEqual(mcc.e_corr, -0.2133432312951, 8)
+
     def test_h2o_non_hf_orbital_high_cost(self):
         nmo = mf.mo_energy.size
         nocc = mol.nelectron // 2
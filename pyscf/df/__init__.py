@@ -36,6 +36,8 @@ from . import outcore
 from . import addons
 from .addons import load, aug_etb, DEFAULT_AUXBASIS, make_auxbasis, make_auxmol
 from .df import DF, DF4C
+from . import cholesky
+from .cholesky import CDDF
 
 from . import r_incore
 
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# Copyright 2014-2020 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Pivoted Cholesky decomposition of the AO electron repulsion integrals
+
+The ERI matrix (ij|kl), with the compound indices ij and kl (i>=j, k>=l), is
+decomposed to the Cholesky vectors L_{x,ij} until the largest diagonal
+element of the residual (ij|ij) - sum_x L_{x,ij}^2 is smaller than the given
+threshold.  The Cholesky vectors have the same layout as the DF integral
+tensor (naux,nao*(nao+1)/2).  They can be used in place of the DF tensor by
+all methods which access the integrals through DF.loop (DF-SCF, DF-MP2,
+DF-CCSD ...).  No auxiliary basis is needed and the error of the integrals
+is controlled by the threshold.
+
+Ref:
+    Beebe, Linderberg, Int. J. Quantum Chem. 12, 683 (1977)
+    Aquilante, Pedersen, Lindh, J. Chem. Phys. 126, 194106 (2007)
+'''
+
+import time
+import copy
+import numpy
+import h5py
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf.df import df
+from pyscf.df import df_jk
+from pyscf import __config__
+
+MAX_MEMORY = getattr(__config__, 'df_outcore_max_memory', 2000)  # 2GB
+# Only the pivots whose diagonal elements are larger than SPAN * max(diag)
+# are selected from the batch of integrals of one shell pair
+SPAN = getattr(__config__, 'df_cholesky_span', 1e-2)
+
+
+def get_diag(mol, intor='int2e'):
+    '''Diagonal elements (ij|ij) of the ERI matrix for i>=j
+
+    Returns:
+        1D array of size nao*(nao+1)/2
+    '''
+    ao_loc = mol.ao_loc_nr()
+    nao = ao_loc[-1]
+    diag = numpy.zeros((nao,nao))
+    for i in range(mol.nbas):
+        i0, i1 = ao_loc[i], ao_loc[i+1]
+        for j in range(i+1):
+            j0, j1 = ao_loc[j], ao_loc[j+1]
+            buf = mol.intor_by_shell(intor, (i, j, i, j))
+            diag[i0:i1,j0:j1] = numpy.einsum('ijij->ij', buf)
+    return lib.pack_tril(diag)
+
+def _shell_pair_index(mol):
+    '''The shell pair (ish,jsh) of each compound AO index ij (i>=j)'''
+    ao_loc = mol.ao_loc_nr()
+    nao = ao_loc[-1]
+    ao_shl = numpy.repeat(numpy.arange(mol.nbas), ao_loc[1:]-ao_loc[:-1])
+    idx = numpy.tril_indices(nao)
+    return ao_shl[idx[0]], ao_shl[idx[1]]
+
+def cholesky_eri(mol, tol=1e-6, intor='int2e', max_memory=MAX_MEMORY,
+                 verbose=0):
+    '''Pivoted Cholesky decomposition of the AO ERI matrix.  The integrals
+    are computed on the fly.  The columns (:|kl) of the ERI matrix are
+    evaluated for one shell pair (KL) at a time, for the shell pair which
+    holds the largest residual diagonal element.
+
+    Kwargs:
+        tol : float
+            The decomposition stops when all residual diagonal elements are
+            smaller than tol.  The error of each integral (ij|kl) is bounded
+            by tol.
+
+    Returns:
+        2D array of (naux,nao*(nao+1)/2) in C-contiguous
+    '''
+    t0 = (time.clock(), time.time())
+    log = logger.new_logger(mol, verbose)
+    ao_loc = mol.ao_loc_nr()
+    nao = ao_loc[-1]
+    nao_pair = nao * (nao+1) // 2
+    intor = mol._add_suffix(intor)
+
+    diag = get_diag(mol, intor)
+    t1 = log.timer_debug1('ERI diagonal', *t0)
+    pair_ish, pair_jsh = _shell_pair_index(mol)
+
+    max_naux = int(max(max_memory*.5e6/8/nao_pair, 1))
+    cap = min(nao_pair, max_naux, nao*8)
+    cderi = numpy.empty((cap,nao_pair))
+    naux = 0
+    npair_eval = 0
+    while True:
+        p = numpy.argmax(diag)
+        dmax = diag[p]
+        if dmax < tol:
+            break
+
+        ish = pair_ish[p]
+        jsh = pair_jsh[p]
+        i0, i1 = ao_loc[ish], ao_loc[ish+1]
+        j0, j1 = ao_loc[jsh], ao_loc[jsh+1]
+        shls_slice = (0, mol.nbas, 0, mol.nbas, ish, ish+1, jsh, jsh+1)
+        cols = mol.intor(intor, aosym='s2ij', shls_slice=shls_slice)
+        i, j = numpy.mgrid[i0:i1,j0:j1]
+        mask = i >= j
+        qidx = i[mask]*(i[mask]+1)//2 + j[mask]
+        cols = numpy.asarray(cols[:,mask], order='C')
+        npair_eval += 1
+
+        if naux > 0:
+            # Remove the contributions of the existing Cholesky vectors
+            lib.dot(cderi[:naux].T, cderi[:naux,qidx], -1, cols, 1)
+
+        thr = max(tol, SPAN * dmax)
+        for k in range(qidx.size):
+            q = numpy.argmax(diag[qidx])
+            dq = diag[qidx[q]]
+            if dq < thr:
+                break
+
+            if naux == cap:
+                if cap == nao_pair or cap >= max_naux:
+                    raise MemoryError('Not enough memory for the Cholesky '
+                                      'vectors (%d vectors of size %d)' %
+                                      (cap, nao_pair))
+                cap = min(nao_pair, max_naux, cap*2)
+                cderi_new = numpy.empty((cap,nao_pair))
+                cderi_new[:naux] = cderi[:naux]
+                cderi = cderi_new
+                cderi_new = None
+
+            vec = cderi[naux] = cols[:,q] * (1/numpy.sqrt(dq))
+            naux += 1
+            cols -= vec[:,None] * vec[qidx]
+            diag -= vec**2
+            diag[qidx[q]] = 0
+
+        diag[diag < 0] = 0
+
+    log.debug('Pivoted Cholesky decomposition: %d vectors, %d shell pairs '
+              'evaluated, max residual diagonal %.3g', naux, npair_eval, dmax)
+    log.timer('Pivoted Cholesky decomposition', *t1)
+    return numpy.asarray(cderi[:naux], order='C')
+
+
+class CDDF(df.DF):
+    '''Object to hold the Cholesky vectors of the AO ERI matrix.  It can be
+    used as the DF object of the DF-SCF and DF post-HF methods.
+
+    Attributes:
+        tol : float
+            Threshold of the pivoted Cholesky decomposition.  The
+            decomposition stops when the largest residual diagonal element
+            (ij|ij) is smaller than tol.  The error of each integral (ij|kl)
+            is bounded by tol.
+
+    The auxiliary basis is not used.  The analytical gradients (which require
+    the 3-center integrals of an auxiliary basis) are not available.
+
+    Examples:
+
+    >>> mol = gto.M(atom='N 0 0 0; N 0 0 1.1', basis='ccpvdz')
+    >>> mf = scf.RHF(mol).density_fit(with_df=df.CDDF(mol, tol=1e-6)).run()
+    >>> mp.dfmp2.DFMP2(mf).run()
+    '''
+
+    tol = getattr(__config__, 'df_cholesky_CDDF_tol', 1e-6)
+
+    def __init__(self, mol, tol=None):
+        df.DF.__init__(self, mol)
+        if tol is not None:
+            self.tol = tol
+
+    def dump_flags(self, verbose=None):
+        log = logger.new_logger(self, verbose)
+        log.info('******** %s ********', self.__class__)
+        log.info('Pivoted Cholesky decomposition tol = %g', self.tol)
+        log.info('max_memory = %s', self.max_memory)
+        if self.mixed_precision:
+            log.info('mixed_precision = %s, mixed_precision_tol = %g',
+                     self.mixed_precision, self.mixed_precision_tol)
+        if self.local_exchange:
+            log.info('local_exchange = %s, local_exchange_tol = %g',
+                     self.local_exchange, self.local_exchange_tol)
+        if isinstance(self._cderi_to_save, str):
+            log.info('_cderi_to_save = %s', self._cderi_to_save)
+        return self
+
+    def build(self):
+        t0 = (time.clock(), time.time())
+        log = logger.Logger(self.stdout, self.verbose)
+
+        self.check_sanity()
+        self.dump_flags()
+
+        self._pair_max = None
+        max_memory = self.max_memory - lib.current_memory()[0]
+        cderi = cholesky_eri(self.mol, self.tol, max_memory=max_memory,
+                             verbose=log)
+        if isinstance(self._cderi_to_save, str):
+            with h5py.File(self._cderi_to_save, 'w') as f:
+                f['j3c'] = cderi
+            self._cderi = self._cderi_to_save
+        else:
+            self._cderi = cderi
+        log.timer_debug1('Generate Cholesky decomposed integrals', *t0)
+
+        if self.mixed_precision:
+            self._cderi_f32 = self._make_cderi_f32()
+        return self
+
+    def get_jk(self, dm, hermi=1, with_j=True, with_k=True,
+               direct_scf_tol=getattr(__config__, 'scf_hf_SCF_direct_scf_tol', 1e-13),
+               omega=None):
+        # The Cholesky vectors are generated before calling df_jk.get_jk.
+        # Otherwise, df_jk.get_j would compute vj with the auxiliary basis
+        if omega is None:
+            if self._cderi is None:
+                self.build()
+            return df_jk.get_jk(self, dm, hermi, with_j, with_k, direct_scf_tol)
+
+        key = '%.6f' % omega
+        if key in self._rsh_df:
+            rsh_df = self._rsh_df[key]
+        else:
+            rsh_df = self._rsh_df[key] = copy.copy(self).reset()
+            logger.info(self, 'Create RSH-DF object %s for omega=%s', rsh_df, omega)
+
+        with rsh_df.mol.with_range_coulomb(omega):
+            if rsh_df._cderi is None:
+                rsh_df.build()
+            return df_jk.get_jk(rsh_df, dm, hermi, with_j, with_k, direct_scf_tol)
@@ -71,9 +71,30 @@ class DF(lib.StreamObject):
         blockdim : int
             When reading DF integrals from disk the chunk size to load.  It is
             used to improve IO performance.
+        mixed_precision : bool
+            Whether to keep a single precision (float32) copy of the DF
+            integral tensor.  The DF-SCF methods use the single precision
+            tensor in the incremental J/K builds while the density matrix
+            changes by more than mixed_precision_tol (or the SCF attribute
+            conv_tol_grad if it is larger), then switch to the double
+            precision tensor and rebuild J/K from the full density matrix.
+            The converged results are not affected.
+        mixed_precision_tol : float
+            See mixed_precision.
+        local_exchange : bool
+            Whether to compute the exchange matrix with localized (Cholesky)
+            orbitals of the density matrix, evaluating only the significant
+            blocks of the half-transformed integrals (P|i nu).  The cost of K
+            scales nearly linearly with the system size for insulators.
+        local_exchange_tol : float
+            Cutoff of |C_{mu,i}| * max_P |(P|mu nu)| for the local exchange.
     '''
 
     blockdim = getattr(__config__, 'df_df_DF_blockdim', 240)
+    mixed_precision = getattr(__config__, 'df_df_DF_mixed_precision', False)
+    mixed_precision_tol = getattr(__config__, 'df_df_DF_mixed_precision_tol', 1e-4)
+    local_exchange = getattr(__config__, 'df_df_DF_local_exchange', False)
+    local_exchange_tol = getattr(__config__, 'df_df_DF_local_exchange_tol', 1e-10)
 
     # Store DF tensor in a format compatible to pyscf-1.1 - pyscf-1.6
     _compatible_format = getattr(__config__, 'df_df_DF_compatible_format', False)
@@ -92,6 +113,10 @@ class DF(lib.StreamObject):
         self._cderi_to_save = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
 # If _cderi is specified, the 3C-integral tensor will be read from this file
         self._cderi = None
+# Single precision copy of the 3C-integral tensor, for mixed_precision mode
+        self._cderi_f32 = None
+# max_P |(P|ij)| for each AO pair, for local_exchange mode
+        self._pair_max = None
         self._vjopt = None
         self._rsh_df = {}  # Range separated Coulomb DF objects
         self._keys = set(self.__dict__.keys())
@@ -113,6 +138,12 @@ class DF(lib.StreamObject):
         else:
             log.info('auxbasis = auxmol.basis = %s', self.auxmol.basis)
         log.info('max_memory = %s', self.max_memory)
+        if self.mixed_precision:
+            log.info('mixed_precision = %s, mixed_precision_tol = %g',
+                     self.mixed_precision, self.mixed_precision_tol)
+        if self.local_exchange:
+            log.info('local_exchange = %s, local_exchange_tol = %g',
+                     self.local_exchange, self.local_exchange_tol)
         if isinstance(self._cderi, str):
             log.info('_cderi = %s  where DF integrals are loaded (readonly).',
                      self._cderi)
@@ -134,11 +165,18 @@ class DF(lib.StreamObject):
         nao = mol.nao_nr()
         naux = auxmol.nao_nr()
         nao_pair = nao*(nao+1)//2
+        self._pair_max = None
 
         max_memory = self.max_memory - lib.current_memory()[0]
         int3c = mol._add_suffix('int3c2e')
         int2c = mol._add_suffix('int2c2e')
-        if (nao_pair*naux*8/1e6 < .9*max_memory and
+        # In mixed_precision mode, the double precision tensor is kept in
+        # memory only if the single precision copy fits in memory as well
+        if self.mixed_precision:
+            itemsize = 12
+        else:
+            itemsize = 8
+        if (nao_pair*naux*itemsize/1e6 < .9*max_memory and
             not isinstance(self._cderi_to_save, str)):
             self._cderi = incore.cholesky_eri(mol, int3c=int3c, int2c=int2c,
                                               auxmol=auxmol,
@@ -166,8 +204,30 @@ class DF(lib.StreamObject):
                                        max_memory=max_memory, verbose=log)
             self._cderi = cderi
             log.timer_debug1('Generate density fitting integrals', *t0)
+
+        if self.mixed_precision:
+            self._cderi_f32 = self._make_cderi_f32()
+            log.timer_debug1('Single precision DF integrals', *t0)
         return self
 
+    def _make_cderi_f32(self):
+        '''Single precision copy of the DF tensor.  It is held in memory if
+        possible, otherwise in a temporary HDF5 file.'''
+        nao = self.mol.nao_nr()
+        nao_pair = nao * (nao+1) // 2
+        naux = self.get_naoaux()
+        max_memory = self.max_memory - lib.current_memory()[0]
+        if naux*nao_pair*4/1e6 < .9*max_memory:
+            cderi_f32 = out = numpy.empty((naux,nao_pair), dtype=numpy.float32)
+        else:
+            cderi_f32 = lib.H5TmpFile()
+            out = cderi_f32.create_dataset('j3c', (naux,nao_pair), 'f4')
+        p1 = 0
+        for eri1 in self.loop():
+            p0, p1 = p1, p1 + eri1.shape[0]
+            out[p0:p1] = eri1
+        return cderi_f32
+
     def kernel(self, *args, **kwargs):
         return self.build(*args, **kwargs)
 
@@ -177,35 +237,45 @@ class DF(lib.StreamObject):
             self.mol = mol
         self.auxmol = None
         self._cderi = None
+        self._cderi_f32 = None
+        self._pair_max = None
         if not isinstance(self._cderi_to_save, str):
             self._cderi_to_save = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
         self._vjopt = None
         self._rsh_df = {}
         return self
 
-    def loop(self, blksize=None):
+    def loop(self, blksize=None, dtype=numpy.double):
+        '''Iterate over the blocks of the DF tensor.  If dtype is
+        numpy.float32, the blocks are read from the single precision copy of
+        the tensor if it exists (see mixed_precision).
+        '''
         if self._cderi is None:
             self.build()
         if blksize is None:
             blksize = self.blockdim
 
-        with addons.load(self._cderi, 'j3c') as feri:
+        cderi = self._cderi
+        if dtype == numpy.float32 and self._cderi_f32 is not None:
+            cderi = self._cderi_f32
+        with addons.load(cderi, 'j3c') as feri:
             if isinstance(feri, numpy.ndarray):
                 naoaux = feri.shape[0]
                 for b0, b1 in self.prange(0, naoaux, blksize):
-                    yield numpy.asarray(feri[b0:b1], order='C')
+                    yield numpy.asarray(feri[b0:b1], dtype=dtype, order='C')
 
             else:
-                if isinstance(feri, h5py.Group):
+                if isinstance(feri, (h5py.Group, lib.RawGroup)):
                     # starting from pyscf-1.7, DF tensor may be stored in
                     # block format
                     naoaux = feri['0'].shape[0]
                     def load(b0, b1, prefetch):
-                        prefetch[0] = _load_from_h5g(feri, b0, b1)
+                        prefetch[0] = numpy.asarray(_load_from_h5g(feri, b0, b1),
+                                                    dtype=dtype)
                 else:
                     naoaux = feri.shape[0]
                     def load(b0, b1, prefetch):
-                        prefetch[0] = numpy.asarray(feri[b0:b1])
+                        prefetch[0] = numpy.asarray(feri[b0:b1], dtype=dtype)
 
                 dat = [None]
                 prefetch = [None]
@@ -227,7 +297,7 @@ class DF(lib.StreamObject):
         if self._cderi is None:
             self.build()
         with addons.load(self._cderi, 'j3c') as feri:
-            if isinstance(feri, h5py.Group):
+            if isinstance(feri, (h5py.Group, lib.RawGroup)):
                 return feri['0'].shape[0]
             else:
                 return feri.shape[0]
@@ -108,6 +108,9 @@ def density_fit(mf, auxbasis=None, with_df=None, only_dfj=False):
             self._eri = None
             self.with_df = df
             self.only_dfj = only_dfj
+            # Whether the last HF potential was built with the single
+            # precision DF tensor (see DF.mixed_precision)
+            self._vhf_f32 = False
             self._keys = self._keys.union(['with_df', 'only_dfj'])
 
         def get_jk(self, mol=None, dm=None, hermi=1, with_j=True, with_k=True,
@@ -127,6 +130,36 @@ def density_fit(mf, auxbasis=None, with_df=None, only_dfj=False):
                 vj, vk = mf_class.get_jk(self, mol, dm, hermi, with_j, with_k, omega)
             return vj, vk
 
+        def get_veff(self, mol=None, dm=None, dm_last=0, vhf_last=0, hermi=1):
+            if not getattr(self.with_df, 'mixed_precision', False):
+                return mf_class.get_veff(self, mol, dm, dm_last, vhf_last, hermi)
+
+            if dm is None: dm = self.make_rdm1()
+            single = False
+            if isinstance(dm_last, numpy.ndarray):
+                # With a loose conv_tol, the SCF can converge before the
+                # density matrix changes by less than mixed_precision_tol.
+                # The double precision tensor is used as soon as the
+                # changes are comparable to the gradient threshold.
+                tol = self.with_df.mixed_precision_tol
+                conv_tol_grad = self.conv_tol_grad
+                if conv_tol_grad is None:
+                    conv_tol_grad = numpy.sqrt(self.conv_tol)
+                tol = max(tol, conv_tol_grad)
+                err = abs(numpy.asarray(dm) - dm_last).max()
+                if err > tol:
+                    single = True
+                elif self._vhf_f32:
+                    # Remove the single precision errors accumulated in
+                    # vhf_last by a J/K build of the full density matrix
+                    logger.debug(self, 'max|dm-dm_last| = %g. Switch to '
+                                 'double precision DF integrals', err)
+                    dm_last = vhf_last = 0
+            with lib.temporary_env(self.with_df, _single_precision=single):
+                vhf = mf_class.get_veff(self, mol, dm, dm_last, vhf_last, hermi)
+            self._vhf_f32 = single
+            return vhf
+
         # for pyscf 1.0, 1.1 compatibility
         @property
         def _cderi(self):
@@ -196,6 +229,12 @@ def get_jk(dfobj, dm, hermi=1, with_j=True, with_k=True, direct_scf_tol=1e-13):
         # 3-center integral tensor is not initialized
         dfobj._cderi is None):
         return get_j(dfobj, dm, hermi, direct_scf_tol), None
+    if getattr(dfobj, '_single_precision', False):
+        return _get_jk_f32(dfobj, dm, hermi, with_j, with_k)
+    if with_k and hermi == 1 and getattr(dfobj, 'local_exchange', False):
+        vjk = _get_jk_local(dfobj, dm, with_j)
+        if vjk is not None:
+            return vjk
 
     t0 = t1 = (time.clock(), time.time())
     log = logger.Logger(dfobj.stdout, dfobj.verbose)
@@ -297,6 +336,187 @@ def get_jk(dfobj, dm, hermi=1, with_j=True, with_k=True, direct_scf_tol=1e-13):
     logger.timer(dfobj, 'df vj and vk', *t0)
     return vj, vk
 
+def _get_jk_f32(dfobj, dm, hermi=1, with_j=True, with_k=True):
+    '''J/K matrices with the single precision DF tensor.  The contractions
+    are carried out in float32 and accumulated in float64.
+    '''
+    t0 = t1 = (time.clock(), time.time())
+    log = logger.Logger(dfobj.stdout, dfobj.verbose)
+
+    dms = numpy.asarray(dm)
+    dm_shape = dms.shape
+    nao = dm_shape[-1]
+    dms = dms.reshape(-1,nao,nao)
+    nset = dms.shape[0]
+    vj = 0
+    vk = numpy.zeros_like(dms)
+
+    if with_j:
+        vj = numpy.zeros((nset,nao*(nao+1)//2))
+        idx = numpy.arange(nao)
+        dmtril = lib.pack_tril(dms + dms.conj().transpose(0,2,1))
+        dmtril[:,idx*(idx+1)//2+idx] *= .5
+        dmtril = dmtril.astype(numpy.float32)
+    if with_k:
+        dms32 = dms.astype(numpy.float32)
+
+    max_memory = dfobj.max_memory - lib.current_memory()[0]
+    blksize = max(4, int(min(dfobj.blockdim, max_memory*.22e6/4/nao**2)))
+    buf = numpy.empty((2,blksize,nao,nao), dtype=numpy.float32)
+    for eri1 in dfobj.loop(blksize, dtype=numpy.float32):
+        naux, nao_pair = eri1.shape
+        if with_j:
+            rho = numpy.dot(dmtril, eri1.T)
+            vj += numpy.dot(rho, eri1)
+
+        if with_k:
+            #:vk = numpy.einsum('pij,jk,pkl->il', cderi, dm, cderi)
+            buf1 = lib.unpack_tril(eri1, out=buf[0])
+            for k in range(nset):
+                buf2 = numpy.matmul(dms32[k], buf1, out=buf[1,:naux])
+                vk[k] += numpy.dot(buf1.reshape(-1,nao).T, buf2.reshape(-1,nao))
+        t1 = log.timer_debug1('jk f32', *t1)
+
+    if with_j: vj = lib.unpack_tril(vj, 1).reshape(dm_shape)
+    if with_k: vk = vk.reshape(dm_shape)
+    logger.timer(dfobj, 'df vj and vk (single precision)', *t0)
+    return vj, vk
+
+def _cholesky_orbitals(dm, tol=1e-12):
+    '''Orbitals C and signs s of dm = C diag(s) C^T from the pivoted
+    Cholesky decomposition of the symmetric matrix dm.  The diagonal pivots
+    are chosen by their absolute values so that the difference density
+    matrices of the incremental J/K builds can be decomposed as well.
+    Cholesky orbitals are localized.  The decomposition stops when the
+    residual diagonal is smaller than tol.  Only the pivot columns of dm are
+    accessed.  Returns None if the decomposition breaks down.
+    '''
+    nao = dm.shape[0]
+    diag = dm.diagonal().copy()
+    orbs = numpy.empty((nao,nao))
+    sign = numpy.empty(nao)
+    rank = 0
+    for rank in range(nao):
+        p = abs(diag).argmax()
+        if abs(diag[p]) < tol:
+            break
+        #:col = dm[:,p] - C diag(s) C[p]
+        col = dm[:,p] - numpy.dot(orbs[:,:rank], sign[:rank]*orbs[p,:rank])
+        sign[rank] = numpy.sign(diag[p])
+        orbs[:,rank] = col * (1./numpy.sqrt(abs(diag[p])))
+        diag -= sign[rank] * orbs[:,rank]**2
+        diag[p] = 0
+    else:
+        rank = nao
+    orbs = orbs[:,:rank]
+    sign = sign[:rank]
+    if abs(lib.dot(orbs*sign, orbs.T) - dm).max() > 1e-9 * max(1, abs(dm).max()):
+        return None
+    return orbs, sign
+
+def _cderi_pair_max(dfobj):
+    '''Upper bound max_P |(P|ij)| of the DF tensor for each AO pair'''
+    if getattr(dfobj, '_pair_max', None) is None:
+        nao = dfobj.mol.nao_nr()
+        qcond = numpy.zeros(nao*(nao+1)//2)
+        for eri1 in dfobj.loop():
+            numpy.maximum(qcond, abs(eri1).max(axis=0), out=qcond)
+        dfobj._pair_max = lib.unpack_tril(qcond)
+    return dfobj._pair_max
+
+def _get_jk_local(dfobj, dm, with_j=True):
+    '''J and the local exchange K.
+
+    The density matrices are factorized in terms of Cholesky orbitals,
+    which are localized.  The orbitals are grouped by the atoms where they
+    are centered and by the signs of their Cholesky pivots.  For each group,
+    the AO functions mu with significant |C_{mu,i}| and the AO functions nu
+    with significant (P|i nu) are selected based on the pair estimates
+    max_P |(P|mu nu)|.  The (mu,nu) blocks are gathered from the packed DF
+    tensor and only the significant blocks of (P|i nu) are computed.
+    Returns None if any density matrix cannot be factorized.
+    '''
+    t0 = t1 = (time.clock(), time.time())
+    log = logger.Logger(dfobj.stdout, dfobj.verbose)
+    mol = dfobj.mol
+    tol = dfobj.local_exchange_tol
+
+    dms = numpy.asarray(dm)
+    dm_shape = dms.shape
+    nao = dm_shape[-1]
+    dms = dms.reshape(-1,nao,nao)
+    nset = dms.shape[0]
+    if dms.dtype != numpy.double:
+        return None
+    orbs = [_cholesky_orbitals(x) for x in dms]
+    if any(c is None for c in orbs):
+        log.debug('Cholesky decomposition of the density matrix failed. '
+                  'Local exchange is not applied.')
+        return None
+    t1 = log.timer_debug1('Cholesky orbitals', *t1)
+
+    qcond = _cderi_pair_max(dfobj)
+    qmax = qcond.max(axis=1)
+    ao_atom = numpy.empty(nao, dtype=int)
+    for ia, (p0, p1) in enumerate(mol.aoslice_by_atom()[:,2:]):
+        ao_atom[p0:p1] = ia
+    # The significant (mu, nu) blocks of each group of orbitals and their
+    # addresses in the packed DF tensor
+    tasks = []
+    for k in range(nset):
+        c_k, sign = orbs[k]
+        center = ao_atom[abs(c_k).argmax(axis=0)] * 2 + (sign < 0)
+        for ia in numpy.unique(center):
+            c = c_k[:,center==ia]
+            cmax = abs(c).max(axis=1)
+            mu = numpy.where(cmax * qmax > tol)[0]
+            if mu.size == 0:
+                continue
+            nu = numpy.where((cmax[mu,None] * qcond[mu]).max(axis=0) > tol)[0]
+            i = numpy.maximum(mu[:,None], nu)
+            j = numpy.minimum(mu[:,None], nu)
+            pair_idx = numpy.asarray(i*(i+1)//2 + j, dtype=numpy.int32)
+            tasks.append((k, -1. if ia % 2 else 1., numpy.asarray(c[mu].T, order='C'),
+                          nu, pair_idx))
+    if log.verbose >= logger.DEBUG:
+        nocc = sum(c[0].shape[1] for c in orbs)
+        size = sum(x[2].shape[0]*x[3].size for x in tasks)
+        log.debug('local exchange: %d orbitals in %d groups, '
+                  '%.3g%% of (P|i nu) evaluated',
+                  nocc, len(tasks), size*100./max(1, nocc*nao*nao))
+
+    vj = 0
+    vk = numpy.zeros_like(dms)
+    if with_j:
+        idx = numpy.arange(nao)
+        dmtril = lib.pack_tril(dms + dms.transpose(0,2,1))
+        dmtril[:,idx*(idx+1)//2+idx] *= .5
+
+    max_pairs = max([x[4].size for x in tasks] + [1])
+    max_memory = dfobj.max_memory - lib.current_memory()[0]
+    blksize = max(4, int(min(dfobj.blockdim, max_memory*.3e6/8/max_pairs)))
+    buf = numpy.empty(blksize*max_pairs)
+    for eri1 in dfobj.loop(blksize):
+        naux = eri1.shape[0]
+        aux_idx = numpy.arange(naux)
+        if with_j:
+            rho = numpy.einsum('ix,px->ip', dmtril, eri1)
+            vj += numpy.einsum('ip,px->ix', rho, eri1)
+
+        for k, sign, c, nu, pair_idx in tasks:
+            #:(P|mu nu) for the significant (mu,nu) block
+            g = lib.take_2d(eri1, aux_idx, pair_idx.ravel(), out=buf)
+            #:(P|i nu) = sum_mu C_{mu,i} (P|mu nu)
+            b = numpy.matmul(c, g.reshape((naux,)+pair_idx.shape))
+            b = b.reshape(-1,nu.size)
+            vk[k][nu[:,None],nu] += lib.dot(b.T, b, sign)
+        t1 = log.timer_debug1('jk local', *t1)
+
+    if with_j: vj = lib.unpack_tril(vj, 1).reshape(dm_shape)
+    vk = vk.reshape(dm_shape)
+    logger.timer(dfobj, 'df vj and local vk', *t0)
+    return vj, vk
+
 def get_j(dfobj, dm, hermi=1, direct_scf_tol=1e-13):
     from pyscf.scf import _vhf
     from pyscf.scf import jk
@@ -32,6 +32,8 @@ from pyscf import __config__
 
 MAX_MEMORY = getattr(__config__, 'df_outcore_max_memory', 2000)  # 2GB
 LINEAR_DEP_THR = getattr(__config__, 'df_df_DF_lindep', 1e-12)
+# File format of the DF tensor file: 'hdf5' or 'raw' (see pyscf.lib.rawfile)
+STORAGE = getattr(__config__, 'df_outcore_storage', 'hdf5')
 
 #
 # for auxe1 (P|ij)
@@ -39,8 +41,15 @@ LINEAR_DEP_THR = getattr(__config__, 'df_df_DF_lindep', 1e-12)
 
 def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='j3c', tmpdir=None,
                  int3c='int3c2e', aosym='s2ij', int2c='int2c2e', comp=1,
-                 max_memory=MAX_MEMORY, auxmol=None, verbose=logger.NOTE):
+                 max_memory=MAX_MEMORY, auxmol=None, verbose=logger.NOTE,
+                 storage=STORAGE):
     '''3-index density-fitting tensor.
+
+    Kwargs:
+        storage : str
+            'hdf5' or 'raw'.  The file format of erifile and the swap file.
+            In the 'raw' format (:class:`lib.RawFile`), the tensor is read
+            through memory-mapped arrays.
     '''
     assert(aosym in ('s1', 's2ij'))
     assert(comp == 1)
@@ -54,8 +63,9 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='j3c', tmpdir=No
         tmpdir = lib.param.TMPDIR
     swapfile = tempfile.NamedTemporaryFile(dir=tmpdir)
     cholesky_eri_b(mol, swapfile.name, auxbasis, dataname,
-                   int3c, aosym, int2c, comp, max_memory, auxmol, verbose=log)
-    fswap = h5py.File(swapfile.name, 'r')
+                   int3c, aosym, int2c, comp, max_memory, auxmol, verbose=log,
+                   storage=storage)
+    fswap = lib.open_datafile(swapfile.name, 'r', storage)
     time1 = log.timer('generate (ij|L) 1 pass', *time0)
 
     # Cannot let naoaux = auxmol.nao_nr() if auxbasis has linear dependence
@@ -65,7 +75,7 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='j3c', tmpdir=No
     else:
         nao_pair = nao * (nao+1) // 2
 
-    feri = _create_h5file(erifile, dataname)
+    feri = _create_h5file(erifile, dataname, storage)
     if comp == 1:
         naoaux = fswap['%s/0'%dataname].shape[0]
         h5d_eri = feri.create_dataset(dataname, (naoaux,nao_pair), 'f8')
@@ -99,7 +109,8 @@ def cholesky_eri(mol, erifile, auxbasis='weigend+etb', dataname='j3c', tmpdir=No
 
 def cholesky_eri_b(mol, erifile, auxbasis='weigend+etb', dataname='j3c',
                  int3c='int3c2e', aosym='s2ij', int2c='int2c2e', comp=1,
-                 max_memory=MAX_MEMORY, auxmol=None, verbose=logger.NOTE):
+                 max_memory=MAX_MEMORY, auxmol=None, verbose=logger.NOTE,
+                 storage=STORAGE):
     '''3-center 2-electron DF tensor.
     '''
     assert(aosym in ('s1', 's2ij'))
@@ -150,7 +161,7 @@ def cholesky_eri_b(mol, erifile, auxbasis='weigend+etb', dataname='j3c',
     cintopt = gto.moleintor.make_cintopt(atm, bas, env, int3c)
     bufs1 = numpy.empty((comp*max([x[2] for x in shranges]),naoaux))
 
-    feri = _create_h5file(erifile, dataname)
+    feri = _create_h5file(erifile, dataname, storage)
     def store(buf, label):
         if comp == 1:
             feri[label] = buf
@@ -196,7 +207,7 @@ def cholesky_eri_b(mol, erifile, auxbasis='weigend+etb', dataname='j3c',
 
 def general(mol, mo_coeffs, erifile, auxbasis='weigend+etb', dataname='eri_mo', tmpdir=None,
             int3c='int3c2e', aosym='s2ij', int2c='int2c2e', comp=1,
-            max_memory=MAX_MEMORY, verbose=0, compact=True):
+            max_memory=MAX_MEMORY, verbose=0, compact=True, storage=STORAGE):
     ''' Transform ij of (ij|L) to MOs.
     '''
     assert(aosym in ('s1', 's2ij'))
@@ -207,8 +218,9 @@ def general(mol, mo_coeffs, erifile, auxbasis='weigend+etb', dataname='eri_mo',
         tmpdir = lib.param.TMPDIR
     swapfile = tempfile.NamedTemporaryFile(dir=tmpdir)
     cholesky_eri_b(mol, swapfile.name, auxbasis, dataname,
-                   int3c, aosym, int2c, comp, max_memory, verbose=log)
-    fswap = h5py.File(swapfile.name, 'r')
+                   int3c, aosym, int2c, comp, max_memory, verbose=log,
+                   storage=storage)
+    fswap = lib.open_datafile(swapfile.name, 'r', storage)
     time1 = log.timer('AO->MO eri transformation 1 pass', *time0)
 
     nmoi = mo_coeffs[0].shape[1]
@@ -227,7 +239,7 @@ def general(mol, mo_coeffs, erifile, auxbasis='weigend+etb', dataname='eri_mo',
                                    compact and aosym != 's1')
 
     naoaux = fswap['%s/0'%dataname].shape[-2]
-    feri = _create_h5file(erifile, dataname)
+    feri = _create_h5file(erifile, dataname, storage)
     if comp == 1:
         h5d_eri = feri.create_dataset(dataname, (naoaux,nij_pair), 'f8')
     else:
@@ -273,14 +285,8 @@ def _guess_shell_ranges(mol, buflen, aosym):
         nao = ao_loc[-1]
         return balance_partition(ao_loc*nao, buflen)
 
-def _create_h5file(erifile, dataname):
-    if h5py.is_hdf5(erifile):
-        feri = h5py.File(erifile, 'a')
-        if dataname in feri:
-            del(feri[dataname])
-    else:
-        feri = h5py.File(erifile, 'w')
-    return feri
+def _create_h5file(erifile, dataname, storage=STORAGE):
+    return ao2mo.outcore._create_erifile(erifile, dataname, storage)
 
 del(MAX_MEMORY)
 
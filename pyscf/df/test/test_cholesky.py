@@ -0,0 +1,82 @@
+# Copyright 2014-2020 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import tempfile
+import numpy
+from pyscf import lib
+from pyscf import gto
+from pyscf import scf
+from pyscf import ao2mo
+from pyscf import mp
+from pyscf import df
+
+mol = gto.Mole()
+mol.build(
+    verbose = 0,
+    atom = '''O     0    0.       0.
+              1     0    -0.757   0.587
+              1     0    0.757    0.587''',
+    basis = 'cc-pvdz',
+)
+
+def tearDownModule():
+    global mol
+    del mol
+
+
+class KnownValues(unittest.TestCase):
+    def test_cholesky_eri(self):
+        nao = mol.nao_nr()
+        eri0 = ao2mo.restore(4, mol.intor('int2e', aosym='s8'), nao)
+        self.assertAlmostEqual(abs(df.cholesky.get_diag(mol) - eri0.diagonal()).max(), 0, 12)
+        for tol in (1e-4, 1e-8):
+            cderi = df.cholesky.cholesky_eri(mol, tol)
+            self.assertEqual(cderi.shape[1], nao*(nao+1)//2)
+            self.assertTrue(abs(lib.dot(cderi.T, cderi) - eri0).max() < tol)
+
+    def test_rhf_mp2(self):
+        mf = scf.RHF(mol).density_fit(with_df=df.CDDF(mol, tol=1e-6))
+        self.assertAlmostEqual(mf.kernel(), -76.026765378, 7)
+        self.assertAlmostEqual(mp.dfmp2.DFMP2(mf).kernel()[0], -0.204019921, 7)
+
+    def test_get_jk(self):
+        numpy.random.seed(1)
+        nao = mol.nao_nr()
+        dm = numpy.random.random((nao,nao))
+        dm = dm + dm.T
+        vj0, vk0 = scf.hf.get_jk(mol, dm)
+        cd = df.CDDF(mol, tol=1e-9)
+        vj1 = cd.get_jk(dm, with_k=False)[0]
+        self.assertAlmostEqual(abs(vj1-vj0).max(), 0, 6)
+        vj1, vk1 = cd.get_jk(dm)
+        self.assertAlmostEqual(abs(vk1-vk0).max(), 0, 6)
+
+    def test_cderi_to_save(self):
+        ftmp = tempfile.NamedTemporaryFile()
+        cd = df.CDDF(mol, tol=1e-5)
+        cd._cderi_to_save = ftmp.name
+        cd.build()
+        self.assertEqual(cd._cderi, ftmp.name)
+        naux = cd.get_naoaux()
+        cderi = numpy.vstack(list(cd.loop(blksize=20)))
+        self.assertEqual(cderi.shape[0], naux)
+        ref = df.cholesky.cholesky_eri(mol, 1e-5)
+        self.assertAlmostEqual(abs(cderi - ref).max(), 0, 12)
+
+
+if __name__ == "__main__":
+    print("Full Tests for df.cholesky")
+    unittest.main()
@@ -192,6 +192,73 @@ class KnownValues(unittest.TestCase):
         self.assertAlmostEqual(abs(vj0-vj1).max(), 0, 12)
         self.assertAlmostEqual(lib.finger(vj0), -194.15910890730052, 9)
 
+    def test_mixed_precision(self):
+        numpy.random.seed(1)
+        nao = mol.nao_nr()
+        dms = numpy.random.random((2,nao,nao))
+        mf = scf.RHF(mol).density_fit(auxbasis='weigend')
+        mf.with_df.mixed_precision = True
+        vj0, vk0 = mf.get_jk(mol, dms, hermi=0)
+        self.assertAlmostEqual(lib.finger(vj0), -194.15910890730066, 9)
+        self.assertAlmostEqual(lib.finger(vk0), -46.365071587653517, 9)
+        self.assertEqual(mf.with_df._cderi_f32.dtype, numpy.float32)
+
+        vj1, vk1 = df_jk._get_jk_f32(mf.with_df, dms, hermi=0)
+        self.assertAlmostEqual(abs(vj1-vj0).max(), 0, 3)
+        self.assertAlmostEqual(abs(vk1-vk0).max(), 0, 4)
+        self.assertTrue(abs(vk1-vk0).max() > 1e-9)
+        vj1, vk1 = df_jk._get_jk_f32(mf.with_df, dms, hermi=0, with_j=False)
+        self.assertEqual(vj1, 0)
+        self.assertAlmostEqual(abs(vk1-vk0).max(), 0, 4)
+
+        self.assertAlmostEqual(mf.scf(), -76.025936299702536, 9)
+        self.assertFalse(mf._vhf_f32)
+
+        mf = scf.UHF(mol).density_fit(auxbasis='weigend')
+        mf.with_df.mixed_precision = True
+        self.assertAlmostEqual(mf.scf(), -76.025936299702536, 9)
+
+        # With a loose conv_tol, the SCF switches to the double precision
+        # tensor before it converges
+        mf = scf.RHF(mol).density_fit(auxbasis='weigend')
+        mf.with_df.mixed_precision = True
+        mf.with_df.mixed_precision_tol = 0
+        mf.conv_tol = 1e-6
+        self.assertAlmostEqual(mf.scf(), -76.025936299702536, 6)
+        self.assertFalse(mf._vhf_f32)
+
+    def test_local_exchange(self):
+        mf = scf.RHF(mol).density_fit(auxbasis='weigend')
+        mf.with_df.local_exchange = True
+        self.assertAlmostEqual(mf.scf(), -76.025936299702536, 9)
+
+        dm = mf.make_rdm1()
+        vj0, vk0 = df_jk.get_jk(mf.with_df, dm)
+        vj1, vk1 = df_jk._get_jk_local(mf.with_df, dm)
+        self.assertAlmostEqual(abs(vj1-vj0).max(), 0, 12)
+        self.assertAlmostEqual(abs(vk1-vk0).max(), 0, 9)
+        mf.with_df.local_exchange = False
+        vj2, vk2 = df_jk.get_jk(mf.with_df, dm)
+        self.assertAlmostEqual(abs(vk2-vk0).max(), 0, 9)
+
+        mf.with_df.local_exchange_tol = 1e-6
+        vj1, vk1 = df_jk._get_jk_local(mf.with_df, dm)
+        self.assertAlmostEqual(abs(vk1-vk2).max(), 0, 4)
+
+        # Difference density matrices of the incremental builds
+        mf.with_df.local_exchange_tol = 1e-10
+        ddm = dm - mf.get_init_guess()
+        vj0, vk0 = df_jk.get_jk(mf.with_df, ddm)
+        vj1, vk1 = df_jk._get_jk_local(mf.with_df, ddm)
+        self.assertAlmostEqual(abs(vk1-vk0).max(), 0, 9)
+
+        # Zero diagonal, the Cholesky decomposition breaks down
+        numpy.random.seed(1)
+        dm = numpy.random.random(dm.shape) - .5
+        dm = dm + dm.T
+        dm[numpy.diag_indices(dm.shape[0])] = 0
+        self.assertTrue(df_jk._get_jk_local(mf.with_df, dm) is None)
+
 
 if __name__ == "__main__":
     print("Full Tests for df")
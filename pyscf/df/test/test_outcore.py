@@ -93,6 +93,30 @@ class KnownValues(unittest.TestCase):
         with h5py.File(ftmp.name, 'r') as feri:
             self.assertTrue(numpy.allclose(feri['eri_mo'], cderi0))
 
+    def test_outcore_raw_storage(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        cderi0 = df.incore.cholesky_eri(mol)
+        df.outcore.cholesky_eri(mol, ftmp.name, max_memory=.05, storage='raw')
+        self.assertTrue(lib.is_rawfile(ftmp.name))
+        with df.addons.load(ftmp.name, 'j3c') as feri:
+            self.assertTrue(isinstance(feri, numpy.memmap))
+            self.assertTrue(numpy.allclose(feri, cderi0))
+
+        mydf = df.DF(mol)
+        mydf._cderi = ftmp.name
+        self.assertEqual(mydf.get_naoaux(), cderi0.shape[0])
+        self.assertTrue(numpy.allclose(numpy.vstack(list(mydf.loop(20))), cderi0))
+
+        df.outcore.cholesky_eri_b(mol, ftmp.name, storage='raw')
+        mydf._cderi = ftmp.name
+        self.assertTrue(numpy.allclose(numpy.vstack(list(mydf.loop(20))), cderi0))
+
+        nao = mol.nao_nr()
+        df.outcore.general(mol, (numpy.eye(nao),)*2, ftmp.name, max_memory=.02,
+                           storage='raw')
+        with lib.RawFile(ftmp.name, 'r') as feri:
+            self.assertTrue(numpy.allclose(feri['eri_mo'], cderi0))
+
     def test_lindep(self):
         ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
         df.outcore.cholesky_eri(mol, ftmp.name, auxmol=auxmol, verbose=7)
@@ -25,7 +25,14 @@ Reference for Lebedev-Laikov grid:
 '''
 
 
+import os
 import ctypes
+import hashlib
+import itertools
+import functools
+import types
+import shutil
+import tempfile
 import numpy
 from pyscf import lib
 from pyscf.lib import logger
@@ -34,8 +41,17 @@ from pyscf.dft import radi
 from pyscf import __config__
 
 libdft = lib.load_library('libdft')
+_grids_version = itertools.count()
 BLKSIZE = 128  # needs to be the same to lib/gto/grid_ao_drv.c
 
+# Threshold of the Becke partition functions to drop the atoms which are far
+# from the grids. Screening is switched off if it is 0.
+BECKE_SCREEN_TOL = getattr(__config__, 'dft_gen_grid_becke_screen_tol', 0)
+# Directory of the on-disk cache of grids. Caching is switched off if it is None.
+GRIDS_CACHE_DIR = getattr(__config__, 'dft_gen_grid_Grids_cache_dir', None)
+# Max size (in MB) of the on-disk cache of grids
+GRIDS_CACHE_SIZE = getattr(__config__, 'dft_gen_grid_Grids_cache_size', 2000)
+
 # ~= (L+1)**2/3
 LEBEDEV_ORDER = {
       0:    1,
@@ -277,10 +293,18 @@ def gen_atomic_grids(mol, atom_grid={}, radi_method=radi.gauss_chebyshev,
 
 def gen_partition(mol, atom_grids_tab,
                   radii_adjust=None, atomic_radii=radi.BRAGG_RADII,
-                  becke_scheme=original_becke):
+                  becke_scheme=original_becke, screen_tol=BECKE_SCREEN_TOL):
     '''Generate the mesh grid coordinates and weights for DFT numerical integration.
     We can change radii_adjust, becke_scheme functions to generate different meshgrid.
 
+    Kwargs:
+        screen_tol : float
+            If screen_tol > 0, the atoms whose Becke partition functions are
+            smaller than screen_tol on a grid are excluded from the
+            normalization of the grid weight.  See :func:`_gen_partition_screened`.
+            Screening is only available for the original Becke scheme with
+            the built-in atomic radii adjustments.
+
     Returns:
         grid_coord and grid_weight arrays.  grid_coord array has shape (N,3);
         weight 1D array has N elements.
@@ -289,6 +313,15 @@ def gen_partition(mol, atom_grids_tab,
         f_radii_adjust = radii_adjust(mol, atomic_radii)
     else:
         f_radii_adjust = None
+
+    if (screen_tol is not None and screen_tol > 0 and
+        becke_scheme is original_becke and
+        (radii_adjust is radi.treutler_atomic_radii_adjust or
+         radii_adjust is radi.becke_atomic_radii_adjust or
+         f_radii_adjust is None)):
+        return _gen_partition_screened(mol, atom_grids_tab, f_radii_adjust,
+                                       screen_tol)
+
     atm_coords = numpy.asarray(mol.atom_coords() , order='C')
     atm_dist = gto.inter_distance(mol)
     if (becke_scheme is original_becke and
@@ -341,6 +374,105 @@ def gen_partition(mol, atom_grids_tab,
         weights_all.append(weights)
     return numpy.vstack(coords_all), numpy.hstack(weights_all)
 
+def _gen_partition_screened(mol, atom_grids_tab, f_radii_adjust=None,
+                            screen_tol=1e-12):
+    '''Becke partitioning (original Becke scheme) with neighbour lists.
+
+    The weight of grid r of atom A is P_A(r) / sum_B P_B(r).  The cell
+    function s(mu_ij) is smaller than screen_tol if mu_ij > mu_cut.  Since
+    mu_ij >= 1 - 2|r-R_i|/R_ij, only the atoms within the Becke cutoff radius
+    2|r-R_i|/(1-mu_cut) of atom i are needed (see :func:`_becke_cutoff_factor`):
+    the sum over B runs over the neighbours of the atom nearest to r, and the
+    product of P_B runs over the neighbours of B.  Partition functions below
+    screen_tol * P_N (N is the nearest atom) are dropped as well.  The error
+    of each weight is bounded by screen_tol times the number of the skipped
+    atoms.
+
+    For a fixed screen_tol, the number of neighbours of each grid does not
+    grow with the size of the system, so the cost is
+    O(natm * npts_per_atom * nnbr), nnbr being the number of atoms within the
+    cutoff radius.  Becke cell functions decay slowly: the cutoff radius is
+    ~80 times the distance to the nearest atom for screen_tol=1e-12 and ~26
+    times for screen_tol=1e-8 (up to twice as large with the atomic radii
+    adjustments).  The scaling is linear only for systems larger than this
+    radius; for smaller systems the cost is O(natm^2 * npts_per_atom) (the
+    unscreened partition costs O(natm^3 * npts_per_atom)).  The sorted
+    neighbour lists take O(natm^2) memory.
+
+    This function supports only the atomic radii adjustments in the form
+    g + a_ij (1 - g^2) (see :func:`radi.becke_atomic_radii_adjust`).
+    '''
+    natm = mol.natm
+    atm_coords = numpy.asarray(mol.atom_coords(), order='C')
+    atm_dist = gto.inter_distance(mol)
+    if f_radii_adjust is None:
+        radii_table = None
+        p_radii_table = lib.c_null_ptr()
+        amax = 0
+    else:
+        i, j = numpy.tril_indices(natm, -1)
+        radii_table = numpy.zeros((natm,natm))
+        # The adjustment of pair (i,j) is defined for i > j. The pair (j,i)
+        # takes the opposite value.
+        radii_table[i,j] = f_radii_adjust(i, j, 0)
+        radii_table = radii_table - radii_table.T
+        p_radii_table = radii_table.ctypes.data_as(ctypes.c_void_p)
+        amax = abs(radii_table).max(initial=0)
+    rcut_factor = _becke_cutoff_factor(screen_tol, amax)
+
+    # Neighbour list. Atoms are sorted by the distance to each atom, the atom
+    # itself being placed first.
+    atm_dist[numpy.diag_indices(natm)] = -1
+    nbr_idx = numpy.asarray(numpy.argsort(atm_dist, axis=1, kind='mergesort'),
+                            dtype=numpy.int32, order='C')
+    nbr_dist = numpy.asarray(numpy.take_along_axis(atm_dist, nbr_idx, axis=1),
+                             order='C')
+    nbr_dist[:,0] = 0
+
+    coords_all = []
+    weights_all = []
+    for ia in range(natm):
+        coords, vol = atom_grids_tab[mol.atom_symbol(ia)]
+        coords = coords + atm_coords[ia]
+        coords = numpy.asarray(coords, order='F')
+        ngrids = coords.shape[0]
+        weights = numpy.empty(ngrids)
+        libdft.VXCgen_grid_screened(weights.ctypes.data_as(ctypes.c_void_p),
+                                    coords.ctypes.data_as(ctypes.c_void_p),
+                                    atm_coords.ctypes.data_as(ctypes.c_void_p),
+                                    p_radii_table,
+                                    nbr_idx.ctypes.data_as(ctypes.c_void_p),
+                                    nbr_dist.ctypes.data_as(ctypes.c_void_p),
+                                    ctypes.c_double(screen_tol),
+                                    ctypes.c_double(rcut_factor),
+                                    ctypes.c_int(ia), ctypes.c_int(natm),
+                                    ctypes.c_int(ngrids))
+        weights *= vol
+        coords_all.append(coords)
+        weights_all.append(weights)
+    return numpy.vstack(coords_all), numpy.hstack(weights_all)
+
+def _becke_cutoff_factor(screen_tol, amax=0):
+    '''The ratio between the Becke cutoff radius and the distance from the
+    grid to the atom, 2/(1-mu_cut).  mu_cut is the smallest mu for which the
+    cell function s(mu + a(1-mu^2)) < screen_tol for all |a| <= amax.
+    '''
+    def cell_function(mu):
+        g = mu - amax * (1 - mu**2)
+        g = (3 - g**2) * g * .5
+        g = (3 - g**2) * g * .5
+        g = (3 - g**2) * g * .5
+        return .5 - g * .5
+
+    mu0, mu1 = 0., 1.
+    for i in range(60):
+        mu = (mu0 + mu1) * .5
+        if cell_function(mu) < screen_tol:
+            mu1 = mu
+        else:
+            mu0 = mu
+    return 2. / max(1 - mu1, 1e-15)
+
 def make_mask(mol, coords, relativity=0, shls_slice=None, verbose=None):
     '''Mask to indicate whether a shell is zero on grid
 
@@ -384,6 +516,129 @@ def make_mask(mol, coords, relativity=0, shls_slice=None, verbose=None):
 
 
 
+def _cache_token(obj):
+    if isinstance(obj, functools.partial):
+        return 'partial(%s,%s,%s)' % (_cache_token(obj.func),
+                                      _cache_token(obj.args),
+                                      _cache_token(obj.keywords or {}))
+    elif isinstance(obj, types.CodeType):
+        return '%s(%s,%s,%s)' % (obj.co_name,
+                                 hashlib.sha1(obj.co_code).hexdigest(),
+                                 _cache_token(obj.co_consts),
+                                 repr(obj.co_names))
+    elif callable(obj):
+        func = getattr(obj, '__func__', obj)
+        name = '%s.%s' % (getattr(func, '__module__', None),
+                          getattr(func, '__qualname__',
+                                  getattr(func, '__name__', repr(func))))
+        code = getattr(func, '__code__', None)
+        if code is None:  # builtin functions, classes
+            return name
+        # Python functions are identified by their code, the default
+        # arguments and the closure variables.  Different lambdas, or
+        # functions of the same name in different scripts, do not share the
+        # cache entry.
+        closure = [c.cell_contents for c in (func.__closure__ or ())]
+        return '%s:%s' % (name, _cache_token((code, func.__defaults__, closure)))
+    elif isinstance(obj, numpy.ndarray):
+        return hashlib.sha1(numpy.ascontiguousarray(obj).data).hexdigest()
+    elif isinstance(obj, dict):
+        return repr(sorted((k, _cache_token(v)) for k, v in obj.items()))
+    elif isinstance(obj, (list, tuple)):
+        return repr([_cache_token(x) for x in obj])
+    else:
+        return repr(obj)
+
+def grids_cache_key(grids, mol=None, **kwargs):
+    '''The key of grids in the on-disk cache.  It is the hash of the
+    geometry, basis and the settings of grids.'''
+    if mol is None: mol = grids.mol
+    h = hashlib.sha1()
+    # Subclasses may override gen_atomic_grids or gen_partition
+    h.update(('%s.%s;' % (type(grids).__module__, type(grids).__name__)).encode())
+    for x in (mol._atm, mol._bas, mol._env):
+        h.update(numpy.ascontiguousarray(x).data)
+    for key in ('atom_grid', 'level', 'prune', 'radi_method', 'becke_scheme',
+                'radii_adjust', 'atomic_radii', 'becke_screen_tol'):
+        h.update(('%s=%s;' % (key, _cache_token(getattr(grids, key)))).encode())
+    h.update(_cache_token(kwargs).encode())
+    return h.hexdigest()
+
+def load_grids_cache(cache_dir, key, with_non0tab=False):
+    '''Load coords, weights and non0tab from the on-disk cache.  The arrays
+    are memory-mapped (copy-on-write).  None is returned if the key is not
+    found in the cache.  non0tab is None if it was not cached.'''
+    path = os.path.join(cache_dir, key)
+    try:
+        coords = numpy.load(os.path.join(path, 'coords.npy'), mmap_mode='c')
+        weights = numpy.load(os.path.join(path, 'weights.npy'), mmap_mode='c')
+    except (IOError, OSError, ValueError):
+        return None
+    non0tab = None
+    if with_non0tab:
+        try:
+            non0tab = numpy.load(os.path.join(path, 'non0tab.npy'), mmap_mode='c')
+        except (IOError, OSError, ValueError):
+            pass
+    try:
+        os.utime(path, None)  # Mark as recently used
+    except OSError:
+        pass
+    return coords, weights, non0tab
+
+def save_grids_cache(cache_dir, key, coords, weights, non0tab=None,
+                     max_size=GRIDS_CACHE_SIZE):
+    '''Save coords, weights and non0tab in the on-disk cache.  When the
+    total size of the cache exceeds max_size (in MB), the least recently used
+    entries are removed.'''
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    path = os.path.join(cache_dir, key)
+    if os.path.isdir(path):
+        # Only non0tab may be added to an existing entry
+        if non0tab is not None:
+            tmpfile = tempfile.NamedTemporaryFile(dir=path, suffix='.npy',
+                                                  delete=False)
+            with tmpfile:
+                numpy.save(tmpfile, non0tab)
+            os.rename(tmpfile.name, os.path.join(path, 'non0tab.npy'))
+    else:
+        tmpdir = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp')
+        numpy.save(os.path.join(tmpdir, 'coords.npy'), coords)
+        numpy.save(os.path.join(tmpdir, 'weights.npy'), weights)
+        if non0tab is not None:
+            numpy.save(os.path.join(tmpdir, 'non0tab.npy'), non0tab)
+        try:
+            os.rename(tmpdir, path)
+        except OSError:  # Created by other processes
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    _evict_grids_cache(cache_dir, max_size, keep=key)
+    return path
+
+def _evict_grids_cache(cache_dir, max_size, keep=None):
+    '''Remove the least recently used entries until the size of the cache is
+    smaller than max_size (in MB)'''
+    entries = []
+    for key in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, key)
+        if key.startswith('.') or not os.path.isdir(path):
+            continue
+        try:
+            size = sum(os.path.getsize(os.path.join(path, f))
+                       for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, key))
+        except OSError:
+            pass
+    tot_size = sum(x[1] for x in entries)
+    for mtime, size, key in sorted(entries):
+        if tot_size <= max_size * 1e6:
+            break
+        if key != keep:
+            shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+            tot_size -= size
+    return tot_size
+
+
 class Grids(lib.StreamObject):
     '''DFT mesh grids
 
@@ -436,6 +691,27 @@ class Grids(lib.StreamObject):
             Eg, grids.atom_grid = {'H': (20,110)} will generate 20 radial
             grids and 110 angular grids for H atom.
 
+        becke_screen_tol : float
+            Threshold to screen the atoms in Becke partitioning.  Atoms
+            whose partition functions are smaller than this value on a grid
+            are excluded in the normalization of the grid weight, and only
+            the atoms within the Becke cutoff radius are visited for each
+            grid.  The cost of the partitioning on each grid does not grow
+            with the system size for large systems (see
+            _gen_partition_screened).  0 (default) switches off the screening.
+
+        cache_dir : str
+            Directory of the on-disk cache of grids.  If specified, the
+            coordinates, weights and non0tab of the grids are stored in the
+            cache.  The key of the cache is the hash of the geometry, the
+            basis and the grids settings (see :func:`grids_cache_key`).  The
+            grids are loaded (memory-mapped) from the cache if the key is
+            found.  Default is None (no cache).
+
+        cache_size : int
+            Max size (in MB) of the on-disk cache.  The least recently used
+            grids are removed when the size of the cache exceeds this value.
+
         Examples:
 
         >>> mol = gto.M(atom='H 0 0 0; H 0 0 1.1')
@@ -486,6 +762,9 @@ class Grids(lib.StreamObject):
         self.prune = _load_conf(None, 'dft_gen_grid_Grids_prune', nwchem_prune)
 
         self.level = getattr(__config__, 'dft_gen_grid_Grids_level', 3)
+        self.becke_screen_tol = BECKE_SCREEN_TOL
+        self.cache_dir = GRIDS_CACHE_DIR
+        self.cache_size = GRIDS_CACHE_SIZE
 
 ##################################################
 # don't modify the following attributes, they are not input options
@@ -499,15 +778,21 @@ class Grids(lib.StreamObject):
 
     def __setattr__(self, key, val):
         if key in ('atom_grid', 'atomic_radii', 'radii_adjust', 'radi_method',
-                   'becke_scheme', 'prune', 'level'):
+                   'becke_scheme', 'prune', 'level', 'becke_screen_tol'):
             self.coords = None
             self.weights = None
             self.non0tab = None
+        elif key in ('coords', 'weights', 'non0tab'):
+            # Identifies the grids for the caches of NumInt.block_loop
+            super(Grids, self).__setattr__('_version', next(_grids_version))
         super(Grids, self).__setattr__(key, val)
 
     def dump_flags(self, verbose=None):
         logger.info(self, 'radial grids: %s', self.radi_method.__doc__)
         logger.info(self, 'becke partition: %s', self.becke_scheme.__doc__)
+        if self.becke_screen_tol > 0:
+            logger.info(self, 'becke partition screening threshold: %g',
+                        self.becke_screen_tol)
         logger.info(self, 'pruning grids: %s', self.prune)
         logger.info(self, 'grids dens level: %d', self.level)
         logger.info(self, 'symmetrized grids: %s', self.symmetry)
@@ -523,18 +808,37 @@ class Grids(lib.StreamObject):
         if mol is None: mol = self.mol
         if self.verbose >= logger.WARN:
             self.check_sanity()
+
+        if self.cache_dir:
+            key = grids_cache_key(self, mol, **kwargs)
+            cached = load_grids_cache(self.cache_dir, key, with_non0tab)
+            if cached is not None:
+                logger.debug(self, 'Load grids from cache %s',
+                             os.path.join(self.cache_dir, key))
+                self.coords, self.weights, self.non0tab = cached
+                if with_non0tab and self.non0tab is None:
+                    self.non0tab = self.make_mask(mol, self.coords)
+                    save_grids_cache(self.cache_dir, key, self.coords,
+                                     self.weights, self.non0tab, self.cache_size)
+                logger.info(self, 'tot grids = %d', len(self.weights))
+                return self
+
         atom_grids_tab = self.gen_atomic_grids(mol, self.atom_grid,
                                                self.radi_method,
                                                self.level, self.prune, **kwargs)
         self.coords, self.weights = \
                 self.gen_partition(mol, atom_grids_tab,
                                    self.radii_adjust, self.atomic_radii,
-                                   self.becke_scheme)
+                                   self.becke_scheme, self.becke_screen_tol)
         if with_non0tab:
             self.non0tab = self.make_mask(mol, self.coords)
         else:
             self.non0tab = None
         logger.info(self, 'tot grids = %d', len(self.weights))
+
+        if self.cache_dir:
+            save_grids_cache(self.cache_dir, key, self.coords, self.weights,
+                             self.non0tab, self.cache_size)
         return self
 
     def kernel(self, mol=None, with_non0tab=False):
@@ -563,10 +867,11 @@ class Grids(lib.StreamObject):
     @lib.with_doc(gen_partition.__doc__)
     def gen_partition(self, mol, atom_grids_tab,
                       radii_adjust=None, atomic_radii=radi.BRAGG_RADII,
-                      becke_scheme=original_becke):
+                      becke_scheme=original_becke, screen_tol=None):
         ''' See gen_grid.gen_partition function'''
+        if screen_tol is None: screen_tol = self.becke_screen_tol
         return gen_partition(mol, atom_grids_tab, radii_adjust, atomic_radii,
-                             becke_scheme)
+                             becke_scheme, screen_tol)
 
     @lib.with_doc(make_mask.__doc__)
     def make_mask(self, mol=None, coords=None, relativity=0, shls_slice=None,
@@ -17,6 +17,7 @@
 #
 
 import warnings
+import collections
 import ctypes
 import numpy
 import scipy.linalg
@@ -43,6 +44,20 @@ OCCDROP = getattr(__config__, 'dft_numint_OCCDROP', 1e-12)
 # If the number of AOs in the system is less than this value, all tensors are
 # treated as dense quantities and contracted by dgemm directly.
 SWITCH_SIZE = getattr(__config__, 'dft_numint_SWITCH_SIZE', 800)
+# Keep the AO values of the grid blocks generated by NumInt.block_loop
+# between calls.  AO values exceeding CACHE_AO_MAX_MEMORY (in MB) are kept
+# in a temporary HDF5 file.  Up to CACHE_AO_NSLOTS sets of AO values (for
+# different grids or derivative orders) are kept, the least recently used
+# one being dropped first.
+CACHE_AO = getattr(__config__, 'dft_numint_cache_ao', False)
+CACHE_AO_MAX_MEMORY = getattr(__config__, 'dft_numint_cache_ao_max_memory', 4000)
+CACHE_AO_NSLOTS = getattr(__config__, 'dft_numint_cache_ao_nslots', 4)
+# Drop the shells which are negligible on all grids of a block from the AO
+# arrays in nr_rks and nr_uks (see eval_ao_sparse).  This saves memory and
+# FLOPs for large molecules.
+SPARSE_AO = getattr(__config__, 'dft_numint_sparse_ao', False)
+# Grid block size (in units of BLKSIZE) of nr_rks_incremental
+INCREMENTAL_XC_NBLK = getattr(__config__, 'dft_numint_incremental_xc_nblk', 8)
 
 def eval_ao(mol, coords, deriv=0, shls_slice=None,
             non0tab=None, out=None, verbose=None):
@@ -105,8 +120,66 @@ def eval_ao(mol, coords, deriv=0, shls_slice=None,
         feval = 'GTOval_sph_deriv%d' % deriv
     return mol.eval_gto(feval, coords, comp, shls_slice, non0tab, out=out)
 
+def eval_ao_sparse(mol, coords, deriv=0, non0tab=None, out=None, verbose=None):
+    '''Evaluate AO function values on the given grids for the shells which
+    are not negligible on any of the grids.  The shells screened out by
+    non0tab are dropped from the returned array.
+
+    Returns:
+        ao, ao_idx.  ao has the same layout as the output of :func:`eval_ao`
+        but only holds the values of the AO functions ao_idx.  It can be
+        passed to :func:`eval_rho`, :func:`eval_rho2` and :func:`eval_mat`
+        with the kwarg ao_idx.
+    '''
+    ngrids = coords.shape[0]
+    if non0tab is None:
+        ao = eval_ao(mol, coords, deriv, None, None, out, verbose)
+        return ao, numpy.arange(mol.nao_nr())
+
+    comp = (deriv+1)*(deriv+2)*(deriv+3)//6
+    ao_loc = mol.ao_loc_nr()
+    shls = _sparse_ao_shls(non0tab, ngrids)
+    ao_idx = _shls_to_ao_idx(shls, ao_loc)
+    aoT = numpy.ndarray((comp,ao_idx.size,ngrids), buffer=out)
+    # One eval_ao call for each range of consecutive shells
+    p1 = 0
+    for seg in numpy.split(shls, numpy.where(numpy.diff(shls) != 1)[0] + 1):
+        if seg.size > 0:
+            sh0, sh1 = seg[0], seg[-1] + 1
+            p0, p1 = p1, p1 + ao_loc[sh1] - ao_loc[sh0]
+            ao = eval_ao(mol, coords, deriv, (sh0,sh1), non0tab)
+            aoT[:,p0:p1] = ao.reshape(comp,ngrids,-1).transpose(0,2,1)
+    ao = aoT.transpose(0,2,1)
+    if deriv == 0:
+        ao = ao[0]
+    return ao, ao_idx
+
+def _sparse_ao_shls(non0tab, ngrids):
+    '''Shells which are not negligible on any of the first ngrids grids'''
+    nblk = (ngrids+BLKSIZE-1) // BLKSIZE
+    return numpy.where(numpy.asarray(non0tab[:nblk]).any(axis=0))[0]
+
+def _shls_to_ao_idx(shls, ao_loc):
+    dims = ao_loc[shls+1] - ao_loc[shls]
+    sub_loc = numpy.append(0, numpy.cumsum(dims))
+    return numpy.arange(sub_loc[-1]) + numpy.repeat(ao_loc[shls] - sub_loc[:-1], dims)
+
+def _sparse_ao_layout(mol, non0tab, ao_idx, ngrids):
+    '''non0tab, shls_slice and ao_loc for the AO array which only holds the
+    AO functions ao_idx (the output of :func:`eval_ao_sparse`).  They can be
+    passed to _dot_ao_dm and _dot_ao_ao.
+    '''
+    ao_loc = mol.ao_loc_nr()
+    shls = numpy.where(numpy.isin(ao_loc[:-1], ao_idx))[0]
+    dims = ao_loc[shls+1] - ao_loc[shls]
+    sub_loc = numpy.append(0, numpy.cumsum(dims)).astype(numpy.int32)
+    nblk = (ngrids+BLKSIZE-1) // BLKSIZE
+    non0tab = numpy.asarray(non0tab[:nblk,shls], order='C')
+    return non0tab, (0, shls.size), sub_loc
+
 #TODO: \nabla^2 rho and tau = 1/2 (\nabla f)^2
-def eval_rho(mol, ao, dm, non0tab=None, xctype='LDA', hermi=0, verbose=None):
+def eval_rho(mol, ao, dm, non0tab=None, xctype='LDA', hermi=0, verbose=None,
+             ao_idx=None):
     r'''Calculate the electron density for LDA functional, and the density
     derivatives for GGA functional.
 
@@ -131,6 +204,9 @@ def eval_rho(mol, ao, dm, non0tab=None, xctype='LDA', hermi=0, verbose=None):
             dm is hermitian or not
         verbose : int or object of :class:`Logger`
             No effects.
+        ao_idx : 1D int array
+            If given, ao only holds the AO functions ao_idx, as returned by
+            :func:`eval_ao_sparse`.
 
     Returns:
         1D array of size N to store electron density if xctype = LDA;  2D array
@@ -163,6 +239,9 @@ def eval_rho(mol, ao, dm, non0tab=None, xctype='LDA', hermi=0, verbose=None):
 
     shls_slice = (0, mol.nbas)
     ao_loc = mol.ao_loc_nr()
+    if ao_idx is not None:
+        dm = dm[ao_idx[:,None],ao_idx]
+        non0tab, shls_slice, ao_loc = _sparse_ao_layout(mol, non0tab, ao_idx, ngrids)
     if xctype == 'LDA' or xctype == 'HF':
         c0 = _dot_ao_dm(mol, ao, dm, non0tab, shls_slice, ao_loc)
         #:rho = numpy.einsum('pi,pi->p', ao, c0)
@@ -200,8 +279,75 @@ def eval_rho(mol, ao, dm, non0tab=None, xctype='LDA', hermi=0, verbose=None):
         rho[5] *= .5
     return rho
 
+def eval_rho_batch(mol, ao, dms, non0tab=None, xctype='LDA', hermi=0,
+                   verbose=None, ao_idx=None):
+    r'''Electron densities (and density derivatives for GGA) of a batch of
+    density matrices.  The AO values are contracted with all density matrices
+    in one matrix-matrix multiplication.  See also :func:`eval_rho`.
+
+    Args:
+        mol : an instance of :class:`Mole`
+
+        ao : 2D array of shape (N,nao) for LDA, 3D array of shape (4,N,nao) for GGA
+            or (10,N,nao) for meta-GGA.
+        dms : 3D array or a list of 2D arrays
+            Density matrices
+
+    Kwargs:
+        non0tab : 2D bool array
+            mask array to indicate whether the AO values are zero.
+        xctype : str
+            LDA/GGA/mGGA.  It affects the shape of the return density.
+        hermi : bool
+            dms are hermitian or not
+        ao_idx : 1D int array
+            If given, ao only holds the AO functions ao_idx.
+
+    Returns:
+        Array of shape (nset,N) for LDA, (nset,4,N) for GGA or (nset,6,N) for
+        meta-GGA.  The i-th element is identical to the output of
+        :func:`eval_rho` for dms[i].
+    '''
+    xctype = xctype.upper()
+    if xctype == 'LDA' or xctype == 'HF':
+        ao0 = ao
+    else:
+        ao0 = ao[0]
+    ngrids, nao = ao0.shape
+    nset = len(dms)
+    if xctype not in ('LDA', 'HF', 'GGA', 'NLC'):
+        return numpy.asarray([eval_rho(mol, ao, dm, non0tab, xctype, hermi,
+                                       verbose, ao_idx) for dm in dms])
+
+    if non0tab is None:
+        non0tab = numpy.ones(((ngrids+BLKSIZE-1)//BLKSIZE,mol.nbas),
+                             dtype=numpy.uint8)
+    if not hermi:
+        dms = [(dm + dm.conj().T) * .5 for dm in dms]
+
+    shls_slice = (0, mol.nbas)
+    ao_loc = mol.ao_loc_nr()
+    if ao_idx is not None:
+        dms = [dm[ao_idx[:,None],ao_idx] for dm in dms]
+        non0tab, shls_slice, ao_loc = _sparse_ao_layout(mol, non0tab, ao_idx, ngrids)
+    #:c0 = [numpy.dot(ao0, dm) for dm in dms]
+    c0 = _dot_ao_dm(mol, ao0, numpy.hstack(dms), non0tab, shls_slice, ao_loc)
+    if xctype == 'LDA' or xctype == 'HF':
+        rho = numpy.empty((nset,ngrids))
+        for i in range(nset):
+            rho[i] = _contract_rho(ao0, c0[:,i*nao:(i+1)*nao])
+    else:
+        rho = numpy.empty((nset,4,ngrids))
+        for i in range(nset):
+            c0i = c0[:,i*nao:(i+1)*nao]
+            rho[i,0] = _contract_rho(c0i, ao[0])
+            for k in range(1, 4):
+                rho[i,k] = _contract_rho(c0i, ao[k])
+            rho[i,1:4] *= 2 # *2 for +c.c.
+    return rho
+
 def eval_rho2(mol, ao, mo_coeff, mo_occ, non0tab=None, xctype='LDA',
-              verbose=None):
+              verbose=None, ao_idx=None):
     r'''Calculate the electron density for LDA functional, and the density
     derivatives for GGA functional.  This function has the same functionality
     as :func:`eval_rho` except that the density are evaluated based on orbital
@@ -245,6 +391,9 @@ def eval_rho2(mol, ao, mo_coeff, mo_occ, non0tab=None, xctype='LDA',
                              dtype=numpy.uint8)
     shls_slice = (0, mol.nbas)
     ao_loc = mol.ao_loc_nr()
+    if ao_idx is not None:
+        mo_coeff = mo_coeff[ao_idx]
+        non0tab, shls_slice, ao_loc = _sparse_ao_layout(mol, non0tab, ao_idx, ngrids)
     pos = mo_occ > OCCDROP
     if pos.sum() > 0:
         cpos = numpy.einsum('ij,j->ij', mo_coeff[:,pos], numpy.sqrt(mo_occ[pos]))
@@ -405,7 +554,7 @@ def _vv10nlc(rho,coords,vvrho,vvweight,vvcoords,nlc_pars):
     return exc,vxc
 
 def eval_mat(mol, ao, weight, rho, vxc,
-             non0tab=None, xctype='LDA', spin=0, verbose=None):
+             non0tab=None, xctype='LDA', spin=0, verbose=None, ao_idx=None):
     r'''Calculate XC potential matrix.
 
     Args:
@@ -444,10 +593,15 @@ def eval_mat(mol, ao, weight, rho, vxc,
         spin : int
             If not 0, the returned matrix is the Vxc matrix of alpha-spin.  It
             is computed with the spin non-degenerated UKS formula.
+        ao_idx : 1D int array
+            If given, ao only holds the AO functions ao_idx, as returned by
+            :func:`eval_ao_sparse`.
 
     Returns:
         XC potential matrix in 2D array of shape (nao,nao) where nao is the
-        number of AO functions.
+        number of AO functions.  If ao_idx is given, the matrix is computed
+        for the AO functions ao_idx only, with shape (len(ao_idx),len(ao_idx)).
+        It can be added to the full matrix by ``_add_ao_mat(vmat, mat, ao_idx)``.
     '''
     xctype = xctype.upper()
     if xctype == 'LDA' or xctype == 'HF':
@@ -460,6 +614,8 @@ def eval_mat(mol, ao, weight, rho, vxc,
                              dtype=numpy.uint8)
     shls_slice = (0, mol.nbas)
     ao_loc = mol.ao_loc_nr()
+    if ao_idx is not None:
+        non0tab, shls_slice, ao_loc = _sparse_ao_layout(mol, non0tab, ao_idx, ngrids)
     transpose_for_uks = False
     if xctype == 'LDA' or xctype == 'HF':
         if not isinstance(vxc, numpy.ndarray) or vxc.ndim == 2:
@@ -538,7 +694,11 @@ def eval_mat(mol, ao, weight, rho, vxc,
 
 
 def _dot_ao_ao(mol, ao1, ao2, non0tab, shls_slice, ao_loc, hermi=0):
-    '''return numpy.dot(ao1.T, ao2)'''
+    '''return numpy.dot(ao1.T, ao2)
+
+    For the AO arrays of :func:`eval_ao_sparse`, non0tab, shls_slice and
+    ao_loc should be generated by :func:`_sparse_ao_layout`.
+    '''
     ngrids, nao = ao1.shape
     if nao < SWITCH_SIZE:
         return lib.dot(ao1.T.conj(), ao2)
@@ -554,9 +714,11 @@ def _dot_ao_ao(mol, ao1, ao2, non0tab, shls_slice, ao_loc, hermi=0):
         ao1 = numpy.asarray(ao1, numpy.complex128)
         ao2 = numpy.asarray(ao2, numpy.complex128)
 
+    nbas = mol.nbas
     if non0tab is None or shls_slice is None or ao_loc is None:
         pnon0tab = pshls_slice = pao_loc = lib.c_null_ptr()
     else:
+        nbas = non0tab.shape[1]
         pnon0tab    = non0tab.ctypes.data_as(ctypes.c_void_p)
         pshls_slice = (ctypes.c_int*2)(*shls_slice)
         pao_loc     = ao_loc.ctypes.data_as(ctypes.c_void_p)
@@ -566,7 +728,7 @@ def _dot_ao_ao(mol, ao1, ao2, non0tab, shls_slice, ao_loc, hermi=0):
        ao1.ctypes.data_as(ctypes.c_void_p),
        ao2.ctypes.data_as(ctypes.c_void_p),
        ctypes.c_int(nao), ctypes.c_int(ngrids),
-       ctypes.c_int(mol.nbas), ctypes.c_int(hermi),
+       ctypes.c_int(nbas), ctypes.c_int(hermi),
        pnon0tab, pshls_slice, pao_loc)
     return vv
 
@@ -585,9 +747,11 @@ def _dot_ao_dm(mol, ao, dm, non0tab, shls_slice, ao_loc, out=None):
         ao = numpy.asarray(ao, numpy.complex128)
         dm = numpy.asarray(dm, numpy.complex128)
 
+    nbas = mol.nbas
     if non0tab is None or shls_slice is None or ao_loc is None:
         pnon0tab = pshls_slice = pao_loc = lib.c_null_ptr()
     else:
+        nbas = non0tab.shape[1]
         pnon0tab    = non0tab.ctypes.data_as(ctypes.c_void_p)
         pshls_slice = (ctypes.c_int*2)(*shls_slice)
         pao_loc     = ao_loc.ctypes.data_as(ctypes.c_void_p)
@@ -598,7 +762,7 @@ def _dot_ao_dm(mol, ao, dm, non0tab, shls_slice, ao_loc, out=None):
        ao.ctypes.data_as(ctypes.c_void_p),
        dm.ctypes.data_as(ctypes.c_void_p),
        ctypes.c_int(nao), ctypes.c_int(dm.shape[1]),
-       ctypes.c_int(ngrids), ctypes.c_int(mol.nbas),
+       ctypes.c_int(ngrids), ctypes.c_int(nbas),
        pnon0tab, pshls_slice, pao_loc)
     return vm
 
@@ -659,6 +823,59 @@ def _contract_rho(bra, ket):
         rho += numpy.einsum('ip,ip->p', bra.imag, ket.imag)
     return rho
 
+def _dot_ao_ao_batch(mol, aows, ao, non0tab, shls_slice, ao_loc, ao_idx=None):
+    '''return numpy.einsum('xip,pj->xij', aows.conj(), ao)
+
+    aows is a (nset,nao,ngrids) array which stores the transposed weighted AO
+    values of nset density matrices.  All of them are contracted with ao in one
+    matrix-matrix multiplication.  If ao_idx is given, ao only holds the AO
+    functions ao_idx and the returned matrices are in the same compressed
+    representation.
+    '''
+    nset, nao, ngrids = aows.shape
+    if ao_idx is not None:
+        non0tab, shls_slice, ao_loc = _sparse_ao_layout(mol, non0tab, ao_idx, ngrids)
+    if nset == 1 or nao >= SWITCH_SIZE:
+        # For large systems, the sparsity screening of _dot_ao_ao is more
+        # important than the batched GEMM
+        return numpy.asarray([_dot_ao_ao(mol, aow.T, ao, non0tab, shls_slice, ao_loc)
+                              for aow in aows])
+    vv = lib.dot(aows.reshape(nset*nao,ngrids).conj(), ao)
+    return vv.reshape(nset,nao,nao)
+
+def _block_loop_ao_idx(ni, mol, grids, nao, deriv, max_memory, blksize=None):
+    '''Loop over ni.sparse_block_loop if ni.sparse_ao is set, otherwise
+    ni.block_loop.  Yields ao, ao_idx, mask, weight, coords.  ao_idx is None
+    for the AO arrays of block_loop.
+    '''
+    if getattr(ni, 'sparse_ao', False):
+        for x in ni.sparse_block_loop(mol, grids, nao, deriv, max_memory,
+                                      blksize=blksize):
+            yield x
+    else:
+        for ao, mask, weight, coords \
+                in ni.block_loop(mol, grids, nao, deriv, max_memory,
+                                 blksize=blksize):
+            yield ao, None, mask, weight, coords
+
+def _add_ao_mat(vmat, v, ao_idx):
+    '''vmat[...,ao_idx,ao_idx] += v'''
+    if ao_idx is None:
+        vmat += v
+    else:
+        vmat[...,ao_idx[:,None],ao_idx] += v
+    return vmat
+
+def _batch_blksize(grids, nao, comp, nset, max_memory):
+    '''Size of grid block to hold AO values and the intermediates of nset
+    density matrices in memory.
+    '''
+    if grids.coords is None:
+        grids.build(with_non0tab=True)
+    ngrids = grids.weights.size
+    blksize = int(max_memory*1e6/((comp+nset*2)*nao*8*BLKSIZE))*BLKSIZE
+    return max(BLKSIZE, min(blksize, ngrids, BLKSIZE*1200))
+
 def nr_vxc(mol, grids, xc_code, dms, spin=0, relativity=0, hermi=0,
            max_memory=2000, verbose=None):
     '''
@@ -748,6 +965,7 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
     '''
     xctype = ni._xc_type(xc_code)
     make_rho, nset, nao = ni._gen_rho_evaluator(mol, dms, hermi)
+    make_rho_batch = ni._gen_rho_batch_evaluator(mol, dms, hermi)[0]
 
     shls_slice = (0, mol.nbas)
     ao_loc = mol.ao_loc_nr()
@@ -761,41 +979,52 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
     aow = None
     if xctype == 'LDA':
         ao_deriv = 0
-        for ao, mask, weight, coords \
-                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
-            aow = numpy.ndarray(ao.shape, order='F', buffer=aow)
+        blksize = None
+        if nset > 1:
+            blksize = _batch_blksize(grids, nao, 1, nset, max_memory)
+        for ao, ao_idx, mask, weight, coords \
+                in _block_loop_ao_idx(ni, mol, grids, nao, ao_deriv, max_memory,
+                                      blksize):
+            aow = numpy.ndarray((nset,ao.shape[-1],weight.size), buffer=aow)
+            rho = make_rho_batch(ao, mask, 'LDA', ao_idx)
             for idm in range(nset):
-                rho = make_rho(idm, ao, mask, 'LDA')
-                exc, vxc = ni.eval_xc(xc_code, rho, 0, relativity, 1,
+                exc, vxc = ni.eval_xc(xc_code, rho[idm], 0, relativity, 1,
                                       verbose=verbose)[:2]
                 vrho = vxc[0]
-                den = rho * weight
+                den = rho[idm] * weight
                 nelec[idm] += den.sum()
                 excsum[idm] += numpy.dot(den, exc)
                 # *.5 because vmat + vmat.T
                 #:aow = numpy.einsum('pi,p->pi', ao, .5*weight*vrho, out=aow)
-                aow = _scale_ao(ao, .5*weight*vrho, out=aow)
-                vmat[idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
-                rho = exc = vxc = vrho = None
+                aow[idm] = _scale_ao(ao, .5*weight*vrho, out=aow[idm]).T
+                exc = vxc = vrho = None
+            _add_ao_mat(vmat, _dot_ao_ao_batch(mol, aow, ao, mask, shls_slice,
+                                               ao_loc, ao_idx), ao_idx)
+            rho = None
     elif xctype == 'GGA':
         ao_deriv = 1
-        for ao, mask, weight, coords \
-                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
-            ngrid = weight.size
-            aow = numpy.ndarray(ao[0].shape, order='F', buffer=aow)
+        blksize = None
+        if nset > 1:
+            blksize = _batch_blksize(grids, nao, 4, nset, max_memory)
+        for ao, ao_idx, mask, weight, coords \
+                in _block_loop_ao_idx(ni, mol, grids, nao, ao_deriv, max_memory,
+                                      blksize):
+            aow = numpy.ndarray((nset,ao.shape[-1],weight.size), buffer=aow)
+            rho = make_rho_batch(ao, mask, 'GGA', ao_idx)
             for idm in range(nset):
-                rho = make_rho(idm, ao, mask, 'GGA')
-                exc, vxc = ni.eval_xc(xc_code, rho, 0, relativity, 1,
+                exc, vxc = ni.eval_xc(xc_code, rho[idm], 0, relativity, 1,
                                       verbose=verbose)[:2]
-                den = rho[0] * weight
+                den = rho[idm,0] * weight
                 nelec[idm] += den.sum()
                 excsum[idm] += numpy.dot(den, exc)
 # ref eval_mat function
-                wv = _rks_gga_wv0(rho, vxc, weight)
+                wv = _rks_gga_wv0(rho[idm], vxc, weight)
                 #:aow = numpy.einsum('npi,np->pi', ao, wv, out=aow)
-                aow = _scale_ao(ao, wv, out=aow)
-                vmat[idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
-                rho = exc = vxc = wv = None
+                aow[idm] = _scale_ao(ao, wv, out=aow[idm]).T
+                exc = vxc = wv = None
+            _add_ao_mat(vmat, _dot_ao_ao_batch(mol, aow, ao[0], mask, shls_slice,
+                                               ao_loc, ao_idx), ao_idx)
+            rho = None
     elif xctype == 'NLC':
         nlc_pars = ni.nlc_coeff(xc_code[:-6])
         if nlc_pars == [0,0]:
@@ -878,6 +1107,139 @@ def nr_rks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
         vmat = vmat[0]
     return nelec, excsum, vmat
 
+def nr_rks_incremental(ni, mol, grids, xc_code, dm, xc_cache, tol=1e-7,
+                       relativity=0, max_memory=2000, verbose=None):
+    '''RKS XC functional and potential matrix of one density matrix, reusing
+    the contributions of the grid blocks in which the density barely changed
+    since they were last evaluated.
+
+    For each grid block, the change of the density is bounded by
+    max|dm - dm_last| (over the shells significant on the block) times the
+    square of the largest AO magnitude sum on the block.  These bounds are
+    accumulated over the calls since the block was last evaluated.  The
+    block is recomputed when the accumulated bound exceeds tol, otherwise
+    the cached contributions (nelec, exc and the compressed Vxc matrix) are
+    reused.  tol=0 forces a full rebuild.
+
+    Args:
+        ni : an instance of :class:`NumInt`
+
+        mol : an instance of :class:`Mole`
+
+        grids : an instance of :class:`Grids`
+
+        xc_code : str
+            XC functional description.
+        dm : 2D array
+            Density matrix (hermitian)
+        xc_cache : dict
+            Storage of the block contributions, updated inplace.  Pass an
+            empty dict for the first call.
+
+    Kwargs:
+        tol : float
+            Threshold of the accumulated density change to recompute a block.
+        max_memory : int or float
+            The maximum size of cache to use (in MB).  Block contributions
+            are not stored beyond this size.
+
+    Returns:
+        nelec, excsum, vmat (see :func:`nr_rks`)
+    '''
+    xctype = ni._xc_type(xc_code)
+    if xctype not in ('LDA', 'GGA'):
+        return ni.nr_rks(mol, grids, xc_code, dm, relativity, 1,
+                         max_memory, verbose)
+
+    log = logger.new_logger(mol, verbose)
+    if grids.coords is None:
+        grids.build(with_non0tab=True)
+    ngrids = grids.weights.size
+    nao = dm.shape[-1]
+    ao_deriv = 0 if xctype == 'LDA' else 1
+    comp = (ao_deriv+1)*(ao_deriv+2)*(ao_deriv+3)//6
+    non0tab = grids.non0tab
+    if non0tab is None:
+        non0tab = numpy.ones(((ngrids+BLKSIZE-1)//BLKSIZE,mol.nbas),
+                             dtype=numpy.uint8)
+    ao_loc = mol.ao_loc_nr()
+
+    key = (xc_code, _ao_cache_key(mol, grids, ao_deriv, None, True))
+    if xc_cache.get('key') != key:
+        xc_cache.clear()
+        # Small blocks to localize the screening.  Grids are ordered by atoms
+        blksize = int(max_memory*1e6/(comp*2*nao*8*BLKSIZE))*BLKSIZE
+        blksize = max(BLKSIZE, min(blksize, ngrids, BLKSIZE*INCREMENTAL_XC_NBLK))
+        xc_cache.update(key=key, blksize=blksize, blocks={}, nbytes=0)
+    blksize = xc_cache['blksize']
+    blocks = xc_cache['blocks']
+
+    dm_last = xc_cache.get('dm')
+    ddm_shl = None
+    if dm_last is not None and tol > 0:
+        ddm = numpy.asarray(dm - dm_last, order='C')
+        ddm_shl = lib.condense('NP_absmax', ddm, ao_loc)
+
+    nelec = excsum = 0
+    vmat = numpy.zeros((nao,nao))
+    buf = numpy.empty((comp,blksize,nao))
+    nblk_eval = 0
+    for ip0 in range(0, ngrids, blksize):
+        ip1 = min(ngrids, ip0+blksize)
+        blk = blocks.get(ip0)
+        if blk is not None and ddm_shl is not None:
+            shls = blk['shls']
+            if shls.size > 0:
+                blk['drift'] += blk['aomax'] * ddm_shl[shls[:,None],shls].max()
+            if blk['drift'] < tol:
+                nelec += blk['nelec']
+                excsum += blk['exc']
+                ao_idx = blk['ao_idx']
+                vmat[ao_idx[:,None],ao_idx] += blk['vmat']
+                continue
+
+        nblk_eval += 1
+        coords = grids.coords[ip0:ip1]
+        weight = grids.weights[ip0:ip1]
+        non0 = non0tab[ip0//BLKSIZE:]
+        ao, ao_idx = eval_ao_sparse(mol, coords, ao_deriv, non0, buf)
+        rho = eval_rho(mol, ao, dm, non0, xctype, hermi=1, ao_idx=ao_idx)
+        exc, vxc = ni.eval_xc(xc_code, rho, 0, relativity, 1, verbose=verbose)[:2]
+        if xctype == 'LDA':
+            den = rho * weight
+            aow = _scale_ao(ao, .5*weight*vxc[0])
+            ao0 = ao
+        else:
+            den = rho[0] * weight
+            aow = _scale_ao(ao, _rks_gga_wv0(rho, vxc, weight))
+            ao0 = ao[0]
+        blk_nelec = den.sum()
+        blk_exc = numpy.dot(den, exc)
+        sub_non0, shls_slice, sub_loc = _sparse_ao_layout(mol, non0, ao_idx, ip1-ip0)
+        v = _dot_ao_ao(mol, ao0, aow, sub_non0, shls_slice, sub_loc)
+        nelec += blk_nelec
+        excsum += blk_exc
+        vmat[ao_idx[:,None],ao_idx] += v
+
+        if blk is not None:
+            xc_cache['nbytes'] -= blk['vmat'].nbytes
+            del blocks[ip0]
+        if xc_cache['nbytes'] + v.nbytes < max_memory * 1e6:
+            # |ao_i(r)| summed over AOs, maximized over grids and components
+            aomax = abs(ao).reshape(-1,ip1-ip0,ao_idx.size).max(axis=0).sum(axis=1).max()
+            blocks[ip0] = {'shls': _sparse_ao_shls(non0, ip1-ip0),
+                           'ao_idx': ao_idx, 'aomax': 2 * aomax**2,
+                           'drift': 0., 'nelec': blk_nelec, 'exc': blk_exc,
+                           'vmat': v}
+            xc_cache['nbytes'] += v.nbytes
+        ao = aow = rho = exc = vxc = v = None
+
+    xc_cache['dm'] = dm
+    log.debug('Incremental XC: %d of %d grid blocks evaluated, cache %.2f MB',
+              nblk_eval, (ngrids+blksize-1)//blksize, xc_cache['nbytes']/1e6)
+    vmat = vmat + vmat.T
+    return nelec, excsum, vmat
+
 def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
            max_memory=2000, verbose=None):
     '''Calculate UKS XC functional and potential matrix on given meshgrids
@@ -932,6 +1294,8 @@ def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
     nao = dma.shape[-1]
     make_rhoa, nset = ni._gen_rho_evaluator(mol, dma, hermi)[:2]
     make_rhob       = ni._gen_rho_evaluator(mol, dmb, hermi)[0]
+    make_rhoa_batch = ni._gen_rho_batch_evaluator(mol, dma, hermi)[0]
+    make_rhob_batch = ni._gen_rho_batch_evaluator(mol, dmb, hermi)[0]
 
     nelec = numpy.zeros((2,nset))
     excsum = numpy.zeros(nset)
@@ -939,12 +1303,17 @@ def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
     aow = None
     if xctype == 'LDA':
         ao_deriv = 0
-        for ao, mask, weight, coords \
-                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
-            aow = numpy.ndarray(ao.shape, order='F', buffer=aow)
+        blksize = _batch_blksize(grids, nao, 1, nset*2, max_memory)
+        for ao, ao_idx, mask, weight, coords \
+                in _block_loop_ao_idx(ni, mol, grids, nao, ao_deriv, max_memory,
+                                      blksize):
+            nao_sub = ao.shape[-1]
+            aow = numpy.ndarray((2,nset,nao_sub,weight.size), buffer=aow)
+            rhoa = make_rhoa_batch(ao, mask, xctype, ao_idx)
+            rhob = make_rhob_batch(ao, mask, xctype, ao_idx)
             for idm in range(nset):
-                rho_a = make_rhoa(idm, ao, mask, xctype)
-                rho_b = make_rhob(idm, ao, mask, xctype)
+                rho_a = rhoa[idm]
+                rho_b = rhob[idm]
                 exc, vxc = ni.eval_xc(xc_code, (rho_a, rho_b),
                                       1, relativity, 1, verbose=verbose)[:2]
                 vrho = vxc[0]
@@ -957,21 +1326,27 @@ def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
 
                 # *.5 due to +c.c. in the end
                 #:aow = numpy.einsum('pi,p->pi', ao, .5*weight*vrho[:,0], out=aow)
-                aow = _scale_ao(ao, .5*weight*vrho[:,0], out=aow)
-                vmat[0,idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
+                aow[0,idm] = _scale_ao(ao, .5*weight*vrho[:,0], out=aow[0,idm]).T
                 #:aow = numpy.einsum('pi,p->pi', ao, .5*weight*vrho[:,1], out=aow)
-                aow = _scale_ao(ao, .5*weight*vrho[:,1], out=aow)
-                vmat[1,idm] += _dot_ao_ao(mol, ao, aow, mask, shls_slice, ao_loc)
+                aow[1,idm] = _scale_ao(ao, .5*weight*vrho[:,1], out=aow[1,idm]).T
                 rho_a = rho_b = exc = vxc = vrho = None
+            v = _dot_ao_ao_batch(mol, aow.reshape(nset*2,nao_sub,-1), ao, mask,
+                                 shls_slice, ao_loc, ao_idx)
+            _add_ao_mat(vmat, v.reshape(2,nset,nao_sub,nao_sub), ao_idx)
+            rhoa = rhob = v = None
     elif xctype == 'GGA':
         ao_deriv = 1
-        for ao, mask, weight, coords \
-                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
-            ngrid = weight.size
-            aow = numpy.ndarray(ao[0].shape, order='F', buffer=aow)
+        blksize = _batch_blksize(grids, nao, 4, nset*2, max_memory)
+        for ao, ao_idx, mask, weight, coords \
+                in _block_loop_ao_idx(ni, mol, grids, nao, ao_deriv, max_memory,
+                                      blksize):
+            nao_sub = ao.shape[-1]
+            aow = numpy.ndarray((2,nset,nao_sub,weight.size), buffer=aow)
+            rhoa = make_rhoa_batch(ao, mask, xctype, ao_idx)
+            rhob = make_rhob_batch(ao, mask, xctype, ao_idx)
             for idm in range(nset):
-                rho_a = make_rhoa(idm, ao, mask, xctype)
-                rho_b = make_rhob(idm, ao, mask, xctype)
+                rho_a = rhoa[idm]
+                rho_b = rhob[idm]
                 exc, vxc = ni.eval_xc(xc_code, (rho_a, rho_b),
                                       1, relativity, 1, verbose=verbose)[:2]
                 den = rho_a[0]*weight
@@ -983,12 +1358,14 @@ def nr_uks(ni, mol, grids, xc_code, dms, relativity=0, hermi=0,
 
                 wva, wvb = _uks_gga_wv0((rho_a,rho_b), vxc, weight)
                 #:aow = numpy.einsum('npi,np->pi', ao, wva, out=aow)
-                aow = _scale_ao(ao, wva, out=aow)
-                vmat[0,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                aow[0,idm] = _scale_ao(ao, wva, out=aow[0,idm]).T
                 #:aow = numpy.einsum('npi,np->pi', ao, wvb, out=aow)
-                aow = _scale_ao(ao, wvb, out=aow)
-                vmat[1,idm] += _dot_ao_ao(mol, ao[0], aow, mask, shls_slice, ao_loc)
+                aow[1,idm] = _scale_ao(ao, wvb, out=aow[1,idm]).T
                 rho_a = rho_b = exc = vxc = wva = wvb = None
+            v = _dot_ao_ao_batch(mol, aow.reshape(nset*2,nao_sub,-1), ao[0], mask,
+                                 shls_slice, ao_loc, ao_idx)
+            _add_ao_mat(vmat, v.reshape(2,nset,nao_sub,nao_sub), ao_idx)
+            rhoa = rhob = v = None
     elif xctype == 'MGGA':
         if (any(x in xc_code.upper() for x in ('CC06', 'CS', 'BR89', 'MK00'))):
             raise NotImplementedError('laplacian in meta-GGA method')
@@ -1101,7 +1478,7 @@ def nr_rks_fxc(ni, mol, grids, xc_code, dm0, dms, relativity=0, hermi=0,
     '''
     xctype = ni._xc_type(xc_code)
 
-    make_rho, nset, nao = ni._gen_rho_evaluator(mol, dms, hermi)
+    make_rho, nset, nao = ni._gen_rho_batch_evaluator(mol, dms, hermi)
     if ((xctype == 'LDA' and fxc is None) or
         (xctype == 'GGA' and rho0 is None)):
         make_rho0 = ni._gen_rho_evaluator(mol, dm0, 1)[0]
@@ -1117,10 +1494,12 @@ def nr_rks_fxc(ni, mol, grids, xc_code, dm0, dms, relativity=0, hermi=0,
     if xctype == 'LDA':
         ao_deriv = 0
         ip = 0
+        blksize = _batch_blksize(grids, nao, 1, nset, max_memory)
         for ao, mask, weight, coords \
-                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory,
+                                 blksize=blksize):
             ngrid = weight.size
-            aow = numpy.ndarray(ao.shape, order='F', buffer=aow)
+            aow = numpy.ndarray((nset,nao,ngrid), buffer=aow)
             if fxc is None:
                 rho = make_rho0(0, ao, mask, 'LDA')
                 fxc0 = ni.eval_xc(xc_code, rho, 0, relativity, 2,
@@ -1130,20 +1509,22 @@ def nr_rks_fxc(ni, mol, grids, xc_code, dm0, dms, relativity=0, hermi=0,
                 frr = fxc[0][ip:ip+ngrid]
                 ip += ngrid
 
+            rho1 = make_rho(ao, mask, 'LDA')
             for i in range(nset):
-                rho1 = make_rho(i, ao, mask, 'LDA')
                 #:aow = numpy.einsum('pi,p->pi', ao, weight*frr*rho1, out=aow)
-                aow = _scale_ao(ao, weight*frr*rho1, out=aow)
-                vmat[i] += _dot_ao_ao(mol, aow, ao, mask, shls_slice, ao_loc)
-                rho1 = None
+                aow[i] = _scale_ao(ao, weight*frr*rho1[i], out=aow[i]).T
+            vmat += _dot_ao_ao_batch(mol, aow, ao, mask, shls_slice, ao_loc)
+            rho1 = None
 
     elif xctype == 'GGA':
         ao_deriv = 1
         ip = 0
+        blksize = _batch_blksize(grids, nao, 4, nset, max_memory)
         for ao, mask, weight, coords \
-                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory,
+                                 blksize=blksize):
             ngrid = weight.size
-            aow = numpy.ndarray(ao[0].shape, order='F', buffer=aow)
+            aow = numpy.ndarray((nset,nao,ngrid), buffer=aow)
             if rho0 is None:
                 rho = make_rho0(0, ao, mask, 'GGA')
             else:
@@ -1156,13 +1537,13 @@ def nr_rks_fxc(ni, mol, grids, xc_code, dm0, dms, relativity=0, hermi=0,
                 fxc0 = (fxc[0][ip:ip+ngrid], fxc[1][ip:ip+ngrid], fxc[2][ip:ip+ngrid])
                 ip += ngrid
 
+            rho1 = make_rho(ao, mask, 'GGA')
             for i in range(nset):
-                rho1 = make_rho(i, ao, mask, 'GGA')
-                wv = _rks_gga_wv1(rho, rho1, vxc0, fxc0, weight)
+                wv = _rks_gga_wv1(rho, rho1[i], vxc0, fxc0, weight)
                 #:aow = numpy.einsum('npi,np->pi', ao, wv, out=aow)
-                aow = _scale_ao(ao, wv, out=aow)
-                vmat[i] += _dot_ao_ao(mol, aow, ao[0], mask, shls_slice, ao_loc)
-                rho1 = sigma1 = None
+                aow[i] = _scale_ao(ao, wv, out=aow[i]).T
+            vmat += _dot_ao_ao_batch(mol, aow, ao[0], mask, shls_slice, ao_loc)
+            rho1 = wv = None
 
         for i in range(nset):  # for (\nabla\mu) \nu + \mu (\nabla\nu)
             vmat[i] = vmat[i] + vmat[i].T.conj()
@@ -1386,8 +1767,8 @@ def nr_uks_fxc(ni, mol, grids, xc_code, dm0, dms, relativity=0, hermi=0,
 
     dma, dmb = _format_uks_dm(dms)
     nao = dms.shape[-1]
-    make_rhoa, nset = ni._gen_rho_evaluator(mol, dma, hermi)[:2]
-    make_rhob       = ni._gen_rho_evaluator(mol, dmb, hermi)[0]
+    make_rhoa, nset = ni._gen_rho_batch_evaluator(mol, dma, hermi)[:2]
+    make_rhob       = ni._gen_rho_batch_evaluator(mol, dmb, hermi)[0]
 
     if ((xctype == 'LDA' and fxc is None) or
         (xctype == 'GGA' and rho0 is None)):
@@ -1401,10 +1782,12 @@ def nr_uks_fxc(ni, mol, grids, xc_code, dm0, dms, relativity=0, hermi=0,
     if xctype == 'LDA':
         ao_deriv = 0
         ip = 0
+        blksize = _batch_blksize(grids, nao, 1, nset*2, max_memory)
         for ao, mask, weight, coords \
-                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory,
+                                 blksize=blksize):
             ngrid = weight.size
-            aow = numpy.ndarray(ao.shape, order='F', buffer=aow)
+            aow = numpy.ndarray((2,nset,nao,ngrid), buffer=aow)
             if fxc is None:
                 rho0a = make_rho0(0, ao, mask, xctype)
                 rho0b = make_rho0(1, ao, mask, xctype)
@@ -1415,27 +1798,30 @@ def nr_uks_fxc(ni, mol, grids, xc_code, dm0, dms, relativity=0, hermi=0,
                 u_u, u_d, d_d = fxc[0][ip:ip+ngrid].T
                 ip += ngrid
 
+            rho1a = make_rhoa(ao, mask, xctype)
+            rho1b = make_rhob(ao, mask, xctype)
             for i in range(nset):
-                rho1a = make_rhoa(i, ao, mask, xctype)
-                rho1b = make_rhob(i, ao, mask, xctype)
-                wv = u_u * rho1a + u_d * rho1b
+                wv = u_u * rho1a[i] + u_d * rho1b[i]
                 wv *= weight
                 #:aow = numpy.einsum('pi,p->pi', ao, wv, out=aow)
-                aow = _scale_ao(ao, wv, out=aow)
-                vmat[0,i] += _dot_ao_ao(mol, aow, ao, mask, shls_slice, ao_loc)
-                wv = u_d * rho1a + d_d * rho1b
+                aow[0,i] = _scale_ao(ao, wv, out=aow[0,i]).T
+                wv = u_d * rho1a[i] + d_d * rho1b[i]
                 wv *= weight
                 #:aow = numpy.einsum('pi,p->pi', ao, wv, out=aow)
-                aow = _scale_ao(ao, wv, out=aow)
-                vmat[1,i] += _dot_ao_ao(mol, aow, ao, mask, shls_slice, ao_loc)
+                aow[1,i] = _scale_ao(ao, wv, out=aow[1,i]).T
+            vmat += _dot_ao_ao_batch(mol, aow.reshape(nset*2,nao,ngrid), ao, mask,
+                                     shls_slice, ao_loc).reshape(vmat.shape)
+            rho1a = rho1b = wv = None
 
     elif xctype == 'GGA':
         ao_deriv = 1
         ip = 0
+        blksize = _batch_blksize(grids, nao, 4, nset*2, max_memory)
         for ao, mask, weight, coords \
-                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory):
+                in ni.block_loop(mol, grids, nao, ao_deriv, max_memory,
+                                 blksize=blksize):
             ngrid = weight.size
-            aow = numpy.ndarray(ao[0].shape, order='F', buffer=aow)
+            aow = numpy.ndarray((2,nset,nao,ngrid), buffer=aow)
             if rho0 is None:
                 rho0a = make_rho0(0, ao, mask, xctype)
                 rho0b = make_rho0(1, ao, mask, xctype)
@@ -1450,16 +1836,18 @@ def nr_uks_fxc(ni, mol, grids, xc_code, dm0, dms, relativity=0, hermi=0,
                 fxc0 = (fxc[0][ip:ip+ngrid], fxc[1][ip:ip+ngrid], fxc[2][ip:ip+ngrid])
                 ip += ngrid
 
+            rho1a = make_rhoa(ao, mask, xctype)
+            rho1b = make_rhob(ao, mask, xctype)
             for i in range(nset):
-                rho1a = make_rhoa(i, ao, mask, xctype)
-                rho1b = make_rhob(i, ao, mask, xctype)
-                wva, wvb = _uks_gga_wv1((rho0a,rho0b), (rho1a,rho1b), vxc0, fxc0, weight)
+                wva, wvb = _uks_gga_wv1((rho0a,rho0b), (rho1a[i],rho1b[i]),
+                                        vxc0, fxc0, weight)
                 #:aow = numpy.einsum('npi,np->pi', ao, wva, out=aow)
-                aow = _scale_ao(ao, wva, out=aow)
-                vmat[0,i] += _dot_ao_ao(mol, aow, ao[0], mask, shls_slice, ao_loc)
+                aow[0,i] = _scale_ao(ao, wva, out=aow[0,i]).T
                 #:aow = numpy.einsum('npi,np->pi', ao, wvb, out=aow)
-                aow = _scale_ao(ao, wvb, out=aow)
-                vmat[1,i] += _dot_ao_ao(mol, aow, ao[0], mask, shls_slice, ao_loc)
+                aow[1,i] = _scale_ao(ao, wvb, out=aow[1,i]).T
+            vmat += _dot_ao_ao_batch(mol, aow.reshape(nset*2,nao,ngrid), ao[0], mask,
+                                     shls_slice, ao_loc).reshape(vmat.shape)
+            rho1a = rho1b = wva = wvb = None
 
         for i in range(nset):  # for (\nabla\mu) \nu + \mu (\nabla\nu)
             vmat[0,i] = vmat[0,i] + vmat[0,i].T.conj()
@@ -1848,10 +2236,90 @@ def get_rho(ni, mol, dm, grids, max_memory=2000):
     return rho
 
 
+class _AOCache(object):
+    '''AO values of grid blocks, in memory up to max_memory (MB) and in a
+    temporary HDF5 file beyond that.  The cache is only valid for the
+    molecule, grids and block partition it was created for (see
+    :func:`_ao_cache_key`).
+    '''
+    def __init__(self, key, blksize, max_memory=CACHE_AO_MAX_MEMORY):
+        self.key = key
+        self.blksize = blksize
+        self.max_memory = max_memory
+        self.hits = 0
+        self.misses = 0
+        self.mem_bytes = 0
+        self.disk_bytes = 0
+        self._mem = {}
+        self._h5 = None
+
+    def get(self, ip0, buf=None):
+        if ip0 in self._mem:
+            self.hits += 1
+            return self._mem[ip0]
+        elif self._h5 is not None and str(ip0) in self._h5:
+            self.hits += 1
+            dat = self._h5[str(ip0)]
+            aoT = numpy.ndarray(dat.shape, buffer=buf)
+            dat.read_direct(aoT)
+            return aoT.swapaxes(-1,-2)
+        self.misses += 1
+        return None
+
+    def put(self, ip0, ao):
+        if self.mem_bytes + ao.nbytes <= self.max_memory * 1e6:
+            # eval_ao output is transposed in memory
+            self._mem[ip0] = numpy.array(ao, order='K')
+            self.mem_bytes += ao.nbytes
+        else:
+            if self._h5 is None:
+                self._h5 = lib.H5TmpFile()
+            # Store the transposed array so that the memory layout of the
+            # loaded array is the same to the eval_ao output
+            self._h5[str(ip0)] = ao.swapaxes(-1,-2)
+            self.disk_bytes += ao.nbytes
+
+    @property
+    def hit_rate(self):
+        return self.hits / max(1, self.hits + self.misses)
+
+    def close(self):
+        self._mem = {}
+        if self._h5 is not None:
+            self._h5.close()
+            self._h5 = None
+        self.mem_bytes = self.disk_bytes = 0
+
+def _ao_cache_key(mol, grids, deriv, non0tab=None, sparse=False):
+    '''Key of the cached AO values.  The grids are identified by
+    grids._version which is updated when grids.coords, grids.weights or
+    grids.non0tab are assigned (e.g. in grids.build()).  In-place changes of
+    grids.coords are not detected.  non0tab=None means grids.non0tab.
+    '''
+    import hashlib
+    sha = hashlib.sha1()
+    for x in (mol._atm, mol._bas, mol._env):
+        sha.update(numpy.ascontiguousarray(x).data)
+    version = getattr(grids, '_version', None)
+    if version is None:
+        # Grids objects which do not track the updates of coords
+        sha.update(numpy.ascontiguousarray(grids.coords).data)
+        version = id(grids)
+    if non0tab is not None and non0tab is not getattr(grids, 'non0tab', None):
+        sha.update(numpy.ascontiguousarray(non0tab).data)
+    return (sha.hexdigest(), version, mol.cart, deriv, sparse)
+
+
 class NumInt(object):
     def __init__(self):
         self.libxc = libxc
         self.omega = None  # RSH paramter
+        # Cache AO values in block_loop for repeated calls (e.g. SCF cycles)
+        self.cache_ao = CACHE_AO
+        self.cache_ao_max_memory = CACHE_AO_MAX_MEMORY
+        self.cache_ao_nslots = CACHE_AO_NSLOTS
+        self._ao_caches = collections.OrderedDict()
+        self.sparse_ao = SPARSE_AO
 
     @lib.with_doc(nr_vxc.__doc__)
     def nr_vxc(self, mol, grids, xc_code, dms, spin=0, relativity=0, hermi=0,
@@ -1875,6 +2343,7 @@ class NumInt(object):
 
     nr_rks = nr_rks
     nr_uks = nr_uks
+    nr_rks_incremental = nr_rks_incremental
     nr_rks_fxc = nr_rks_fxc
     nr_uks_fxc = nr_uks_fxc
     cache_xc_kernel  = cache_xc_kernel
@@ -1892,39 +2361,123 @@ class NumInt(object):
 
     @lib.with_doc(eval_rho2.__doc__)
     def eval_rho2(self, mol, ao, mo_coeff, mo_occ, non0tab=None, xctype='LDA',
-                  verbose=None):
-        return eval_rho2(mol, ao, mo_coeff, mo_occ, non0tab, xctype, verbose)
+                  verbose=None, ao_idx=None):
+        return eval_rho2(mol, ao, mo_coeff, mo_occ, non0tab, xctype, verbose,
+                         ao_idx)
 
     @lib.with_doc(eval_rho.__doc__)
-    def eval_rho(self, mol, ao, dm, non0tab=None, xctype='LDA', hermi=0, verbose=None):
-        return eval_rho(mol, ao, dm, non0tab, xctype, hermi, verbose)
+    def eval_rho(self, mol, ao, dm, non0tab=None, xctype='LDA', hermi=0,
+                 verbose=None, ao_idx=None):
+        return eval_rho(mol, ao, dm, non0tab, xctype, hermi, verbose, ao_idx)
+
+    @lib.with_doc(eval_rho_batch.__doc__)
+    def eval_rho_batch(self, mol, ao, dms, non0tab=None, xctype='LDA', hermi=0,
+                       verbose=None, ao_idx=None):
+        return eval_rho_batch(mol, ao, dms, non0tab, xctype, hermi, verbose,
+                              ao_idx)
 
     def block_loop(self, mol, grids, nao, deriv=0, max_memory=2000,
                    non0tab=None, blksize=None, buf=None):
         '''Define this macro to loop over grids by blocks.
         '''
+        for ao, ao_idx, mask, weight, coords \
+                in self._block_loop(mol, grids, nao, deriv, max_memory,
+                                    non0tab, blksize, buf, False):
+            yield ao, mask, weight, coords
+
+    def sparse_block_loop(self, mol, grids, nao, deriv=0, max_memory=2000,
+                          non0tab=None, blksize=None, buf=None):
+        '''Similar to :meth:`block_loop`, but the shells which are negligible
+        on all grids of a block are dropped from the AO array.  It yields
+        ao, ao_idx, mask, weight, coords, where ao only holds the AO
+        functions ao_idx (see :func:`eval_ao_sparse`).
+        '''
+        return self._block_loop(mol, grids, nao, deriv, max_memory,
+                                non0tab, blksize, buf, True)
+
+    def _block_loop(self, mol, grids, nao, deriv=0, max_memory=2000,
+                    non0tab=None, blksize=None, buf=None, sparse=False):
         if grids.coords is None:
             grids.build(with_non0tab=True)
         ngrids = grids.coords.shape[0]
         comp = (deriv+1)*(deriv+2)*(deriv+3)//6
-# NOTE to index grids.non0tab, the blksize needs to be the integer multiplier of BLKSIZE
-        if blksize is None:
-            blksize = int(max_memory*1e6/(comp*2*nao*8*BLKSIZE))*BLKSIZE
-            blksize = max(BLKSIZE, min(blksize, ngrids, BLKSIZE*1200))
+
+        cache = None
+        if getattr(self, 'cache_ao', False):
+            key = _ao_cache_key(mol, grids, deriv, non0tab, sparse)
+            caches = self._ao_caches
+            cache = caches.pop(key, None)
+            if cache is not None:
+                # Keep the block partition of the cached AO values unless
+                # another blksize is explicitly requested
+                if blksize is None:
+                    blksize = cache.blksize
+                elif blksize != cache.blksize:
+                    cache.close()
+                    cache = None
+            if cache is not None:
+                caches[key] = cache  # most recently used
+
         if non0tab is None:
             non0tab = grids.non0tab
         if non0tab is None:
             non0tab = numpy.ones(((ngrids+BLKSIZE-1)//BLKSIZE,mol.nbas),
                                  dtype=numpy.uint8)
+
+# NOTE to index grids.non0tab, the blksize needs to be the integer multiplier of BLKSIZE
+        if blksize is None:
+            blksize = int(max_memory*1e6/(comp*2*nao*8*BLKSIZE))*BLKSIZE
+            blksize = max(BLKSIZE, min(blksize, ngrids, BLKSIZE*1200))
         if buf is None:
             buf = numpy.empty((comp,blksize,nao))
+        if getattr(self, 'cache_ao', False) and cache is None:
+            while caches and len(caches) >= max(1, self.cache_ao_nslots):
+                caches.popitem(last=False)[1].close()
+            mem_used = sum(c.mem_bytes for c in caches.values()) * 1e-6
+            cache = caches[key] = _AOCache(key, blksize,
+                                           self.cache_ao_max_memory - mem_used)
+
         for ip0 in range(0, ngrids, blksize):
             ip1 = min(ngrids, ip0+blksize)
             coords = grids.coords[ip0:ip1]
             weight = grids.weights[ip0:ip1]
             non0 = non0tab[ip0//BLKSIZE:]
-            ao = self.eval_ao(mol, coords, deriv=deriv, non0tab=non0, out=buf)
-            yield ao, non0, weight, coords
+            ao = ao_idx = None
+            if cache is not None:
+                ao = cache.get(ip0, buf)
+            if ao is None:
+                if sparse:
+                    ao, ao_idx = eval_ao_sparse(mol, coords, deriv, non0, buf)
+                else:
+                    ao = self.eval_ao(mol, coords, deriv=deriv, non0tab=non0, out=buf)
+                if cache is not None:
+                    cache.put(ip0, ao)
+            elif sparse:
+                ao_idx = _shls_to_ao_idx(_sparse_ao_shls(non0, ip1-ip0),
+                                         mol.ao_loc_nr())
+            yield ao, ao_idx, non0, weight, coords
+
+        if cache is not None:
+            logger.debug(mol, 'AO cache: hit rate %.3f, memory %.2f MB, disk %.2f MB',
+                         cache.hit_rate, cache.mem_bytes/1e6, cache.disk_bytes/1e6)
+
+    def ao_cache_info(self):
+        '''Statistics of the AO values cache of block_loop'''
+        caches = self._ao_caches.values()
+        hits = sum(c.hits for c in caches)
+        misses = sum(c.misses for c in caches)
+        return {'hits': hits, 'misses': misses,
+                'hit_rate': hits / max(1, hits + misses),
+                'entries': len(caches),
+                'mem_bytes': sum(c.mem_bytes for c in caches),
+                'disk_bytes': sum(c.disk_bytes for c in caches)}
+
+    def reset_ao_cache(self):
+        '''Release the AO values cached by block_loop'''
+        for cache in self._ao_caches.values():
+            cache.close()
+        self._ao_caches.clear()
+        return self
 
     def _gen_rho_evaluator(self, mol, dms, hermi=0):
         if getattr(dms, 'mo_coeff', None) is not None:
@@ -1936,9 +2489,12 @@ class NumInt(object):
                 mo_occ = [mo_occ]
             nao = mo_coeff[0].shape[0]
             ndms = len(mo_occ)
-            def make_rho(idm, ao, non0tab, xctype):
+            def make_rho(idm, ao, non0tab, xctype, ao_idx=None):
+                if ao_idx is None:
+                    return self.eval_rho2(mol, ao, mo_coeff[idm], mo_occ[idm],
+                                          non0tab, xctype)
                 return self.eval_rho2(mol, ao, mo_coeff[idm], mo_occ[idm],
-                                      non0tab, xctype)
+                                      non0tab, xctype, ao_idx=ao_idx)
         else:
             if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
                 dms = [dms]
@@ -1947,8 +2503,33 @@ class NumInt(object):
                 dms = [(dm+dm.conj().T)*.5 for dm in dms]
             nao = dms[0].shape[0]
             ndms = len(dms)
-            def make_rho(idm, ao, non0tab, xctype):
-                return self.eval_rho(mol, ao, dms[idm], non0tab, xctype, hermi=1)
+            def make_rho(idm, ao, non0tab, xctype, ao_idx=None):
+                if ao_idx is None:
+                    return self.eval_rho(mol, ao, dms[idm], non0tab, xctype, hermi=1)
+                return self.eval_rho(mol, ao, dms[idm], non0tab, xctype, hermi=1,
+                                     ao_idx=ao_idx)
+        return make_rho, ndms, nao
+
+    def _gen_rho_batch_evaluator(self, mol, dms, hermi=0):
+        '''Similar to :meth:`_gen_rho_evaluator`.  The returned function
+        make_rho(ao, non0tab, xctype, ao_idx=None) evaluates the densities of
+        all density matrices on the given AO values in one call.
+        '''
+        if getattr(dms, 'mo_coeff', None) is not None:
+            make_rho1, ndms, nao = self._gen_rho_evaluator(mol, dms, hermi)
+            def make_rho(ao, non0tab, xctype, ao_idx=None):
+                return numpy.asarray([make_rho1(i, ao, non0tab, xctype, ao_idx)
+                                      for i in range(ndms)])
+        else:
+            if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
+                dms = [dms]
+            if not hermi:
+                dms = [(dm+dm.conj().T)*.5 for dm in dms]
+            nao = dms[0].shape[0]
+            ndms = len(dms)
+            def make_rho(ao, non0tab, xctype, ao_idx=None):
+                return self.eval_rho_batch(mol, ao, dms, non0tab, xctype, hermi=1,
+                                           ao_idx=ao_idx)
         return make_rho, ndms, nao
 
 ####################
@@ -87,7 +87,10 @@ def get_veff(ks, mol=None, dm=None, dm_last=0, vhf_last=0, hermi=1):
         n, exc, vxc = 0, 0, 0
     else:
         max_memory = ks.max_memory - lib.current_memory()[0]
-        n, exc, vxc = ni.nr_rks(mol, ks.grids, ks.xc, dm, max_memory=max_memory)
+        if getattr(ks, 'incremental_xc_tol', 0) > 0 and ground_state:
+            n, exc, vxc = _get_vxc_incremental(ks, mol, dm, dm_last, max_memory)
+        else:
+            n, exc, vxc = ni.nr_rks(mol, ks.grids, ks.xc, dm, max_memory=max_memory)
         if ks.nlc != '':
             assert('VV10' in ks.nlc.upper())
             _, enlc, vnlc = ni.nr_rks(mol, ks.nlcgrids, ks.xc+'__'+ks.nlc, dm,
@@ -142,6 +145,25 @@ def get_veff(ks, mol=None, dm=None, dm_last=0, vhf_last=0, hermi=1):
     vxc = lib.tag_array(vxc, ecoul=ecoul, exc=exc, vj=vj, vk=vk)
     return vxc
 
+def _get_vxc_incremental(ks, mol, dm, dm_last, max_memory):
+    '''XC potential of the incremental mode (see numint.nr_rks_incremental).
+    A full rebuild is made for every ks.incremental_xc_rebuild cycles and
+    whenever get_veff is called without dm_last.
+    '''
+    xc_cache = ks._xc_cache
+    ncycle = xc_cache.get('ncycle', 0)
+    if (isinstance(dm_last, numpy.ndarray) and
+        ncycle % max(1, ks.incremental_xc_rebuild) != 0):
+        tol = ks.incremental_xc_tol
+    else:
+        tol = 0
+    n, exc, vxc = ks._numint.nr_rks_incremental(mol, ks.grids, ks.xc, dm,
+                                                xc_cache, tol,
+                                                max_memory=max_memory,
+                                                verbose=ks.verbose)
+    xc_cache['ncycle'] = ncycle + 1
+    return n, exc, vxc
+
 # The vhfopt of standard Coulomb operator can be used here as an approximate
 # opt since long-range part Coulomb is always smaller than standard Coulomb.
 # It's safe to prescreen LR integrals with the integral estimation from
@@ -232,11 +254,16 @@ def _dft_common_init_(mf):
                                 mf.nlcgrids.level)
     # Use rho to filter grids
     mf.small_rho_cutoff = getattr(__config__, 'dft_rks_RKS_small_rho_cutoff', 1e-7)
+    # Screened incremental XC build in SCF iterations (RKS only).  0 to disable
+    mf.incremental_xc_tol = getattr(__config__, 'dft_rks_RKS_incremental_xc_tol', 0)
+    mf.incremental_xc_rebuild = getattr(__config__, 'dft_rks_RKS_incremental_xc_rebuild', 8)
 ##################################################
 # don't modify the following attributes, they are not input options
     mf._numint = numint.NumInt()
+    mf._xc_cache = {}
     mf._keys = mf._keys.union(['xc', 'nlc', 'omega', 'grids', 'nlcgrids',
-                               'small_rho_cutoff'])
+                               'small_rho_cutoff', 'incremental_xc_tol',
+                               'incremental_xc_rebuild'])
 
 class KohnShamDFT(object):
     '''
@@ -286,6 +313,15 @@ class KohnShamDFT(object):
             Drop grids if their contribution to total electrons smaller than
             this cutoff value.  Default is 1e-7.
 
+        incremental_xc_tol : float
+            If > 0, SCF iterations of RKS only recompute the XC contributions
+            of the grid blocks in which the (bound of the) accumulated density
+            change exceeds this value.  Default is 0 (disabled).
+
+        incremental_xc_rebuild : int
+            Full rebuild of the XC potential every N SCF cycles in the
+            incremental mode.  Default is 8.
+
     Examples:
 
     >>> mol = gto.M(atom='O 0 0 0; H 0 0 1; H 0 1 0', basis='ccpvdz', verbose=0)
@@ -309,6 +345,9 @@ class KohnShamDFT(object):
         if self.nlc!='':
             logger.info(self, 'NLC functional = %s', self.nlc)
         logger.info(self, 'small_rho_cutoff = %g', self.small_rho_cutoff)
+        if self.incremental_xc_tol > 0:
+            logger.info(self, 'incremental_xc_tol = %g  rebuild every %d cycles',
+                        self.incremental_xc_tol, self.incremental_xc_rebuild)
         self.grids.dump_flags(verbose)
         if self.nlc!='':
             logger.info(self, '** Following is NLC Grids **')
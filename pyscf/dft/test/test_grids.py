@@ -68,6 +68,80 @@ class KnownValues(unittest.TestCase):
         grid.build(with_non0tab=False)
         self.assertAlmostEqual(numpy.linalg.norm(grid.weights), 1712.3069450297105, 8)
 
+    def test_becke_screening(self):
+        mol = gto.M(atom='''
+            C    0.000  0.000  0.000
+            C    1.540  0.000  0.000
+            C    2.053  1.452  0.000
+            C    3.593  1.452  0.000
+            H   -0.363 -1.028  0.000
+            H   -0.363  0.514  0.890
+            H    1.903 -0.514 -0.890
+            H    3.956  2.480  0.000
+            H    1.690  1.966  0.890
+            H    3.956  0.938 -0.890''', basis='sto3g', verbose=0)
+        grid = gen_grid.Grids(mol)
+        grid.atom_grid = (30, 110)
+        w0 = grid.build(with_non0tab=False).weights
+
+        grid.becke_screen_tol = 1e-14
+        self.assertTrue(grid.weights is None)
+        grid.build(with_non0tab=False)
+        self.assertAlmostEqual(abs(grid.weights - w0).max(), 0, 9)
+
+        grid.radii_adjust = None
+        grid.becke_screen_tol = 0
+        w0 = grid.build(with_non0tab=False).weights
+        grid.becke_screen_tol = 1e-14
+        grid.build(with_non0tab=False)
+        self.assertAlmostEqual(abs(grid.weights - w0).max(), 0, 9)
+
+    def test_grids_cache(self):
+        import os, shutil, tempfile
+        cache_dir = tempfile.mkdtemp()
+        try:
+            grid = gen_grid.Grids(h2o)
+            grid.atom_grid = {"H": (10, 50), "O": (10, 50),}
+            grid.cache_dir = cache_dir
+            grid.build(with_non0tab=True)
+            coords, weights, non0tab = grid.coords, grid.weights, grid.non0tab
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            g1 = gen_grid.Grids(h2o)
+            g1.atom_grid = {"H": (10, 50), "O": (10, 50),}
+            g1.cache_dir = cache_dir
+            g1.build(with_non0tab=True)
+            self.assertTrue(isinstance(g1.weights, numpy.memmap))
+            self.assertAlmostEqual(abs(g1.coords - coords).max(), 0, 14)
+            self.assertAlmostEqual(abs(g1.weights - weights).max(), 0, 14)
+            self.assertTrue(numpy.all(g1.non0tab == non0tab))
+
+            g1.atom_grid = {"H": (10, 50), "O": (10, 86),}
+            g1.build()
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+            self.assertTrue(g1.weights.size != weights.size)
+
+            # Anonymous functions are distinguished by their code
+            g1.radii_adjust = lambda mol, atomic_radii: None
+            key1 = gen_grid.grids_cache_key(g1)
+            g1.radii_adjust = lambda mol, atomic_radii: radi.treutler_atomic_radii_adjust(mol, atomic_radii)
+            self.assertNotEqual(gen_grid.grids_cache_key(g1), key1)
+            g1.radii_adjust = lambda mol, atomic_radii: None
+            self.assertEqual(gen_grid.grids_cache_key(g1), key1)
+
+            class Grids1(gen_grid.Grids):
+                pass
+            g2 = Grids1(h2o)
+            g2.atom_grid = grid.atom_grid
+            self.assertNotEqual(gen_grid.grids_cache_key(g2),
+                                gen_grid.grids_cache_key(grid))
+
+            key = gen_grid.grids_cache_key(grid)
+            gen_grid._evict_grids_cache(cache_dir, 0, keep=key)
+            self.assertEqual(os.listdir(cache_dir), [key])
+        finally:
+            shutil.rmtree(cache_dir)
+
     def test_radi(self):
         grid = gen_grid.Grids(h2o)
         grid.prune = None
@@ -97,6 +97,27 @@ class KnownValues(unittest.TestCase):
         method.xc = 'b88, vwn'
         self.assertAlmostEqual(method.scf(), -76.690247578608236, 8)
 
+    def test_nr_b88vwn_incremental_xc(self):
+        method = dft.RKS(h2o)
+        method.grids.prune = dft.gen_grid.treutler_prune
+        method.grids.atom_grid = {"H": (50, 194), "O": (50, 194),}
+        method.xc = 'b88, vwn'
+        method.incremental_xc_tol = 1e-9
+        self.assertAlmostEqual(method.scf(), -76.690247578608236, 8)
+
+        ni = method._numint
+        grids = method.grids
+        dm = method.make_rdm1()
+        ref = ni.nr_rks(h2o, grids, method.xc, dm)
+        xc_cache = {}
+        v1 = ni.nr_rks_incremental(h2o, grids, method.xc, dm, xc_cache, tol=0)
+        for x, y in zip(v1, ref):
+            self.assertAlmostEqual(abs(x - y).max(), 0, 9)
+        # Small changes of the density are screened off by a loose tolerance
+        v2 = ni.nr_rks_incremental(h2o, grids, method.xc, dm*(1+1e-9),
+                                   xc_cache, tol=1e-2)
+        self.assertAlmostEqual(abs(v2[2] - v1[2]).max(), 0, 12)
+
     def test_nr_xlyp(self):
         method = dft.RKS(h2o)
         method.grids.prune = dft.gen_grid.treutler_prune
@@ -149,6 +149,22 @@ class KnownValues(unittest.TestCase):
         self.assertTrue(numpy.allclose(rho0, rho1))
         self.assertTrue(numpy.allclose(rho0, rho2))
 
+    def test_eval_rho_batch(self):
+        numpy.random.seed(10)
+        ngrids = 500
+        coords = numpy.random.random((ngrids,3))*20
+        dms = numpy.random.random((3,nao,nao))
+        ao = dft.numint.eval_ao(mol, coords, deriv=1)
+        ni = dft.numint.NumInt()
+        rho = ni.eval_rho_batch(mol, ao, dms, xctype='GGA')
+        self.assertEqual(rho.shape, (3,4,ngrids))
+        for i, dm in enumerate(dms):
+            ref = ni.eval_rho(mol, ao, dm, xctype='GGA')
+            self.assertAlmostEqual(abs(rho[i] - ref).max(), 0, 9)
+        rho = ni.eval_rho_batch(mol, ao[0], dms, xctype='LDA')
+        ref = ni.eval_rho(mol, ao[0], dms[2], xctype='LDA')
+        self.assertAlmostEqual(abs(rho[2] - ref).max(), 0, 9)
+
     def test_eval_mat(self):
         numpy.random.seed(10)
         ngrids = 500
@@ -266,6 +282,137 @@ class KnownValues(unittest.TestCase):
         v = ni.nr_fxc(mol1, mf.grids, '', dm0, dms, spin=0, hermi=0)
         self.assertAlmostEqual(abs(v).max(), 0, 9)
 
+    def test_fxc_batch(self):
+        numpy.random.seed(12)
+        nao = mol1.nao_nr()
+        dm0 = numpy.random.random((nao,nao))
+        dm0 = dm0 + dm0.T
+        dms = numpy.random.random((5,nao,nao))
+        ni = dft.numint.NumInt()
+        dft.numint.SWITCH_SIZE = 800
+        try:
+            for xc in ('LDA,', 'B88,'):
+                v = ni.nr_fxc(mol1, mf.grids, xc, dm0, dms, spin=0)
+                for i, dm in enumerate(dms):
+                    v1 = ni.nr_fxc(mol1, mf.grids, xc, dm0, dm, spin=0)
+                    self.assertAlmostEqual(abs(v[i]-v1).max(), 0, 9)
+
+                v = ni.nr_fxc(mol1, mf.grids, xc, (dm0,dm0),
+                              dms[:4].reshape(2,2,nao,nao), spin=1)
+                v1 = ni.nr_fxc(mol1, mf.grids, xc, (dm0,dm0), dms[[1,3]], spin=1)
+                self.assertAlmostEqual(abs(v[:,1]-v1).max(), 0, 9)
+
+                n, e, v = ni.nr_vxc(mol1, mf.grids, xc, dms, spin=0, hermi=0)
+                n1, e1, v1 = ni.nr_vxc(mol1, mf.grids, xc, dms[3], spin=0, hermi=0)
+                self.assertAlmostEqual(abs(e[3]-e1).max(), 0, 9)
+                self.assertAlmostEqual(abs(v[3]-v1).max(), 0, 9)
+        finally:
+            dft.numint.SWITCH_SIZE = 0
+
+    def test_block_loop_ao_cache(self):
+        numpy.random.seed(1)
+        nao = h2o.nao_nr()
+        dm = numpy.random.random((nao,nao))
+        dm = dm + dm.T
+        grids = dft.gen_grid.Grids(h2o)
+        grids.atom_grid = {"H": (20, 110), "O": (20, 110),}
+        ni = dft.numint.NumInt()
+        ref = ni.nr_vxc(h2o, grids, 'b88,', dm)
+
+        ni.cache_ao = True
+        for max_memory in (4000, 0):
+            ni.cache_ao_max_memory = max_memory
+            ni.reset_ao_cache()
+            for i in range(2):
+                n, e, v = ni.nr_vxc(h2o, grids, 'b88,', dm)
+                self.assertAlmostEqual(abs(e - ref[1]).max(), 0, 12)
+                self.assertAlmostEqual(abs(v - ref[2]).max(), 0, 12)
+            info = ni.ao_cache_info()
+            self.assertAlmostEqual(info['hit_rate'], .5, 12)
+            if max_memory == 0:
+                self.assertEqual(info['mem_bytes'], 0)
+                self.assertTrue(info['disk_bytes'] > 0)
+            else:
+                self.assertEqual(info['disk_bytes'], 0)
+        ni.reset_ao_cache()
+
+    def test_block_loop_ao_cache_slots(self):
+        numpy.random.seed(1)
+        nao = h2o.nao_nr()
+        dm = numpy.random.random((nao,nao))
+        dm = dm + dm.T
+        grids = dft.gen_grid.Grids(h2o)
+        grids.atom_grid = {"H": (20, 110), "O": (20, 110),}
+        grids1 = dft.gen_grid.Grids(h2o)
+        grids1.atom_grid = {"H": (10, 50), "O": (10, 50),}
+        ni = dft.numint.NumInt()
+        ref = ni.nr_vxc(h2o, grids, 'b88,', dm)[2]
+        ref1 = ni.nr_vxc(h2o, grids1, 'lda,', dm)[2]
+
+        ni.cache_ao = True
+        ni.cache_ao_nslots = 2
+        for i in range(2):
+            # Alternating grids and derivative orders share the cache slots
+            v = ni.nr_vxc(h2o, grids, 'b88,', dm)[2]
+            self.assertAlmostEqual(abs(v - ref).max(), 0, 12)
+            v = ni.nr_vxc(h2o, grids1, 'lda,', dm)[2]
+            self.assertAlmostEqual(abs(v - ref1).max(), 0, 12)
+        info = ni.ao_cache_info()
+        self.assertEqual(info['entries'], 2)
+        self.assertAlmostEqual(info['hit_rate'], .5, 12)
+
+        # grids.build() invalidates the cached AO values
+        grids.atom_grid = {"H": (20, 50), "O": (20, 50),}
+        grids.build()
+        ref = dft.numint.NumInt().nr_vxc(h2o, grids, 'b88,', dm)[2]
+        v = ni.nr_vxc(h2o, grids, 'b88,', dm)[2]
+        self.assertAlmostEqual(abs(v - ref).max(), 0, 12)
+        self.assertEqual(ni.ao_cache_info()['entries'], 2)
+        ni.reset_ao_cache()
+
+    def test_sparse_ao(self):
+        numpy.random.seed(2)
+        coords = mf.grids.coords[:1000]
+        non0tab = dft.numint.make_mask(mol, coords)
+        ao = dft.numint.eval_ao(mol, coords, deriv=1, non0tab=non0tab)
+        ao1, ao_idx = dft.numint.eval_ao_sparse(mol, coords, deriv=1, non0tab=non0tab)
+        self.assertTrue(ao_idx.size < nao)
+        self.assertAlmostEqual(abs(ao1 - ao[:,:,ao_idx]).max(), 0, 12)
+        mask = numpy.ones(nao, dtype=bool)
+        mask[ao_idx] = False
+        self.assertAlmostEqual(abs(ao[:,:,mask]).max(), 0, 12)
+
+        dm = numpy.random.random((nao,nao))
+        dm = dm + dm.T
+        rho = dft.numint.eval_rho(mol, ao, dm, non0tab, xctype='GGA')
+        rho1 = dft.numint.eval_rho(mol, ao1, dm, non0tab, xctype='GGA', ao_idx=ao_idx)
+        self.assertAlmostEqual(abs(rho1 - rho).max(), 0, 9)
+
+        weight = numpy.random.random(1000)
+        vxc = (numpy.random.random(1000), numpy.random.random(1000))
+        mat = dft.numint.eval_mat(mol, ao, weight, rho, vxc, non0tab, 'GGA')
+        mat1 = dft.numint.eval_mat(mol, ao1, weight, rho, vxc, non0tab, 'GGA',
+                                   ao_idx=ao_idx)
+        self.assertEqual(mat1.shape, (ao_idx.size, ao_idx.size))
+        mat2 = numpy.zeros((nao,nao))
+        dft.numint._add_ao_mat(mat2, mat1, ao_idx)
+        self.assertAlmostEqual(abs(mat2 - mat).max(), 0, 9)
+
+        grids = dft.gen_grid.Grids(mol)
+        grids.atom_grid = {"H": (20, 50)}
+        grids.build(with_non0tab=True)
+        ni = dft.numint.NumInt()
+        for xc in ('lda,', 'b88,'):
+            ref = ni.nr_vxc(mol, grids, xc, dm)
+            ni.sparse_ao = True
+            n, e, v = ni.nr_vxc(mol, grids, xc, dm)
+            self.assertAlmostEqual(abs(e - ref[1]).max(), 0, 9)
+            self.assertAlmostEqual(abs(v - ref[2]).max(), 0, 9)
+            n, e, v = ni.nr_vxc(mol, grids, xc, (dm*.5,dm*.5), spin=1)
+            self.assertAlmostEqual(abs(e - ref[1]).max(), 0, 9)
+            self.assertAlmostEqual(abs(v[0] - ref[2]).max(), 0, 9)
+            ni.sparse_ao = False
+
     def test_rks_fxc_st(self):
         numpy.random.seed(10)
         nao = mol1.nao_nr()
@@ -16,14 +16,30 @@
 # Author: Qiming Sun <osirpt.sun@gmail.com>
 #
 
+import os
 import sys
 import ctypes
 import math
+import tempfile
+import threading
+import collections
 import numpy
 from pyscf import lib
+from pyscf import __config__
 
 libfci = lib.load_library('libfci')
 
+# The strings and the link tables of the full orbital space (orb_list =
+# range(norb)) are cached in memory up to LINKSTR_CACHE_MAX_MEMORY (MB), the
+# least recently used ones being dropped first.  The public functions
+# (make_strings, gen_linkstr_index, ...) return copies of the cached arrays.
+# The FCI solvers use the read-only cached arrays directly.  If LINKSTR_CACHE_DIR is
+# set, the tables are saved in this directory and loaded as memory-mapped
+# read-only arrays, so that they are shared by all processes using the same
+# directory.
+LINKSTR_CACHE_MAX_MEMORY = getattr(__config__, 'fci_cistring_linkstr_cache_max_memory', 50)
+LINKSTR_CACHE_DIR = getattr(__config__, 'fci_cistring_linkstr_cache_dir', None)
+
 def make_strings(orb_list, nelec):
     '''Generate string from the given orbital list.
 
@@ -44,6 +60,12 @@ def make_strings(orb_list, nelec):
     if len(orb_list) > 63:
         return _gen_occslst(orb_list, nelec)
 
+    if _is_full_space(orb_list):
+        return numpy.array(_make_strings_cached(len(orb_list), nelec))
+    return _make_strings(orb_list, nelec)
+gen_strings4orblist = make_strings
+
+def _make_strings(orb_list, nelec):
     assert(nelec >= 0)
     if nelec == 0:
         return numpy.asarray([0], dtype=numpy.int64)
@@ -67,7 +89,6 @@ def make_strings(orb_list, nelec):
     strings = gen_str_iter(orb_list, nelec)
     assert(strings.__len__() == num_strings(len(orb_list),nelec))
     return numpy.asarray(strings, dtype=numpy.int64)
-gen_strings4orblist = make_strings
 
 def _gen_occslst(orb_list, nelec):
     '''Generate occupied orbital list for each string.
@@ -203,8 +224,14 @@ def gen_linkstr_index(orb_list, nocc, strs=None, tril=False):
     excitations, which do not change the string. The next nocc*nvir rows
     [a(:vir),i(:occ),str1,sign] are occupied-virtual exciations, starting from
     str0, annihilating i, creating a, to get str1.
+
+    The tables of the full orbital space are cached (see
+    :func:`linkstr_cache_info`).
     '''
     if strs is None:
+        orb_list = list(orb_list)
+        if len(orb_list) <= 63 and _is_full_space(orb_list):
+            return numpy.array(_gen_linkstr_index_cached(len(orb_list), nocc, tril))
         strs = make_strings(orb_list, nocc)
 
     if isinstance(strs, OIndexList):
@@ -223,6 +250,129 @@ def gen_linkstr_index(orb_list, nocc, strs=None, tril=False):
                             ctypes.c_int(tril))
     return link_index
 
+def _is_full_space(orb_list):
+    return all(i == k for k, i in enumerate(orb_list))
+
+class _LinkstrCache(object):
+    '''LRU cache of the strings and link tables, optionally backed by .npy
+    files in LINKSTR_CACHE_DIR'''
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.mem_bytes = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                val = self._data.pop(key)
+                self._data[key] = val  # most recently used
+                return val
+
+        cache_dir = LINKSTR_CACHE_DIR
+        filename = None
+        val = None
+        if cache_dir:
+            filename = os.path.join(cache_dir, '-'.join([str(x) for x in key]) + '.npy')
+            if os.path.isfile(filename):
+                try:
+                    val = numpy.load(filename, mmap_mode='r')
+                except (IOError, ValueError):
+                    val = None
+        if val is None:
+            val = build()
+            if filename is not None:
+                self._save(filename, val)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+                self.disk_hits += 1
+        val.flags.writeable = False
+        self._put(key, val)
+        return val
+
+    def _save(self, filename, val):
+        try:
+            cache_dir = os.path.dirname(filename)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            # Write to a temporary file then rename it so that other
+            # processes never see a partial file
+            fd, tmpname = tempfile.mkstemp(suffix='.npy', dir=cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                numpy.save(f, val)
+            os.rename(tmpname, filename)
+        except (IOError, OSError):
+            pass
+
+    def _put(self, key, val):
+        # memory-mapped arrays are held by the page cache
+        nbytes = 0 if isinstance(val, numpy.memmap) else val.nbytes
+        max_bytes = LINKSTR_CACHE_MAX_MEMORY * 1e6
+        if nbytes > max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                return
+            self._data[key] = val
+            self.mem_bytes += nbytes
+            while self.mem_bytes > max_bytes:
+                old = self._data.popitem(last=False)[1]
+                if not isinstance(old, numpy.memmap):
+                    self.mem_bytes -= old.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.disk_hits = self.mem_bytes = 0
+
+_linkstr_cache = _LinkstrCache()
+
+def _make_strings_cached(norb, nelec):
+    '''make_strings(range(norb), nelec) from the cache.  The returned array
+    is read-only.'''
+    return _linkstr_cache.get(('strs', norb, nelec),
+                              lambda: _make_strings(range(norb), nelec))
+
+def _gen_linkstr_index_cached(norb, nocc, tril=False):
+    '''gen_linkstr_index(range(norb), nocc, tril=tril) from the cache.  The
+    returned array is read-only.'''
+    if norb > 63:
+        return gen_linkstr_index(range(norb), nocc, tril=tril)
+    tril = bool(tril)
+    def build():
+        strs = _make_strings_cached(norb, nocc)
+        return gen_linkstr_index(range(norb), nocc, strs, tril)
+    return _linkstr_cache.get(('link', norb, nocc, tril), build)
+
+def _gen_linkstr_packed_cached(norb, nocc):
+    '''gen_linkstr_index_packed(range(norb), nocc) from the cache.  The
+    returned array is read-only.'''
+    if norb > 63:
+        return gen_linkstr_index_packed(range(norb), nocc)
+    def build():
+        strs = _make_strings_cached(norb, nocc)
+        return gen_linkstr_index_packed(range(norb), nocc, strs)
+    return _linkstr_cache.get(('packed', norb, nocc), build)
+
+def linkstr_cache_info():
+    '''Statistics of the cache of :func:`make_strings` and
+    :func:`gen_linkstr_index`'''
+    cache = _linkstr_cache
+    return {'hits': cache.hits, 'misses': cache.misses,
+            'disk_hits': cache.disk_hits,
+            'hit_rate': cache.hits / max(1., cache.hits + cache.misses),
+            'entries': len(cache._data), 'mem_bytes': cache.mem_bytes}
+
+def clear_linkstr_cache():
+    '''Release the strings and link tables cached in memory'''
+    _linkstr_cache.clear()
+
 def reform_linkstr_index(link_index):
     '''Compress the (a, i) pair index in linkstr_index to a lower triangular
     index. The compressed indices can match the 4-fold symmetry of integrals.
@@ -249,6 +399,65 @@ def gen_linkstr_index_trilidx(orb_list, nocc, strs=None):
     '''
     return gen_linkstr_index(orb_list, nocc, strs, True)
 
+# The packed link table, one record [addr, tril(cre,des), sign] of 8 bytes
+# per entry.  It is the layout of _LinkTrilT in lib/mcscf/fci.h
+LINKSTR_PACKED_DTYPE = numpy.dtype([('addr', numpy.uint32), ('ia', numpy.uint16),
+                                    ('sign', numpy.int8), ('_padding', numpy.int8)])
+
+def gen_linkstr_index_packed(orb_list, nocc, strs=None):
+    '''Same to :func:`gen_linkstr_index_trilidx` but the table is stored in
+    the packed records of LINKSTR_PACKED_DTYPE (8 bytes per entry, vs. 16 bytes
+    of the int32 table).  The packed table has the shape (nstr, nlink).  It
+    can be passed to direct_spin0/direct_spin1.contract_2e without conversion.
+    '''
+    if strs is None:
+        orb_list = list(orb_list)
+        if len(orb_list) <= 63 and _is_full_space(orb_list):
+            return numpy.array(_gen_linkstr_packed_cached(len(orb_list), nocc))
+        strs = make_strings(orb_list, nocc)
+
+    if isinstance(strs, OIndexList):
+        return pack_linkstr_index(gen_linkstr_index_o1(orb_list, nocc, strs, True))
+
+    strs = numpy.array(strs, dtype=numpy.int64)
+    assert(all(strs[:-1] < strs[1:]))
+    norb = len(orb_list)
+    nvir = norb - nocc
+    na = strs.shape[0]
+    link_index = numpy.empty((na,nocc*nvir+nocc), dtype=LINKSTR_PACKED_DTYPE)
+    libfci.FCIlinkstr_index_tril_packed(link_index.ctypes.data_as(ctypes.c_void_p),
+                                        ctypes.c_int(norb), ctypes.c_int(na),
+                                        ctypes.c_int(nocc),
+                                        strs.ctypes.data_as(ctypes.c_void_p))
+    return link_index
+
+def is_packed_linkstr_index(link_index):
+    return getattr(link_index, 'dtype', None) == LINKSTR_PACKED_DTYPE
+
+def pack_linkstr_index(link_index):
+    '''Convert the link table of :func:`gen_linkstr_index_trilidx` to the
+    packed table of :func:`gen_linkstr_index_packed`'''
+    if is_packed_linkstr_index(link_index):
+        return link_index
+    link_index = numpy.asarray(link_index)
+    clink = numpy.empty(link_index.shape[:2], dtype=LINKSTR_PACKED_DTYPE)
+    clink['addr'] = link_index[:,:,2]
+    clink['ia'] = link_index[:,:,0]
+    clink['sign'] = link_index[:,:,3]
+    clink['_padding'] = 0
+    return clink
+
+def unpack_linkstr_index(link_index):
+    '''Convert the packed table to the int32 table [tril(cre,des), 0, str1, sign]
+    of :func:`gen_linkstr_index_trilidx`'''
+    if not is_packed_linkstr_index(link_index):
+        return link_index
+    out = numpy.zeros(link_index.shape+(4,), dtype=numpy.int32)
+    out[:,:,0] = link_index['ia']
+    out[:,:,2] = link_index['addr']
+    out[:,:,3] = link_index['sign']
+    return out
+
 # return [cre, des, target_address, parity]
 def gen_cre_str_index_o0(orb_list, nelec):
     '''Slow version of gen_cre_str_index function'''
@@ -158,8 +158,8 @@ class FCISolver(direct_spin1.FCISolver):
             neleca = nelec - nelecb
         else:
             neleca, nelecb = nelec
-        link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
-        link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+        link_indexa = cistring._gen_linkstr_index_cached(norb, neleca)
+        link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb)
         e, c = direct_spin1.kernel_ms1(self, h1e, eri, norb, nelec, ci0,
                                        (link_indexa,link_indexb),
                                        tol, lindep, max_cycle, max_space, nroots,
@@ -199,8 +199,8 @@ def _unpack(norb, nelec, link_index):
             neleca = nelec - nelecb
         else:
             neleca, nelecb = nelec
-        link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
-        link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+        link_indexa = cistring._gen_linkstr_index_cached(norb, neleca)
+        link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb)
         return link_indexa, link_indexb
     else:
         return link_index
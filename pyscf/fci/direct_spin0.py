@@ -56,7 +56,7 @@ libfci = lib.load_library('libfci')
 @lib.with_doc(direct_spin1.contract_1e.__doc__)
 def contract_1e(f1e, fcivec, norb, nelec, link_index=None):
     fcivec = numpy.asarray(fcivec, order='C')
-    link_index = _unpack(norb, nelec, link_index)
+    link_index = cistring.unpack_linkstr_index(_unpack(norb, nelec, link_index))
     na, nlink = link_index.shape[:2]
     assert(fcivec.size == na**2)
     ci1 = numpy.empty_like(fcivec)
@@ -85,17 +85,17 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
     eri = ao2mo.restore(4, eri, norb)
     lib.transpose_sum(eri, inplace=True)
     eri *= .5
-    link_index = _unpack(norb, nelec, link_index)
+    link_index = _unpack_packed(norb, nelec, link_index)
     na, nlink = link_index.shape[:2]
     assert(fcivec.size == na**2)
     ci1 = numpy.empty((na,na))
 
-    libfci.FCIcontract_2e_spin0(eri.ctypes.data_as(ctypes.c_void_p),
-                                fcivec.ctypes.data_as(ctypes.c_void_p),
-                                ci1.ctypes.data_as(ctypes.c_void_p),
-                                ctypes.c_int(norb), ctypes.c_int(na),
-                                ctypes.c_int(nlink),
-                                link_index.ctypes.data_as(ctypes.c_void_p))
+    libfci.FCIcontract_2e_spin0_packed(eri.ctypes.data_as(ctypes.c_void_p),
+                                       fcivec.ctypes.data_as(ctypes.c_void_p),
+                                       ci1.ctypes.data_as(ctypes.c_void_p),
+                                       ctypes.c_int(norb), ctypes.c_int(na),
+                                       ctypes.c_int(nlink),
+                                       link_index.ctypes.data_as(ctypes.c_void_p))
 # no *.5 because FCIcontract_2e_spin0 only compute half of the contraction
     return lib.transpose_sum(ci1, inplace=True).reshape(fcivec.shape)
 
@@ -158,7 +158,7 @@ def trans_rdm1s(cibra, ciket, norb, nelec, link_index=None):
         else:
             neleca, nelecb = nelec
             assert(neleca == nelecb)
-        link_index = cistring.gen_linkstr_index(range(norb), neleca)
+        link_index = cistring._gen_linkstr_index_cached(norb, neleca)
     rdm1a = rdm.make_rdm1('FCItrans_rdm1a', cibra, ciket,
                           norb, nelec, link_index)
     rdm1b = rdm.make_rdm1('FCItrans_rdm1b', cibra, ciket,
@@ -236,6 +236,10 @@ def kernel_ms0(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
     assert(fci.spin is None or fci.spin == 0)
     assert(0 <= numpy.sum(nelec) <= norb*2)
 
+    if (link_index is None and
+        getattr(fci.contract_2e, '__func__', None) is FCISolver.contract_2e):
+        # contract_2e of FCISolver takes the packed link table
+        link_index = _unpack_packed(norb, nelec)
     link_index = _unpack(norb, nelec, link_index)
     h1e = numpy.ascontiguousarray(h1e)
     eri = numpy.ascontiguousarray(eri)
@@ -401,10 +405,13 @@ class FCISolver(direct_spin1.FCISolver):
         else:
             neleca, nelecb = nelec
             assert(neleca == nelecb)
-        if tril:
-            link_index = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
+        # The read-only tables of the cache
+        if (tril and
+            getattr(self.contract_2e, '__func__', None) is FCISolver.contract_2e):
+            # contract_2e of FCISolver takes the packed link table
+            link_index = cistring._gen_linkstr_packed_cached(norb, neleca)
         else:
-            link_index = cistring.gen_linkstr_index(range(norb), neleca)
+            link_index = cistring._gen_linkstr_index_cached(norb, neleca, tril)
         return link_index
 
 FCI = FCISolver
@@ -417,10 +424,21 @@ def _unpack(norb, nelec, link_index):
         else:
             neleca, nelecb = nelec
             assert(neleca == nelecb)
-        return cistring.gen_linkstr_index_trilidx(range(norb), neleca)
+        return cistring._gen_linkstr_index_cached(norb, neleca, True)
     else:
         return link_index
 
+def _unpack_packed(norb, nelec, link_index=None):
+    if link_index is None:
+        if isinstance(nelec, (int, numpy.number)):
+            neleca = nelec//2
+        else:
+            neleca, nelecb = nelec
+            assert(neleca == nelecb)
+        return cistring._gen_linkstr_packed_cached(norb, neleca)
+    else:
+        return numpy.asarray(cistring.pack_linkstr_index(link_index), order='C')
+
 
 if __name__ == '__main__':
     import time
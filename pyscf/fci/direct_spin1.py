@@ -55,12 +55,18 @@ from pyscf import __config__
 
 libfci = lib.load_library('libfci')
 
+# The number of beta strings processed in one batch by contract_2e
+STRB_BLKSIZE = getattr(__config__, 'fci_direct_spin1_strb_blksize', 112)
+BLKMIN = getattr(__config__, 'fci_direct_spin1_blkmin', 8)
+
 def contract_1e(f1e, fcivec, norb, nelec, link_index=None):
     '''Contract the 1-electron Hamiltonian with a FCI vector to get a new FCI
     vector.
     '''
     fcivec = numpy.asarray(fcivec, order='C')
     link_indexa, link_indexb = _unpack(norb, nelec, link_index)
+    link_indexa = cistring.unpack_linkstr_index(link_indexa)
+    link_indexb = cistring.unpack_linkstr_index(link_indexb)
     na, nlinka = link_indexa.shape[:2]
     nb, nlinkb = link_indexb.shape[:2]
     assert(fcivec.size == na*nb)
@@ -84,7 +90,8 @@ def contract_1e(f1e, fcivec, norb, nelec, link_index=None):
                             link_indexb.ctypes.data_as(ctypes.c_void_p))
     return ci1
 
-def contract_2e(eri, fcivec, norb, nelec, link_index=None):
+def contract_2e(eri, fcivec, norb, nelec, link_index=None, max_memory=None,
+                verbose=None):
     r'''Contract the 4-index tensor eri[pqrs] with a FCI vector
 
     .. math::
@@ -121,25 +128,99 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
         eri_{pq,rs} = (pq|rs) - (.5/Nelec) [\sum_q (pq|qs) + \sum_p (pq|rp)]
 
     See also :func:`direct_spin1.absorb_h1e`
+
+    The beta strings are processed in batches.  Each thread holds an
+    intermediate of size na*blksize.  If max_memory (in MB) is given and the
+    intermediates of STRB_BLKSIZE beta strings do not fit in max_memory, the
+    batch size is reduced.
+
+    link_index can be the int32 tables of :func:`cistring.gen_linkstr_index_trilidx`
+    or the packed tables of :func:`cistring.gen_linkstr_index_packed`.
     '''
     fcivec = numpy.asarray(fcivec, order='C')
     eri = ao2mo.restore(4, eri, norb)
-    link_indexa, link_indexb = _unpack(norb, nelec, link_index)
+    link_indexa, link_indexb = _unpack_packed(norb, nelec, link_index)
     na, nlinka = link_indexa.shape[:2]
     nb, nlinkb = link_indexb.shape[:2]
     assert(fcivec.size == na*nb)
     ci1 = numpy.empty_like(fcivec)
 
-    libfci.FCIcontract_2e_spin1(eri.ctypes.data_as(ctypes.c_void_p),
-                                fcivec.ctypes.data_as(ctypes.c_void_p),
-                                ci1.ctypes.data_as(ctypes.c_void_p),
-                                ctypes.c_int(norb),
-                                ctypes.c_int(na), ctypes.c_int(nb),
-                                ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
-                                link_indexa.ctypes.data_as(ctypes.c_void_p),
-                                link_indexb.ctypes.data_as(ctypes.c_void_p))
+    blksize = _strb_blksize(norb, na, nb, max_memory, verbose=verbose)
+    libfci.FCIcontract_2e_spin1_blksize(eri.ctypes.data_as(ctypes.c_void_p),
+                                        fcivec.ctypes.data_as(ctypes.c_void_p),
+                                        ci1.ctypes.data_as(ctypes.c_void_p),
+                                        ctypes.c_int(norb),
+                                        ctypes.c_int(na), ctypes.c_int(nb),
+                                        ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
+                                        link_indexa.ctypes.data_as(ctypes.c_void_p),
+                                        link_indexb.ctypes.data_as(ctypes.c_void_p),
+                                        ctypes.c_int(blksize))
     return ci1
 
+def contract_2e_multi(eri, fcivecs, norb, nelec, link_index=None,
+                      max_memory=None, verbose=None):
+    '''Apply contract_2e to a list of FCI vectors.
+
+    The FCI vectors are interleaved so that the string link tables are
+    traversed once for all vectors, and the integrals are contracted with
+    the intermediates of all vectors in one matrix multiplication.  The
+    interleaved input and output take 2*len(fcivecs) FCI vectors of memory.
+    '''
+    eri = ao2mo.restore(4, eri, norb)
+    link_indexa, link_indexb = _unpack_packed(norb, nelec, link_index)
+    na, nlinka = link_indexa.shape[:2]
+    nb, nlinkb = link_indexb.shape[:2]
+    nvec = len(fcivecs)
+    assert(all(numpy.size(x) == na*nb for x in fcivecs))
+
+    ci0 = numpy.empty((na,nb,nvec))
+    for i, x in enumerate(fcivecs):
+        ci0[:,:,i] = numpy.reshape(x, (na,nb))
+    ci1 = numpy.empty_like(ci0)
+
+    blksize = _strb_blksize(norb, na, nb, max_memory, nvec, verbose)
+    libfci.FCIcontract_2e_spin1_multi(eri.ctypes.data_as(ctypes.c_void_p),
+                                      ci0.ctypes.data_as(ctypes.c_void_p),
+                                      ci1.ctypes.data_as(ctypes.c_void_p),
+                                      ctypes.c_int(norb),
+                                      ctypes.c_int(na), ctypes.c_int(nb),
+                                      ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
+                                      link_indexa.ctypes.data_as(ctypes.c_void_p),
+                                      link_indexb.ctypes.data_as(ctypes.c_void_p),
+                                      ctypes.c_int(nvec), ctypes.c_int(blksize))
+    ci0 = None
+    return [ci1[:,:,i].reshape(numpy.shape(x)) for i, x in enumerate(fcivecs)]
+
+def _strb_blksize(norb, na, nb, max_memory=None, nvec=1, verbose=None):
+    '''The number of beta strings in each batch of contract_2e.  STRB_BLKSIZE
+    is used unless the intermediates of the threads exceed max_memory (in MB).
+    '''
+    if max_memory is None:
+        return STRB_BLKSIZE
+    # ci1buf and t1buf of each thread for one beta string
+    unit = (na + norb*(norb+1)) * nvec * lib.num_threads() * 8e-6
+    if unit * STRB_BLKSIZE <= max_memory:
+        return STRB_BLKSIZE
+
+    if verbose is not None:
+        log = logger.new_logger(verbose=verbose)
+    else:
+        log = None
+    if unit * BLKMIN > max_memory:
+        # Smaller batches cannot keep the intermediates within max_memory
+        if log is not None:
+            log.debug('contract_2e: max_memory %d MB is exhausted. '
+                      'Intermediates of %d beta strings take %.1f MB',
+                      max_memory, STRB_BLKSIZE, unit*STRB_BLKSIZE)
+        return STRB_BLKSIZE
+
+    blksize = max(BLKMIN, int(max_memory / unit))
+    if log is not None:
+        log.debug('contract_2e: beta strings are processed in batches of %d '
+                  'to fit the intermediates in max_memory %d MB',
+                  blksize, max_memory)
+    return blksize
+
 def make_hdiag(h1e, eri, norb, nelec):
     '''Diagonal Hamiltonian for Davidson preconditioner
     '''
@@ -285,8 +366,8 @@ def make_rdm1s(fcivec, norb, nelec, link_index=None):
     '''
     if link_index is None:
         neleca, nelecb = _unpack_nelec(nelec)
-        link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
-        link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+        link_indexa = cistring._gen_linkstr_index_cached(norb, neleca)
+        link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb)
         link_index = (link_indexa, link_indexb)
     rdm1a = rdm.make_rdm1_spin1('FCImake_rdm1a', fcivec, fcivec,
                                 norb, nelec, link_index)
@@ -464,6 +545,9 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
 
     nelec = _unpack_nelec(nelec, fci.spin)
     assert(0 <= nelec[0] <= norb and 0 <= nelec[1] <= norb)
+    if link_index is None and _is_default_contract_2e(fci):
+        # contract_2e of FCISolver takes the packed link tables
+        link_index = _unpack_packed(norb, nelec)
     link_indexa, link_indexb = _unpack(norb, nelec, link_index)
     na = link_indexa.shape[0]
     nb = link_indexb.shape[0]
@@ -506,6 +590,28 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
         hc = fci.contract_2e(h2e, c, norb, nelec, (link_indexa,link_indexb))
         return hc.ravel()
 
+    if (nroots > 1 and getattr(fci, 'multiroot_sigma', True) and
+        _is_default_sigma(fci)):
+        # The sigma vectors of the trial vectors are computed in one pass.
+        # The interleaved vectors of contract_2e_multi take 3*nvec CI vectors
+        # of memory.  The number of vectors in each pass is limited by
+        # max_memory.  With one vector, contract_2e is called.
+        def hop(cs):
+            max_memory = max(0, fci.max_memory - lib.current_memory()[0])
+            nvec = max(1, min(len(cs), int(max_memory/(na*nb*24e-6))))
+            hcs = []
+            for p0, p1 in lib.prange(0, len(cs), nvec):
+                if p1 - p0 == 1:
+                    hcs.append(fci.contract_2e(h2e, cs[p0], norb, nelec,
+                                               (link_indexa,link_indexb)))
+                else:
+                    mem_now = max(0, max_memory - (p1-p0)*na*nb*24e-6)
+                    hcs.extend(contract_2e_multi(h2e, cs[p0:p1], norb, nelec,
+                                                 (link_indexa,link_indexb),
+                                                 mem_now, log))
+            return [hc.ravel() for hc in hcs]
+        kwargs['multi_vectors'] = True
+
     if ci0 is None:
         if callable(getattr(fci, 'get_init_guess', None)):
             ci0 = lambda: fci.get_init_guess(norb, nelec, nroots, hdiag)
@@ -549,6 +655,15 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
     else:
         return e+ecore, c.reshape(na,nb)
 
+def _is_default_contract_2e(fci):
+    return getattr(fci.contract_2e, '__func__', None) is FCISolver.contract_2e
+
+def _is_default_sigma(fci):
+    '''Whether the solver uses the contract_2e and eig of direct_spin1.FCISolver
+    and can be fed with the sigma vectors of contract_2e_multi'''
+    return (_is_default_contract_2e(fci) and
+            getattr(fci.eig, '__func__', None) is FCISolver.eig)
+
 def make_pspace_precond(hdiag, pspaceig, pspaceci, addr, level_shift=0):
     # precondition with pspace Hamiltonian, CPL, 169, 463
     def precond(r, e0, x0, *args):
@@ -604,6 +719,12 @@ class FCISolver(lib.StreamObject):
             This is roughly corresponding to a (6e,6o) system.
         nroots : int
             Number of states to be solved.  Default is 1, the ground state.
+        multiroot_sigma : bool
+            When nroots > 1, whether to compute the sigma vectors of the
+            trial vectors of all roots in one pass (see
+            :func:`contract_2e_multi`).  It takes about three extra CI
+            vectors for each root.  The number of vectors in one pass is
+            reduced to fit in max_memory.  Default is True.
         spin : int or None
             Spin (2S = nalpha-nbeta) of the system.  If this attribute is None,
             spin will be determined by the argument nelec (number of electrons)
@@ -652,6 +773,7 @@ class FCISolver(lib.StreamObject):
     pspace_size = getattr(__config__, 'fci_direct_spin1_FCI_pspace_size', 400)
     threads = getattr(__config__, 'fci_direct_spin1_FCI_threads', None)
     lessio = getattr(__config__, 'fci_direct_spin1_FCI_lessio', False)
+    multiroot_sigma = getattr(__config__, 'fci_direct_spin1_FCI_multiroot_sigma', True)
 
     def __init__(self, mol=None):
         if mol is None:
@@ -678,7 +800,7 @@ class FCISolver(lib.StreamObject):
 
         keys = set(('max_cycle', 'max_space', 'conv_tol', 'lindep',
                     'level_shift', 'davidson_only', 'pspace_size', 'threads',
-                    'lessio'))
+                    'lessio', 'multiroot_sigma'))
         self._keys = set(self.__dict__.keys()).union(keys)
 
     @property
@@ -730,6 +852,9 @@ class FCISolver(lib.StreamObject):
     @lib.with_doc(contract_2e.__doc__)
     def contract_2e(self, eri, fcivec, norb, nelec, link_index=None, **kwargs):
         nelec = _unpack_nelec(nelec, self.spin)
+        if 'max_memory' not in kwargs:
+            kwargs['max_memory'] = max(0, self.max_memory - lib.current_memory()[0])
+            kwargs.setdefault('verbose', logger.new_logger(self))
         return contract_2e(eri, fcivec, norb, nelec, link_index, **kwargs)
 
     def eig(self, op, x0=None, precond=None, **kwargs):
@@ -737,9 +862,14 @@ class FCISolver(lib.StreamObject):
             self.converged = True
             return scipy.linalg.eigh(op)
 
+        # multi_vectors: op takes a list of vectors and returns their sigma
+        # vectors (see kernel_ms1)
+        if kwargs.pop('multi_vectors', False):
+            aop = op
+        else:
+            aop = lambda xs: [op(x) for x in xs]
         self.converged, e, ci = \
-                lib.davidson1(lambda xs: [op(x) for x in xs],
-                              x0, precond, lessio=self.lessio, **kwargs)
+                lib.davidson1(aop, x0, precond, lessio=self.lessio, **kwargs)
         if kwargs['nroots'] == 1:
             self.converged = self.converged[0]
             e = e[0]
@@ -854,12 +984,14 @@ class FCISolver(lib.StreamObject):
         if spin is None:
             spin = self.spin
         neleca, nelecb = _unpack_nelec(nelec, spin)
-        if tril:
-            link_indexa = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
-            link_indexb = cistring.gen_linkstr_index_trilidx(range(norb), nelecb)
+        # The read-only tables of the cache
+        if tril and _is_default_contract_2e(self):
+            # contract_2e of FCISolver takes the packed link tables
+            link_indexa = cistring._gen_linkstr_packed_cached(norb, neleca)
+            link_indexb = cistring._gen_linkstr_packed_cached(norb, nelecb)
         else:
-            link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
-            link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+            link_indexa = cistring._gen_linkstr_index_cached(norb, neleca, tril)
+            link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb, tril)
         return link_indexa, link_indexb
 
 FCI = FCISolver
@@ -868,13 +1000,31 @@ FCI = FCISolver
 def _unpack(norb, nelec, link_index, spin=None):
     if link_index is None:
         neleca, nelecb = _unpack_nelec(nelec, spin)
-        link_indexa = link_indexb = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
+        link_indexa = link_indexb = cistring._gen_linkstr_index_cached(norb, neleca, True)
         if neleca != nelecb:
-            link_indexb = cistring.gen_linkstr_index_trilidx(range(norb), nelecb)
+            link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb, True)
         return link_indexa, link_indexb
     else:
         return link_index
 
+def _unpack_packed(norb, nelec, link_index=None, spin=None):
+    '''The packed link tables (see cistring.gen_linkstr_index_packed) which
+    are passed to the C contraction functions'''
+    if link_index is None:
+        neleca, nelecb = _unpack_nelec(nelec, spin)
+        link_indexa = link_indexb = cistring._gen_linkstr_packed_cached(norb, neleca)
+        if neleca != nelecb:
+            link_indexb = cistring._gen_linkstr_packed_cached(norb, nelecb)
+        return link_indexa, link_indexb
+    else:
+        link_indexa, link_indexb = link_index
+        link_indexa = numpy.asarray(cistring.pack_linkstr_index(link_indexa), order='C')
+        if link_index[1] is link_index[0]:
+            link_indexb = link_indexa
+        else:
+            link_indexb = numpy.asarray(cistring.pack_linkstr_index(link_indexb), order='C')
+        return link_indexa, link_indexb
+
 
 if __name__ == '__main__':
     from functools import reduce
@@ -187,8 +187,8 @@ def pspace(h1e, eri, norb, nelec, hdiag=None, np=400):
     g2e_aa = ao2mo.restore(1, eri[0], norb)
     g2e_ab = ao2mo.restore(1, eri[1], norb)
     g2e_bb = ao2mo.restore(1, eri[2], norb)
-    link_indexa = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
-    link_indexb = cistring.gen_linkstr_index_trilidx(range(norb), nelecb)
+    link_indexa = cistring._gen_linkstr_index_cached(norb, neleca, True)
+    link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb, True)
     nb = link_indexb.shape[0]
     if hdiag is None:
         hdiag = make_hdiag(h1e, eri, norb, nelec)
@@ -50,7 +50,7 @@ def make_rdm1_ms0(fname, cibra, ciket, norb, nelec, link_index=None):
     if link_index is None:
         neleca, nelecb = _unpack_nelec(nelec)
         assert(neleca == nelecb)
-        link_index = cistring.gen_linkstr_index(range(norb), neleca)
+        link_index = cistring._gen_linkstr_index_cached(norb, neleca)
     na, nlink = link_index.shape[:2]
     assert(cibra.size == na**2)
     assert(ciket.size == na**2)
@@ -75,7 +75,7 @@ def make_rdm12_ms0(fname, cibra, ciket, norb, nelec, link_index=None, symm=0):
     if link_index is None:
         neleca, nelecb = _unpack_nelec(nelec)
         assert(neleca == nelecb)
-        link_index = cistring.gen_linkstr_index(range(norb), neleca)
+        link_index = cistring._gen_linkstr_index_cached(norb, neleca)
     link_index = (link_index, link_index)
     return make_rdm12_spin1(fname, cibra, ciket, norb, nelec, link_index, symm)
 
@@ -92,9 +92,9 @@ def make_rdm1_spin1(fname, cibra, ciket, norb, nelec, link_index=None):
     ciket = numpy.asarray(ciket, order='C')
     if link_index is None:
         neleca, nelecb = _unpack_nelec(nelec)
-        link_indexa = link_indexb = cistring.gen_linkstr_index(range(norb), neleca)
+        link_indexa = link_indexb = cistring._gen_linkstr_index_cached(norb, neleca)
         if neleca != nelecb:
-            link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+            link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb)
     else:
         link_indexa, link_indexb = link_index
     na,nlinka = link_indexa.shape[:2]
@@ -124,9 +124,9 @@ def make_rdm12_spin1(fname, cibra, ciket, norb, nelec, link_index=None, symm=0):
     ciket = numpy.asarray(ciket, order='C')
     if link_index is None:
         neleca, nelecb = _unpack_nelec(nelec)
-        link_indexa = link_indexb = cistring.gen_linkstr_index(range(norb), neleca)
+        link_indexa = link_indexb = cistring._gen_linkstr_index_cached(norb, neleca)
         if neleca != nelecb:
-            link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+            link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb)
     else:
         link_indexa, link_indexb = link_index
     na,nlinka = link_indexa.shape[:2]
@@ -170,8 +170,8 @@ def make_dm123(fname, cibra, ciket, norb, nelec):
     cibra = numpy.asarray(cibra, order='C')
     ciket = numpy.asarray(ciket, order='C')
     neleca, nelecb = _unpack_nelec(nelec)
-    link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
-    link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+    link_indexa = cistring._gen_linkstr_index_cached(norb, neleca)
+    link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb)
     na,nlinka = link_indexa.shape[:2]
     nb,nlinkb = link_indexb.shape[:2]
     assert(cibra.size == na*nb)
@@ -238,8 +238,8 @@ def make_dm1234(fname, cibra, ciket, norb, nelec):
     cibra = numpy.asarray(cibra, order='C')
     ciket = numpy.asarray(ciket, order='C')
     neleca, nelecb = _unpack_nelec(nelec)
-    link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
-    link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
+    link_indexa = cistring._gen_linkstr_index_cached(norb, neleca)
+    link_indexb = cistring._gen_linkstr_index_cached(norb, nelecb)
     na,nlinka = link_indexa.shape[:2]
     nb,nlinkb = link_indexb.shape[:2]
     assert(cibra.size == na*nb)
@@ -108,21 +108,101 @@ def contract_2e(eri, civec_strs, norb, nelec, link_index=None):
     return _as_SCIvector(ci1.reshape(ci_coeff.shape), ci_strs)
 
 def select_strs(myci, eri, eri_pq_max, civec_max, strs, norb, nelec):
+    '''Strings generated from strs by the single and double excitations whose
+    integrals (eri_pq_max for singles, eri for doubles) times civec_max are
+    larger than myci.select_cutoff.
+
+    The excitations are generated by heat-bath selection: the integrals of
+    each orbital pair are sorted in advance (see :func:`_heatbath_tables`), so
+    that for each string the loops stop at the first integral below the
+    cutoff.  The new strings are deduplicated as sorted int64 arrays.
+    '''
     strs = numpy.asarray(strs, dtype=numpy.int64)
+    civec_max = numpy.asarray(civec_max, dtype=numpy.double, order='C')
     nstrs = len(strs)
-    nvir = norb - nelec
-    strs_add = numpy.empty((nstrs*(nelec*nvir)**2//4), dtype=numpy.int64)
-    libfci.SCIselect_strs.restype = ctypes.c_int
-    nadd = libfci.SCIselect_strs(strs_add.ctypes.data_as(ctypes.c_void_p),
-                                 strs.ctypes.data_as(ctypes.c_void_p),
-                                 eri.ctypes.data_as(ctypes.c_void_p),
-                                 eri_pq_max.ctypes.data_as(ctypes.c_void_p),
-                                 civec_max.ctypes.data_as(ctypes.c_void_p),
-                                 ctypes.c_double(myci.select_cutoff),
-                                 ctypes.c_int(norb), ctypes.c_int(nelec),
-                                 ctypes.c_int(nstrs))
-    strs_add = sorted(set(strs_add[:nadd]) - set(strs))
-    return numpy.asarray(strs_add, dtype=numpy.int64)
+    if nstrs == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+
+    tables = _heatbath_tables(eri, eri_pq_max, civec_max.max(),
+                              myci.select_cutoff, norb, nelec)
+    tables = [x.ctypes.data_as(ctypes.c_void_p) for x in tables]
+
+    def select(inter, offsets, counts, p0, p1):
+        libfci.SCIselect_strs_heatbath(inter, offsets,
+                                       counts[p0:p1].ctypes.data_as(ctypes.c_void_p),
+                                       strs[p0:p1].ctypes.data_as(ctypes.c_void_p),
+                                       civec_max[p0:p1].ctypes.data_as(ctypes.c_void_p),
+                                       ctypes.c_double(myci.select_cutoff),
+                                       ctypes.c_int(norb), ctypes.c_int(p1-p0),
+                                       *tables)
+
+    counts = numpy.empty(nstrs, dtype=numpy.int64)
+    select(None, None, counts, 0, nstrs)
+    offsets = numpy.append(0, numpy.cumsum(counts))
+
+    # The selected strings are generated in batches of ~blksize strings, each
+    # batch being deduplicated before the next one is generated.
+    max_memory = max(0, myci.max_memory - lib.current_memory()[0])
+    blksize = max(1<<20, int(max_memory*.25e6/8))
+    strs_add = []
+    p0 = 0
+    while p0 < nstrs:
+        p1 = numpy.searchsorted(offsets, offsets[p0]+blksize, side='right') - 1
+        p1 = min(nstrs, max(p0+1, p1))
+        inter = numpy.empty(offsets[p1]-offsets[p0], dtype=numpy.int64)
+        locs = numpy.asarray(offsets[p0:p1]-offsets[p0], dtype=numpy.int64)
+        select(inter.ctypes.data_as(ctypes.c_void_p),
+               locs.ctypes.data_as(ctypes.c_void_p), counts, p0, p1)
+        strs_add.append(numpy.unique(inter))
+        inter = None
+        p0 = p1
+
+    if len(strs_add) == 1:
+        strs_add = strs_add[0]
+    else:
+        strs_add = numpy.unique(numpy.hstack(strs_add))
+    return numpy.setdiff1d(strs_add, strs)
+
+def _heatbath_tables(eri, eri_pq_max, civec_max, select_cutoff, norb, nocc):
+    '''The sorted integrals for the heat-bath selection in
+    SCIselect_strs_heatbath.  The integrals which cannot pass the cutoff for
+    the largest CI coefficient civec_max are dropped.
+
+    Returns CSR-like tables
+    single_offset, single_orb, single_val: for each orbital i, the orbitals a
+        sorted by eri_pq_max[a,i] in descending order.
+    double_offset, double_pair, double_val: for each pair a*norb+i (i < nocc,
+        a >= nocc), the pairs b*norb+j (b > a, j < i) sorted by
+        |eri[a,i,b,j]| in descending order.
+    '''
+    nn = norb * norb
+    eri_pq_max = numpy.asarray(eri_pq_max).reshape(norb,norb)
+    val = eri_pq_max.T
+    i, a = numpy.where(val * civec_max > select_cutoff)
+    val = val[i,a]
+    idx = numpy.lexsort((-val, i))
+    single_offset = numpy.append(0, numpy.cumsum(numpy.bincount(i, minlength=norb)))
+    single_orb = a[idx]
+    single_val = val[idx]
+
+    eri = abs(numpy.asarray(eri).reshape(norb,norb,norb,norb)[nocc:,:nocc])
+    a, i, b, j = numpy.where(eri * civec_max > select_cutoff)
+    val = eri[a,i,b,j]
+    eri = None
+    a += nocc
+    mask = (b > a) & (j < i)
+    a, i, b, j, val = a[mask], i[mask], b[mask], j[mask], val[mask]
+    ai = a * norb + i
+    idx = numpy.lexsort((-val, ai))
+    double_offset = numpy.append(0, numpy.cumsum(numpy.bincount(ai, minlength=nn)))
+    double_pair = (b * norb + j)[idx]
+    double_val = val[idx]
+    return (numpy.asarray(single_offset, dtype=numpy.int32),
+            numpy.asarray(single_orb, dtype=numpy.int32),
+            numpy.asarray(single_val, dtype=numpy.double, order='C'),
+            numpy.asarray(double_offset, dtype=numpy.int32),
+            numpy.asarray(double_pair, dtype=numpy.int32),
+            numpy.asarray(double_val, dtype=numpy.double, order='C'))
 
 def enlarge_space(myci, civec_strs, eri, norb, nelec):
     if isinstance(civec_strs, (tuple, list)):
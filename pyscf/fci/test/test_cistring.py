@@ -13,8 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import shutil
+import tempfile
 import unittest
 import numpy
+from pyscf import lib
+from pyscf import fci
 from pyscf.fci import cistring
 
 
@@ -65,6 +69,59 @@ class KnownValues(unittest.TestCase):
         tab3 = cistring.gen_linkstr_index_o1(range(8), 4)
         self.assertAlmostEqual(abs(tab1 - tab3).sum(), 0, 12)
 
+    def test_linkstr_cache(self):
+        cistring.clear_linkstr_cache()
+        ref = cistring.gen_linkstr_index_o1(range(9), 4)
+        link1 = cistring.gen_linkstr_index(range(9), 4)
+        self.assertEqual(cistring.linkstr_cache_info()['misses'], 2)
+        link1[:] = 0  # the returned table is a copy of the cached one
+        link2 = cistring._gen_linkstr_index_cached(9, 4)
+        self.assertEqual(cistring.linkstr_cache_info()['hits'], 1)
+        self.assertFalse(link2.flags.writeable)
+        self.assertAlmostEqual(abs(link2 - ref).max(), 0, 12)
+        link3 = cistring.gen_linkstr_index_trilidx(range(9), 4)
+        ref3 = cistring.reform_linkstr_index(ref)
+        self.assertAlmostEqual(abs(link3[:,:,[0,2,3]] - ref3[:,:,[0,2,3]]).max(), 0, 12)
+
+        # The FCI solver uses the cached table without copying
+        link5 = fci.direct_spin1.FCI().gen_linkstr(9, (4,4), tril=False)[0]
+        self.assertTrue(link5 is link2)
+
+        cistring.clear_linkstr_cache()
+        cache_dir = tempfile.mkdtemp()
+        with lib.temporary_env(cistring, LINKSTR_CACHE_DIR=cache_dir):
+            cistring._gen_linkstr_index_cached(9, 4)
+            cistring.clear_linkstr_cache()
+            link4 = cistring._gen_linkstr_index_cached(9, 4)
+            self.assertTrue(isinstance(link4, numpy.memmap))
+            self.assertEqual(cistring.linkstr_cache_info()['disk_hits'], 1)
+            self.assertAlmostEqual(abs(link4 - ref).max(), 0, 12)
+        shutil.rmtree(cache_dir)
+
+        cistring.clear_linkstr_cache()
+        with lib.temporary_env(cistring, LINKSTR_CACHE_MAX_MEMORY=ref.nbytes*1.5e-6):
+            cistring.gen_linkstr_index(range(9), 4)
+            cistring.gen_linkstr_index(range(9), 5)
+            info = cistring.linkstr_cache_info()
+            self.assertTrue(info['mem_bytes'] <= ref.nbytes*1.5)
+        cistring.clear_linkstr_cache()
+
+    def test_linkstr_index_packed(self):
+        ref = cistring.gen_linkstr_index_trilidx(range(9), 4)
+        link = cistring.gen_linkstr_index_packed(range(9), 4)
+        self.assertEqual(link.shape, ref.shape[:2])
+        self.assertEqual(ref.nbytes, link.nbytes*2)
+        self.assertTrue(link.flags.writeable)
+        link1 = cistring.unpack_linkstr_index(link)
+        self.assertAlmostEqual(abs(link1[:,:,[0,2,3]] - ref[:,:,[0,2,3]]).max(), 0, 12)
+        self.assertTrue(numpy.all(cistring.pack_linkstr_index(ref) == link))
+
+        orb_list = [0,1,3,4,6,7]
+        strs = cistring.make_strings(orb_list, 3)
+        ref = cistring.gen_linkstr_index_trilidx(orb_list, 3, strs)
+        link = cistring.gen_linkstr_index_packed(orb_list, 3, strs)
+        self.assertTrue(numpy.all(cistring.pack_linkstr_index(ref) == link))
+
     def test_addr2str(self):
         self.assertEqual(bin(cistring.addr2str(6, 3, 7)), '0b11001')
         self.assertEqual(bin(cistring.addr2str(6, 3, 8)), '0b11010')
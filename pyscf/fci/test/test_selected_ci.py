@@ -74,6 +74,34 @@ class KnownValues(unittest.TestCase):
                                             strs, norb, nelec)
         self.assertTrue(numpy.all(strs_add0 == strs_add1))
 
+    def test_heatbath_tables(self):
+        nocc = 3
+        eri1 = ao2mo.restore(1, eri, norb)
+        eri_pq_max = abs(eri1.reshape(norb**2,-1)).max(axis=1).reshape(norb,norb)
+        tabs = selected_ci._heatbath_tables(eri1, eri_pq_max, .5, 1e-3, norb, nocc)
+        single_offset, single_orb, single_val = tabs[:3]
+        double_offset, double_pair, double_val = tabs[3:]
+        for i in range(norb):
+            val = single_val[single_offset[i]:single_offset[i+1]]
+            self.assertTrue(numpy.all(val[:-1] >= val[1:]))
+            a = single_orb[single_offset[i]:single_offset[i+1]]
+            self.assertAlmostEqual(abs(val - eri_pq_max[a,i]).max(initial=0), 0, 14)
+            self.assertTrue(numpy.all(val*.5 > 1e-3))
+        for ai in range(norb**2):
+            a, i = divmod(ai, norb)
+            p0, p1 = double_offset[ai:ai+2]
+            if not (a >= nocc and i < nocc):
+                self.assertEqual(p0, p1)
+                continue
+            b, j = divmod(double_pair[p0:p1], norb)
+            val = double_val[p0:p1]
+            self.assertTrue(numpy.all(val[:-1] >= val[1:]))
+            self.assertTrue(numpy.all(b > a) and numpy.all(j < i))
+            self.assertAlmostEqual(abs(val - abs(eri1[a,i,b,j])).max(initial=0), 0, 14)
+        self.assertEqual(double_offset[-1],
+                         sum((abs(eri1[a,i,a+1:,:i])*.5 > 1e-3).sum()
+                             for a in range(nocc, norb) for i in range(nocc)))
+
     def test_select_strs1(self):
         myci = selected_ci.SCI()
         myci.select_cutoff = .1
@@ -16,7 +16,7 @@
 import unittest
 from functools import reduce
 import numpy
-from pyscf import gto
+from pyscf import gto, lib
 from pyscf import scf
 from pyscf import ao2mo
 from pyscf import fci
@@ -75,6 +75,33 @@ class KnownValues(unittest.TestCase):
         ci3 = fci.direct_spin1.contract_2e(g2e, ci2, norb, neleci)
         self.assertAlmostEqual(numpy.linalg.norm(ci3), 127.49780293866368, 6)
 
+    def test_contract_2e_max_memory(self):
+        ref = fci.direct_spin1.contract_2e(g2e, ci3, norb, neleci)
+        unit = (na + norb*(norb+1)) * lib.num_threads() * 8e-6
+        with lib.temporary_env(fci.direct_spin1, BLKMIN=1):
+            ci1 = fci.direct_spin1.contract_2e(g2e, ci3, norb, neleci,
+                                               max_memory=unit*1.5)
+        self.assertAlmostEqual(abs(ci1 - ref).max(), 0, 12)
+        with lib.temporary_env(fci.direct_spin1, STRB_BLKSIZE=5):
+            ci1 = fci.direct_spin1.contract_2e(g2e, ci3, norb, neleci)
+        self.assertAlmostEqual(abs(ci1 - ref).max(), 0, 12)
+        self.assertEqual(fci.direct_spin1._strb_blksize(norb, na, nb, 1e9),
+                         fci.direct_spin1.STRB_BLKSIZE)
+        # Smaller batches do not help if max_memory is exhausted
+        self.assertEqual(fci.direct_spin1._strb_blksize(norb, na, nb, 0),
+                         fci.direct_spin1.STRB_BLKSIZE)
+        unit = (na + norb*(norb+1)) * lib.num_threads() * 8e-6
+        self.assertEqual(fci.direct_spin1._strb_blksize(norb, na, nb, unit*20.5), 20)
+
+    def test_contract_2e_packed_link(self):
+        ref = fci.direct_spin1.contract_2e(g2e, ci3, norb, neleci)
+        link_index = (fci.cistring.gen_linkstr_index_packed(range(norb), neleci[0]),
+                      fci.cistring.gen_linkstr_index_packed(range(norb), neleci[1]))
+        ci1 = fci.direct_spin1.contract_2e(g2e, ci3, norb, neleci, link_index)
+        self.assertAlmostEqual(abs(ci1 - ref).max(), 0, 12)
+        ci1 = fci.direct_spin1.contract_2e_multi(g2e, [ci3], norb, neleci, link_index)[0]
+        self.assertAlmostEqual(abs(ci1 - ref).max(), 0, 12)
+
     def test_kernel(self):
         eref, cref = fci.direct_spin0.kernel(h1e, g2e, norb, mol.nelectron)
         e, c = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)
@@ -89,6 +116,33 @@ class KnownValues(unittest.TestCase):
         e, c = sol.kernel(h1e, g2e, norb, neleci)
         self.assertAlmostEqual(e, -8.7498253981782, 8)
 
+    def test_contract_2e_multi(self):
+        ci1s = fci.direct_spin1.contract_2e_multi(g2e, [ci2, ci3], norb, neleci)
+        for c, ci1 in zip((ci2, ci3), ci1s):
+            ref = fci.direct_spin1.contract_2e(g2e, c, norb, neleci)
+            self.assertAlmostEqual(abs(ci1 - ref).max(), 0, 12)
+        with lib.temporary_env(fci.direct_spin1, STRB_BLKSIZE=5):
+            ci1s = fci.direct_spin1.contract_2e_multi(g2e, [ci2, ci3], norb, neleci)
+        self.assertAlmostEqual(abs(ci1s[1] - ref).max(), 0, 12)
+
+    def test_kernel_nroots(self):
+        sol = fci.direct_spin1.FCI(mol)
+        sol.nroots = 3
+        self.assertTrue(fci.direct_spin1._is_default_sigma(sol))
+        sol.multiroot_sigma = False
+        eref, cref = sol.kernel(h1e, g2e, norb, neleci, davidson_only=True)
+        self.assertAlmostEqual(eref[0], -8.7498253981782, 8)
+        sol.multiroot_sigma = True
+        e, c = sol.kernel(h1e, g2e, norb, neleci, davidson_only=True)
+        self.assertAlmostEqual(abs(e - eref).max(), 0, 8)
+        # Not enough memory for the interleaved vectors
+        with lib.temporary_env(sol, max_memory=0):
+            e, c = sol.kernel(h1e, g2e, norb, neleci, davidson_only=True)
+        self.assertAlmostEqual(abs(e - eref).max(), 0, 8)
+
+        sol = fci.addons.fix_spin_(fci.direct_spin1.FCI(mol))
+        self.assertFalse(fci.direct_spin1._is_default_sigma(sol))
+
     def test_hdiag(self):
         hdiagref = fci.direct_spin0.make_hdiag(h1e, g2e, norb, mol.nelectron)
         hdiag = fci.direct_spin1.make_hdiag(h1e, g2e, norb, nelec)
@@ -151,9 +205,15 @@ class KnownValues(unittest.TestCase):
 
     def test_gen_linkstr(self):
         sol = fci.direct_spin1.FCI(mol)
-        link1a, link1b = sol.gen_linkstr(7, 7, tril=True)
-        link1a[:,:,1] = 0
-        link1b[:,:,1] = 0
+        link1 = sol.gen_linkstr(7, 7, tril=True)
+        self.assertTrue(fci.cistring.is_packed_linkstr_index(link1[0]))
+        link2 = fci.direct_spin1._unpack_packed(7, 7, link1)
+        self.assertTrue(link2[0] is link1[0] and link2[1] is link1[1])
+        f1e = numpy.random.random((7,7))
+        ci0 = numpy.random.random((35,35))
+        self.assertAlmostEqual(abs(sol.contract_1e(f1e, ci0, 7, (4,3), link1) -
+                                   sol.contract_1e(f1e, ci0, 7, (4,3))).max(), 0, 12)
+        link1a, link1b = [fci.cistring.unpack_linkstr_index(x) for x in link1]
         link2a, link2b = sol.gen_linkstr(7, (4,3), tril=False)
         self.assertAlmostEqual(abs(link1a - fci.cistring.reform_linkstr_index(link2a)).max(), 0, 12)
         self.assertAlmostEqual(abs(link1b - fci.cistring.reform_linkstr_index(link2b)).max(), 0, 12)
@@ -31,3 +31,5 @@ from pyscf.lib.linalg_helper import *
 from pyscf.lib import chkfile
 from pyscf.lib import diis
 from pyscf.lib.misc import StreamObject
+from pyscf.lib import rawfile
+from pyscf.lib.rawfile import RawFile, RawGroup, RawTmpFile, is_rawfile, open_datafile
@@ -156,3 +156,161 @@ void VXCgen_grid(double *out, double *coords, double *atm_coords,
         free(atom_dist);
 }
 
+
+/*
+ * Distance between the grid and atom ia.  The distances are evaluated on
+ * demand and saved in grid_dist.  stamp[ia] == ig marks the valid entries.
+ */
+static double _grid_dist(int ia, size_t ig, double *coords, size_t ngrids,
+                         double *atm_coords, double *grid_dist, size_t *stamp)
+{
+        if (stamp[ia] != ig) {
+                double dx = coords[0*ngrids+ig] - atm_coords[ia*3+0];
+                double dy = coords[1*ngrids+ig] - atm_coords[ia*3+1];
+                double dz = coords[2*ngrids+ig] - atm_coords[ia*3+2];
+                grid_dist[ia] = sqrt(dx*dx + dy*dy + dz*dz);
+                stamp[ia] = ig;
+        }
+        return grid_dist[ia];
+}
+
+/*
+ * Partition function of atom ia, P_ia = prod_j s(mu_ij).  Only the
+ * neighbours j of atom ia within rcut_factor * |r-R_ia| are included.  The
+ * cell functions of the other atoms are 1 up to the screening threshold.
+ * Return 0 if the partial product is smaller than cutoff.
+ */
+static double _becke_partition(int ia, size_t ig, double *coords, size_t ngrids,
+                               double *atm_coords, double *grid_dist, size_t *stamp,
+                               int *nbr_idx, double *nbr_dist, double *radii_table,
+                               double rcut_factor, double cutoff, int natm)
+{
+        int *idx = nbr_idx + (size_t)ia * natm;
+        double *dist = nbr_dist + (size_t)ia * natm;
+        double ri = _grid_dist(ia, ig, coords, ngrids, atm_coords, grid_dist, stamp);
+        double rcut = ri * rcut_factor;
+        double g;
+        double p = 1;
+        int j, k;
+        // k = 0 is atom ia itself
+        for (k = 1; k < natm && dist[k] < rcut; k++) {
+                j = idx[k];
+                g = (ri - _grid_dist(j, ig, coords, ngrids, atm_coords,
+                                     grid_dist, stamp)) / dist[k];
+                if (radii_table != NULL) {
+                        g += radii_table[(size_t)ia*natm+j] * (1 - g*g);
+                }
+                g = (3 - g*g) * g * .5;
+                g = (3 - g*g) * g * .5;
+                g = (3 - g*g) * g * .5;
+                p *= .5 - g * .5;
+                if (p < cutoff) {
+                        return 0;
+                }
+        }
+        return p;
+}
+
+/*
+ * Becke partitioning with screening for the grids of atom ia.
+ *
+ * nbr_idx[i] and nbr_dist[i] are the atoms and their distances to atom i,
+ * sorted by distance (nbr_idx[i,0] == i).  radii_table, if given, should be
+ * antisymmetric.  If mu_ij > mu_cut (with mu_cut determined by tol, see
+ * gen_grid._becke_cutoff_factor) the cell function s(mu_ij) < tol.  Since
+ * mu_ij >= 1 - 2|r-R_i|/R_ij, the atoms j farther than
+ * rcut_factor*|r-R_i| = 2|r-R_i|/(1-mu_cut) from atom i can be skipped:
+ *
+ * - The nearest atom N is searched in the neighbour list of atom ia.
+ * - Atoms B farther than rcut_factor*|r-R_N| from N have P_B < tol and are
+ *   excluded from the normalization.
+ * - In P_B, the cell functions of the atoms farther than
+ *   rcut_factor*|r-R_B| from B are 1 - O(tol) and are skipped.
+ *
+ * The partition function of an atom is also dropped if it is smaller than
+ * tol * P_N.
+ *
+ * out[i] = P_ia / sum_B P_B for grid i
+ */
+void VXCgen_grid_screened(double *out, double *coords, double *atm_coords,
+                          double *radii_table, int *nbr_idx, double *nbr_dist,
+                          double tol, double rcut_factor,
+                          int ia, int natm, int ngrids)
+{
+        const size_t Ngrids = ngrids;
+        int *idxa = nbr_idx + (size_t)ia * natm;
+        double *dista = nbr_dist + (size_t)ia * natm;
+
+#pragma omp parallel
+{
+        double *grid_dist = malloc(sizeof(double) * natm);
+        size_t *stamp = malloc(sizeof(size_t) * natm);
+        int *idxn;
+        double *distn;
+        double ra, rn, r, pn, p0, psum, cutoff, rcut, dx, dy, dz;
+        size_t ig;
+        int i, k, nearest;
+        for (i = 0; i < natm; i++) {
+                stamp[i] = (size_t)-1;
+        }
+#pragma omp for schedule(static)
+        for (ig = 0; ig < Ngrids; ig++) {
+                // The nearest atom is within ra+rn from atom ia
+                ra = _grid_dist(ia, ig, coords, Ngrids, atm_coords, grid_dist, stamp);
+                nearest = ia;
+                rn = ra;
+                for (k = 1; k < natm && dista[k] <= ra + rn; k++) {
+                        r = _grid_dist(idxa[k], ig, coords, Ngrids, atm_coords,
+                                       grid_dist, stamp);
+                        if (r < rn) {
+                                nearest = idxa[k];
+                                rn = r;
+                        }
+                }
+
+                pn = _becke_partition(nearest, ig, coords, Ngrids, atm_coords,
+                                      grid_dist, stamp, nbr_idx, nbr_dist,
+                                      radii_table, rcut_factor, 0, natm);
+                cutoff = tol * pn;
+                rcut = rcut_factor * rn;
+                idxn = nbr_idx + (size_t)nearest * natm;
+                distn = nbr_dist + (size_t)nearest * natm;
+                if (nearest == ia) {
+                        p0 = pn;
+                } else {
+                        dx = atm_coords[ia*3+0] - atm_coords[nearest*3+0];
+                        dy = atm_coords[ia*3+1] - atm_coords[nearest*3+1];
+                        dz = atm_coords[ia*3+2] - atm_coords[nearest*3+2];
+                        if (dx*dx + dy*dy + dz*dz >= rcut*rcut) {
+                                p0 = 0;
+                        } else {
+                                p0 = _becke_partition(ia, ig, coords, Ngrids,
+                                                      atm_coords, grid_dist, stamp,
+                                                      nbr_idx, nbr_dist, radii_table,
+                                                      rcut_factor, cutoff, natm);
+                        }
+                }
+                if (p0 == 0) {
+                        out[ig] = 0;
+                        continue;
+                }
+
+                psum = pn;
+                for (k = 1; k < natm && distn[k] < rcut; k++) {
+                        i = idxn[k];
+                        if (i == ia) {
+                                psum += p0;
+                        } else {
+                                psum += _becke_partition(i, ig, coords, Ngrids,
+                                                         atm_coords, grid_dist, stamp,
+                                                         nbr_idx, nbr_dist,
+                                                         radii_table, rcut_factor,
+                                                         cutoff, natm);
+                        }
+                }
+                out[ig] = p0 / psum;
+        }
+        free(grid_dist);
+        free(stamp);
+}
+}
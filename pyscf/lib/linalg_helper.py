@@ -23,6 +23,8 @@ Extension to scipy.linalg module
 import sys
 import warnings
 import tempfile
+import threading
+import collections
 from functools import reduce
 import numpy
 import scipy.linalg
@@ -31,6 +33,7 @@ from pyscf.lib import parameters
 from pyscf.lib import logger
 from pyscf.lib import numpy_helper
 from pyscf.lib import misc
+from pyscf.lib.rawfile import RawTmpFile
 from pyscf import __config__
 
 SAFE_EIGH_LINDEP = getattr(__config__, 'lib_linalg_helper_safe_eigh_lindep', 1e-15)
@@ -53,6 +56,14 @@ PROJECT_OUT_CONV_EIGS = \
 
 FOLLOW_STATE = getattr(__config__, 'lib_linalg_helper_davidson_follow_state', False)
 
+# The scratch storage of the subspace vectors when they do not fit in memory.
+# 'hdf5' for the HDF5 temporary file, 'mmap' for the memory-mapped raw file
+# which is written asynchronously.
+SUBSPACE_STORAGE = getattr(__config__, 'lib_linalg_helper_davidson_subspace_storage', 'mmap')
+# Store the old subspace vectors of the 'mmap' storage in single precision
+SUBSPACE_SINGLE_PRECISION = \
+        getattr(__config__, 'lib_linalg_helper_davidson_subspace_single_precision', False)
+
 
 def safe_eigh(h, s, lindep=SAFE_EIGH_LINDEP):
     '''Solve generalized eigenvalue problem  h v = w s v.
@@ -260,10 +271,13 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
              lindep=DAVIDSON_LINDEP, max_memory=MAX_MEMORY,
              dot=numpy.dot, callback=None,
              nroots=1, lessio=False, pick=None, verbose=logger.WARN,
-             follow_state=FOLLOW_STATE, tol_residual=None):
+             follow_state=FOLLOW_STATE, tol_residual=None,
+             thick_restart=False, nkeep=None, lobpcg=True):
     '''Davidson diagonalization method to solve  a c = e c.  Ref
     [1] E.R. Davidson, J. Comput. Phys. 17 (1), 87-94 (1975).
     [2] http://people.inf.ethz.ch/arbenz/ewp/Lnotes/chapter11.pdf
+    [3] K. Wu and H. Simon, SIAM J. Matrix Anal. Appl. 22, 602 (2000)
+    [4] A. V. Knyazev, SIAM J. Sci. Comput. 23, 517 (2001)
 
     Note: This function has an overhead of memory usage ~4*x0.size*nroots
 
@@ -317,6 +331,21 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
             If the solution dramatically changes in two iterations, clean the
             subspace and restart the iteration with the old solution.  It can
             help to improve numerical stability.  Default is False.
+        thick_restart : bool
+            When the subspace is full, the iterations are restarted with the
+            current eigenvectors by default.  With thick_restart, nkeep Ritz
+            vectors and (if lobpcg is set) the eigenvectors of the previous
+            iteration, which play the role of the conjugate directions of
+            LOBPCG, are kept.  The subspace is rotated in place and no
+            matrix-vector multiplication is needed for the restart.  New
+            trial vectors are only generated for the roots which are not
+            converged (the converged roots are locked).
+        nkeep : int
+            Number of Ritz vectors to keep in the thick restart.  The
+            default is (max_space-nroots)//2.
+        lobpcg : bool
+            Whether to keep the eigenvectors of the previous iteration in
+            the thick restart.
 
     Returns:
         conv : bool
@@ -358,6 +387,12 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
         x0 = [x0]
     #max_cycle = min(max_cycle, x0[0].size)
     max_space = max_space + (nroots-1) * 3
+    if thick_restart:
+        if nkeep is None:
+            nkeep = (max_space - nroots) // 2
+        # Leave space for the conjugate directions and the new trial vectors
+        nkeep = max(nroots, min(nkeep, max_space - nroots*2))
+        log.debug1('thick restart with nkeep %d', nkeep)
     # max_space*2 for holding ax and xs, nroots*2 for holding axt and xt
     _incore = max_memory*1e6/x0[0].nbytes > max_space*2+nroots*3
     lessio = lessio and not _incore
@@ -378,8 +413,8 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
                 xs = []
                 ax = []
             else:
-                xs = _Xlist()
-                ax = _Xlist()
+                xs = _new_xlist(nroots)
+                ax = _new_xlist(nroots)
             space = 0
 # Orthogonalize xt space because the basis of subspace xs must be orthogonal
 # but the eigenvectors x0 might not be strictly orthogonal
@@ -434,6 +469,7 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
         w, v = scipy.linalg.eigh(heff[:space,:space])
         if callable(pick):
             w, v, idx = pick(w, v, nroots, locals())
+        vritz = v
         if SORT_EIG_BY_SIMILARITY:
             e, v = _sort_by_similarity(w, v, nroots, conv, vlast, emin)
             if elast.size != e.size:
@@ -497,7 +533,15 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
                 emin = min(e)
 
         # remove subspace linear dependency
-        if any(((not conv[k]) and n**2>lindep) for k, n in enumerate(dx_norm)):
+        if thick_restart:
+            # Trial vectors for the roots which are not converged
+            for k, ek in enumerate(e):
+                if (not conv[k]) and dx_norm[k]**2 > lindep:
+                    xt[k] = precond(xt[k], ek, x0[k])
+                    xt[k] *= 1/numpy.sqrt(dot(xt[k].conj(), xt[k]).real)
+                else:
+                    xt[k] = None
+        elif any(((not conv[k]) and n**2>lindep) for k, n in enumerate(dx_norm)):
             for k, ek in enumerate(e):
                 if (not conv[k]) and dx_norm[k]**2 > lindep:
                     xt[k] = precond(xt[k], e[0], x0[k])
@@ -537,8 +581,30 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
             conv = [conv[k] or (norm < toloose) for k,norm in enumerate(dx_norm)]
             break
 
+        if thick_restart and space + len(xt) > max_space:
+            # The subspace is spanned by the lowest Ritz vectors and the
+            # eigenvectors of the previous iteration.
+            c = vritz[:,:nkeep]
+            if lobpcg and vlast is not None and not fresh_start:
+                vpad = numpy.zeros((space,vlast.shape[1]), dtype=c.dtype)
+                vpad[:vlast.shape[0]] = vlast
+                c = numpy.hstack((c, vpad))
+            c = _qr(c.T, numpy.dot, lindep)[0].T
+            nvec = c.shape[1]
+            if nvec < space:
+                log.debug1('Thick restart with %d vectors', nvec)
+                xs = _rotate_subspace(c, xs, _incore, nroots)
+                ax = _rotate_subspace(c, ax, _incore, nroots)
+                heff[:nvec,:nvec] = reduce(numpy.dot, (c.conj().T,
+                                                        heff[:space,:space], c))
+                v = numpy.dot(c.conj().T, v)
+                space = nvec
+
         max_dx_last = max_dx_norm
-        fresh_start = space+nroots > max_space
+        if thick_restart:
+            fresh_start = False
+        else:
+            fresh_start = space+nroots > max_space
 
         if callable(callback):
             callback(locals())
@@ -558,6 +624,35 @@ def davidson1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
 
     return numpy.asarray(conv), e, x0
 
+def block_davidson1(aop, x0, precond, *args, **kwargs):
+    '''Block Davidson diagonalization with thick restart.  It is
+    :func:`davidson1` with thick_restart=True and can be used in place of
+    :func:`davidson1`.  See the kwargs thick_restart, nkeep and lobpcg of
+    :func:`davidson1`.
+
+    Examples:
+
+    >>> from pyscf import lib
+    >>> a = numpy.random.random((10,10))
+    >>> a = a + a.T
+    >>> aop = lambda xs: [numpy.dot(a,x) for x in xs]
+    >>> precond = lambda dx, e, x0: dx/(a.diagonal()-e)
+    >>> x0 = a[0]
+    >>> conv, e, c = lib.block_davidson1(aop, x0, precond, nroots=2)
+    '''
+    kwargs.setdefault('thick_restart', True)
+    return davidson1(aop, x0, precond, *args, **kwargs)
+
+def _rotate_subspace(c, xs, incore, nroots):
+    '''Subspace bases transformed by the coefficients c: xs_new = c^T xs'''
+    if incore:
+        return list(_gen_x0(c, xs))
+    xs_new = _new_xlist(nroots)
+    for p0, p1 in misc.prange(0, c.shape[1], nroots):
+        for x in _gen_x0(c[:,p0:p1], xs):
+            xs_new.append(x)
+    return xs_new
+
 
 def make_diag_precond(diag, level_shift=0):
     '''Generate the preconditioner function with the diagonal function.'''
@@ -774,8 +869,8 @@ def davidson_nosym1(aop, x0, precond, tol=1e-12, max_cycle=50, max_space=12,
                 xs = []
                 ax = []
             else:
-                xs = _Xlist()
-                ax = _Xlist()
+                xs = _new_xlist(nroots)
+                ax = _new_xlist(nroots)
             space = 0
 # Orthogonalize xt space because the basis of subspace xs must be orthogonal
 # but the eigenvectors x0 might not be strictly orthogonal
@@ -1109,9 +1204,9 @@ def dgeev1(abop, x0, precond, type=1, tol=1e-12, max_cycle=50, max_space=12,
                 ax = []
                 bx = []
             else:
-                xs = _Xlist()
-                ax = _Xlist()
-                bx = _Xlist()
+                xs = _new_xlist(nroots)
+                ax = _new_xlist(nroots)
+                bx = _new_xlist(nroots)
             space = 0
 # Orthogonalize xt space because the basis of subspace xs must be orthogonal
 # but the eigenvectors x0 are very likely non-orthogonal when A is non-Hermitian.
@@ -1333,8 +1428,8 @@ def krylov(aop, b, x0=None, tol=1e-10, max_cycle=30, dot=numpy.dot,
         xs = []
         ax = []
     else:
-        xs = _Xlist()
-        ax = _Xlist()
+        xs = _new_xlist()
+        ax = _new_xlist()
 
     max_cycle = min(max_cycle, ndim)
     for cycle in range(max_cycle):
@@ -1564,6 +1659,186 @@ class _Xlist(list):
         key = self.index.pop(index)
         del(self.scr_h5[str(key)])
 
+
+class _MmapXlist(object):
+    '''Subspace vectors saved in a memory-mapped scratch file (see
+    :class:`RawTmpFile`).  It has the same interface as :class:`_Xlist`.
+
+    The vectors are written to the file in a background thread.  A vector
+    is read from the memory until it is written to the file.  The vectors
+    should not be modified after they are added to the list.  The arrays
+    returned by __getitem__ are only valid until the list is modified.
+
+    Kwargs:
+        depth : int
+            Max number of vectors waiting in the memory to be written.
+        single_precision_after : int or None
+            If specified, only the last single_precision_after vectors are
+            stored in double precision.  Older vectors are converted to
+            single precision, which halves the size of the scratch file and
+            the I/O of the subspace projection.  The errors of the
+            eigenvalues are ~1e-7 (relative) in this case.
+    '''
+    def __init__(self, depth=2, single_precision_after=None):
+        self.scr = RawTmpFile()
+        self.index = []
+        self.depth = depth
+        self.single_precision_after = single_precision_after
+        self._lock = threading.Lock()
+        self._nslots = 0
+        # The vectors which are not yet written to the file
+        self._pending = {}
+        # slot -> name of the dataset
+        self._datasets = {}
+        self._dtypes = {}
+        self._single = set()
+        self._ndatasets = 0
+        # The datasets which are released by the background thread.  They
+        # can be reused for new vectors when the list is modified next time
+        # (the arrays returned by __getitem__ may still refer to them).
+        self._released = []
+        self._free = []
+        self._tasks = collections.deque()
+        if (misc.ASYNC_IO and misc.ThreadPoolExecutor is not None and
+                not misc.imp.lock_held()):
+            self._executor = misc.ThreadPoolExecutor(max_workers=1)
+        else:
+            self._executor = None
+
+    def __getitem__(self, n):
+        slot = self.index[n]
+        with self._lock:
+            if slot in self._pending:
+                return self._pending[slot]
+            x = self.scr[self._datasets[slot]]
+        if x.dtype != self._dtypes[slot]:
+            x = numpy.asarray(x, dtype=self._dtypes[slot])
+        return x
+
+    def _submit(self, fn, *args):
+        if self._executor is None:
+            fn(*args)
+        else:
+            self._tasks.append(self._executor.submit(fn, *args))
+            while len(self._tasks) > self.depth:
+                self._tasks.popleft().result()
+
+    def _new_dataset(self, shape, dtype):
+        with self._lock:
+            for i, key in enumerate(self._free):
+                dset = self.scr[key]
+                if dset.shape == shape and dset.dtype == dtype:
+                    return self._free.pop(i)
+            key = str(self._ndatasets)
+            self._ndatasets += 1
+        self.scr.create_dataset(key, shape, dtype)
+        return key
+
+    def _write(self, slot, x, src=None):
+        if src is None:
+            src = x
+        key = self._new_dataset(x.shape, x.dtype)
+        self.scr[key][:] = x
+        with self._lock:
+            if slot in self._datasets:
+                self._released.append(self._datasets[slot])
+            self._datasets[slot] = key
+            if self._pending.get(slot) is src:
+                del self._pending[slot]
+
+    def _to_single_precision(self, slot):
+        with self._lock:
+            if slot not in self._datasets:  # released
+                return
+            x = self.scr[self._datasets[slot]]
+        if x.dtype == numpy.double:
+            self._write(slot, x.astype(numpy.float32))
+        elif x.dtype == numpy.complex128:
+            self._write(slot, x.astype(numpy.complex64))
+
+    def _release(self, slot):
+        with self._lock:
+            self._pending.pop(slot, None)
+            self._dtypes.pop(slot, None)
+            if slot in self._datasets:
+                self._released.append(self._datasets.pop(slot))
+
+    def append(self, x):
+        x = numpy.asarray(x)
+        slot = self._nslots
+        self._nslots += 1
+        self.index.append(slot)
+        with self._lock:
+            self._pending[slot] = x
+            self._dtypes[slot] = x.dtype
+            self._free.extend(self._released)
+            self._released = []
+        self._submit(self._write, slot, x)
+
+        nkeep = self.single_precision_after
+        if nkeep is not None and len(self.index) > nkeep:
+            slot = self.index[-nkeep-1]
+            if slot not in self._single:
+                self._single.add(slot)
+                self._submit(self._to_single_precision, slot)
+
+    def extend(self, x):
+        for xi in x:
+            self.append(xi)
+
+    def __setitem__(self, n, x):
+        x = numpy.asarray(x)
+        slot = self.index[n]
+        self._single.discard(slot)
+        with self._lock:
+            self._pending[slot] = x
+            self._dtypes[slot] = x.dtype
+            self._free.extend(self._released)
+            self._released = []
+        self._submit(self._write, slot, x)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def pop(self, index):
+        slot = self.index.pop(index)
+        self._single.discard(slot)
+        self._submit(self._release, slot)
+
+    def close(self):
+        while self._tasks:
+            self._tasks.popleft().result()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.scr.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+def _new_xlist(nroots=1):
+    '''Scratch storage of the subspace vectors for the out-of-core solvers.
+    The storage is determined by the config option
+    lib_linalg_helper_davidson_subspace_storage ('hdf5' or 'mmap').
+    '''
+    if SUBSPACE_STORAGE == 'mmap':
+        if SUBSPACE_SINGLE_PRECISION:
+            nkeep = nroots * 2
+        else:
+            nkeep = None
+        return _MmapXlist(depth=nroots*2, single_precision_after=nkeep)
+    elif SUBSPACE_STORAGE == 'hdf5':
+        return _Xlist()
+    else:
+        raise ValueError('Unknown subspace storage %s' % SUBSPACE_STORAGE)
+
 del(SAFE_EIGH_LINDEP, DAVIDSON_LINDEP, DSOLVE_LINDEP, MAX_MEMORY)
 
 
@@ -339,12 +339,9 @@ void FCIaxpy2d(double *out, double *in, size_t count, size_t no, size_t ni)
  * symmetry between alpha and beta spin.  The right contracted ci vector
  * is (ci1+ci1.T)
  */
-void FCIcontract_2e_spin0(double *eri, double *ci0, double *ci1,
-                          int norb, int na, int nlink, int *link_index)
+void FCIcontract_2e_spin0_packed(double *eri, double *ci0, double *ci1,
+                                 int norb, int na, int nlink, _LinkTrilT *clink)
 {
-        _LinkTrilT *clink = malloc(sizeof(_LinkTrilT) * nlink * na);
-        FCIcompress_link_tril(clink, link_index, na, nlink);
-
         memset(ci1, 0, sizeof(double)*na*na);
         double *ci1bufs[MAX_THREADS];
 #pragma omp parallel
@@ -376,30 +373,41 @@ void FCIcontract_2e_spin0(double *eri, double *ci0, double *ci1,
         free(ci1buf);
         free(t1buf);
 }
+}
+
+void FCIcontract_2e_spin0(double *eri, double *ci0, double *ci1,
+                          int norb, int na, int nlink, int *link_index)
+{
+        _LinkTrilT *clink = malloc(sizeof(_LinkTrilT) * nlink * na);
+        FCIcompress_link_tril(clink, link_index, na, nlink);
+        FCIcontract_2e_spin0_packed(eri, ci0, ci1, norb, na, nlink, clink);
         free(clink);
 }
 
 
-void FCIcontract_2e_spin1(double *eri, double *ci0, double *ci1,
-                          int norb, int na, int nb, int nlinka, int nlinkb,
-                          int *link_indexa, int *link_indexb)
+/*
+ * The beta strings are processed in batches of blksize strings.  Each thread
+ * holds an intermediate of na*blksize for the alpha-spread contributions.
+ * clinka and clinkb are the packed link tables (see
+ * FCIlinkstr_index_tril_packed).
+ */
+void FCIcontract_2e_spin1_blksize(double *eri, double *ci0, double *ci1,
+                                  int norb, int na, int nb, int nlinka, int nlinkb,
+                                  _LinkTrilT *clinka, _LinkTrilT *clinkb,
+                                  int blksize)
 {
-        _LinkTrilT *clinka = malloc(sizeof(_LinkTrilT) * nlinka * na);
-        _LinkTrilT *clinkb = malloc(sizeof(_LinkTrilT) * nlinkb * nb);
-        FCIcompress_link_tril(clinka, link_indexa, na, nlinka);
-        FCIcompress_link_tril(clinkb, link_indexb, nb, nlinkb);
-
+        blksize = MAX(1, MIN(blksize, nb));
         memset(ci1, 0, sizeof(double)*na*nb);
         double *ci1bufs[MAX_THREADS];
 #pragma omp parallel
 {
         int strk, ib;
         size_t blen;
-        double *t1buf = malloc(sizeof(double) * (STRB_BLKSIZE*norb*(norb+1)+2));
-        double *ci1buf = malloc(sizeof(double) * (na*STRB_BLKSIZE+2));
+        double *t1buf = malloc(sizeof(double) * ((size_t)blksize*norb*(norb+1)+2));
+        double *ci1buf = malloc(sizeof(double) * ((size_t)na*blksize+2));
         ci1bufs[omp_get_thread_num()] = ci1buf;
-        for (ib = 0; ib < nb; ib += STRB_BLKSIZE) {
-                blen = MIN(STRB_BLKSIZE, nb-ib);
+        for (ib = 0; ib < nb; ib += blksize) {
+                blen = MIN(blksize, nb-ib);
                 memset(ci1buf, 0, sizeof(double) * na*blen);
 #pragma omp for schedule(static)
                 for (strk = 0; strk < na; strk++) {
@@ -418,11 +426,157 @@ void FCIcontract_2e_spin1(double *eri, double *ci0, double *ci1,
         free(ci1buf);
         free(t1buf);
 }
+}
+
+void FCIcontract_2e_spin1(double *eri, double *ci0, double *ci1,
+                          int norb, int na, int nb, int nlinka, int nlinkb,
+                          int *link_indexa, int *link_indexb)
+{
+        _LinkTrilT *clinka = malloc(sizeof(_LinkTrilT) * nlinka * na);
+        _LinkTrilT *clinkb = malloc(sizeof(_LinkTrilT) * nlinkb * nb);
+        FCIcompress_link_tril(clinka, link_indexa, na, nlinka);
+        FCIcompress_link_tril(clinkb, link_indexb, nb, nlinkb);
+        FCIcontract_2e_spin1_blksize(eri, ci0, ci1, norb, na, nb, nlinka, nlinkb,
+                                     clinka, clinkb, STRB_BLKSIZE);
         free(clinka);
         free(clinkb);
 }
 
 
+/*
+ * Contract eri with nvec CI vectors in one pass.  The CI vectors are
+ * interleaved, ci0[stra,strb,nvec], so that each entry of the link tables
+ * is applied to nvec contiguous elements.  The intermediates of all vectors
+ * are stored in t1[nnorb,bcount,nvec] and contracted with eri by one dgemm.
+ */
+static void ctr_rhf2e_multi_kern(double *eri, double *ci0, double *ci1,
+                                 double *ci1buf, double *t1buf, int nvec,
+                                 int bcount, int stra_id, int strb_id,
+                                 int norb, int na, int nb, int nlinka, int nlinkb,
+                                 _LinkTrilT *clink_indexa, _LinkTrilT *clink_indexb)
+{
+        const char TRANS_N = 'N';
+        const double D0 = 0;
+        const double D1 = 1;
+        const int nnorb = norb * (norb+1)/2;
+        const int nrow = nvec * bcount;
+        const _LinkTrilT *taba = clink_indexa + stra_id * nlinka;
+        const _LinkTrilT *tabb = clink_indexb + strb_id * nlinkb;
+        double *t1 = t1buf;
+        double *vt1 = t1buf + (size_t)nnorb*nrow;
+        double *pt1, *pci;
+        double *pci0 = ci0 + (size_t)stra_id*nb*nvec;
+        double *pci1 = ci1 + (size_t)stra_id*nb*nvec;
+        int i, j, k, ia, sign;
+        size_t str1;
+
+        memset(t1, 0, sizeof(double)*nnorb*nrow);
+        for (j = 0; j < nlinka; j++) {
+                ia   = EXTRACT_IA  (taba[j]);
+                str1 = EXTRACT_ADDR(taba[j]);
+                sign = EXTRACT_SIGN(taba[j]);
+                pt1 = t1 + ia*nrow;
+                pci = ci0 + (str1*nb+strb_id) * nvec;
+                if (sign == 0) {
+                        break;
+                } else if (sign > 0) {
+                        for (k = 0; k < nrow; k++) {
+                                pt1[k] += pci[k];
+                        }
+                } else {
+                        for (k = 0; k < nrow; k++) {
+                                pt1[k] -= pci[k];
+                        }
+                }
+        }
+        for (i = 0; i < bcount; i++) {
+                for (j = 0; j < nlinkb; j++) {
+                        ia   = EXTRACT_IA  (tabb[i*nlinkb+j]);
+                        str1 = EXTRACT_ADDR(tabb[i*nlinkb+j]);
+                        sign = EXTRACT_SIGN(tabb[i*nlinkb+j]);
+                        pt1 = t1 + ia*nrow + i*nvec;
+                        pci = pci0 + str1*nvec;
+                        if (sign == 0) {
+                                break;
+                        } else if (sign > 0) {
+                                for (k = 0; k < nvec; k++) {
+                                        pt1[k] += pci[k];
+                                }
+                        } else {
+                                for (k = 0; k < nvec; k++) {
+                                        pt1[k] -= pci[k];
+                                }
+                        }
+                }
+        }
+
+        dgemm_(&TRANS_N, &TRANS_N, &nrow, &nnorb, &nnorb,
+               &D1, t1, &nrow, eri, &nnorb, &D0, vt1, &nrow);
+
+        for (i = 0; i < bcount; i++) {
+                for (j = 0; j < nlinkb; j++) {
+                        ia   = EXTRACT_IA  (tabb[i*nlinkb+j]);
+                        str1 = EXTRACT_ADDR(tabb[i*nlinkb+j]);
+                        sign = EXTRACT_SIGN(tabb[i*nlinkb+j]);
+                        pt1 = vt1 + ia*nrow + i*nvec;
+                        pci = pci1 + str1*nvec;
+                        if (sign == 0) {
+                                break;
+                        } else if (sign > 0) {
+                                for (k = 0; k < nvec; k++) {
+                                        pci[k] += pt1[k];
+                                }
+                        } else {
+                                for (k = 0; k < nvec; k++) {
+                                        pci[k] -= pt1[k];
+                                }
+                        }
+                }
+        }
+        spread_bufa_t1(ci1buf, vt1, nrow, nrow, stra_id, 0,
+                       norb, nrow, nlinka, clink_indexa);
+}
+
+/*
+ * ci1[:,:,i] = H ci0[:,:,i] for nvec interleaved CI vectors
+ * ci0[na,nb,nvec].  The link tables are traversed once for all vectors.
+ */
+void FCIcontract_2e_spin1_multi(double *eri, double *ci0, double *ci1,
+                                int norb, int na, int nb, int nlinka, int nlinkb,
+                                _LinkTrilT *clinka, _LinkTrilT *clinkb,
+                                int nvec, int blksize)
+{
+        blksize = MAX(1, MIN(blksize, nb));
+        memset(ci1, 0, sizeof(double)*na*nb*nvec);
+        double *ci1bufs[MAX_THREADS];
+#pragma omp parallel
+{
+        int strk, ib;
+        size_t blen;
+        double *t1buf = malloc(sizeof(double) * ((size_t)nvec*blksize*norb*(norb+1)+2));
+        double *ci1buf = malloc(sizeof(double) * ((size_t)nvec*na*blksize+2));
+        ci1bufs[omp_get_thread_num()] = ci1buf;
+        for (ib = 0; ib < nb; ib += blksize) {
+                blen = MIN(blksize, nb-ib);
+                memset(ci1buf, 0, sizeof(double) * nvec*na*blen);
+#pragma omp for schedule(static)
+                for (strk = 0; strk < na; strk++) {
+                        ctr_rhf2e_multi_kern(eri, ci0, ci1, ci1buf, t1buf,
+                                             nvec, blen, strk, ib,
+                                             norb, na, nb, nlinka, nlinkb,
+                                             clinka, clinkb);
+                }
+                NPomp_dsum_reduce_inplace(ci1bufs, nvec*blen*na);
+#pragma omp master
+                FCIaxpy2d(ci1+ib*nvec, ci1buf, na, (size_t)nb*nvec, nvec*blen);
+#pragma omp barrier
+        }
+        free(ci1buf);
+        free(t1buf);
+}
+}
+
+
 /*
  * eri_ab is mixed integrals (alpha,alpha|beta,beta), |beta,beta) in small strides
  */
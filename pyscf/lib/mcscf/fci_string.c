@@ -385,3 +385,58 @@ void FCIcompress_link_tril(_LinkTrilT *clink, int *link_index,
                 link_index += nlink * 4;
         }
 }
+
+/*
+ * Same to FCIlinkstr_index(..., store_trilidx=1) but the table is stored in
+ * the compressed _LinkTrilT records (8 bytes per entry instead of the 16 bytes
+ * of the int32 [tril(cre,des),0,linking-string-id,sign] records).
+ */
+void FCIlinkstr_index_tril_packed(_LinkTrilT *clink, int norb, int na, int nocc,
+                                  uint64_t *strs)
+{
+        int occ[norb];
+        int vir[norb];
+        int nvir = norb - nocc;
+        int nlink = nocc * nvir + nocc;
+        int str_id, io, iv, i, a, k;
+        uint64_t str0;
+        uint64_t str1s[nocc*nvir+1];
+        int addrbuf[nocc*nvir+1];
+        _LinkTrilT *tab;
+
+        for (str_id = 0; str_id < na; str_id++) {
+                str0 = strs[str_id];
+                for (i = 0, io = 0, iv = 0; i < norb; i++) {
+                        if (str0 & (1ULL<<i)) {
+                                occ[io] = i;
+                                io += 1;
+                        } else {
+                                vir[iv] = i;
+                                iv += 1;
+                        }
+                }
+
+                tab = clink + (size_t)str_id * nlink;
+                for (k = 0; k < nocc; k++) {
+                        tab[k].ia = occ[k]*(occ[k]+1)/2+occ[k];
+                        tab[k].addr = str_id;
+                        tab[k].sign = 1;
+                        tab[k]._padding = 0;
+                }
+                for (i = 0; i < nocc; i++) {
+                for (a = 0; a < nvir; a++, k++) {
+                        str1s[k-nocc] = (str0^(1ULL<<occ[i])) | (1ULL<<vir[a]);
+                        if (vir[a] > occ[i]) {
+                                tab[k].ia = vir[a]*(vir[a]+1)/2+occ[i];
+                        } else {
+                                tab[k].ia = occ[i]*(occ[i]+1)/2+vir[a];
+                        }
+                        tab[k].sign = FCIcre_des_sign(vir[a], occ[i], str0);
+                        tab[k]._padding = 0;
+                } }
+                FCIstrs2addr(addrbuf, str1s, nocc*nvir, norb, nocc);
+                for (k = 0; k < nocc*nvir; k++) {
+                        tab[k+nocc].addr = addrbuf[k];
+                }
+        }
+}
@@ -315,6 +315,94 @@ int SCIselect_strs(uint64_t *inter, uint64_t *strs,
         return ninter;
 }
 
+/*
+ * Heat-bath selection.  For each occupied orbital i, hb_single_orb lists the
+ * orbitals a sorted by eri_pq_max[a,i] in descending order (the values in
+ * hb_single_val).  For each pair a*norb+i, hb_double_pair lists the pairs
+ * b*norb+j sorted by |eri[a,i,b,j]| in descending order.  The loops over a
+ * list are terminated at the first integral below select_cutoff/civec_max.
+ * If inter is NULL, only the number of selected strings is returned.
+ */
+static int heatbath_select(uint64_t *inter, uint64_t str0, double ca,
+                           double select_cutoff, int norb,
+                           int *hb_single_offset, int *hb_single_orb,
+                           double *hb_single_val, int *hb_double_offset,
+                           int *hb_double_pair, double *hb_double_val)
+{
+        int ninter = 0;
+        int i, a, b, j, k, m, ai;
+        uint64_t str1;
+        for (i = 0; i < norb; i++) {
+                if (!(str0 & (1ULL<<i))) {
+                        continue;
+                }
+                for (k = hb_single_offset[i]; k < hb_single_offset[i+1]; k++) {
+                        if (hb_single_val[k] * ca <= select_cutoff) {
+                                break;
+                        }
+                        a = hb_single_orb[k];
+                        if (str0 & (1ULL<<a)) {
+                                continue;
+                        }
+                        str1 = (str0 ^ (1ULL<<i)) | (1ULL<<a);
+                        if (inter != NULL) {
+                                inter[ninter] = str1;
+                        }
+                        ninter++;
+
+                        ai = a * norb + i;
+                        for (m = hb_double_offset[ai]; m < hb_double_offset[ai+1]; m++) {
+                                if (hb_double_val[m] * ca <= select_cutoff) {
+                                        break;
+                                }
+                                b = hb_double_pair[m] / norb;
+                                j = hb_double_pair[m] % norb;
+                                if ((str0 & (1ULL<<b)) || !(str0 & (1ULL<<j))) {
+                                        continue;
+                                }
+                                if (inter != NULL) {
+                                        inter[ninter] = (str1 ^ (1ULL<<j)) | (1ULL<<b);
+                                }
+                                ninter++;
+                        }
+                }
+        }
+        return ninter;
+}
+
+/*
+ * If inter is NULL, counts[k] is the number of strings selected from
+ * strs[k].  Otherwise, the strings selected from strs[k] are stored in
+ * inter[offsets[k]:offsets[k]+counts[k]].
+ */
+void SCIselect_strs_heatbath(uint64_t *inter, int64_t *offsets, int64_t *counts,
+                             uint64_t *strs, double *civec_max,
+                             double select_cutoff, int norb, int nstrs,
+                             int *hb_single_offset, int *hb_single_orb,
+                             double *hb_single_val, int *hb_double_offset,
+                             int *hb_double_pair, double *hb_double_val)
+{
+#pragma omp parallel
+{
+        int str_id;
+        uint64_t *pinter;
+#pragma omp for schedule(dynamic, 16)
+        for (str_id = 0; str_id < nstrs; str_id++) {
+                if (inter == NULL) {
+                        pinter = NULL;
+                } else {
+                        pinter = inter + offsets[str_id];
+                }
+                counts[str_id] = heatbath_select(pinter, strs[str_id],
+                                                 civec_max[str_id], select_cutoff,
+                                                 norb, hb_single_offset,
+                                                 hb_single_orb, hb_single_val,
+                                                 hb_double_offset,
+                                                 hb_double_pair, hb_double_val);
+        }
+}
+}
+
 
 /*
  ***********************************************************
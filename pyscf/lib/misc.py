@@ -21,6 +21,7 @@ Some hacky functions
 '''
 
 import os, sys
+import time
 import warnings
 import imp
 import tempfile
@@ -32,8 +33,13 @@ import types
 import ctypes
 import numpy
 import h5py
+import threading
 from threading import Thread
 from multiprocessing import Queue, Process
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
 try:
     from concurrent.futures import ThreadPoolExecutor
 except ImportError:
@@ -789,6 +795,88 @@ def background_process(func, *args, **kwargs):
 bg = background = bg_thread = background_thread
 bp = bg_process = background_process
 
+def fork_context():
+    '''The multiprocessing context which starts the processes by fork.
+    Returns None if fork is not available (e.g. on Windows).
+    '''
+    import multiprocessing
+    try:
+        return multiprocessing.get_context('fork')
+    except (AttributeError, ValueError):
+        return None
+
+def map_in_processes(fn, tasks, nproc, callback=None, initializer=None,
+                     stdout=None):
+    '''Evaluate fn(task) for all tasks in nproc processes created by fork.
+
+    The inputs of fn are inherited by the processes through fork.  The
+    tasks are distributed to the processes through a queue and each process
+    runs with a single OpenMP thread.  The return value of fn(task) is sent
+    to the parent process where callback(i, result) is called in the order
+    the tasks are finished.  If fork is not available or nproc is 1, the
+    tasks are evaluated in the current process.
+
+    Kwargs:
+        callback : function(i, result)
+            Called in the parent process for the result of tasks[i].
+        initializer : function(p)
+            Called at the beginning of the p-th process.
+        stdout : file object
+            The output stream (besides sys.stdout) which is flushed before
+            the processes are created and when the processes exit.
+    '''
+    ctx = fork_context()
+    nproc = min(nproc, len(tasks))
+    if ctx is None or nproc <= 1:
+        if initializer is not None:
+            initializer(0)
+        for i, task in enumerate(tasks):
+            result = fn(task)
+            if callback is not None:
+                callback(i, result)
+        return
+
+    streams = [sys.stdout]
+    if stdout is not None:
+        streams.append(stdout)
+    task_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    for i in range(len(tasks)):
+        task_queue.put(i)
+    for p in range(nproc):
+        task_queue.put(None)
+
+    def worker(p):
+        # The OpenMP thread pool of the parent process is not usable in the
+        # forked processes
+        num_threads(1)
+        if initializer is not None:
+            initializer(p)
+        for i in iter(task_queue.get, None):
+            result_queue.put((i, fn(tasks[i])))
+        [f.flush() for f in streams]
+
+    # Avoid writing the buffered output of the parent process in children
+    [f.flush() for f in streams]
+    ps = [ctx.Process(target=worker, args=(p,)) for p in range(nproc)]
+    [p.start() for p in ps]
+    try:
+        for k in range(len(tasks)):
+            while True:
+                try:
+                    i, result = result_queue.get(timeout=1)
+                    break
+                except queue.Empty:
+                    if any(p.exitcode for p in ps):
+                        raise ProcessRuntimeError('Worker process failed')
+            if callback is not None:
+                callback(i, result)
+    finally:
+        for p in ps:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+
 ASYNC_IO = getattr(__config__, 'ASYNC_IO', True)
 class call_in_background(object):
     '''Within this macro, function(s) can be executed asynchronously (the
@@ -889,6 +977,203 @@ class call_in_background(object):
             self.executor.shutdown(wait=True)
 
 
+def iter_in_background(iterable, depth=2, sync=None):
+    '''Iterate over the iterable in a background thread.  At most depth
+    items are generated ahead of the consumer and kept in a bounded queue.
+
+    Generators can be chained to build a pipeline in which each stage runs
+    in its own thread.  If the items are views of reused buffers, the
+    producer should rotate over at least depth+2 buffers since one item can
+    be in production while depth items are queued and one is being
+    consumed.
+
+    Kwargs:
+        depth : int
+            The size of the queue.
+        sync : bool
+            Whether to iterate in the current thread.  By default, it follows
+            the config option ASYNC_IO.
+
+    Examples:
+
+    >>> ao_blocks = iter_in_background(gen_ao_integrals(), depth=2)
+    >>> for mo_block in iter_in_background(transform(ao_blocks), depth=2):
+    ...     save(mo_block)
+    '''
+    if sync is None:
+        sync = not ASYNC_IO
+    if sync or depth < 1 or imp.lock_held():
+        for item in iterable:
+            yield item
+        return
+
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((0, item)):
+                    break
+            else:
+                put((1, None))
+        except BaseException as e:
+            put((2, e))
+        finally:
+            if stop.is_set() and hasattr(iterable, 'close'):
+                iterable.close()
+
+    thread = Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            flag, item = q.get()
+            if flag == 1:
+                break
+            elif flag == 2:
+                raise ThreadRuntimeError('Error on thread %s:\n%s' % (thread, item))
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+def readahead(dset, start=0, stop=None, axis=0):
+    '''Advise the operating system to read the data dset[start:stop] (along
+    the given axis) into the page cache (posix_fadvise WILLNEED).  It is a
+    hint only.  Nothing is done for the chunked HDF5 datasets, the in-memory
+    arrays or if the file driver does not expose the file descriptor.
+
+    Kwargs:
+        axis : int
+            0 or 1.  The axis of the slice start:stop.
+    '''
+    if (not hasattr(os, 'posix_fadvise') or
+        not isinstance(dset, h5py.Dataset) or axis > 1 or dset.ndim <= axis):
+        return
+    try:
+        offset = dset.id.get_offset()
+        fd = dset.file.id.get_vfd_handle()
+    except Exception:
+        return
+    if offset is None or not isinstance(fd, int):
+        return
+
+    shape = dset.shape
+    if stop is None:
+        stop = shape[axis]
+    row_bytes = dset.dtype.itemsize * int(numpy.prod(shape[axis+1:], dtype=int))
+    length = (stop - start) * row_bytes
+    if length <= 0:
+        return
+    if axis == 0:
+        offsets = [offset + start * row_bytes]
+    else:
+        stride = shape[1] * row_bytes
+        offsets = [offset + i * stride + start * row_bytes
+                   for i in range(shape[0])]
+    try:
+        for off in offsets:
+            os.posix_fadvise(fd, off, length, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+
+class BlockReader(object):
+    '''Read blocks of data in a background thread (see
+    :func:`iter_in_background`), ahead of the consumer.  The data are read
+    into a fixed set of preallocated buffers.  Up to depth blocks are read
+    ahead.  A block returned by the iterator is valid until the next block is
+    requested.
+
+    Args:
+        load : function(p0, p1, buf) => array
+            Read the block [p0:p1] into the buffer buf and return the data
+            (usually a view of buf).
+        blocks : list of (p0, p1)
+            The blocks to read, e.g. lib.prange(0, n, blksize).
+        shape : tuple
+            The shape of the buffers
+        dtype :
+            The data type of the buffers
+
+    Kwargs:
+        depth : int
+            Number of blocks to read ahead.  depth+1 buffers are allocated.
+        hint : function(p0, p1) => None
+            If given, it is called for the next block before loading the
+            current block, e.g. to let the operating system read ahead the
+            data with :func:`readahead`.
+        sync : bool
+            Whether to read the data in the current thread.  By default, it
+            follows the config option ASYNC_IO.
+
+    Attributes:
+        wait_time : float
+            The wall time (in seconds) that the consumer waited for the data.
+
+    Examples:
+
+    >>> reader = lib.BlockReader(lambda p0, p1, buf: numpy.asarray(dset[p0:p1], out=buf[:p1-p0]),
+    ...                          lib.prange(0, n, blksize), (blksize, ncol), 'f8')
+    >>> for (p0, p1), dat in reader:
+    ...     dat.sum()
+    >>> print(reader.wait_time)
+    '''
+    def __init__(self, load, blocks, shape, dtype=numpy.double, depth=1,
+                 hint=None, sync=None):
+        self.load = load
+        self.blocks = list(blocks)
+        self.shape = shape
+        self.dtype = dtype
+        self.depth = max(1, depth)
+        self.hint = hint
+        if sync is None:
+            sync = not ASYNC_IO
+        self.sync = sync
+        self.wait_time = 0
+
+    def _hint(self, k):
+        if self.hint is not None and k < len(self.blocks):
+            self.hint(*self.blocks[k])
+
+    def __iter__(self):
+        # The buffers are returned to the producer through the queue free
+        free = queue.Queue()
+        for i in range(min(self.depth+1, len(self.blocks))):
+            free.put(numpy.empty(self.shape, self.dtype))
+
+        def load_blocks():
+            for k, (p0, p1) in enumerate(self.blocks):
+                buf = free.get()
+                if buf is None:  # The consumer stopped
+                    return
+                self._hint(k+1)
+                yield (p0, p1), self.load(p0, p1, buf), buf
+
+        blocks = iter_in_background(load_blocks(), self.depth, self.sync)
+        try:
+            while True:
+                t0 = time.time()
+                try:
+                    block, dat, buf = next(blocks)
+                except StopIteration:
+                    break
+                self.wait_time += time.time() - t0
+                yield block, dat
+                dat = None
+                free.put(buf)
+        finally:
+            free.put(None)
+            blocks.close()
+
 class H5TmpFile(h5py.File):
     '''Create and return an HDF5 temporary file.
 
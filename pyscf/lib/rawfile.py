@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Raw binary data files
+
+A light-weight alternative to HDF5 for the integral and scratch files of the
+out-of-core algorithms.  The datasets are stored as contiguous arrays in one
+file and are accessed through numpy.memmap.  Slicing a dataset does not copy
+the data and does not go through the global lock of h5py, so that multiple
+threads can read the file concurrently.  The names, shapes and dtypes of the
+datasets are kept in a small JSON index at the end of the file.
+
+RawFile mimics the part of the h5py.File/h5py.Group API which is used by the
+out-of-core code (create_group, create_dataset, __getitem__, __setitem__,
+__delitem__, __contains__, keys, flush, close).  Datasets are returned as
+numpy.memmap arrays.
+
+File layout::
+
+    magic (8 bytes) | index offset (int64) | index size (int64) | data ... | index
+'''
+
+import os
+import json
+import tempfile
+import threading
+import numpy
+import h5py
+from pyscf.lib import param
+
+MAGIC = b'PYSCFRAW'
+HEADER_SIZE = 24
+# Datasets are aligned to memory pages
+ALIGNMENT = 4096
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def is_rawfile(filename):
+    '''Whether filename is a raw data file created by :class:`RawFile`'''
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except (IOError, OSError, TypeError):
+        return False
+
+def open_datafile(filename, mode='r', storage=None):
+    '''Open a data file with :class:`RawFile` or h5py.File
+
+    Kwargs:
+        storage : str
+            'raw' or 'hdf5'.  The file format for the new files.  If not
+            specified, the format is determined by the existing file (HDF5 if
+            the file does not exist).
+    '''
+    if storage is None:
+        storage = 'raw' if is_rawfile(filename) else 'hdf5'
+    if storage == 'raw':
+        return RawFile(filename, mode)
+    elif storage == 'hdf5':
+        return h5py.File(filename, mode)
+    else:
+        raise ValueError('Unknown storage %s' % storage)
+
+
+class RawGroup(object):
+    '''A group in :class:`RawFile`, analogous to h5py.Group'''
+    def __init__(self, rawfile, name='/'):
+        self.file = rawfile
+        self.name = name
+
+    def _path(self, key):
+        key = str(key)
+        if key.startswith('/'):
+            return key.strip('/')
+        prefix = self.name.strip('/')
+        if prefix:
+            return prefix + '/' + key.strip('/')
+        else:
+            return key.strip('/')
+
+    def __getitem__(self, key):
+        return self.file._get(self._path(key))
+
+    def __setitem__(self, key, data):
+        self.create_dataset(key, data=data)
+
+    def __delitem__(self, key):
+        self.file._delete(self._path(key))
+
+    def __contains__(self, key):
+        return self.file._exists(self._path(key))
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return self.file._children(self.name.strip('/'))
+
+    def create_group(self, key):
+        return self.file._create_group(self._path(key))
+
+    def create_dataset(self, key, shape=None, dtype=None, data=None, **kwargs):
+        '''Create a dataset and return it as a numpy.memmap array.  The h5py
+        keyword arguments (chunks, compression, ...) are ignored.
+        '''
+        return self.file._create_dataset(self._path(key), shape, dtype, data)
+
+    def __repr__(self):
+        return '<RawGroup "%s" (%d members) in %s>' % (self.name, len(self),
+                                                       self.file.filename)
+
+
+class RawFile(RawGroup):
+    '''Raw binary data file
+
+    Args:
+        filename : str
+            The file name.
+
+    Kwargs:
+        mode : str
+            'r' for read-only, 'r+' to modify an existing file, 'w' to
+            create (overwrite) a file, 'a' to modify the file if it exists
+            or create it otherwise.
+
+    The JSON index is written to the file by :meth:`flush` or :meth:`close`.
+
+    Examples:
+
+    >>> f = lib.RawFile('eri.dat', 'w')
+    >>> f['a/b'] = numpy.eye(3)
+    >>> f.close()
+    >>> f = lib.RawFile('eri.dat', 'r')
+    >>> f['a']['b'][1:]
+    memmap([[0., 1., 0.],
+            [0., 0., 1.]])
+    '''
+    def __init__(self, filename, mode='a'):
+        RawGroup.__init__(self, self, '/')
+        self.filename = filename
+        self.mode = mode
+        self._lock = threading.RLock()
+        self._datasets = {}
+        self._groups = set()
+        self._arrays = {}
+        self._fd = None
+
+        if mode == 'r':
+            self._fd = open(filename, 'rb')
+        elif mode == 'r+':
+            self._fd = open(filename, 'r+b')
+        elif mode == 'w' or (mode == 'a' and not os.path.exists(filename)):
+            self._fd = open(filename, 'w+b')
+        elif mode == 'a':
+            self._fd = open(filename, 'r+b')
+        else:
+            raise ValueError('Invalid mode %s' % mode)
+
+        if mode == 'w' or (mode == 'a' and os.path.getsize(filename) == 0):
+            self._fd.truncate(0)
+            self._end = _align(HEADER_SIZE)
+            self._write_header(0, 0)
+        else:
+            self._load_index()
+
+    def _write_header(self, index_offset, index_size):
+        self._fd.seek(0)
+        self._fd.write(MAGIC)
+        self._fd.write(numpy.asarray((index_offset, index_size), '<i8').tobytes())
+
+    def _load_index(self):
+        self._fd.seek(0)
+        head = self._fd.read(HEADER_SIZE)
+        if head[:len(MAGIC)] != MAGIC:
+            raise IOError('%s is not a raw data file' % self.filename)
+        offset, size = numpy.frombuffer(head[len(MAGIC):HEADER_SIZE], '<i8')
+        if offset == 0:  # index was not written
+            self._end = _align(HEADER_SIZE)
+            return
+        self._fd.seek(int(offset))
+        index = json.loads(self._fd.read(int(size)).decode())
+        self._datasets = index['datasets']
+        self._groups = set(index['groups'])
+        self._end = int(offset)
+
+    def _exists(self, path):
+        return path in self._datasets or self._is_group(path)
+
+    def _is_group(self, path):
+        if path == '' or path in self._groups:
+            return True
+        prefix = path + '/'
+        return any(key.startswith(prefix) for key in self._datasets)
+
+    def _children(self, prefix):
+        if prefix:
+            prefix = prefix + '/'
+        names = set()
+        for key in list(self._datasets) + list(self._groups):
+            if key.startswith(prefix) and key != prefix:
+                names.add(key[len(prefix):].split('/')[0])
+        return sorted(names)
+
+    def _map(self, path):
+        meta = self._datasets[path]
+        shape = tuple(meta['shape'])
+        dtype = numpy.dtype(meta['dtype'])
+        if numpy.prod(shape, dtype=int) == 0:
+            return numpy.zeros(shape, dtype)
+        if self.mode == 'r':
+            mode = 'r'
+        else:
+            mode = 'r+'
+        return numpy.memmap(self._fd, dtype, mode, meta['offset'], shape)
+
+    def _get(self, path):
+        with self._lock:
+            if path in self._datasets:
+                if path not in self._arrays:
+                    self._arrays[path] = self._map(path)
+                return self._arrays[path]
+            elif self._is_group(path):
+                return RawGroup(self, '/' + path)
+        raise KeyError('Unable to open object %s in %s' % (path, self.filename))
+
+    def _add_parents(self, path):
+        names = path.split('/')
+        for i in range(1, len(names)):
+            self._groups.add('/'.join(names[:i]))
+
+    def _create_group(self, path):
+        if self.mode == 'r':
+            raise ValueError('%s is opened in read-only mode' % self.filename)
+        with self._lock:
+            if self._exists(path):
+                raise ValueError('Unable to create group %s (name already exists)'
+                                 % path)
+            self._add_parents(path)
+            self._groups.add(path)
+        return RawGroup(self, '/' + path)
+
+    def _create_dataset(self, path, shape=None, dtype=None, data=None):
+        if self.mode == 'r':
+            raise ValueError('%s is opened in read-only mode' % self.filename)
+        if data is not None:
+            data = numpy.asarray(data, dtype=dtype)
+            if shape is None:
+                shape = data.shape
+            dtype = data.dtype
+        if dtype is None:
+            dtype = 'f8'
+        if isinstance(shape, (int, numpy.integer)):
+            shape = (shape,)
+        shape = tuple(int(x) for x in shape)
+        dtype = numpy.dtype(dtype)
+        nbytes = int(numpy.prod(shape, dtype=int)) * dtype.itemsize
+
+        with self._lock:
+            if self._exists(path):
+                raise ValueError('Unable to create dataset %s (name already exists)'
+                                 % path)
+            offset = self._end
+            self._end = _align(offset + nbytes)
+            self._datasets[path] = {'offset': offset, 'shape': shape,
+                                    'dtype': dtype.str}
+            self._add_parents(path)
+            if os.fstat(self._fd.fileno()).st_size < self._end:
+                self._fd.truncate(self._end)
+            arr = self._arrays[path] = self._map(path)
+        if data is not None:
+            arr[...] = data.reshape(shape)
+        return arr
+
+    def _delete(self, path):
+        if self.mode == 'r':
+            raise ValueError('%s is opened in read-only mode' % self.filename)
+        with self._lock:
+            if not self._exists(path) or path == '':
+                raise KeyError('Unable to delete object %s in %s' %
+                               (path, self.filename))
+            prefix = path + '/'
+            for key in list(self._datasets):
+                if key == path or key.startswith(prefix):
+                    del(self._datasets[key])
+                    self._arrays.pop(key, None)
+            for key in list(self._groups):
+                if key == path or key.startswith(prefix):
+                    self._groups.remove(key)
+# The space of the deleted datasets is not reclaimed, as in HDF5
+
+    def flush(self):
+        '''Flush the datasets and write the index to the file'''
+        if self._fd is None or self.mode == 'r':
+            return
+        with self._lock:
+            for arr in self._arrays.values():
+                if isinstance(arr, numpy.memmap):
+                    arr.flush()
+            index = json.dumps({'datasets': self._datasets,
+                                'groups': sorted(self._groups)}).encode()
+            self._fd.seek(self._end)
+            self._fd.write(index)
+            self._fd.truncate()
+            self._write_header(self._end, len(index))
+            self._fd.flush()
+
+    def close(self):
+        if self._fd is not None:
+            self.flush()
+            self._arrays = {}
+            self._fd.close()
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except (ValueError, AttributeError):
+            pass
+
+    def __repr__(self):
+        return '<RawFile "%s" (mode %s)>' % (self.filename, self.mode)
+
+
+class RawTmpFile(RawFile):
+    '''Create and return a temporary raw data file.
+
+    Kwargs:
+        filename : str or None
+            If a string is given, a raw data file of the given filename will
+            be created. The file will exist even if the RawTmpFile object is
+            released.  If nothing is specified, the temporary file will be
+            deleted when the RawTmpFile object is released.
+
+    Examples:
+
+    >>> from pyscf import lib
+    >>> ftmp = lib.RawTmpFile()
+    '''
+    def __init__(self, filename=None, mode='a'):
+        # The anonymous temporary file is unlinked once tmpfile is released.
+        # Its contents are not written back when it is closed.
+        self._scratch = filename is None
+        if filename is None:
+            tmpfile = tempfile.NamedTemporaryFile(dir=param.TMPDIR)
+            filename = tmpfile.name
+        RawFile.__init__(self, filename, mode)
+
+    def close(self):
+        if self._fd is not None and self._scratch:
+            self._arrays = {}
+            self._fd.close()
+            self._fd = None
+        else:
+            RawFile.close(self)
@@ -20,8 +20,10 @@ import numpy
 import scipy.linalg
 import tempfile
 from pyscf import gto
+from pyscf import lib
 from pyscf import scf
 from pyscf import fci
+from pyscf.lib import linalg_helper
 
 class KnownValues(unittest.TestCase):
     def test_davidson(self):
@@ -38,6 +40,88 @@ class KnownValues(unittest.TestCase):
         e = myfci.kernel()[0]
         self.assertAlmostEqual(e, -11.579978414933732+mol.energy_nuc(), 9)
 
+    def test_davidson_subspace_storage(self):
+        mol = gto.Mole()
+        mol.verbose = 0
+        mol.atom = [['H', (0,0,i)] for i in range(8)]
+        mol.basis = {'H': 'sto-3g'}
+        mol.build()
+        mf = scf.RHF(mol)
+        mf.scf()
+        eref = -11.579978414933732+mol.energy_nuc()
+        for storage in ('hdf5', 'mmap'):
+            with lib.temporary_env(linalg_helper, SUBSPACE_STORAGE=storage):
+                myfci = fci.FCI(mol, mf.mo_coeff)
+                myfci.max_memory = .001
+                myfci.max_cycle = 100
+                e = myfci.kernel()[0]
+                self.assertAlmostEqual(e, eref, 9)
+
+                with lib.temporary_env(lib.misc, ASYNC_IO=False):
+                    e = myfci.kernel(nroots=2)[0]
+                self.assertAlmostEqual(e[0], eref, 9)
+
+        with lib.temporary_env(linalg_helper, SUBSPACE_STORAGE='mmap',
+                               SUBSPACE_SINGLE_PRECISION=True):
+            myfci = fci.FCI(mol, mf.mo_coeff)
+            myfci.max_memory = .001
+            myfci.max_cycle = 100
+            myfci.conv_tol = 1e-8
+            e = myfci.kernel()[0]
+        self.assertAlmostEqual(e, eref, 5)
+
+    def test_block_davidson(self):
+        numpy.random.seed(12)
+        n = 200
+        a = numpy.random.random((n,n)) * .1
+        a = a + a.T + numpy.diag(numpy.arange(n)*.1)
+        e_ref = numpy.linalg.eigh(a)[0]
+        aop = lambda xs: [numpy.dot(a, x) for x in xs]
+        x0 = numpy.eye(n)[:4]
+        for lobpcg in (True, False):
+            for max_memory in (2000, 0):
+                conv, e, c = linalg_helper.block_davidson1(
+                    aop, x0, a.diagonal(), tol=1e-12, nroots=4, max_cycle=100,
+                    max_memory=max_memory, lobpcg=lobpcg)
+                self.assertTrue(all(conv))
+                self.assertAlmostEqual(abs(e - e_ref[:4]).max(), 0, 9)
+                self.assertAlmostEqual(abs(numpy.dot(a, c[3]) - e[3]*c[3]).max(), 0, 5)
+
+        mol = gto.M(atom=[['H', (0,0,i)] for i in range(8)], basis='sto-3g')
+        mf = scf.RHF(mol).run()
+        myfci = fci.FCI(mol, mf.mo_coeff)
+        e_ref = myfci.kernel(nroots=3)[0]
+        with lib.temporary_env(lib, davidson1=linalg_helper.block_davidson1):
+            e = myfci.kernel(nroots=3)[0]
+        self.assertTrue(all(myfci.converged))
+        self.assertAlmostEqual(abs(numpy.array(e) - e_ref).max(), 0, 8)
+
+    def test_mmap_xlist(self):
+        numpy.random.seed(1)
+        a = numpy.random.random((6,10))
+        for sync in (True, False):
+            with lib.temporary_env(lib.misc, ASYNC_IO=not sync):
+                xs = linalg_helper._MmapXlist(depth=1, single_precision_after=3)
+            xs.extend(a[:5])
+            xs[1] = a[5]
+            xs.pop(0)
+            xs.append(a[0])
+            self.assertEqual(len(xs), 5)
+            ref = a[[5,2,3,4,0]]
+            self.assertEqual(xs[0].dtype, numpy.double)
+            self.assertAlmostEqual(abs(numpy.array(list(xs)) - ref).max(), 0, 6)
+            self.assertAlmostEqual(abs(xs[4] - ref[4]).max(), 0, 14)
+            xs.close()
+
+    def test_krylov_mmap(self):
+        numpy.random.seed(1)
+        a = numpy.random.random((20,20)) * .1
+        b = numpy.random.random(20)
+        ref = numpy.linalg.solve(numpy.eye(20)+a, b)
+        with lib.temporary_env(linalg_helper, SUBSPACE_STORAGE='mmap'):
+            x = lib.krylov(lambda x: numpy.dot(x, a.T), b, max_memory=0)
+        self.assertAlmostEqual(abs(x - ref).max(), 0, 8)
+
 if __name__ == "__main__":
     print("Full Tests for linalg_helper")
     unittest.main()
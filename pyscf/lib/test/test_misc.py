@@ -30,6 +30,72 @@ class KnownValues(unittest.TestCase):
 
         self.assertRaises(lib.ThreadRuntimeError, bg_raise)
 
+    def test_iter_in_background(self):
+        def gen(n):
+            for i in range(n):
+                yield i
+        def square(it):
+            for i in it:
+                yield i * i
+        out = list(lib.iter_in_background(square(lib.iter_in_background(gen(10)))))
+        self.assertEqual(out, [i*i for i in range(10)])
+
+        for i in lib.iter_in_background(gen(1000), depth=1):
+            if i == 3:
+                break
+        self.assertEqual(i, 3)
+
+        def raise1():
+            yield 1
+            raise ValueError
+        self.assertRaises(lib.ThreadRuntimeError, list,
+                          lib.iter_in_background(raise1()))
+
+    def test_block_reader(self):
+        a = numpy.arange(100.).reshape(25,4)
+        def load(p0, p1, buf):
+            buf = buf[:p1-p0]
+            buf[:] = a[p0:p1]
+            return buf
+        hints = []
+        for sync in (True, False):
+            reader = lib.BlockReader(load, lib.prange(0, 25, 3), (3,4),
+                                     hint=lambda p0, p1: hints.append(p0),
+                                     sync=sync)
+            out = [dat.copy() for (p0, p1), dat in reader]
+            self.assertAlmostEqual(abs(numpy.vstack(out) - a).max(), 0, 14)
+            self.assertTrue(reader.wait_time >= 0)
+
+        reader = lib.BlockReader(load, lib.prange(0, 25, 3), (3,4), depth=2)
+        for (p0, p1), dat in reader:
+            if p0 == 6:
+                break
+        self.assertAlmostEqual(abs(dat - a[6:9]).max(), 0, 14)
+
+        def raise1(p0, p1, buf):
+            raise ValueError
+        self.assertRaises(lib.ThreadRuntimeError, list,
+                          lib.BlockReader(raise1, [(0, 1)], (1,), sync=False))
+
+        with lib.H5TmpFile() as f:
+            f['a'] = a
+            lib.readahead(f['a'], 2, 5)
+            lib.readahead(f['a'], 1, 2, axis=1)
+
+    def test_map_in_processes(self):
+        out = {}
+        def callback(i, x):
+            out[i] = x
+        for nproc in (1, 3):
+            out.clear()
+            lib.map_in_processes(lambda x: x**2, list(range(10)), nproc, callback)
+            self.assertEqual(out, dict((i, i**2) for i in range(10)))
+
+        def fail(x):
+            raise ValueError
+        self.assertRaises(lib.ProcessRuntimeError, lib.map_in_processes,
+                          fail, [1, 2], 2)
+
     def test_index_tril_to_pair(self):
         i_j = (numpy.random.random((2,30)) * 100).astype(int)
         i0 = numpy.max(i_j, axis=0)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# Copyright 2014-2018 The PySCF Developers. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import tempfile
+import numpy
+import h5py
+from pyscf import lib
+
+class KnownValues(unittest.TestCase):
+    def test_rawfile(self):
+        ftmp = tempfile.NamedTemporaryFile(dir=lib.param.TMPDIR)
+        numpy.random.seed(2)
+        a = numpy.random.random((5,7))
+        with lib.RawFile(ftmp.name, 'w') as f:
+            g = f.create_group('0')
+            self.assertEqual(len(g), 0)
+            dat = g.create_dataset('0', (7,5), 'f8', chunks=(2,5))
+            dat[:4] = a.T[:4]
+            dat[4:] = a.T[4:]
+            f['0/1'] = a.astype(numpy.complex128)
+            f['empty'] = numpy.zeros((0,3))
+            self.assertRaises(ValueError, f.create_dataset, '0/1', (2,))
+        self.assertTrue(lib.is_rawfile(ftmp.name))
+        self.assertFalse(h5py.is_hdf5(ftmp.name))
+
+        with lib.open_datafile(ftmp.name, 'r') as f:
+            self.assertEqual(f.keys(), ['0', 'empty'])
+            self.assertEqual(f['0'].keys(), ['0', '1'])
+            self.assertTrue('0/1' in f)
+            self.assertTrue(isinstance(f['0']['0'], numpy.memmap))
+            self.assertAlmostEqual(abs(f['0/0'][2:5] - a.T[2:5]).max(), 0, 14)
+            self.assertEqual(f['0/1'].dtype, numpy.complex128)
+            self.assertAlmostEqual(abs(f['0/1'] - a).max(), 0, 14)
+            self.assertEqual(f['empty'].shape, (0,3))
+            self.assertRaises(ValueError, f.create_dataset, 'x', (2,))
+            self.assertRaises(KeyError, f.__getitem__, 'x')
+
+        with lib.RawFile(ftmp.name, 'a') as f:
+            del(f['0'])
+            f['x'] = numpy.arange(3)
+        with lib.RawFile(ftmp.name, 'r') as f:
+            self.assertEqual(f.keys(), ['empty', 'x'])
+            self.assertEqual(f['x'].tolist(), [0, 1, 2])
+
+    def test_raw_tmpfile(self):
+        with lib.RawTmpFile() as f:
+            dat = f.create_dataset('a', (300,200), 'f8')
+            dat[:] = 1.
+            blocks = [f['a'][i:i+50] for i in range(0, 300, 50)]
+            self.assertTrue(all(numpy.shares_memory(b, f['a']) for b in blocks))
+            self.assertAlmostEqual(sum(b.sum() for b in blocks), 60000, 9)
+
+        # A scratch file is closed without writing back its data
+        f = lib.RawTmpFile()
+        f.create_dataset('a', (30,20), 'f8')[:] = 1.
+        with lib.temporary_env(f, flush=None):
+            f.close()
+        self.assertTrue(f._fd is None)
+
+        ftmp = tempfile.NamedTemporaryFile()
+        f = lib.RawTmpFile(ftmp.name)
+        f.create_dataset('a', (30,20), 'f8')[:] = 1.
+        f.close()
+        with lib.RawFile(ftmp.name, 'r') as f:
+            self.assertAlmostEqual(f['a'].sum(), 600, 9)
+
+
+if __name__ == "__main__":
+    print("Full Tests for lib.rawfile")
+    unittest.main()
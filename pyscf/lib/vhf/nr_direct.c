@@ -353,23 +353,23 @@ static int shls_block_partition(int *block_loc, int *shls_slice, int *ao_loc)
 
 
 
+int CVHFnr_direct_block_partition(int *block_loc, int *shls_slice, int *ao_loc)
+{
+        return shls_block_partition(block_loc, shls_slice, ao_loc);
+}
+
 /*
- * drv loop over ij, generate eris of kl for given ij, call fjk to
- * calculate vj, vk.
- * 
- * n_dm is the number of dms for one [array(ij|kl)], it is also the size of dms and vjk
- * ncomp is the number of components that produced by intor
- * shls_slice = [ishstart, ishend, jshstart, jshend, kshstart, kshend, lshstart, lshend]
- *
- * ao_loc[i+1] = ao_loc[i] + CINTcgto_spheric(i, bas)  for i = 0..nbas
- *
- * Return [(ptr[ncomp,nao,nao] in C-contiguous) for ptr in vjk]
+ * Evaluate the shell-quartet blocks given by tasks (or all blocks if tasks
+ * is NULL).  The block id of (i, j, k, l) is
+ *      ((i * nblock_j + j) * nblock_k + k) * nblock_l + l
+ * with the block partitions generated by CVHFnr_direct_block_partition.
  */
-void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), JKOperator **jkop,
-                       double **dms, double **vjk, int n_dm, int ncomp,
-                       int *shls_slice, int *ao_loc,
-                       CINTOpt *cintopt, CVHFOpt *vhfopt,
-                       int *atm, int natm, int *bas, int nbas, double *env)
+static void direct_blocks(int (*intor)(), void (*fdot)(), JKOperator **jkop,
+                          double **dms, double **vjk, int n_dm, int ncomp,
+                          int *shls_slice, int *ao_loc,
+                          CINTOpt *cintopt, CVHFOpt *vhfopt,
+                          int *tasks, int ntasks,
+                          int *atm, int natm, int *bas, int nbas, double *env)
 {
         IntorEnvs envs = {natm, nbas, atm, bas, env, shls_slice, ao_loc, NULL,
                 cintopt, ncomp};
@@ -396,10 +396,13 @@ void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), JKOperator **jkop,
         const int nblock_kl = nblock_k * nblock_l;
         const int nblock_jkl = nblock_j * nblock_kl;
         const int nblock_ijkl = nblock_i * nblock_jkl;
+        if (tasks == NULL) {
+                ntasks = nblock_ijkl;
+        }
 
 #pragma omp parallel
 {
-        int i, j, k, l, r, blk_id;
+        int i, j, k, l, r, blk_id, itask;
         JKArray *v_priv[n_dm];
         for (i = 0; i < n_dm; i++) {
                 v_priv[i] = allocate_JKArray(jkop[i], shls_slice, ao_loc, ncomp);
@@ -407,7 +410,12 @@ void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), JKOperator **jkop,
         double *buf = malloc(sizeof(double) * (di*di*di*di*ncomp + cache_size));
         double *cache = buf + di*di*di*di*ncomp;
 #pragma omp for nowait schedule(dynamic, 1)
-        for (blk_id = 0; blk_id < nblock_ijkl; blk_id++) {
+        for (itask = 0; itask < ntasks; itask++) {
+                if (tasks == NULL) {
+                        blk_id = itask;
+                } else {
+                        blk_id = tasks[itask];
+                }
                 // dispatch blk_id to sub-block indices (i, j, k, l)
                 r = blk_id;
                 i = r / nblock_jkl; r = r - i * nblock_jkl;
@@ -433,3 +441,76 @@ void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), JKOperator **jkop,
         free(block_iloc);
 }
 
+/*
+ * drv loop over ij, generate eris of kl for given ij, call fjk to
+ * calculate vj, vk.
+ * 
+ * n_dm is the number of dms for one [array(ij|kl)], it is also the size of dms and vjk
+ * ncomp is the number of components that produced by intor
+ * shls_slice = [ishstart, ishend, jshstart, jshend, kshstart, kshend, lshstart, lshend]
+ *
+ * ao_loc[i+1] = ao_loc[i] + CINTcgto_spheric(i, bas)  for i = 0..nbas
+ *
+ * Return [(ptr[ncomp,nao,nao] in C-contiguous) for ptr in vjk]
+ */
+void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), JKOperator **jkop,
+                       double **dms, double **vjk, int n_dm, int ncomp,
+                       int *shls_slice, int *ao_loc,
+                       CINTOpt *cintopt, CVHFOpt *vhfopt,
+                       int *atm, int natm, int *bas, int nbas, double *env)
+{
+        direct_blocks(intor, fdot, jkop, dms, vjk, n_dm, ncomp,
+                      shls_slice, ao_loc, cintopt, vhfopt, NULL, 0,
+                      atm, natm, bas, nbas, env);
+}
+
+/*
+ * Same to CVHFnr_direct_drv, but only the shell-quartet blocks listed in
+ * tasks are evaluated.  It is used to distribute the blocks over processes.
+ */
+void CVHFnr_direct_tasks_drv(int (*intor)(), void (*fdot)(), JKOperator **jkop,
+                             double **dms, double **vjk, int n_dm, int ncomp,
+                             int *shls_slice, int *ao_loc,
+                             CINTOpt *cintopt, CVHFOpt *vhfopt,
+                             int *tasks, int ntasks,
+                             int *atm, int natm, int *bas, int nbas, double *env)
+{
+        direct_blocks(intor, fdot, jkop, dms, vjk, n_dm, ncomp,
+                      shls_slice, ao_loc, cintopt, vhfopt, tasks, ntasks,
+                      atm, natm, bas, nbas, env);
+}
+
+/*
+ * Count the shell quartets (i>=j, k>=l, ij>=kl) which pass the prescreen
+ * function of vhfopt.
+ */
+void CVHFnr_direct_count(size_t *count, CVHFOpt *vhfopt,
+                         int *atm, int natm, int *bas, int nbas, double *env)
+{
+        int (*fprescreen)();
+        if (vhfopt) {
+                fprescreen = vhfopt->fprescreen;
+        } else {
+                fprescreen = CVHFnoscreen;
+        }
+        const int npair = nbas * (nbas+1) / 2;
+        size_t n = 0;
+#pragma omp parallel
+{
+        int ij, kl;
+        int shls[4];
+#pragma omp for schedule(dynamic, 4) reduction(+:n)
+        for (ij = 0; ij < npair; ij++) {
+                shls[0] = (int)(sqrt(2*ij+.25) - .5 + 1e-7);
+                shls[1] = ij - shls[0]*(shls[0]+1)/2;
+                for (kl = 0; kl <= ij; kl++) {
+                        shls[2] = (int)(sqrt(2*kl+.25) - .5 + 1e-7);
+                        shls[3] = kl - shls[2]*(shls[2]+1)/2;
+                        if ((*fprescreen)(shls, vhfopt, atm, bas, env)) {
+                                n++;
+                        }
+                }
+        }
+}
+        *count = n;
+}
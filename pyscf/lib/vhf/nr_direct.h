@@ -74,3 +74,12 @@ void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), JKOperator **jkop,
                        int *shls_slice, int *ao_loc,
                        CINTOpt *cintopt, CVHFOpt *vhfopt,
                        int *atm, int natm, int *bas, int nbas, double *env);
+
+int CVHFnr_direct_block_partition(int *block_loc, int *shls_slice, int *ao_loc);
+
+void CVHFnr_direct_tasks_drv(int (*intor)(), void (*fdot)(), JKOperator **jkop,
+                             double **dms, double **vjk, int n_dm, int ncomp,
+                             int *shls_slice, int *ao_loc,
+                             CINTOpt *cintopt, CVHFOpt *vhfopt,
+                             int *tasks, int ntasks,
+                             int *atm, int natm, int *bas, int nbas, double *env);
@@ -55,6 +55,8 @@ class VHFOpt(object):
             cintopt = lib.c_null_ptr()
         ao_loc = make_loc(mol._bas, intor)
         fsetqcond = getattr(libcvhf, qcondname)
+        # The task partition of direct_mp depends on q_cond
+        self._mp_task_groups = None
         natm = ctypes.c_int(mol.natm)
         nbas = ctypes.c_int(mol.nbas)
         fsetqcond(self._this, getattr(libcvhf, intor), cintopt,
@@ -285,6 +287,235 @@ def direct(dms, atm, bas, env, vhfopt=None, hermi=0, cart=False,
         vk = vk.reshape(dms_shape)
     return vj, vk
 
+def direct_mp(dms, atm, bas, env, vhfopt=None, hermi=0, cart=False,
+              with_j=True, with_k=True, nproc=None):
+    '''Multiprocess version of :func:`direct`.
+
+    The shell-quartet blocks of the 8-fold symmetric direct J/K driver are
+    distributed over nproc forked processes.  Blocks are assigned to the
+    processes based on the costs estimated by :func:`direct_block_costs`.
+    The density matrices and the J/K matrices are placed in shared memory.
+    Each process evaluates its blocks with a single thread and adds its
+    contributions to the shared J/K matrices.
+
+    The worker processes are created by fork.  On platforms without fork
+    (e.g. Windows), this function falls back to the serial :func:`direct`.
+
+    Kwargs:
+        nproc : int
+            Number of processes.  By default, lib.num_threads().
+    '''
+    mp = lib.fork_context()
+    if mp is None:
+        return direct(dms, atm, bas, env, vhfopt, hermi, cart, with_j, with_k)
+    if nproc is None:
+        nproc = lib.num_threads()
+    c_atm = numpy.asarray(atm, dtype=numpy.int32, order='C')
+    c_bas = numpy.asarray(bas, dtype=numpy.int32, order='C')
+    c_env = numpy.asarray(env, dtype=numpy.double, order='C')
+    natm = ctypes.c_int(c_atm.shape[0])
+    nbas = ctypes.c_int(c_bas.shape[0])
+
+    dms = numpy.asarray(dms, order='C')
+    dms_shape = dms.shape
+    nao = dms_shape[-1]
+    dms = dms.reshape(-1,nao,nao)
+    n_dm = dms.shape[0]
+
+    if vhfopt is None:
+        if cart:
+            intor = 'int2e_cart'
+        else:
+            intor = 'int2e_sph'
+        cintopt = make_cintopt(c_atm, c_bas, c_env, intor)
+        cvhfopt = lib.c_null_ptr()
+    else:
+        vhfopt.set_dm(dms, atm, bas, env)
+        cvhfopt = vhfopt._this
+        cintopt = vhfopt._cintopt
+        intor = vhfopt._intor
+    cintor = _fpointer(intor)
+    ao_loc = make_loc(bas, intor)
+
+    fjk = []
+    if with_j:
+        fjk.extend([_fpointer('CVHFnrs8_ji_s2kl')] * n_dm)
+    if with_k:
+        if hermi == 1:
+            fjk.extend([_fpointer('CVHFnrs8_li_s2kj')] * n_dm)
+        else:
+            fjk.extend([_fpointer('CVHFnrs8_li_s1kj')] * n_dm)
+    n_ops = len(fjk)
+
+    shm_dms = numpy.ndarray(dms.shape, buffer=mp.RawArray('d', dms.size))
+    shm_dms[:] = dms
+    shm_vjk = numpy.ndarray((n_ops,nao,nao),
+                            buffer=mp.RawArray('d', n_ops*nao*nao))
+    shm_vjk[:] = 0
+    if with_j and with_k:
+        dmsptr = list(shm_dms) * 2
+    else:
+        dmsptr = list(shm_dms)
+    dmsptr = [dm.ctypes.data_as(ctypes.c_void_p) for dm in dmsptr]
+
+    shls_slice = (ctypes.c_int*8)(*([0, c_bas.shape[0]]*4))
+    task_groups = _direct_mp_task_groups(c_bas, ao_loc, vhfopt, nproc)
+
+    fdrv = getattr(libcvhf, 'CVHFnr_direct_tasks_drv')
+    fdot = _fpointer('CVHFdot_nrs8')
+    lock = mp.Lock()
+    def jk_worker(tasks):
+        tasks = numpy.asarray(tasks, dtype=numpy.int32)
+        vjk = numpy.empty((n_ops,nao,nao))
+        vjkptr = [v.ctypes.data_as(ctypes.c_void_p) for v in vjk]
+        fdrv(cintor, fdot, (ctypes.c_void_p*n_ops)(*fjk),
+             (ctypes.c_void_p*n_ops)(*dmsptr), (ctypes.c_void_p*n_ops)(*vjkptr),
+             ctypes.c_int(n_ops), ctypes.c_int(1),
+             shls_slice, ao_loc.ctypes.data_as(ctypes.c_void_p), cintopt, cvhfopt,
+             tasks.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(tasks.size),
+             c_atm.ctypes.data_as(ctypes.c_void_p), natm,
+             c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
+             c_env.ctypes.data_as(ctypes.c_void_p))
+        with lock:
+            shm_vjk[:] += vjk
+
+    task_groups = [t for t in task_groups if len(t) > 0]
+    lib.map_in_processes(jk_worker, task_groups, len(task_groups))
+
+    vjk = numpy.array(shm_vjk)
+    vj = vk = None
+    if with_j:
+        vj = vjk[:n_dm]
+        # vj must be symmetric
+        for i in range(n_dm):
+            lib.hermi_triu(vj[i], 1, inplace=True)
+        vj = vj.reshape(dms_shape)
+    if with_k:
+        vk = vjk[n_ops-n_dm:]
+        if hermi != 0:
+            for i in range(n_dm):
+                lib.hermi_triu(vk[i], hermi, inplace=True)
+        vk = vk.reshape(dms_shape)
+    return vj, vk
+
+def direct_block_costs(bas, ao_loc, vhfopt=None):
+    '''Estimated costs of the shell-quartet blocks of the 8-fold symmetric
+    direct J/K driver (CVHFdot_nrs8), indexed by the block id used by
+    CVHFnr_direct_tasks_drv.
+
+    The cost of a shell quartet is approximated by the product of the
+    numbers of contracted and primitive functions of the four shells.  If
+    the integral estimates q_cond are available in vhfopt and used by the
+    prescreen function, the quartets with q_cond[i,j]*q_cond[k,l] below
+    the direct_scf_tol are not counted.
+    Blocks skipped by the permutation symmetry have zero cost.
+    '''
+    bas = numpy.asarray(bas, dtype=numpy.int32)
+    nbas = bas.shape[0]
+    ao_loc = numpy.asarray(ao_loc, dtype=numpy.int32)
+    block_loc = numpy.empty(nbas+1, dtype=numpy.int32)
+    shls_slice = (ctypes.c_int*2)(0, nbas)
+    nblk = libcvhf.CVHFnr_direct_block_partition(
+        block_loc.ctypes.data_as(ctypes.c_void_p), shls_slice,
+        ao_loc.ctypes.data_as(ctypes.c_void_p))
+    block_loc = block_loc[:nblk+1]
+
+    shl_cost = (ao_loc[1:] - ao_loc[:-1]) * bas[:,gto.NPRIM_OF]
+    q_cond = cutoff = None
+    if (vhfopt is not None and vhfopt._this.contents.q_cond and
+        vhfopt.prescreen != _fpointer('CVHFnoscreen').value):
+        q_cond = numpy.ctypeslib.as_array(
+            (ctypes.c_double*(nbas*nbas)).from_address(vhfopt._this.contents.q_cond))
+        q_cond = q_cond.reshape(nbas,nbas)
+        cutoff = vhfopt.direct_scf_tol
+
+    # For each block pair (I>=J), the sorted q_cond of the shell pairs and the
+    # accumulated costs of the pairs with larger q_cond
+    pairs = {}
+    for I in range(nblk):
+        i0, i1 = block_loc[I:I+2]
+        for J in range(I+1):
+            j0, j1 = block_loc[J:J+2]
+            w = numpy.einsum('i,j->ij', shl_cost[i0:i1], shl_cost[j0:j1])
+            if I == J:
+                w = lib.pack_tril(w)
+            else:
+                w = w.ravel()
+            if q_cond is None:
+                q = numpy.ones_like(w)
+            elif I == J:
+                q = lib.pack_tril(q_cond[i0:i1,j0:j1])
+            else:
+                q = q_cond[i0:i1,j0:j1].ravel()
+            idx = numpy.argsort(q)
+            q = q[idx]
+            w_acc = numpy.append(numpy.cumsum(w[idx][::-1])[::-1], 0)
+            pairs[I,J] = (q, w_acc)
+
+    costs = numpy.zeros((nblk,)*4)
+    for I, J in pairs:
+        qij, wij_acc = pairs[I,J]
+        wij = wij_acc[:-1] - wij_acc[1:]
+        for K in range(I+1):
+            for L in range(K+1):
+                qkl, wkl_acc = pairs[K,L]
+                if q_cond is None:
+                    c = wij_acc[0] * wkl_acc[0]
+                else:
+                    qij_min = cutoff / numpy.maximum(qij, 1e-300)
+                    c = numpy.dot(wij, wkl_acc[numpy.searchsorted(qkl, qij_min, 'right')])
+                if I == K:
+                    c *= .5
+                costs[I,J,K,L] = c
+    return costs.ravel()
+
+def direct_count(vhfopt, atm, bas, env):
+    '''Number of shell quartets (i>=j, k>=l, ij>=kl) which pass the prescreen
+    function of vhfopt.  The density matrix conditions of the last call to
+    vhfopt.set_dm are used by the prescreen function.
+    '''
+    c_atm = numpy.asarray(atm, dtype=numpy.int32, order='C')
+    c_bas = numpy.asarray(bas, dtype=numpy.int32, order='C')
+    c_env = numpy.asarray(env, dtype=numpy.double, order='C')
+    if vhfopt is None:
+        cvhfopt = lib.c_null_ptr()
+    else:
+        cvhfopt = vhfopt._this
+    count = numpy.zeros(1, dtype=numpy.uint64)
+    libcvhf.CVHFnr_direct_count(
+        count.ctypes.data_as(ctypes.c_void_p), cvhfopt,
+        c_atm.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(c_atm.shape[0]),
+        c_bas.ctypes.data_as(ctypes.c_void_p), ctypes.c_int(c_bas.shape[0]),
+        c_env.ctypes.data_as(ctypes.c_void_p))
+    return int(count[0])
+
+def _direct_mp_task_groups(bas, ao_loc, vhfopt, nproc):
+    '''The tasks of the nproc processes of :func:`direct_mp`.  The costs
+    depend on the integral estimates q_cond and the direct_scf_tol of vhfopt
+    only.  The task groups are cached in vhfopt.
+    '''
+    if vhfopt is not None:
+        key = (vhfopt.direct_scf_tol, vhfopt.prescreen, len(bas), nproc)
+        cache = getattr(vhfopt, '_mp_task_groups', None)
+        if cache is not None and cache[0] == key:
+            return cache[1]
+
+    costs = direct_block_costs(bas, ao_loc, vhfopt)
+    tasks = numpy.where(costs > 0)[0]
+    task_groups = _partition_tasks(tasks, costs[tasks], nproc)
+    if vhfopt is not None:
+        vhfopt._mp_task_groups = (key, task_groups)
+    return task_groups
+
+def _partition_tasks(tasks, costs, nproc):
+    '''Distribute tasks over nproc groups with similar total costs.  Tasks
+    are sorted by costs then dealt to the groups in zigzag order.'''
+    idx = numpy.argsort(costs)[::-1]
+    tasks = numpy.asarray(tasks)[idx]
+    zigzag = numpy.append(numpy.arange(nproc), numpy.arange(nproc)[::-1])
+    owner = zigzag[numpy.arange(tasks.size) % (nproc*2)]
+    return [tasks[owner == i] for i in range(nproc)]
+
 # call all fjk for each dm, the return array has len(dms)*len(jkdescript)*ncomp components
 # jkdescript: 'ij->s1kl', 'kl->s2ij', ...
 def direct_mapdm(intor, aosym, jkdescript,
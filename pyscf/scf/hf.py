@@ -23,6 +23,8 @@ Hartree-Fock
 import sys
 import tempfile
 import time
+import contextlib
+import functools
 from functools import reduce
 import numpy
 import scipy.linalg
@@ -41,6 +43,12 @@ PRE_ORTH_METHOD = getattr(__config__, 'scf_analyze_pre_orth_method', 'ANO')
 MO_BASE = getattr(__config__, 'MO_BASE', 1)
 TIGHT_GRAD_CONV_TOL = getattr(__config__, 'scf_hf_kernel_tight_grad_conv_tol', True)
 MUTE_CHKFILE = getattr(__config__, 'scf_hf_SCF_mute_chkfile', False)
+# The direct SCF cutoff of the adaptive screening is max|dm-dm_last| times
+# this factor
+ADAPTIVE_SCF_TOL_SCALE = getattr(__config__, 'scf_hf_adaptive_direct_scf_tol_scale', 1e-4)
+# Rebuild J/K from the full density matrix when the cutoff is tightened by
+# this factor since the last full build
+ADAPTIVE_SCF_TOL_REBUILD = getattr(__config__, 'scf_hf_adaptive_direct_scf_tol_rebuild', 1e-2)
 
 # For code compatiblity in python-2 and python-3
 if sys.version_info >= (3,):
@@ -726,7 +734,8 @@ def dot_eri_dm(eri, dm, hermi=0, with_j=True, with_k=True):
     return vj, vk
 
 
-def get_jk(mol, dm, hermi=1, vhfopt=None, with_j=True, with_k=True, omega=None):
+def get_jk(mol, dm, hermi=1, vhfopt=None, with_j=True, with_k=True, omega=None,
+           nproc=None):
     '''Compute J, K matrices for all input density matrices
 
     Args:
@@ -758,6 +767,11 @@ def get_jk(mol, dm, hermi=1, vhfopt=None, with_j=True, with_k=True, omega=None):
             If specified, integration are evaluated based on the long-range
             part of the range-seperated Coulomb operator.
 
+        nproc : int
+            If greater than 1, the integrals are distributed over nproc
+            processes (see :func:`_vhf.direct_mp`) instead of the OpenMP
+            threads of one process.
+
     Returns:
         Depending on the given dm, the function returns one J and one K matrix,
         or a list of J matrices and a list of K matrices, corresponding to the
@@ -782,17 +796,22 @@ def get_jk(mol, dm, hermi=1, vhfopt=None, with_j=True, with_k=True, omega=None):
         dm = numpy.vstack((dm.real, dm.imag)).reshape(-1,nao,nao)
         hermi = 0
 
+    if nproc is not None and nproc > 1:
+        jkdrv = functools.partial(_vhf.direct_mp, nproc=nproc)
+    else:
+        jkdrv = _vhf.direct
+
     if omega is None:
-        vj, vk = _vhf.direct(dm, mol._atm, mol._bas, mol._env,
-                             vhfopt, hermi, mol.cart, with_j, with_k)
+        vj, vk = jkdrv(dm, mol._atm, mol._bas, mol._env,
+                       vhfopt, hermi, mol.cart, with_j, with_k)
     else:
 # The vhfopt of standard Coulomb operator can be used here as an approximate
 # integral prescreening conditioner since long-range part Coulomb is always
 # smaller than standard Coulomb.  It's safe to filter LR integrals with the
 # integral estimation from standard Coulomb.
         with mol.with_range_coulomb(omega):
-            vj, vk = _vhf.direct(dm, mol._atm, mol._bas, mol._env,
-                                 vhfopt, hermi, mol.cart, with_j, with_k)
+            vj, vk = jkdrv(dm, mol._atm, mol._bas, mol._env,
+                           vhfopt, hermi, mol.cart, with_j, with_k)
 
     if dm_dtype == numpy.complex128:
         if with_j:
@@ -858,6 +877,72 @@ def get_veff(mol, dm, dm_last=None, vhf_last=None, hermi=1, vhfopt=None):
         vj, vk = get_jk(mol, ddm, hermi, vhfopt)
         return vj - vk * .5 + numpy.asarray(vhf_last)
 
+@contextlib.contextmanager
+def adaptive_direct_scf(mf, dm, dm_last=0):
+    '''Convergence-aware screening for the incremental direct SCF J/K build.
+
+    If mf.direct_scf_tol_init is larger than mf.direct_scf_tol, the direct
+    SCF cutoff of the J/K builds within this context is
+    max|dm-dm_last| * ADAPTIVE_SCF_TOL_SCALE, bounded by mf.direct_scf_tol
+    and mf.direct_scf_tol_init.  Integrals skipped by a loose cutoff leave
+    errors in the accumulated potential vhf_last.  The context therefore
+    returns True, requesting a J/K build from the full density matrix, every
+    mf.direct_scf_rebuild cycles and when the cutoff has been tightened by
+    ADAPTIVE_SCF_TOL_REBUILD since the last full build.  Otherwise it
+    returns False, and the cutoff is mf.direct_scf_tol.
+
+    When verbose >= DEBUG, the number of shell quartets evaluated in each
+    J/K build is logged.
+
+    Examples:
+
+    >>> with adaptive_direct_scf(mf, dm, dm_last) as rebuild:
+    ...     if rebuild:
+    ...         dm_last = vhf_last = 0
+    ...     vj, vk = mf.get_jk(mol, dm - dm_last)
+    '''
+    mol = mf.mol
+    log = logger.new_logger(mf)
+    sched = mf._direct_scf_sched
+    rebuild = not isinstance(dm_last, numpy.ndarray)
+    if rebuild:
+        sched['nquartets'] = 0
+
+    def count_quartets(rebuild):
+        if log.verbose >= logger.DEBUG and mf.opt is not None and mf._eri is None:
+            count = _vhf.direct_count(mf.opt, mol._atm, mol._bas, mol._env)
+            sched['nquartets'] = sched.get('nquartets', 0) + count
+            log.debug('direct SCF cutoff %.3g, %s J/K build, '
+                      '%d shell quartets (accumulated %d)',
+                      mf.opt.direct_scf_tol, ('incremental', 'full')[rebuild],
+                      count, sched['nquartets'])
+
+    if mf.direct_scf_tol_init > mf.direct_scf_tol:
+        if mf.opt is None:
+            mf.opt = mf.init_direct_scf(mol)
+        if rebuild:
+            tol = mf.direct_scf_tol_init
+        else:
+            err = abs(numpy.asarray(dm) - dm_last).max()
+            tol = min(mf.direct_scf_tol_init,
+                      max(mf.direct_scf_tol, err * ADAPTIVE_SCF_TOL_SCALE))
+            rebuild = ('ncycle' not in sched or
+                       sched['ncycle'] >= mf.direct_scf_rebuild or
+                       tol < sched['tol_max'] * ADAPTIVE_SCF_TOL_REBUILD)
+        if rebuild:
+            sched['ncycle'] = 0
+            sched['tol_max'] = tol
+        else:
+            sched['ncycle'] += 1
+            sched['tol_max'] = max(sched['tol_max'], tol)
+
+        with lib.temporary_env(mf.opt, direct_scf_tol=tol):
+            yield rebuild
+            count_quartets(rebuild)
+    else:
+        yield False
+        count_quartets(rebuild)
+
 def get_fock(mf, h1e=None, s1e=None, vhf=None, dm=None, cycle=-1, diis=None,
              diis_start_cycle=None, level_shift_factor=None, damp_factor=None):
     '''F = h^{core} + V^{HF}
@@ -1362,6 +1447,18 @@ class SCF(lib.StreamObject):
             Direct SCF is used by default.
         direct_scf_tol : float
             Direct SCF cutoff threshold.  Default is 1e-13.
+        direct_scf_tol_init : float
+            If larger than direct_scf_tol, the direct SCF cutoff is adjusted
+            in each SCF cycle, from direct_scf_tol_init in the early cycles
+            to direct_scf_tol as the density matrix converges (see
+            :func:`adaptive_direct_scf`).  Default is 0 (fixed cutoff).
+        direct_scf_rebuild : int
+            With the adaptive cutoff, the J/K matrices are rebuilt from the
+            full density matrix at least every direct_scf_rebuild cycles.
+        jk_nproc : int
+            Number of processes to compute the direct SCF J/K matrices.  If
+            it is 1 (default), J/K are computed with OpenMP threads in the
+            current process.
         callback : function(envs_dict) => None
             callback function takes one dict as the argument which is
             generated by the builtin function :func:`locals`, so that the
@@ -1414,6 +1511,9 @@ class SCF(lib.StreamObject):
     level_shift = getattr(__config__, 'scf_hf_SCF_level_shift', 0)
     direct_scf = getattr(__config__, 'scf_hf_SCF_direct_scf', True)
     direct_scf_tol = getattr(__config__, 'scf_hf_SCF_direct_scf_tol', 1e-13)
+    direct_scf_tol_init = getattr(__config__, 'scf_hf_SCF_direct_scf_tol_init', 0)
+    direct_scf_rebuild = getattr(__config__, 'scf_hf_SCF_direct_scf_rebuild', 8)
+    jk_nproc = getattr(__config__, 'scf_hf_SCF_jk_nproc', 1)
     conv_check = getattr(__config__, 'scf_hf_SCF_conv_check', True)
 
     def __init__(self, mol):
@@ -1447,11 +1547,13 @@ class SCF(lib.StreamObject):
 
         self.opt = None
         self._eri = None # Note: self._eri requires large amount of memory
+        self._direct_scf_sched = {}
 
         keys = set(('conv_tol', 'conv_tol_grad', 'max_cycle', 'init_guess',
                     'DIIS', 'diis', 'diis_space', 'diis_start_cycle',
                     'diis_file', 'diis_space_rollback', 'damp', 'level_shift',
-                    'direct_scf', 'direct_scf_tol', 'conv_check'))
+                    'direct_scf', 'direct_scf_tol', 'direct_scf_tol_init',
+                    'direct_scf_rebuild', 'jk_nproc', 'conv_check'))
         self._keys = set(self.__dict__.keys()).union(keys)
 
     def build(self, mol=None):
@@ -1489,6 +1591,11 @@ class SCF(lib.StreamObject):
         log.info('direct_scf = %s', self.direct_scf)
         if self.direct_scf:
             log.info('direct_scf_tol = %g', self.direct_scf_tol)
+            if self.direct_scf_tol_init > self.direct_scf_tol:
+                log.info('direct_scf_tol_init = %g', self.direct_scf_tol_init)
+                log.info('direct_scf_rebuild = %d', self.direct_scf_rebuild)
+            if self.jk_nproc > 1:
+                log.info('jk_nproc = %d', self.jk_nproc)
         if self.chkfile:
             log.info('chkfile to save SCF result = %s', self.chkfile)
         log.info('max_memory %d MB (current use %d MB)',
@@ -1685,14 +1792,16 @@ class SCF(lib.StreamObject):
             self.opt = self.init_direct_scf(mol)
 
         if with_j and with_k:
-            vj, vk = get_jk(mol, dm, hermi, self.opt, with_j, with_k, omega)
+            vj, vk = get_jk(mol, dm, hermi, self.opt, with_j, with_k, omega,
+                            self.jk_nproc)
         else:
             if with_j:
                 prescreen = 'CVHFnrs8_vj_prescreen'
             else:
                 prescreen = 'CVHFnrs8_vk_prescreen'
             with lib.temporary_env(self.opt, prescreen=prescreen):
-                vj, vk = get_jk(mol, dm, hermi, self.opt, with_j, with_k, omega)
+                vj, vk = get_jk(mol, dm, hermi, self.opt, with_j, with_k, omega,
+                                self.jk_nproc)
 
         logger.timer(self, 'vj and vk', *cpu0)
         return vj, vk
@@ -1713,8 +1822,11 @@ class SCF(lib.StreamObject):
         if mol is None: mol = self.mol
         if dm is None: dm = self.make_rdm1()
         if self.direct_scf:
-            ddm = numpy.asarray(dm) - dm_last
-            vj, vk = self.get_jk(mol, ddm, hermi=hermi)
+            with adaptive_direct_scf(self, dm, dm_last) as rebuild:
+                if rebuild:
+                    dm_last = vhf_last = 0
+                ddm = numpy.asarray(dm) - dm_last
+                vj, vk = self.get_jk(mol, ddm, hermi=hermi)
             return vhf_last + vj - vk * .5
         else:
             vj, vk = self.get_jk(mol, dm, hermi=hermi)
@@ -1903,8 +2015,11 @@ class RHF(SCF):
             vj, vk = self.get_jk(mol, dm, hermi)
             vhf = vj - vk * .5
         else:
-            ddm = numpy.asarray(dm) - numpy.asarray(dm_last)
-            vj, vk = self.get_jk(mol, ddm, hermi)
+            with adaptive_direct_scf(self, dm, dm_last) as rebuild:
+                if rebuild:
+                    dm_last = vhf_last = 0
+                ddm = numpy.asarray(dm) - numpy.asarray(dm_last)
+                vj, vk = self.get_jk(mol, ddm, hermi)
             vhf = vj - vk * .5
             vhf += numpy.asarray(vhf_last)
         return vhf
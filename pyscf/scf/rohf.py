@@ -412,8 +412,11 @@ class ROHF(hf.RHF):
             vj, vk = self.get_jk(mol, dm, hermi)
             vhf = vj[0] + vj[1] - vk
         else:
-            ddm = dm - numpy.asarray(dm_last)
-            vj, vk = self.get_jk(mol, ddm, hermi)
+            with hf.adaptive_direct_scf(self, dm, dm_last) as rebuild:
+                if rebuild:
+                    dm_last = vhf_last = 0
+                ddm = dm - numpy.asarray(dm_last)
+                vj, vk = self.get_jk(mol, ddm, hermi)
             vhf = vj[0] + vj[1] - vk
             vhf += numpy.asarray(vhf_last)
         return vhf
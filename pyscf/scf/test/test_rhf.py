@@ -706,6 +706,22 @@ H     0    0.757    0.587'''
         self.assertAlmostEqual(abs(vk1 - vk2).max(), 0, 12)
         self.assertAlmostEqual(lib.finger(vk1), -11.399103957754445, 12)
 
+    def test_adaptive_direct_scf(self):
+        mf1 = scf.RHF(mol)
+        mf1.max_memory = 0
+        mf1.conv_tol = 1e-10
+        mf1.direct_scf_tol_init = 1e-8
+        mf1.direct_scf_rebuild = 4
+        self.assertAlmostEqual(mf1.kernel(), mf.e_tot, 9)
+        self.assertAlmostEqual(mf1.opt.direct_scf_tol, mf1.direct_scf_tol, 14)
+        self.assertTrue(mf1._direct_scf_sched['nquartets'] > 0)
+
+        mf1 = scf.UHF(mol)
+        mf1.max_memory = 0
+        mf1.conv_tol = 1e-10
+        mf1.direct_scf_tol_init = 1e-8
+        self.assertAlmostEqual(mf1.kernel(), mf.e_tot, 9)
+
 if __name__ == "__main__":
     print("Full Tests for rhf")
     unittest.main()
@@ -83,6 +83,44 @@ class KnownValues(unittest.TestCase):
         self.assertTrue(numpy.allclose(vk0, vk[0]))
         self.assertTrue(numpy.allclose(vk0, vk[1]))
 
+    def test_direct_mp(self):
+        mol1 = gto.M(atom='''
+O     0    0        0
+H     0    -0.757   0.587
+H     0    0.757    0.587
+O     3    0        0
+H     3    -0.757   0.587
+H     3    0.757    0.587''', basis='ccpvdz', verbose=0)
+        numpy.random.seed(1)
+        nao = mol1.nao_nr()
+        dms = numpy.random.random((2,nao,nao))
+        vhfopt = _vhf.VHFOpt(mol1, 'int2e', 'CVHFnrs8_prescreen',
+                             'CVHFsetnr_direct_scf',
+                             'CVHFsetnr_direct_scf_dm')
+        vj0, vk0 = _vhf.direct(dms, mol1._atm, mol1._bas, mol1._env,
+                               vhfopt=vhfopt, hermi=0)
+        vj1, vk1 = _vhf.direct_mp(dms, mol1._atm, mol1._bas, mol1._env,
+                                  vhfopt=vhfopt, hermi=0, nproc=3)
+        self.assertAlmostEqual(abs(vj0 - vj1).max(), 0, 11)
+        self.assertAlmostEqual(abs(vk0 - vk1).max(), 0, 11)
+
+        # The task partition is cached in vhfopt
+        task_groups = vhfopt._mp_task_groups[1]
+        vj1, vk1 = _vhf.direct_mp(dms, mol1._atm, mol1._bas, mol1._env,
+                                  vhfopt=vhfopt, hermi=0, nproc=3)
+        self.assertTrue(vhfopt._mp_task_groups[1] is task_groups)
+        self.assertAlmostEqual(abs(vk0 - vk1).max(), 0, 11)
+
+        vj1 = _vhf.direct_mp(dms[0], mol1._atm, mol1._bas, mol1._env,
+                             hermi=0, with_k=False, nproc=2)[0]
+        self.assertAlmostEqual(abs(vj0[0] - vj1).max(), 0, 11)
+
+        costs = _vhf.direct_block_costs(mol1._bas, mol1.ao_loc_nr(), vhfopt)
+        costs = costs.reshape(2,2,2,2)
+        self.assertTrue(abs(costs[0,1]).max() == 0)
+        self.assertTrue(abs(costs[0,0,1]).max() == 0)
+        self.assertEqual(costs.argmax(), 0)
+
     def test_direct_bindm(self):
         numpy.random.seed(1)
         dm = numpy.random.random((nao,nao))
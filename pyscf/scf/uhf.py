@@ -785,8 +785,11 @@ class UHF(hf.SCF):
             vj, vk = self.get_jk(mol, dm, hermi)
             vhf = vj[0] + vj[1] - vk
         else:
-            ddm = numpy.asarray(dm) - numpy.asarray(dm_last)
-            vj, vk = self.get_jk(mol, ddm, hermi)
+            with hf.adaptive_direct_scf(self, dm, dm_last) as rebuild:
+                if rebuild:
+                    dm_last = vhf_last = 0
+                ddm = numpy.asarray(dm) - numpy.asarray(dm_last)
+                vj, vk = self.get_jk(mol, ddm, hermi)
             vhf = vj[0] + vj[1] - vk
             vhf += numpy.asarray(vhf_last)
         return vhf